@@ -0,0 +1,228 @@
+"""
+Модуль описывает исполнитель команд терминального клиента (simple_client)
+
+Команды - строки вида "[дата] сумма категория[; комментарий]" (добавить
+расход; дата в формате ISO, например 2024-03-01 или 2024-03-01T12:30,
+по умолчанию - текущее время) или названия списков ("категории",
+"расходы", "бюджет"). В пакетном режиме команды
+читаются из файла или канала: категории ищутся по заранее построенному
+индексу "название -> pk" (одно обращение к словарю вместо перебора
+репозитория на каждый расход), расходы копятся в буфере и записываются
+пачками (add_many), а вместо вывода каждого расхода в конце выводится
+итог.
+
+При загрузке пересекающихся выписок расходы, уже загруженные раньше,
+пропускаются (см. bookkeeper.dedup). Расход без даты так найти нельзя:
+он получает текущее время, поэтому такие строки не сверяются с индексом
+и учитываются в итоге отдельно.
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Iterable, TextIO
+
+from bookkeeper.dedup.abstract_index import AbstractDuplicateIndex
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+
+BATCH_SIZE = 10000  # Сколько расходов записывать одной пачкой.
+LISTS = ('категории', 'расходы', 'бюджет')  # Команды вывода списков.
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+@dataclass
+class BatchSummary:
+    """
+    Итог выполнения команд.
+    lines - число прочитанных непустых строк
+    added - число добавленных расходов
+    total - сумма добавленных расходов
+    unknown_categories - сколько раз встретилась каждая неизвестная категория
+    errors - номера строк, которые не удалось разобрать
+    duplicates - число пропущенных расходов, загруженных раньше
+    near_duplicates - номера строк с расходами, похожими на загруженные
+        раньше (они добавляются, но их стоит проверить)
+    undated - число расходов без даты, не сверявшихся с загруженными раньше
+    """
+    lines: int = 0
+    added: int = 0
+    total: int = 0
+    unknown_categories: Counter[str] = field(default_factory=Counter)
+    errors: list[int] = field(default_factory=list)
+    duplicates: int = 0
+    near_duplicates: list[int] = field(default_factory=list)
+    undated: int = 0
+
+    def __str__(self) -> str:
+        result = [f'строк: {self.lines}, добавлено расходов: {self.added}'
+                  f' на сумму {self.total}']
+        for name, times in self.unknown_categories.most_common():
+            result.append(f'категория {name} не найдена ({times} раз)')
+        if self.duplicates:
+            result.append(f'пропущено загруженных раньше: {self.duplicates}')
+        if self.undated:
+            result.append(f'без даты, не проверены на повторы: {self.undated}')
+        for title, lines in (('похожие на загруженные раньше', self.near_duplicates),
+                             ('ошибки', self.errors)):
+            if lines:
+                shown = ', '.join(map(str, lines[:10]))
+                more = ' ...' if len(lines) > 10 else ''
+                result.append(f'{title} в строках: {shown}{more}')
+        return '\n'.join(result)
+
+
+class CommandExecutor:
+    """
+    Исполнитель команд клиента.
+    Индекс категорий строится при создании исполнителя: категории,
+    добавленные в репозиторий позже, не находятся.
+    Индекс дубликатов доводится до состояния репозитория расходов
+    (AbstractDuplicateIndex.sync) перед загрузкой (execute_all) и после
+    её окончания, а в интерактивном режиме - после каждого расхода.
+    Поэтому строки сверяются с расходами, сохранёнными до начала загрузки,
+    и одинаковые строки одной выписки не считаются дубликатами друг друга.
+    """
+
+    def __init__(self,
+                 budgets: AbstractRepository[Budget],
+                 categories: AbstractRepository[Category],
+                 expenses: AbstractRepository[Expense],
+                 output: TextIO,
+                 batch_size: int = BATCH_SIZE,
+                 duplicates: AbstractDuplicateIndex | None = None,
+                 tolerance: timedelta | None = None) -> None:
+        """
+        output - поток для вывода списков и сообщений
+        batch_size - сколько расходов записывать одной пачкой
+            (1 - записывать каждый расход сразу и выводить его)
+        duplicates - индекс расходов репозитория expenses; если он задан,
+            уже загруженные расходы пропускаются
+        tolerance - допуск по времени для поиска похожих расходов
+            (None - не искать)
+        """
+        if batch_size < 1:
+            raise ValueError(f'batch_size must be positive, got {batch_size}')
+        self.budgets = budgets
+        self.categories = categories
+        self.expenses = expenses
+        self.output = output
+        self.batch_size = batch_size
+        self.duplicates = duplicates
+        self.tolerance = tolerance
+        self.summary = BatchSummary()
+        self._category_pks = {cat.name: cat.pk for cat in categories.get_all()}
+        self._buffer: list[Expense] = []
+        self._batch_date = datetime.now()
+        if duplicates is not None:
+            duplicates.sync(expenses)
+
+    def execute(self, command: str, line_number: int = 0) -> None:
+        """
+        Выполнить одну команду. line_number - номер строки для итога.
+        """
+        command = command.strip()
+        if not command:
+            return
+        self.summary.lines += 1
+        if command in LISTS:
+            self.flush()
+            repositories: dict[str, AbstractRepository[Any]] = {
+                'категории': self.categories,
+                'расходы': self.expenses,
+                'бюджет': self.budgets}
+            print(*repositories[command].get_all(), sep='\n', file=self.output)
+            return
+        parsed = self._parse_expense(command, line_number)
+        if parsed is None:
+            return
+        expense, dated = parsed
+        if self.duplicates is not None and not self._check_duplicate(
+                expense, dated, line_number):
+            return
+        self._buffer.append(expense)
+        self.summary.total += expense.amount
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def _parse_expense(self, command: str,
+                       line_number: int) -> tuple[Expense, bool] | None:
+        """
+        Разобрать команду добавления расхода и вернуть расход и признак того,
+        что дата указана в команде. Если команду не удалось разобрать или
+        категория не найдена, учесть это в итоге и вернуть None.
+        """
+        body, _, comment = command.partition(';')
+        words = body.split()
+        try:
+            expense_date = (datetime.fromisoformat(words.pop(0))
+                            if words and _DATE_RE.match(words[0]) else None)
+            amount = int(words[0])
+        except (ValueError, IndexError):
+            words = []
+        name = ' '.join(words[1:])
+        if not name:
+            self.summary.errors.append(line_number)
+            if self.batch_size == 1:
+                print(f'не удалось разобрать команду {command}', file=self.output)
+            return None
+        pk = self._category_pks.get(name)
+        if pk is None:
+            self.summary.unknown_categories[name] += 1
+            if self.batch_size == 1:
+                print(f'категория {name} не найдена', file=self.output)
+            return None
+        if not self._buffer:
+            self._batch_date = datetime.now()
+        return (Expense(amount, pk, expense_date or self._batch_date,
+                        self._batch_date, comment.strip()),
+                expense_date is not None)
+
+    def _check_duplicate(self, expense: Expense, dated: bool, line_number: int) -> bool:
+        """
+        Сверить расход с индексом дубликатов. Вернуть False, если расход
+        уже загружен и его нужно пропустить.
+        """
+        assert self.duplicates is not None
+        if not dated:
+            self.summary.undated += 1
+            return True
+        if self.duplicates.is_duplicate(expense):
+            self.summary.duplicates += 1
+            return False
+        if (self.tolerance is not None
+                and self.duplicates.is_near_duplicate(expense, self.tolerance)):
+            self.summary.near_duplicates.append(line_number)
+        return True
+
+    def execute_all(self, lines: Iterable[str]) -> BatchSummary:
+        """
+        Выполнить команды из lines (например, из открытого файла)
+        и записать оставшиеся расходы.
+        """
+        if self.duplicates is not None:
+            self.duplicates.sync(self.expenses)
+        for line_number, line in enumerate(lines, 1):
+            self.execute(line, line_number)
+        self.flush()
+        if self.duplicates is not None:
+            self.duplicates.sync(self.expenses)
+        return self.summary
+
+    def flush(self) -> None:
+        """
+        Записать накопленные расходы. Расходы одной пачки получают одну
+        дату - время чтения первой строки пачки.
+        """
+        if not self._buffer:
+            return
+        self.expenses.add_many(self._buffer)
+        self.summary.added += len(self._buffer)
+        if self.batch_size == 1:
+            print(*self._buffer, sep='\n', file=self.output)
+            if self.duplicates is not None:
+                self.duplicates.sync(self.expenses)
+        self._buffer = []
@@ -0,0 +1,287 @@
+"""
+Модуль содержит описание абстрактного индекса дубликатов расходов
+
+Если выписки, которые импортируются, пересекаются по времени, одни и те же
+расходы приходят повторно. Индекс хранит для каждого загруженного расхода
+два канонических хэша:
+- точный - от даты, суммы, валюты, категории и комментария: совпадение
+  означает, что расход уже загружен;
+- приблизительный - от тех же полей без даты, вместе с моментом расхода:
+  по нему находятся расходы, отличающиеся только временем в пределах
+  заданного допуска (например, банк округлил время операции).
+Комментарий сравнивается без учёта регистра и лишних пробелов.
+
+Индекс - производная от репозитория расходов: он хранит ключи по pk
+расхода и догоняет репозиторий по его ленте изменений (sync), так что
+удалённые и изменённые расходы перестают считаться загруженными. Версия
+репозитория, до которой индекс доведён, хранится вместе с ключами; если
+нужные изменения уже не хранятся в ленте, индекс строится заново.
+
+Перед индексом стоят фильтры Блума (см. bookkeeper.dedup.bloom): для
+расхода, которого в индексе нет, - а при импорте новых операций таких
+большинство - проверка стоит одного хэширования и нескольких обращений
+к битовому массиву в памяти, без обращения к индексу.
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from hashlib import blake2b
+from typing import Iterable
+
+import numpy as np
+
+from bookkeeper.dedup.bloom import BloomFilter
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.change_feed import OP_DELETE, OP_RESET, ChangeFeedGap
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Ключи расхода: точный хэш, приблизительный хэш, момент расхода в микросекундах
+ExpenseKeys = tuple[int, int, int]
+
+
+def _hash(text: str) -> int:
+    """ 64-битный хэш строки со знаком (помещается в INTEGER SQLite) """
+    return int.from_bytes(blake2b(text.encode(), digest_size=8).digest(),
+                          'little', signed=True)
+
+
+def expense_keys(expense: Expense) -> ExpenseKeys:
+    """
+    Получить точный и приблизительный хэши расхода и момент расхода.
+    """
+    comment = ' '.join(expense.comment.casefold().split())
+    near = f'{expense.amount}|{expense.currency}|{expense.category}|{comment}'
+    exact = f'{expense.expense_date.isoformat(timespec="microseconds")}|{near}'
+    return _hash(exact), _hash(near), (expense.expense_date - EPOCH) // MICROSECOND
+
+
+@dataclass
+class DuplicateStats:
+    """
+    Статистика проверок.
+    checks - число проверок
+    lookups - сколько из них дошло до индекса (фильтр ответил "да")
+    false_positives - сколько обращений к индексу оказались лишними
+    """
+    checks: int = 0
+    lookups: int = 0
+    false_positives: int = 0
+
+
+class AbstractDuplicateIndex(ABC):
+    """
+    Абстрактный индекс дубликатов.
+    version - версия репозитория расходов, до которой доведён индекс
+    Абстрактные методы:
+    _transaction
+    _insert
+    _delete
+    _clear
+    _save_version
+    _contains
+    _near
+    _keys
+    __len__
+
+    Наследник, загрузивший ключи и версию из хранилища, вызывает
+    _rebuild_filters.
+    """
+
+    def __init__(self, capacity: int = 1 << 20, error_rate: float = 0.01) -> None:
+        """
+        capacity - ожидаемое число расходов; при его превышении фильтры
+            перестраиваются вдвое большими
+        error_rate - доля расходов без дубликата, для которых всё же
+            придётся обратиться к индексу
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.version = 0
+        self.stats = DuplicateStats()
+        self._exact_filter = BloomFilter(capacity, error_rate)
+        self._near_filter = BloomFilter(capacity, error_rate)
+
+    def add(self, expense: Expense) -> None:
+        """ Запомнить сохранённый расход (или его новое состояние) """
+        self.add_many([expense])
+
+    def add_many(self, expenses: Iterable[Expense]) -> None:
+        """ Запомнить сохранённые расходы (или их новые состояния) """
+        rows = [(expense.pk, expense_keys(expense)) for expense in expenses]
+        for pk, _ in rows:
+            if pk == 0:
+                raise ValueError('expense must be saved to a repository first')
+        with self._transaction():
+            self._insert(rows)
+        self._add_to_filters(rows)
+
+    def remove(self, pk: int) -> None:
+        """
+        Забыть расход с id pk (например, удалённый пользователем), чтобы его
+        можно было загрузить снова. Фильтры не меняются: из фильтра Блума
+        нельзя удалить ключ, это лишь добавляет ложные срабатывания.
+        """
+        with self._transaction():
+            self._delete([pk])
+
+    def rebuild(self, expenses: Iterable[Expense], version: int = 0) -> None:
+        """
+        Заменить содержимое индекса расходами expenses - состоянием
+        репозитория версии version.
+        """
+        rows = [(expense.pk, expense_keys(expense)) for expense in expenses]
+        with self._transaction():
+            self._clear()
+            self._insert(rows)
+            self._save_version(version)
+        self.version = version
+        self._rebuild_filters()
+
+    def sync(self, repository: AbstractRepository[Expense]) -> int:
+        """
+        Довести индекс до текущего состояния репозитория расходов: применить
+        изменения, сделанные после self.version, одной транзакцией. Если
+        они не сохранились в ленте (или репозиторий её не поддерживает),
+        индекс строится заново. Вернуть число применённых изменений
+        (при построении заново - число расходов).
+        """
+        try:
+            changes = repository.changes(self.version)
+        except (ChangeFeedGap, NotImplementedError):
+            changes = []
+            reset = True
+        else:
+            reset = any(change.op == OP_RESET for change in changes)
+        if reset:
+            try:
+                version = repository.version
+            except NotImplementedError:
+                version = 0
+            # Версия читается до расходов: изменения между чтениями будут
+            # применены повторно при следующей синхронизации, а не потеряны.
+            self.rebuild(repository.get_all(), version)
+            return len(self)
+        if not changes:
+            return 0
+        deleted: set[int] = set()
+        inserted: dict[int, ExpenseKeys] = {}
+        for change in changes:
+            # Объект изменения мог быть прочитан уже после удаления (None).
+            if change.op == OP_DELETE or change.obj is None:
+                deleted.add(change.pk)
+                inserted.pop(change.pk, None)
+            else:
+                deleted.discard(change.pk)
+                inserted[change.pk] = expense_keys(change.obj)
+        rows = list(inserted.items())
+        with self._transaction():
+            self._delete(sorted(deleted))
+            self._insert(rows)
+            self._save_version(changes[-1].version)
+        self.version = changes[-1].version
+        self._add_to_filters(rows)
+        return len(changes)
+
+    def is_duplicate(self, expense: Expense) -> bool:
+        """ Загружен ли уже расход с теми же датой, суммой, категорией и т. д. """
+        self.stats.checks += 1
+        exact, _, _ = expense_keys(expense)
+        if exact not in self._exact_filter:
+            return False
+        self.stats.lookups += 1
+        if self._contains(exact):
+            return True
+        self.stats.false_positives += 1
+        return False
+
+    def is_near_duplicate(self, expense: Expense, tolerance: timedelta) -> bool:
+        """
+        Загружен ли расход с той же суммой, категорией и комментарием,
+        время которого отличается от времени expense не больше чем на
+        tolerance (точный дубликат тоже считается).
+        """
+        self.stats.checks += 1
+        _, near, at = expense_keys(expense)
+        if near not in self._near_filter:
+            return False
+        self.stats.lookups += 1
+        delta = tolerance // MICROSECOND
+        if self._near(near, at - delta, at + delta):
+            return True
+        self.stats.false_positives += 1
+        return False
+
+    def _add_to_filters(self, rows: list[tuple[int, ExpenseKeys]]) -> None:
+        """ Добавить в фильтры ключи записанных расходов """
+        if not rows:
+            return
+        if len(self) > self.capacity:
+            self._rebuild_filters()
+            return
+        self._exact_filter.add_many(np.array([keys[0] for _, keys in rows], np.int64))
+        self._near_filter.add_many(np.array([keys[1] for _, keys in rows], np.int64))
+
+    def _rebuild_filters(self) -> None:
+        """
+        Построить фильтры заново по всем ключам индекса, увеличив их,
+        если ключей больше capacity.
+        """
+        while self.capacity < len(self):
+            self.capacity *= 2
+        exact, near = self._keys()
+        self._exact_filter = BloomFilter(self.capacity, self.error_rate)
+        self._exact_filter.add_many(exact)
+        self._near_filter = BloomFilter(self.capacity, self.error_rate)
+        self._near_filter.add_many(near)
+
+    @abstractmethod
+    def _transaction(self) -> AbstractContextManager[object]:
+        """
+        Контекстный менеджер, внутри которого изменения индекса
+        записываются целиком или не записываются совсем
+        """
+
+    @abstractmethod
+    def _insert(self, rows: list[tuple[int, ExpenseKeys]]) -> None:
+        """
+        Записать ключи расходов с данными pk, заменив прежние ключи этих pk
+        """
+
+    @abstractmethod
+    def _delete(self, pks: list[int]) -> None:
+        """ Удалить ключи расходов с данными pk, если они есть """
+
+    @abstractmethod
+    def _clear(self) -> None:
+        """ Удалить все ключи """
+
+    @abstractmethod
+    def _save_version(self, version: int) -> None:
+        """ Запомнить версию репозитория, до которой доведён индекс """
+
+    @abstractmethod
+    def _contains(self, exact: int) -> bool:
+        """ Есть ли в индексе точный хэш exact """
+
+    @abstractmethod
+    def _near(self, near: int, start: int, end: int) -> bool:
+        """
+        Есть ли в индексе приблизительный хэш near с моментом расхода
+        от start до end включительно
+        """
+
+    @abstractmethod
+    def _keys(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Различные точные и различные приблизительные хэши индекса
+        (массивы int64)
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """ Число расходов в индексе """
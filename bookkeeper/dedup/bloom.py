@@ -0,0 +1,69 @@
+"""
+Модуль описывает фильтр Блума для 64-битных ключей
+
+Фильтр отвечает на вопрос "встречался ли ключ" без обращения к индексу:
+ответ "нет" всегда верен, ответ "да" бывает ложным с вероятностью около
+error_rate, пока число ключей не превышает capacity. Позиции битов
+получаются из двух половин ключа (двойное хэширование), поэтому ключ
+должен быть уже хорошо перемешан (см. bookkeeper.dedup.abstract_index).
+"""
+
+from math import ceil, log
+from typing import Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+_MASK32 = 0xFFFFFFFF
+
+
+class BloomFilter:
+    """
+    Фильтр Блума.
+    size - число битов
+    hashes - число проверяемых битов на ключ
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        """
+        capacity - ожидаемое число ключей
+        error_rate - допустимая доля ложных срабатываний при capacity ключах
+        """
+        if capacity < 1:
+            raise ValueError(f'capacity must be positive, got {capacity}')
+        if not 0 < error_rate < 1:
+            raise ValueError(f'error_rate must be in (0, 1), got {error_rate}')
+        self.size = max(64, ceil(-capacity * log(error_rate) / log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key: int) -> None:
+        """ Добавить ключ """
+        bits = self._bits
+        first, step = key & _MASK32, (key >> 32) & _MASK32 | 1
+        for i in range(self.hashes):
+            position = (first + i * step) % self.size
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def add_many(self, keys: Iterable[int] | np.ndarray) -> None:
+        """ Добавить ключи (массив numpy добавляется без цикла по ключам) """
+        array: npt.NDArray[np.int64] = np.asarray(
+            keys if isinstance(keys, np.ndarray) else list(keys), dtype=np.int64)
+        if not array.size:
+            return
+        bits = np.frombuffer(self._bits, dtype=np.uint8)
+        first = array & _MASK32
+        step = (array >> 32) & _MASK32 | 1
+        for i in range(self.hashes):
+            positions = (first + i * step) % self.size
+            np.bitwise_or.at(bits, positions >> 3,
+                             np.left_shift(1, positions & 7).astype(np.uint8))
+
+    def __contains__(self, key: int) -> bool:
+        bits = self._bits
+        first, step = key & _MASK32, (key >> 32) & _MASK32 | 1
+        for i in range(self.hashes):
+            position = (first + i * step) % self.size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
@@ -0,0 +1,73 @@
+"""
+Модуль описывает индекс дубликатов, работающий в оперативной памяти
+"""
+
+from bisect import bisect_left, insort
+from collections import Counter
+from contextlib import AbstractContextManager, nullcontext
+
+import numpy as np
+
+from bookkeeper.dedup.abstract_index import AbstractDuplicateIndex, ExpenseKeys
+
+
+class MemoryDuplicateIndex(AbstractDuplicateIndex):
+    """
+    Индекс дубликатов в оперативной памяти: ключи по pk расходов, счётчик
+    точных хэшей и для каждого приблизительного хэша отсортированный
+    список моментов расходов, по которому диапазон времени ищется
+    двоичным поиском.
+    """
+
+    def __init__(self, capacity: int = 1 << 20, error_rate: float = 0.01) -> None:
+        super().__init__(capacity, error_rate)
+        self._by_pk: dict[int, ExpenseKeys] = {}
+        self._exact: Counter[int] = Counter()
+        self._near_times: dict[int, list[int]] = {}
+
+    def _transaction(self) -> AbstractContextManager[object]:
+        return nullcontext()
+
+    def _insert(self, rows: list[tuple[int, ExpenseKeys]]) -> None:
+        self._delete([pk for pk, _ in rows])
+        for pk, (exact, near, at) in rows:
+            self._by_pk[pk] = exact, near, at
+            self._exact[exact] += 1
+            insort(self._near_times.setdefault(near, []), at)
+
+    def _delete(self, pks: list[int]) -> None:
+        for pk in pks:
+            keys = self._by_pk.pop(pk, None)
+            if keys is None:
+                continue
+            exact, near, at = keys
+            self._exact[exact] -= 1
+            if not self._exact[exact]:
+                del self._exact[exact]
+            times = self._near_times[near]
+            del times[bisect_left(times, at)]
+            if not times:
+                del self._near_times[near]
+
+    def _clear(self) -> None:
+        self._by_pk.clear()
+        self._exact.clear()
+        self._near_times.clear()
+
+    def _save_version(self, version: int) -> None:
+        pass
+
+    def _contains(self, exact: int) -> bool:
+        return exact in self._exact
+
+    def _near(self, near: int, start: int, end: int) -> bool:
+        times = self._near_times.get(near, [])
+        index = bisect_left(times, start)
+        return index < len(times) and times[index] <= end
+
+    def _keys(self) -> tuple[np.ndarray, np.ndarray]:
+        return (np.fromiter(self._exact, np.int64, len(self._exact)),
+                np.fromiter(self._near_times, np.int64, len(self._near_times)))
+
+    def __len__(self) -> int:
+        return len(self._by_pk)
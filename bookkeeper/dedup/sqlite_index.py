@@ -0,0 +1,106 @@
+"""
+Модуль описывает индекс дубликатов, хранящийся в базе данных SQLite
+"""
+
+import sqlite3
+from contextlib import AbstractContextManager
+from pathlib import Path
+
+import numpy as np
+
+from bookkeeper.dedup.abstract_index import AbstractDuplicateIndex, ExpenseKeys
+
+
+class SQLiteDuplicateIndex(AbstractDuplicateIndex):
+    """
+    Индекс дубликатов в таблице базы данных SQLite, сохраняющийся между
+    запусками. Обычно таблица лежит в той же базе, что и расходы
+    (см. SQLiteRepository), и индекс догоняет их при открытии (sync).
+    Ключи хранятся по pk расхода; поиск точного хэша и поиск по времени
+    (приблизительный хэш, момент) - обращения к индексам таблицы.
+    Версия репозитория хранится в таблице <имя таблицы>_meta и
+    записывается в одной транзакции с ключами. Фильтры Блума строятся
+    при открытии по ключам из таблицы.
+    """
+
+    def __init__(self, db_file: str | Path, table_name: str = 'expense_duplicates',
+                 capacity: int = 1 << 20, error_rate: float = 0.01) -> None:
+        """
+        db_file - путь до файла базы данных
+        table_name - имя таблицы индекса
+        """
+        super().__init__(capacity, error_rate)
+        self._connection = sqlite3.connect(db_file)
+        self._table_name = table_name
+        self._meta_table_name = f'{table_name}_meta'
+        with self._connection:
+            columns = {row[1] for row in self._connection.execute(
+                f'PRAGMA table_info({table_name})')}
+            if columns and 'pk' not in columns:
+                # Таблица прежнего формата, без pk расходов: индекс
+                # производный, поэтому он строится заново (см. sync).
+                self._connection.execute(f'DROP TABLE {table_name}')
+                self._connection.execute(
+                    f'DROP TABLE IF EXISTS {self._meta_table_name}')
+            self._connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {table_name} (pk INTEGER PRIMARY KEY, '
+                f'exact INTEGER NOT NULL, near INTEGER NOT NULL, at INTEGER NOT NULL)')
+            self._connection.execute(
+                f'CREATE INDEX IF NOT EXISTS {table_name}_exact ON {table_name} (exact)')
+            self._connection.execute(
+                f'CREATE INDEX IF NOT EXISTS {table_name}_near '
+                f'ON {table_name} (near, at)')
+            self._connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {self._meta_table_name} '
+                f'(key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        row = self._connection.execute(
+            f"SELECT value FROM {self._meta_table_name} WHERE key = 'version'"
+        ).fetchone()
+        self.version = 0 if row is None else row[0]
+        self._rebuild_filters()
+
+    def _transaction(self) -> AbstractContextManager[object]:
+        return self._connection
+
+    def _insert(self, rows: list[tuple[int, ExpenseKeys]]) -> None:
+        self._connection.executemany(
+            f'INSERT OR REPLACE INTO {self._table_name} (pk, exact, near, at) '
+            f'VALUES (?, ?, ?, ?)', [(pk, *keys) for pk, keys in rows])
+
+    def _delete(self, pks: list[int]) -> None:
+        self._connection.executemany(
+            f'DELETE FROM {self._table_name} WHERE pk = ?', [(pk,) for pk in pks])
+
+    def _clear(self) -> None:
+        self._connection.execute(f'DELETE FROM {self._table_name}')
+
+    def _save_version(self, version: int) -> None:
+        self._connection.execute(
+            f'INSERT OR REPLACE INTO {self._meta_table_name} (key, value) '
+            f"VALUES ('version', ?)", (version,))
+
+    def _contains(self, exact: int) -> bool:
+        return self._connection.execute(
+            f'SELECT 1 FROM {self._table_name} WHERE exact = ? LIMIT 1',
+            (exact,)).fetchone() is not None
+
+    def _near(self, near: int, start: int, end: int) -> bool:
+        return self._connection.execute(
+            f'SELECT 1 FROM {self._table_name} '
+            f'WHERE near = ? AND at BETWEEN ? AND ? LIMIT 1',
+            (near, start, end)).fetchone() is not None
+
+    def _keys(self) -> tuple[np.ndarray, np.ndarray]:
+        exact = self._connection.execute(f'SELECT DISTINCT exact FROM {self._table_name}')
+        near = self._connection.execute(f'SELECT DISTINCT near FROM {self._table_name}')
+        return (np.fromiter((key for (key,) in exact), np.int64),
+                np.fromiter((key for (key,) in near), np.int64))
+
+    def __len__(self) -> int:
+        (size,) = self._connection.execute(
+            f'SELECT count(*) FROM {self._table_name}').fetchone()
+        return int(size)
+
+    def close(self) -> None:
+        """ Закрыть соединение с базой данных """
+        self._connection.close()
@@ -2,8 +2,10 @@
 Основной скрипт проекта, который следует запускать,
 чтобы работать с приложением через графический интерфейс.
 """
+import locale
 import sys
 import traceback
+from datetime import date
 
 import settings
 
@@ -15,8 +17,13 @@ from bookkeeper import utils
 from bookkeeper.models.budget import Budget
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
+from bookkeeper.models.money import FxRates
+from bookkeeper.models.recurring_expense import RecurringExpense
 from bookkeeper.presenter.bookkeeper import BookkeeperPresenter
 from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.unit_of_work import MemoryUnitOfWork
+from bookkeeper.repository.versioned_repository import VersionedMemoryRepository
+from bookkeeper.search.memory_index import MemorySearchIndex
 from bookkeeper.view.qtgui_view import QtGUIView
 
 
@@ -24,9 +31,14 @@ def main() -> None:
     """
     Главная функция приложения.
     """
-    repository_budgets = MemoryRepository[Budget]()
-    repository_categories = MemoryRepository[Category]()
+    # Бюджеты и категории хранят историю версий (можно узнать их на прошлую дату).
+    repository_budgets = VersionedMemoryRepository[Budget]()
+    repository_categories = VersionedMemoryRepository[Category]()
     repository_expenses = MemoryRepository[Expense]()
+    repository_recurring = MemoryRepository[RecurringExpense]()
+    repository_categories.add_foreign_key('parent', repository_categories)
+    for repository in (repository_budgets, repository_expenses, repository_recurring):
+        repository.add_foreign_key('category', repository_categories)
 
     cats = '''
     продукты
@@ -38,23 +50,47 @@ def main() -> None:
     одежда
     '''.splitlines()
 
-    Category.create_from_tree(utils.read_tree(cats), repository_categories)
-    repository_expenses.add(Expense(category=1, amount=1714, comment='Гречка'))
-    repository_expenses.add(Expense(category=4, amount=199914, comment='Пельмени'))
+    tree = Category.create_from_paths(utils.iter_tree(cats), repository_categories)
+    food = tree[('продукты',)].pk
+    meat_products = tree['продукты', 'мясо', 'мясные продукты'].pk
+    books = tree[('книги',)].pk
+    clothes = tree[('одежда',)].pk
+    repository_expenses.add(Expense(category=food, amount=1714, comment='Гречка'))
+    repository_expenses.add(Expense(category=meat_products, amount=199914,
+                                    comment='Пельмени'))
 
-    repository_budgets.add(Budget(period='день', amount=100, category=6))
-    repository_budgets.add(Budget(period='неделя', amount=700, category=6))
-    repository_budgets.add(Budget(period='месяц', amount=3000, category=6))
-    repository_budgets.add(Budget(period='день', amount=200, category=7))
-    repository_budgets.add(Budget(period='неделя', amount=1400, category=7))
-    repository_budgets.add(Budget(period='месяц', amount=6000, category=7))
+    repository_budgets.add(Budget(period='день', amount=100, category=books))
+    repository_budgets.add(Budget(period='неделя', amount=700, category=books))
+    repository_budgets.add(Budget(period='месяц', amount=3000, category=books))
+    repository_budgets.add(Budget(period='день', amount=200, category=clothes))
+    repository_budgets.add(Budget(period='неделя', amount=1400, category=clothes))
+    repository_budgets.add(Budget(period='месяц', amount=6000, category=clothes))
 
+    repository_recurring.add(RecurringExpense(
+        amount=299, category=books, period='месяц', comment='Подписка'))
+
+    fx_rates = FxRates()
+    fx_rates.add('USD', date(2024, 1, 1), '89.69')
+    fx_rates.add('EUR', date(2024, 1, 1), '99.19')
+    repository_expenses.add(Expense(category=books, amount=12, currency='EUR',
+                                    comment='Электронная книга'))
+
+    try:
+        # Разделители разрядов в таблицах берутся из локали пользователя.
+        locale.setlocale(locale.LC_NUMERIC, '')
+    except locale.Error:
+        pass
     view = QtGUIView()
     bookkeeper_presenter = BookkeeperPresenter(
         repository_budgets,
         repository_categories,
         repository_expenses,
         view,
+        MemorySearchIndex(),
+        repository_recurring,
+        fx_rates=fx_rates,
+        unit_of_work=MemoryUnitOfWork([repository_budgets, repository_categories,
+                                       repository_expenses, repository_recurring]),
     )
     bookkeeper_presenter.run()
 
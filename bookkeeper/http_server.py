@@ -0,0 +1,56 @@
+"""
+Скрипт для запуска приложения без графического интерфейса,
+в виде HTTP-сервера с JSON API (см. bookkeeper.view.http_view).
+"""
+import argparse
+import sys
+import traceback
+
+import settings
+
+if (base_dir_str := str(settings.BASE_DIR)) not in sys.path:
+    sys.path.append(base_dir_str)
+# Это костыль, чтобы не было ошибки ModuleNotFoundError.
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.models.recurring_expense import RecurringExpense
+from bookkeeper.presenter.bookkeeper import BookkeeperPresenter
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.search.memory_index import MemorySearchIndex
+from bookkeeper.view.http_view import HTTPView
+
+
+def main() -> None:
+    """
+    Главная функция сервера.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default=settings.HTTP_SERVER_HOST,
+                        help='адрес для приёма соединений '
+                             '(0.0.0.0 - принимать из локальной сети)')
+    parser.add_argument('--port', type=int, default=settings.HTTP_SERVER_PORT)
+    args = parser.parse_args()
+
+    view = HTTPView(args.host, args.port)
+    bookkeeper_presenter = BookkeeperPresenter(
+        MemoryRepository[Budget](),
+        MemoryRepository[Category](),
+        MemoryRepository[Expense](),
+        view,
+        MemorySearchIndex(),
+        MemoryRepository[RecurringExpense](),
+    )
+    print(f'Сервер запущен на http://{args.host}:{args.port}/')
+    bookkeeper_presenter.run()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
+    except Exception as exc:
+        print(f'Произошла ошибка ({exc}), обратитесь к разработчику:')
+        print(''.join(traceback.format_exception(exc)))
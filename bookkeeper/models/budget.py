@@ -3,14 +3,18 @@
 """
 from dataclasses import dataclass
 
+from .money import BASE_CURRENCY
+
 
 @dataclass
 class Budget:
     """
     Бюджет, хранит срок в атрибуте period, сумму в атрибуте amount и ссылку (id) на
-    категорию данного бюджета в атрибуте category
+    категорию данного бюджета в атрибуте category, код валюты суммы - в атрибуте
+    currency
     """
     period: str
     category: int
     amount: int
+    currency: str = BASE_CURRENCY
     pk: int = 0
@@ -3,9 +3,10 @@
 """
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Iterator
+from typing import Iterable, Iterator
 
 from ..repository.abstract_repository import AbstractRepository
+from ..utils import paused_gc
 
 
 @dataclass
@@ -100,6 +101,9 @@ class Category:
         со стороны СУБД, результат, возможно, будет корректным, если исходные
         данные корректны за исключением сортировки. Если нет, то нет.
         "Мусор на входе, мусор на выходе".
+        Родитель ищется по имени, поэтому одинаковые имена в разных ветках
+        смешиваются; в таком случае и для больших деревьев следует
+        использовать create_from_paths.
 
         Parameters
         ----------
@@ -116,3 +120,64 @@ class Category:
             repo.add(cat)
             created[child] = cat
         return list(created.values())
+
+    @classmethod
+    def create_from_paths(
+            cls,
+            paths: Iterable[tuple[str, ...]],
+            repo: AbstractRepository['Category'],
+            batch_size: int = 10_000) -> dict[tuple[str, ...], 'Category']:
+        """
+        Создать дерево категорий из путей (см. bookkeeper.utils.iter_tree).
+        Категория определяется путём, а не именем, поэтому одинаковые имена
+        в разных ветках не смешиваются; повторно встреченный путь
+        пропускается. Родитель должен встретиться раньше потомков, иначе
+        вызывается KeyError.
+
+        Пути читаются лениво. Категории записываются пакетами (add_many)
+        не больше batch_size штук, внутри пакета - по уровням дерева,
+        чтобы pk родителей были известны до записи потомков.
+
+        Parameters
+        ----------
+        paths - пути к категориям от категории верхнего уровня
+        repo - репозиторий для сохранения объектов
+        batch_size - размер пакета записи
+
+        Returns
+        -------
+        Индекс дерева: словарь путь -> созданный объект Category
+        """
+        index: dict[tuple[str, ...], Category] = {}
+        # Категории, ещё не записанные в репозиторий, по уровням дерева,
+        # вместе с их родителями.
+        levels: dict[int, list[tuple[Category | None, Category]]] = defaultdict(list)
+        pending = 0
+
+        def flush() -> None:
+            for depth in sorted(levels):
+                level = levels[depth]
+                for parent, cat in level:
+                    if parent is not None:
+                        cat.parent = parent.pk
+                repo.add_many(cat for _, cat in level)
+            levels.clear()
+
+        with paused_gc():
+            for path in paths:
+                cat = cls(path[-1])
+                if index.setdefault(path, cat) is not cat:
+                    continue
+                parent = None
+                if len(path) > 1:
+                    parent = index.get(path[:-1])
+                    if parent is None:
+                        del index[path]
+                        raise KeyError(path[:-1])
+                levels[len(path)].append((parent, cat))
+                pending += 1
+                if pending >= batch_size:
+                    flush()
+                    pending = 0
+            flush()
+        return index
@@ -0,0 +1,105 @@
+"""
+Модуль описывает операции над поддеревьями категорий: удаление (вместе
+с зависимыми записями или с передачей их другой категории), перенос
+поддерева под другого родителя и слияние двух категорий.
+
+Каждый шаг операции - одно множественное изменение репозитория
+(update_where, delete_where) по множеству pk всего поддерева, а не
+обращение к репозиторию для каждого затронутого расхода. Шаги упорядочены
+так, что прерванная операция не оставляет ссылок на удалённые категории:
+зависимые записи изменяются или удаляются раньше категорий. Чтобы операция
+выполнялась целиком или не выполнялась совсем, её вызывают в блоке единицы
+работы (см. bookkeeper.repository.unit_of_work).
+
+Зависимые репозитории передаются списком пар (репозиторий, название поля
+со ссылкой на категорию), например [(expense_repo, 'category')].
+"""
+
+from collections import defaultdict
+from typing import Any, Sequence
+
+from bookkeeper.models.category import Category
+from bookkeeper.repository.abstract_repository import AbstractRepository
+
+Dependents = Sequence[tuple[AbstractRepository[Any], str]]
+
+
+def subtree(pk: int, repo: AbstractRepository[Category]) -> set[int]:
+    """
+    Получить pk категории и всех её подкатегорий разного уровня.
+    Дерево читается из репозитория одним запросом.
+    Если категории нет, вызывается KeyError.
+    """
+    children: dict[int | None, list[int]] = defaultdict(list)
+    known = set()
+    for cat in repo.get_all():
+        children[cat.parent].append(cat.pk)
+        known.add(cat.pk)
+    if pk not in known:
+        raise KeyError(pk)
+    result = {pk}
+    stack = [pk]
+    while stack:
+        for child in children[stack.pop()]:
+            if child not in result:
+                result.add(child)
+                stack.append(child)
+    return result
+
+
+def delete_category(pk: int,
+                    repo: AbstractRepository[Category],
+                    dependents: Dependents,
+                    reassign_to: int | None = None) -> None:
+    """
+    Удалить категорию.
+    Если reassign_to не задан, удаляется всё поддерево категории вместе
+    со всеми ссылающимися на него записями. Иначе удаляется только сама
+    категория, а её записи и подкатегории передаются категории reassign_to
+    (см. merge_categories).
+    """
+    if reassign_to is not None:
+        merge_categories(pk, reassign_to, repo, dependents)
+        return
+    pks = subtree(pk, repo)
+    for dependent, field in dependents:
+        dependent.delete_where({field: pks})
+    repo.delete_where({'pk': pks})
+
+
+def move_category(pk: int,
+                  new_parent: int | None,
+                  repo: AbstractRepository[Category]) -> None:
+    """
+    Перенести категорию вместе с поддеревом под категорию new_parent
+    (None - сделать категорией верхнего уровня). Подкатегории ссылаются
+    на переносимую категорию, поэтому изменяется одна запись.
+    Перенос категории внутрь собственного поддерева вызывает ValueError.
+    """
+    pks = subtree(pk, repo)
+    if new_parent is not None:
+        if new_parent in pks:
+            raise ValueError(f'category {new_parent} is inside subtree of {pk}')
+        if repo.get(new_parent) is None:
+            raise KeyError(new_parent)
+    repo.update_where({'pk': pk}, {'parent': new_parent})
+
+
+def merge_categories(source: int,
+                     target: int,
+                     repo: AbstractRepository[Category],
+                     dependents: Dependents) -> None:
+    """
+    Слить категорию source с категорией target: записи и подкатегории
+    source передаются target, после чего source удаляется.
+    Если target находится в поддереве source (в том числе совпадает с ней),
+    вызывается ValueError.
+    """
+    if target in subtree(source, repo):
+        raise ValueError(f'category {target} is inside subtree of {source}')
+    if repo.get(target) is None:
+        raise KeyError(target)
+    for dependent, field in dependents:
+        dependent.update_where({field: source}, {field: target})
+    repo.update_where({'parent': source}, {'parent': target})
+    repo.delete_where({'pk': source})
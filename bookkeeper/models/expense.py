@@ -5,6 +5,8 @@
 from dataclasses import dataclass, field
 from datetime import datetime
 
+from .money import BASE_CURRENCY
+
 
 @dataclass(slots=True)
 class Expense:
@@ -15,6 +17,7 @@ class Expense:
     expense_date - дата расхода
     added_date - дата добавления в бд
     comment - комментарий
+    currency - код валюты суммы
     pk - id записи в базе данных
     """
     amount: int
@@ -22,4 +25,5 @@ class Expense:
     expense_date: datetime = field(default_factory=datetime.now)
     added_date: datetime = field(default_factory=datetime.now)
     comment: str = ''
+    currency: str = BASE_CURRENCY
     pk: int = 0
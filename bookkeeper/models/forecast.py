@@ -0,0 +1,240 @@
+"""
+Модуль описывает прогноз расходов до конца срока бюджета.
+
+Расходы раскладываются в матрицу дневных сумм "категория x день" (NumPy).
+Прогноз расходов категории на следующий день - скользящее среднее
+за последние window дней, умноженное на коэффициент дня недели (недельная
+сезонность): средние расходы категории в этот день недели, делённые
+на средние расходы категории за день. Все вычисления векторные, поэтому
+прогноз для сотен категорий по истории за несколько лет занимает доли
+секунды.
+
+Срок бюджета - текущие календарные сутки, неделя (с понедельника), месяц
+или год. Бюджет учитывает расходы своей категории и всех её подкатегорий.
+
+Расходы в разных валютах переводятся в базовую валюту по курсу дня расхода,
+бюджеты прогнозируются в своей валюте по сегодняшнему курсу (см.
+bookkeeper.models.money).
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+from .budget import Budget
+from .category import Category
+from .expense import Expense
+from .money import FxRates
+from .recurring_expense import (
+    PERIOD_DAY, PERIOD_MONTH, PERIOD_WEEK, PERIOD_YEAR, RecurringExpense, expand)
+
+PERIODS = (PERIOD_DAY, PERIOD_WEEK, PERIOD_MONTH, PERIOD_YEAR)  # Сроки бюджетов.
+
+
+@dataclass(slots=True)
+class BudgetForecast:
+    """
+    Прогноз исполнения бюджета за текущий срок.
+    budget - бюджет
+    spent - потрачено с начала срока по сегодняшний день включительно
+    projected - ожидаемая сумма расходов к концу срока
+    """
+    budget: Budget
+    spent: int
+    projected: int
+
+    @property
+    def exceeded(self) -> bool:
+        """ Ожидается ли превышение бюджета """
+        return self.projected > self.budget.amount
+
+
+def period_bounds(period: str, today: date) -> tuple[date, date]:
+    """
+    Начало и конец (не включительно) срока бюджета, в который входит today.
+    """
+    if period == PERIOD_DAY:
+        return today, today + timedelta(days=1)
+    if period == PERIOD_WEEK:
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=7)
+    if period == PERIOD_MONTH:
+        start = today.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    if period == PERIOD_YEAR:
+        start = today.replace(month=1, day=1)
+        return start, start.replace(year=start.year + 1)
+    raise ValueError(f'unknown period {period!r}')
+
+
+class SpendForecast:
+    """
+    Дневные ряды расходов по категориям и прогноз по ним.
+    series[i, j] - сумма расходов категории category_pks[i]
+    за день first_day + j; последний столбец - сегодняшний день.
+    """
+
+    def __init__(self,
+                 expenses: Iterable[Expense],
+                 categories: Iterable[Category],
+                 today: date,
+                 window: int = 28,
+                 rates: FxRates | None = None) -> None:
+        """
+        expenses - расходы; расходы после today и расходы неизвестных
+            категорий не учитываются
+        categories - категории
+        today - текущая дата
+        window - ширина окна скользящего среднего, дней
+        rates - курсы валют; по умолчанию все суммы считаются
+            суммами в базовой валюте
+        """
+        if window < 1:
+            raise ValueError(f'window must be positive, got {window}')
+        self.today = today
+        self.window = window
+        self.rates = FxRates() if rates is None else rates
+        categories = list(categories)
+        self.category_pks = np.array(sorted(cat.pk for cat in categories),
+                                     dtype=np.int64)
+        self._children: dict[int | None, list[int]] = defaultdict(list)
+        for cat in categories:
+            self._children[cat.parent].append(cat.pk)
+
+        expenses = list(expenses)
+        amounts = np.fromiter((e.amount for e in expenses), np.float64, len(expenses))
+        days = np.fromiter((e.expense_date.toordinal() for e in expenses),
+                           np.int64, len(expenses))
+        rows = self._rows(np.fromiter((e.category for e in expenses),
+                                      np.int64, len(expenses)))
+        end = today.toordinal() + 1
+        keep = (rows >= 0) & (days < end)
+        if rates is not None:
+            self._to_base(amounts, days, keep, [e.currency for e in expenses])
+        # История не короче окна, чтобы среднее не завышалось
+        # в первые дни учёта.
+        first = min(days[keep].min(initial=end), end - window)
+        n_days = end - first
+        self.first_day = date.fromordinal(first)
+        self.series = np.bincount(
+            rows[keep] * n_days + (days[keep] - first), weights=amounts[keep],
+            minlength=len(self.category_pks) * n_days,
+        ).reshape(len(self.category_pks), n_days)
+
+        self.level = self.series[:, -window:].mean(axis=1)
+        weekdays = self._weekdays(first, end)
+        by_weekday = np.stack(
+            [self.series[:, weekdays == day].mean(axis=1) for day in range(7)], axis=1)
+        mean = self.series.mean(axis=1, keepdims=True)
+        self.seasonality = np.divide(by_weekday, mean, out=np.ones_like(by_weekday),
+                                     where=mean > 0)
+
+    def _to_base(self, amounts: np.ndarray, days: np.ndarray,
+                 keep: np.ndarray, currencies: list[str]) -> None:
+        """
+        Перевести учитываемые суммы в базовую валюту. Курс берётся один раз
+        на каждую пару "валюта, день", а не для каждого расхода.
+        """
+        codes = np.array(currencies, dtype=object)
+        for currency in set(currencies) - {self.rates.base}:
+            mask = keep & (codes == currency)
+            group_days, inverse = np.unique(days[mask], return_inverse=True)
+            factors = np.array(
+                [float(self.rates.cross_rate(currency, self.rates.base,
+                                             date.fromordinal(day)))
+                 for day in group_days.tolist()], dtype=np.float64)
+            amounts[mask] *= factors[inverse]
+
+    def _rows(self, category_pks: np.ndarray) -> np.ndarray:
+        """ Номера строк матрицы для pk категорий (-1 для неизвестных) """
+        if not len(self.category_pks):
+            return np.full(len(category_pks), -1)
+        rows: npt.NDArray[np.intp] = np.asarray(
+            np.searchsorted(self.category_pks, category_pks), dtype=np.intp)
+        rows[rows == len(self.category_pks)] = 0
+        return np.where(self.category_pks[rows] == category_pks, rows, -1)
+
+    @staticmethod
+    def _weekdays(first: int, end: int) -> np.ndarray:
+        """ Дни недели (0 - понедельник) для дней [first, end) """
+        # День с порядковым номером 1 (1 января 1 года) - понедельник.
+        return (np.arange(first, end) - 1) % 7
+
+    def daily(self, start: date, end: date) -> np.ndarray:
+        """
+        Прогноз дневных расходов всех категорий за дни [start, end)
+        в виде матрицы "категория x день".
+        """
+        weekdays = self._weekdays(start.toordinal(), end.toordinal())
+        return self.level[:, None] * self.seasonality[:, weekdays]
+
+    def period_totals(self, period: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Суммы по категориям за текущий срок: потраченные с начала срока
+        и ожидаемые до конца срока сверх потраченного. Сегодняшний день
+        ещё не закончился, поэтому на него ожидается не меньше прогноза.
+        """
+        start, end = period_bounds(period, self.today)
+        offset = max((start - self.first_day).days, 0)
+        spent = self.series[:, offset:].sum(axis=1)
+        weekdays = self._weekdays(self.today.toordinal(), end.toordinal())
+        counts = np.bincount(weekdays[1:], minlength=7)
+        today = self.level * self.seasonality[:, weekdays[0]]
+        future = np.maximum(today - self.series[:, -1], 0)
+        return spent, future + self.level * (self.seasonality @ counts)
+
+    def subtree_rows(self, pk: int) -> np.ndarray:
+        """ Номера строк матрицы для категории и всех её подкатегорий """
+        pks = [pk]
+        stack = [pk]
+        while stack:
+            children = self._children[stack.pop()]
+            pks.extend(children)
+            stack.extend(children)
+        rows = self._rows(np.array(pks, dtype=np.int64))
+        return rows[rows >= 0]
+
+    def forecast_budgets(
+            self,
+            budgets: Iterable[Budget],
+            recurring: Iterable[RecurringExpense] = ()) -> list[BudgetForecast]:
+        """
+        Спрогнозировать исполнение бюджетов.
+        recurring - правила регулярных расходов: их повторения в сроке
+            бюджета учитываются по датам, а не прогнозируются.
+        Бюджеты с неизвестным сроком (см. PERIODS) пропускаются.
+        """
+        budgets = [budget for budget in budgets if budget.period in PERIODS]
+        if not budgets:
+            return []
+        totals = {budget.period: self.period_totals(budget.period) for budget in budgets}
+        bounds = {period: period_bounds(period, self.today) for period in totals}
+        planned = expand(
+            recurring,
+            datetime.combine(min(start for start, _ in bounds.values()), time()),
+            datetime.combine(max(end for _, end in bounds.values()), time()))
+        tomorrow = self.today + timedelta(days=1)
+
+        result = []
+        for budget in budgets:
+            rows = self.subtree_rows(budget.category)
+            spent, future = (float(total[rows].sum()) for total in totals[budget.period])
+            start, end = bounds[budget.period]
+            pks = set(self.category_pks[rows].tolist())
+            for expense in planned:
+                if expense.category in pks and start <= expense.expense_date.date() < end:
+                    amount = expense.amount * float(self.rates.cross_rate(
+                        expense.currency, self.rates.base, expense.expense_date))
+                    if expense.expense_date.date() < tomorrow:
+                        spent += amount
+                    else:
+                        future += amount
+            factor = float(self.rates.cross_rate(self.rates.base, budget.currency,
+                                                 self.today))
+            result.append(BudgetForecast(budget, round(spent * factor),
+                                         round((spent + future) * factor)))
+        return result
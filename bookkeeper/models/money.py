@@ -0,0 +1,151 @@
+"""
+Модуль описывает денежные суммы в разных валютах и их пересчёт по курсам.
+
+Сумма хранится целым числом минимальных единиц валюты
+(см. settings.AMOUNT_MINOR_DIGITS) вместе с кодом валюты ISO 4217,
+без float. Курсы задаются по датам: для каждой валюты хранится
+отсортированный список дат, с которых действует курс, поэтому курс на
+любую дату находится двоичным поиском (bisect). Курсы - точные дроби
+(Fraction), сумма округляется до минимальных единиц один раз, при
+получении результата. Курсы пересчёта между валютами кэшируются.
+
+Итоги по длинной истории расходов (FxRates.total) сначала складываются
+целыми числами по группам "валюта, день", и на курс умножается сумма
+группы: число умножений равно числу групп, а не числу расходов.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+from typing import Iterable
+
+BASE_CURRENCY = 'RUB'  # Валюта сумм, для которых валюта не указана.
+
+
+@dataclass(frozen=True, slots=True)
+class Money:
+    """
+    Денежная сумма.
+    amount - сумма в минимальных единицах валюты
+    currency - код валюты
+    Складывать и вычитать можно только суммы в одной валюте,
+    иначе вызывается ValueError.
+    """
+    amount: int
+    currency: str = BASE_CURRENCY
+
+    def _same_currency(self, other: 'Money') -> None:
+        if other.currency != self.currency:
+            raise ValueError(f'currency mismatch: {self.currency} and {other.currency}')
+
+    def __add__(self, other: 'Money') -> 'Money':
+        self._same_currency(other)
+        return Money(self.amount + other.amount, self.currency)
+
+    def __sub__(self, other: 'Money') -> 'Money':
+        self._same_currency(other)
+        return Money(self.amount - other.amount, self.currency)
+
+    def __neg__(self) -> 'Money':
+        return Money(-self.amount, self.currency)
+
+
+class FxRates:
+    """
+    Таблица курсов валют к базовой валюте по датам.
+    Курс действует с указанной даты до даты следующего курса той же валюты.
+    version - номер версии таблицы, растёт при каждом изменении курсов
+    (по нему кэши результатов узнают, что пересчёт устарел)
+    """
+
+    def __init__(self, base: str = BASE_CURRENCY, cache_size: int = 4096) -> None:
+        """
+        base - базовая валюта, к которой задаются курсы
+        cache_size - размер кэша курсов пересчёта
+        """
+        self.base = base
+        self.version = 0
+        self._days: dict[str, list[int]] = {}
+        self._rates: dict[str, list[Fraction]] = {}
+        self._cross_rate = lru_cache(maxsize=cache_size)(self._cross_rate_uncached)
+
+    def add(self, currency: str, day: date, rate: Fraction | Decimal | int | str) -> None:
+        """
+        Задать курс валюты currency (стоимость единицы валюты в единицах
+        базовой валюты), действующий с даты day. Курс на ту же дату
+        заменяется. rate можно передать строкой ('92.47'), чтобы
+        не терять точность на float.
+        """
+        if currency == self.base:
+            raise ValueError(f'{currency} is the base currency')
+        value = Fraction(rate)
+        if value <= 0:
+            raise ValueError(f'rate must be positive, got {rate}')
+        days = self._days.setdefault(currency, [])
+        rates = self._rates.setdefault(currency, [])
+        ordinal = day.toordinal()
+        index = bisect_left(days, ordinal)
+        if index < len(days) and days[index] == ordinal:
+            rates[index] = value
+        else:
+            days.insert(index, ordinal)
+            rates.insert(index, value)
+        self.version += 1
+        self._cross_rate.cache_clear()
+
+    def currencies(self) -> list[str]:
+        """ Базовая валюта и валюты, для которых заданы курсы """
+        return [self.base, *sorted(self._days)]
+
+    def rate(self, currency: str, day: date) -> Fraction:
+        """
+        Курс валюты к базовой на дату day - последний курс, заданный
+        не позже day. Если такого курса нет, вызывается KeyError.
+        """
+        if currency == self.base:
+            return Fraction(1)
+        days = self._days.get(currency, [])
+        index = bisect_right(days, day.toordinal()) - 1
+        if index < 0:
+            raise KeyError(f'no {currency} rate on {day}')
+        return self._rates[currency][index]
+
+    def cross_rate(self, source: str, target: str, day: date) -> Fraction:
+        """ Сколько единиц валюты target стоит единица валюты source на дату day """
+        return self._cross_rate(source, target, day.toordinal())
+
+    def _cross_rate_uncached(self, source: str, target: str, ordinal: int) -> Fraction:
+        day = date.fromordinal(ordinal)
+        return self.rate(source, day) / self.rate(target, day)
+
+    def convert(self, money: Money, target: str, day: date) -> Money:
+        """ Перевести сумму в валюту target по курсу на дату day """
+        if money.currency == target:
+            return money
+        return Money(round(money.amount * self.cross_rate(money.currency, target, day)),
+                     target)
+
+    def total(self,
+              amounts: Iterable[tuple[int, str, date]],
+              target: str | None = None) -> Money:
+        """
+        Итог сумм, заданных тройками (сумма, валюта, дата), в валюте target
+        (по умолчанию - базовой). Каждая сумма пересчитывается по курсу
+        своей даты; вместо даты можно передать datetime.
+        """
+        target = self.base if target is None else target
+        exact = 0
+        groups: dict[tuple[str, int], int] = defaultdict(int)
+        for amount, currency, day in amounts:
+            if currency == target:
+                exact += amount
+            else:
+                groups[currency, day.toordinal()] += amount
+        total = Fraction(exact)
+        for (currency, ordinal), amount in groups.items():
+            total += amount * self._cross_rate(currency, target, ordinal)
+        return Money(round(total), target)
@@ -0,0 +1,133 @@
+"""
+Описан класс, представляющий регулярный (повторяющийся) расход,
+и функции для получения его повторений в заданном промежутке времени
+"""
+
+import calendar
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import count
+from typing import Iterable
+
+from .expense import Expense
+from .money import BASE_CURRENCY
+
+PERIOD_DAY = 'день'
+PERIOD_WEEK = 'неделя'
+PERIOD_MONTH = 'месяц'
+PERIOD_YEAR = 'год'
+
+_DAYS_IN_PERIOD = {PERIOD_DAY: 1, PERIOD_WEEK: 7}
+_MONTHS_IN_PERIOD = {PERIOD_MONTH: 1, PERIOD_YEAR: 12}
+
+
+@dataclass(slots=True)
+class RecurringExpense:
+    """
+    Правило регулярного расхода (аренда, подписки, коммунальные платежи).
+    amount - сумма одного повторения
+    category - id категории расходов
+    period - единица периода: 'день', 'неделя', 'месяц' или 'год'
+    interval - число периодов между повторениями (например, period='неделя',
+        interval=2 - раз в две недели)
+    start_date - дата первого повторения
+    end_date - дата, после которой повторений нет (None - бессрочно)
+    comment - комментарий
+    currency - код валюты суммы
+    pk - id записи в базе данных
+
+    Повторения не записываются в репозиторий расходов, а вычисляются
+    по запросу для нужного промежутка времени.
+    """
+    amount: int
+    category: int
+    period: str
+    interval: int = 1
+    start_date: datetime = field(default_factory=datetime.now)
+    end_date: datetime | None = None
+    comment: str = ''
+    currency: str = BASE_CURRENCY
+    pk: int = 0
+
+    def occurrences(self, start: datetime, end: datetime) -> tuple[datetime, ...]:
+        """
+        Получить даты повторений в полуинтервале [start, end).
+        Время работы пропорционально числу повторений в промежутке,
+        результаты кэшируются.
+        """
+        return _occurrences(self.period, self.interval, self.start_date,
+                            self.end_date, start, end)
+
+    def materialize(self, start: datetime, end: datetime) -> list[Expense]:
+        """
+        Получить повторения в полуинтервале [start, end) в виде объектов
+        Expense. Эти объекты не сохранены в репозитории (pk = 0).
+        """
+        return [Expense(amount=self.amount, category=self.category,
+                        expense_date=date, added_date=date, comment=self.comment,
+                        currency=self.currency)
+                for date in self.occurrences(start, end)]
+
+
+def expand(rules: Iterable[RecurringExpense],
+           start: datetime, end: datetime) -> list[Expense]:
+    """
+    Получить повторения всех правил в полуинтервале [start, end).
+
+    Parameters
+    ----------
+    rules - правила регулярных расходов
+    start - начало промежутка (включительно)
+    end - конец промежутка (не включительно)
+
+    Returns
+    -------
+    Список несохранённых объектов Expense, упорядоченный по дате
+    """
+    result = [expense for rule in rules for expense in rule.materialize(start, end)]
+    result.sort(key=lambda expense: expense.expense_date)
+    return result
+
+
+def _add_months(date: datetime, months: int) -> datetime:
+    month_index = date.month - 1 + months
+    year, month = date.year + month_index // 12, month_index % 12 + 1
+    return date.replace(year=year, month=month,
+                        day=min(date.day, calendar.monthrange(year, month)[1]))
+
+
+@lru_cache(maxsize=4096)
+def _occurrences(period: str, interval: int, first: datetime, last: datetime | None,
+                 start: datetime, end: datetime) -> tuple[datetime, ...]:
+    if interval < 1:
+        raise ValueError(f'interval must be positive, got {interval}')
+    if last is not None and last < end:
+        end = last + timedelta.resolution
+    start = max(start, first)
+    if start >= end:
+        return ()
+
+    if period in _DAYS_IN_PERIOD:
+        step = timedelta(days=_DAYS_IN_PERIOD[period] * interval)
+        # Номер первого повторения не раньше start: -(-a // b) - деление
+        # с округлением вверх.
+        number = -(-(start - first) // step)
+        dates = (first + n * step for n in count(number))
+    elif period in _MONTHS_IN_PERIOD:
+        step_months = _MONTHS_IN_PERIOD[period] * interval
+        months = (start.year - first.year) * 12 + start.month - first.month
+        # Из-за разной длины месяцев повторение с номером months // step
+        # может оказаться раньше start, оно отбрасывается ниже.
+        number = months // step_months
+        dates = (_add_months(first, n * step_months) for n in count(number))
+    else:
+        raise ValueError(f'unknown period {period!r}')
+
+    result = []
+    for date in dates:
+        if date >= end:
+            break
+        if date >= start:
+            result.append(date)
+    return tuple(result)
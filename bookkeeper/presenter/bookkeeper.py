@@ -1,11 +1,43 @@
 import datetime
+from contextlib import nullcontext
+from functools import partial
+from itertools import chain
+from typing import Any, Callable
 
 from bookkeeper.models.budget import Budget
 from bookkeeper.models.category import Category
+from bookkeeper.models.category_operations import (
+    Dependents, delete_category, merge_categories, subtree)
 from bookkeeper.models.expense import Expense
+from bookkeeper.models.forecast import BudgetForecast, SpendForecast
+from bookkeeper.models.money import FxRates
+from bookkeeper.models.recurring_expense import RecurringExpense, expand
+from bookkeeper.presenter.history import BulkCommand, Command, CommandHistory
+from bookkeeper.reports.abstract_report import AbstractReportEngine, ReportQuery
+from bookkeeper.reports.memory_report import MemoryReportEngine
 from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.change_feed import OP_RESET, Change
+from bookkeeper.repository.result_cache import ResultCache, Versioned
+from bookkeeper.repository.unit_of_work import AbstractUnitOfWork
+from bookkeeper.search.abstract_index import AbstractSearchIndex
 from bookkeeper.view.abstract_view import AbstractView
 
+# Объект изменён, но лента изменений его не передала: его нужно прочитать.
+_UNREAD = object()
+
+
+class _AppliedVersion:
+    """
+    Версия репозитория, изменения до которой применены к спискам
+    презентера. Результаты, вычисленные по этим спискам, кэшируются
+    по ней, а не по текущей версии репозитория: та меняется, как только
+    репозиторий изменит другой клиент, а списки - только при получении
+    его изменений (см. BookkeeperPresenter._poll_changes).
+    """
+
+    def __init__(self, version: int) -> None:
+        self.version = version
+
 
 class BookkeeperPresenter:
     """
@@ -17,6 +49,10 @@ class BookkeeperPresenter:
     TIMEDELTA_DAY = datetime.timedelta(days=1)
     TIMEDELTA_WEEK = datetime.timedelta(days=7)
     TIMEDELTA_MONTH = datetime.timedelta(days=30)
+    SEARCH_PAGE_SIZE = 50
+    HISTORY_SIZE = 100
+    RESULT_CACHE_SIZE = 16
+    BUDGET_PERIODS = ('день', 'неделя', 'месяц')
 
     def __init__(
             self,
@@ -24,27 +60,97 @@ class BookkeeperPresenter:
             repository_categories: AbstractRepository[Category],
             repository_expenses: AbstractRepository[Expense],
             view: AbstractView,
+            search_index: AbstractSearchIndex | None = None,
+            repository_recurring: AbstractRepository[RecurringExpense] | None = None,
+            report_engine: AbstractReportEngine | None = None,
+            fx_rates: FxRates | None = None,
+            unit_of_work: AbstractUnitOfWork | None = None,
     ) -> None:
+        """
+        search_index - индекс для поиска расходов по комментарию.
+            Если он пуст, в него добавляются все расходы из репозитория.
+        repository_recurring - правила регулярных расходов. Их повторения
+            учитываются в анализе бюджета, но не записываются в репозиторий.
+        report_engine - исполнитель отчётов по расходам. По умолчанию
+            расходы группируются в памяти (MemoryReportEngine).
+        fx_rates - курсы валют. Суммы расходов и бюджетов в анализе бюджета
+            и прогнозе переводятся в базовую валюту; по умолчанию курсов нет,
+            и все суммы должны быть в базовой валюте.
+        unit_of_work - единица работы над репозиториями. Изменения,
+            затрагивающие несколько репозиториев (удаление и слияние
+            категорий), выполняются в ней целиком или не выполняются совсем.
+
+        Презентер подписывается на ленты изменений репозиториев, поэтому
+        видит и изменения, сделанные другими клиентами (другим окном,
+        импортом). Бюджеты, категории и расходы читаются из репозиториев
+        один раз, при создании презентера, а изменения применяются
+        к прочитанным спискам и поисковому индексу по одному объекту;
+        репозиторий перечитывается целиком, только если часть его ленты
+        потеряна (OP_RESET).
+
+        Итоги анализа бюджета и прогноз кэшируются в self.cache по версиям
+        репозиториев, из которых они считаются: например, изменение бюджета
+        не приводит к повторному перебору расходов. Статистика кэшей -
+        в self.cache.stats и self.report_engine.cache.stats.
+        """
         self.repository_budgets = repository_budgets
         self.repository_categories = repository_categories
         self.repository_expenses = repository_expenses
         self.view = view
-        self.view.update_data_in_view(
-            self.repository_budgets.get_all(),
-            self.repository_categories.get_all(),
-            self.repository_expenses.get_all(),
-            self._calculate_current_budget_sums(),
-            self._calculate_current_expenses_sums()
-        )
+        self.search_index = search_index
+        self.repository_recurring = repository_recurring
+        self.history = CommandHistory(self.HISTORY_SIZE)
+        self.fx_rates = FxRates() if fx_rates is None else fx_rates
+        self.unit_of_work = unit_of_work
+        self.cache = ResultCache(self.RESULT_CACHE_SIZE)
+        self.report_engine = report_engine or MemoryReportEngine(
+            repository_expenses, repository_categories)
+        # Изменённые с последнего обновления представления объекты
+        # по репозиториям: pk -> объект после изменения (None - удалён,
+        # _UNREAD - нужно прочитать). None вместо словаря - изменилось
+        # неизвестно что, нужно перечитать всё.
+        self._changed: dict[AbstractRepository[Any], dict[int, Any] | None] = {}
+        # Записи, выведенные в представление: pk -> объект.
+        self._records: dict[AbstractRepository[Any], dict[int, Any]] = {
+            repository: {obj.pk: obj for obj in repository.get_all()}
+            for repository in (repository_budgets, repository_categories,
+                               repository_expenses)}
+        # Версии, до которых изменения применены к self._records
+        # (для репозиториев с лентой изменений), и версии полученных,
+        # но ещё не применённых изменений.
+        self._applied: dict[AbstractRepository[Any], _AppliedVersion] = {}
+        self._received: dict[AbstractRepository[Any], int] = {}
+        # Модели записей self._records (для show_pk_changes).
+        self._models: dict[AbstractRepository[Any], type] = {
+            repository_budgets: Budget,
+            repository_categories: Category,
+            repository_expenses: Expense}
+        for repository in (repository_budgets, repository_categories,
+                           repository_expenses, repository_recurring):
+            if repository is not None:
+                self._subscribe(repository)
+        if search_index is not None and len(search_index) == 0:
+            for expense in self._list(self.repository_expenses):
+                search_index.add(expense.pk, expense.comment)
+        for repository, records in self._records.items():
+            if records:
+                self.view.show_pk_changes(self._models[repository], list(records), [])
+        self._update_data_in_view_wrapped()
         self.view.add_handler_budget_create(self._create_budget)
         self.view.add_handler_budget_update(self._update_budget)
         self.view.add_handler_budget_delete(self._delete_budget)
         self.view.add_handler_category_create(self._create_category)
         self.view.add_handler_category_update(self._update_category)
         self.view.add_handler_category_delete(self._delete_category)
+        self.view.add_handler_category_merge(self._merge_categories)
         self.view.add_handler_expense_create(self._create_expense)
         self.view.add_handler_expense_update(self._update_expense)
         self.view.add_handler_expense_delete(self._delete_expense)
+        self.view.add_handler_expense_search(self._search_expenses)
+        self.view.add_handler_report(self._run_report)
+        self.view.add_handler_undo(self._undo)
+        self.view.add_handler_redo(self._redo)
+        self.view.add_handler_poll_changes(self._poll_changes)
 
     def run(self) -> None:
         """
@@ -53,49 +159,151 @@ class BookkeeperPresenter:
         """
         self.view.run()
 
+    def _list(self, repository: AbstractRepository[Any]) -> list[Any]:
+        """
+        Возвращает записи репозитория (бюджетов, категорий или расходов)
+        в том виде, в каком они выведены в представление.
+        """
+        return list(self._records[repository].values())
+
+    def _source(self, repository: AbstractRepository[Any]) -> Versioned:
+        """
+        Возвращает версию, по которой кэшируются результаты, вычисленные
+        по записям репозитория из self._records (см. _AppliedVersion).
+        """
+        return self._applied.get(repository, repository)
+
+    def _expense_sources(self) -> list[Versioned]:
+        """
+        Источники данных итогов расходов: расходы, регулярные расходы
+        и курсы валют.
+        """
+        sources: list[Versioned] = [self._source(self.repository_expenses),
+                                    self.fx_rates]
+        if self.repository_recurring is not None:
+            sources.append(self.repository_recurring)
+        return sources
+
     def _calculate_current_budget_sums(self) -> list[int]:
         """
-        Возвращает суммы бюджетов по категориям за день, месяц, неделю.
-        """
-        budgets = self.repository_budgets.get_all()
-        budgets_sum_dayly = sum([budget.amount
-                                 for budget in budgets
-                                 if budget.period == 'день'])
-        budgets_sum_weeky = sum([budget.amount
-                                 for budget in budgets
-                                 if budget.period == 'неделя'])
-        budgets_sum_monthly = sum([budget.amount
-                                   for budget in budgets
-                                   if budget.period == 'месяц'])
+        Возвращает суммы бюджетов по категориям за день, месяц, неделю
+        в базовой валюте (по сегодняшнему курсу).
+        """
+        today = datetime.date.today()
+        return self.cache.get_or_compute(
+            ('budget_sums', today), [self._source(self.repository_budgets),
+                                     self.fx_rates],
+            partial(self._calculate_budget_sums_uncached, today))
+
+    def _calculate_budget_sums_uncached(self, today: datetime.date) -> list[int]:
+        """
+        Вычисляет суммы бюджетов без кэша.
+        """
+        budgets = self._list(self.repository_budgets)
         return [
-            budgets_sum_dayly,
-            budgets_sum_weeky,
-            budgets_sum_monthly,
+            self.fx_rates.total((budget.amount, budget.currency, today)
+                                for budget in budgets
+                                if budget.period == period).amount
+            for period in self.BUDGET_PERIODS
         ]
 
     def _calculate_current_expenses_sums(self) -> list[int]:
         """
-        Возвращает суммы расходов по категориям за день, месяц, неделю.
+        Возвращает суммы расходов по категориям за день, месяц, неделю
+        в базовой валюте (по курсу дня расхода).
+        Учитываются и повторения регулярных расходов.
+
+        Вместе с суммами вычисляется момент, когда первый из расходов войдёт
+        в окно или выйдет из него; до этого момента (и не дольше, чем
+        до конца дня) суммы берутся из кэша, если расходы не менялись.
         """
-        expenses = self.repository_expenses.get_all()
-        expenses_sum_dayly = 0
-        expenses_sum_weeky = 0
-        expenses_sum_monthly = 0
         now = datetime.datetime.now()
+        versions = self.cache.versions(self._expense_sources())
+        cached: list[int] | None = self.cache.get('expenses_sums', versions, now)
+        if cached is not None:
+            return cached
+        expenses = chain(self._list(self.repository_expenses),
+                         self._get_recurring_expenses(now))
+        expires = (now.replace(hour=0, minute=0, second=0, microsecond=0)
+                   + self.TIMEDELTA_DAY)
+        windows = (self.TIMEDELTA_ZERO, self.TIMEDELTA_DAY,
+                   self.TIMEDELTA_WEEK, self.TIMEDELTA_MONTH)
+        expenses_dayly = []
+        expenses_weeky = []
+        expenses_monthly = []
         for expense in expenses:
             now_to_expense_datetime_timedelta = now - expense.expense_date
+            if now_to_expense_datetime_timedelta < self.TIMEDELTA_MONTH:
+                boundary = next(window for window in windows
+                                if window >= now_to_expense_datetime_timedelta)
+                expires = min(expires, expense.expense_date + boundary)
             if now_to_expense_datetime_timedelta > self.TIMEDELTA_ZERO:
+                item = (expense.amount, expense.currency, expense.expense_date)
                 if now_to_expense_datetime_timedelta < self.TIMEDELTA_DAY:
-                    expenses_sum_dayly += expense.amount
+                    expenses_dayly.append(item)
                 if now_to_expense_datetime_timedelta < self.TIMEDELTA_WEEK:
-                    expenses_sum_weeky += expense.amount
+                    expenses_weeky.append(item)
                 if now_to_expense_datetime_timedelta < self.TIMEDELTA_MONTH:
-                    expenses_sum_monthly += expense.amount
-        return [
-            expenses_sum_dayly,
-            expenses_sum_weeky,
-            expenses_sum_monthly,
+                    expenses_monthly.append(item)
+        sums = [
+            self.fx_rates.total(expenses_dayly).amount,
+            self.fx_rates.total(expenses_weeky).amount,
+            self.fx_rates.total(expenses_monthly).amount,
         ]
+        self.cache.put('expenses_sums', versions, sums, expires)
+        return sums
+
+    def _calculate_budget_forecast(self) -> list[BudgetForecast]:
+        """
+        Возвращает прогноз исполнения бюджетов к концу их сроков.
+        Модель трат по расходам кэшируется отдельно от прогноза,
+        поэтому изменение бюджетов не приводит к перебору расходов.
+        """
+        today = datetime.date.today()
+        return self.cache.get_or_compute(
+            ('forecast', today),
+            [self._source(self.repository_budgets),
+             self._source(self.repository_categories),
+             *self._expense_sources()],
+            partial(self._calculate_budget_forecast_uncached, today))
+
+    def _calculate_budget_forecast_uncached(
+            self, today: datetime.date) -> list[BudgetForecast]:
+        """
+        Вычисляет прогноз исполнения бюджетов без кэша.
+        """
+        forecast: SpendForecast = self.cache.get_or_compute(
+            ('spend_forecast', today),
+            [self._source(self.repository_expenses),
+             self._source(self.repository_categories), self.fx_rates],
+            lambda: SpendForecast(self._list(self.repository_expenses),
+                                  self._list(self.repository_categories),
+                                  today,
+                                  rates=self.fx_rates))
+        recurring = ([] if self.repository_recurring is None
+                     else self.repository_recurring.get_all())
+        return forecast.forecast_budgets(self._list(self.repository_budgets),
+                                         recurring)
+
+    def _show_budget_forecast(self) -> None:
+        """
+        Выводит прогноз исполнения бюджетов.
+        """
+        self.view.show_budget_forecast(self._calculate_budget_forecast(),
+                                       self._list(self.repository_categories))
+
+    def _get_recurring_expenses(self, now: datetime.datetime) -> list[Expense]:
+        """
+        Возвращает повторения регулярных расходов за последний месяц.
+        Промежуток выравнивается по границам суток, чтобы в течение дня
+        повторения брались из кэша, а не вычислялись заново.
+        """
+        if self.repository_recurring is None:
+            return []
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return expand(self.repository_recurring.get_all(),
+                      today - self.TIMEDELTA_MONTH,
+                      today + self.TIMEDELTA_DAY)
 
     def _update_data_in_view_wrapped(self):
         """
@@ -103,72 +311,363 @@ class BookkeeperPresenter:
         чтобы каждый раз не писать одно и то же
         """
         self.view.update_data_in_view(
-            self.repository_budgets.get_all(),
-            self.repository_categories.get_all(),
-            self.repository_expenses.get_all(),
+            self._list(self.repository_budgets),
+            self._list(self.repository_categories),
+            self._list(self.repository_expenses),
             self._calculate_current_budget_sums(),
             self._calculate_current_expenses_sums()
         )
+        self._show_budget_forecast()
+
+    def _subscribe(self, repository: AbstractRepository[Any]) -> None:
+        """
+        Подписывается на изменения репозитория, если он их поддерживает.
+        """
+        try:
+            repository.subscribe(partial(self._on_change, repository))
+        except NotImplementedError:
+            return
+        if repository in self._records:
+            self._applied[repository] = _AppliedVersion(repository.version)
+
+    def _on_change(self, repository: AbstractRepository[Any], change: Change) -> None:
+        """
+        Запоминает изменение. Представление обновляется в _apply_changes,
+        один раз на группу изменений.
+        """
+        self._received[repository] = change.version
+        if change.op == OP_RESET:
+            self._changed[repository] = None
+            return
+        objs = self._changed.setdefault(repository, {})
+        if objs is not None:
+            objs[change.pk] = change.obj
+
+    def _poll_changes(self) -> None:
+        """
+        Получает изменения, сделанные другими клиентами, и выводит их.
+        """
+        for repository in (self.repository_budgets, self.repository_categories,
+                           self.repository_expenses, self.repository_recurring):
+            if repository is not None:
+                repository.poll()
+        self._apply_changes()
+
+    def _execute(self, command: Command) -> None:
+        """
+        Выполняет команду, записывает её в историю и обновляет представление.
+        """
+        self.history.execute(command)
+        self._after_change(command)
+
+    def _create(self, repository: AbstractRepository[Any], obj: Any) -> None:
+        """
+        Создаёт запись obj и записывает в obj её pk.
+        """
+        command = Command.create(repository, obj)
+        self._execute(command)
+        obj.pk = command.pk
+
+    def _undo(self) -> None:
+        """
+        Отменяет последнее изменение.
+        """
+        with self.unit_of_work or nullcontext():
+            command = self.history.undo()
+        if command is not None:
+            self._after_change(command)
+
+    def _redo(self) -> None:
+        """
+        Повторяет последнее отменённое изменение.
+        """
+        with self.unit_of_work or nullcontext():
+            command = self.history.redo()
+        if command is not None:
+            self._after_change(command)
+
+    def _category_dependents(self) -> Dependents:
+        """
+        Репозитории, записи которых ссылаются на категории.
+        """
+        dependents: list[tuple[AbstractRepository[Any], str]] = [
+            (self.repository_expenses, 'category'),
+            (self.repository_budgets, 'category')]
+        if self.repository_recurring is not None:
+            dependents.append((self.repository_recurring, 'category'))
+        return dependents
+
+    def _execute_bulk(self, operation: Callable[[], None],
+                      affected: list[tuple[AbstractRepository[Any], list[Any]]]
+                      ) -> None:
+        """
+        Выполняет множественное изменение категорий и зависимых записей,
+        записывает его в историю одной командой и обновляет представление.
+        affected - записи, которые операция может изменить или удалить
+        (см. BulkCommand.record).
+        """
+        with self.unit_of_work or nullcontext():
+            command = BulkCommand.record(operation, affected)
+        self.history.push(command)
+        self._after_change(command)
+
+    def _category_records(self, pks: set[int]
+                          ) -> list[tuple[AbstractRepository[Any], list[Any]]]:
+        """
+        Записи, которые может изменить или удалить операция над категориями
+        pks: ссылающиеся на них записи, их подкатегории и они сами.
+        Категории упорядочены от вложенных к верхним, чтобы при отмене
+        категория восстанавливалась раньше своих подкатегорий.
+        """
+        records: list[tuple[AbstractRepository[Any], list[Any]]] = [
+            (dependent, dependent.get_all({field: pks}))
+            for dependent, field in self._category_dependents()]
+        categories = {cat.pk: cat for cat in chain(
+            self.repository_categories.get_all({'parent': pks}),
+            self.repository_categories.get_all({'pk': pks}))}
+
+        def depth(cat: Category) -> int:
+            result = 0
+            while cat.parent in categories:
+                cat = categories[cat.parent]
+                result += 1
+            return result
+
+        records.append((self.repository_categories,
+                        sorted(categories.values(), key=depth, reverse=True)))
+        return records
+
+    def _after_change(self, command: Command | BulkCommand) -> None:
+        """
+        Отмечает объекты команды изменёнными (на случай, если репозиторий
+        не поддерживает ленту изменений) и обновляет представление.
+        """
+        commands = command.commands if isinstance(command, BulkCommand) else [command]
+        for single in commands:
+            objs = self._changed.setdefault(single.repository, {})
+            if objs is not None:
+                objs.setdefault(single.pk, _UNREAD)
+        self._apply_changes()
+
+    def _apply_changes(self) -> None:
+        """
+        Применяет изменения к выведенным записям и поисковому индексу
+        и выводит в представление только данные, которые могли измениться.
+        """
+        changed, self._changed = self._changed, {}
+        if not changed:
+            return
+        for repository, objs in changed.items():
+            self._update_records(repository, objs)
+        received, self._received = self._received, {}
+        for repository, version in received.items():
+            if repository in self._applied:
+                self._applied[repository].version = version
+        if self.search_index is not None and self.repository_expenses in changed:
+            self._reindex_expenses(changed[self.repository_expenses])
+        if self.repository_categories in changed:
+            self._update_data_in_view_wrapped()
+            return
+        if self.repository_expenses in changed:
+            self.view.show_expenses(
+                self._list(self.repository_expenses),
+                self._list(self.repository_categories))
+        if self.repository_budgets in changed:
+            self.view.show_budgets(
+                self._list(self.repository_budgets),
+                self._list(self.repository_categories))
+        self.view.show_budget_analysis(
+            self._calculate_current_budget_sums(),
+            self._calculate_current_expenses_sums())
+        self._show_budget_forecast()
+
+    def _update_records(self, repository: AbstractRepository[Any],
+                        objs: dict[int, Any] | None) -> None:
+        """
+        Применяет изменения objs (None - перечитать всё) к записям
+        репозитория, выведенным в представление, и сообщает представлению
+        о появившихся и исчезнувших pk. Объекты, которые лента изменений
+        не передала, читаются из репозитория.
+        """
+        if objs is not None:
+            for pk, obj in objs.items():
+                if obj is _UNREAD:
+                    objs[pk] = repository.get(pk)
+        records = self._records.get(repository)
+        if records is None:
+            return
+        if objs is None:
+            old = set(records)
+            records.clear()
+            records.update((obj.pk, obj) for obj in repository.get_all())
+            added = [pk for pk in records if pk not in old]
+            removed = list(old.difference(records))
+        else:
+            added = [pk for pk, obj in objs.items()
+                     if obj is not None and pk not in records]
+            removed = [pk for pk, obj in objs.items() if obj is None and pk in records]
+            for pk, obj in objs.items():
+                if obj is None:
+                    records.pop(pk, None)
+                else:
+                    records[pk] = obj
+        if added or removed:
+            self.view.show_pk_changes(self._models[repository], added, removed)
+
+    def _reindex_expenses(self, objs: dict[int, Any] | None) -> None:
+        """
+        Обновляет в поисковом индексе изменённые расходы
+        (None - все расходы).
+        """
+        assert self.search_index is not None
+        if objs is None:
+            for expense in self._list(self.repository_expenses):
+                self.search_index.update(expense.pk, expense.comment)
+            return
+        for pk, expense in objs.items():
+            if expense is None:
+                self.search_index.remove(pk)
+            else:
+                self.search_index.update(pk, expense.comment)
+
+    def _check_currency(self, currency: str, day: datetime.date) -> None:
+        """
+        Проверяет, что сумму в валюте currency можно перевести в базовую
+        валюту по курсу на дату day, иначе вызывает ValueError. Проверка
+        выполняется до записи: сумму без курса нельзя учесть в анализе
+        бюджета.
+        """
+        try:
+            self.fx_rates.rate(currency, day)
+        except KeyError:
+            raise ValueError(f'no {currency} rate on {day}') from None
 
     def _create_expense(self, expense: Expense) -> None:
         """
         Создаёт запись о расходе.
         """
-        self.repository_expenses.add(expense)
-        self._update_data_in_view_wrapped()
+        self._check_currency(expense.currency, expense.expense_date.date())
+        self._create(self.repository_expenses, expense)
 
     def _update_expense(self, expense: Expense) -> None:
         """
         Обноваляет запись о расходе.
         """
-        self.repository_expenses.update(expense)
-        self._update_data_in_view_wrapped()
+        self._check_currency(expense.currency, expense.expense_date.date())
+        self._execute(Command.update(self.repository_expenses, expense))
 
     def _delete_expense(self, pk: int) -> None:
         """
         Удаляет запись о расходе по ПК.
         """
-        self.repository_expenses.delete(pk)
-        self._update_data_in_view_wrapped()
+        self._execute(Command.delete(self.repository_expenses, pk))
+
+    def _search_expenses(self, query: str, page: int) -> None:
+        """
+        Ищет расходы по комментарию и выводит страницу результатов
+        с номером page (нумерация с нуля).
+        """
+        if self.search_index is None:
+            return
+        pks = self.search_index.search(
+            query, page * self.SEARCH_PAGE_SIZE, self.SEARCH_PAGE_SIZE + 1)
+        expenses = [expense
+                    for expense in map(self._records[self.repository_expenses].get,
+                                       pks[:self.SEARCH_PAGE_SIZE])
+                    if expense is not None]
+        self.view.show_search_results(
+            expenses,
+            self._list(self.repository_categories),
+            page,
+            len(pks) > self.SEARCH_PAGE_SIZE,
+        )
+
+    def _run_report(self, query: ReportQuery) -> None:
+        """
+        Строит отчёт по расходам. Строки передаются представлению
+        по мере получения.
+        """
+        self.view.show_report(query, self.report_engine.run(query),
+                              self._list(self.repository_categories))
 
     def _create_category(self, category: Category) -> None:
         """
         Создаёт запись о категории.
         """
-        self.repository_categories.add(category)
-        self._update_data_in_view_wrapped()
+        self._create(self.repository_categories, category)
 
     def _update_category(self, category: Category) -> None:
         """
-        Обновляет запись о категории.
+        Обновляет запись о категории. Перенос категории внутрь собственного
+        поддерева вызывает ValueError.
         """
-        self.repository_categories.update(category)
-        self._update_data_in_view_wrapped()
+        if (category.parent is not None
+                and category.parent in subtree(category.pk, self.repository_categories)):
+            raise ValueError(
+                f'category {category.parent} is inside subtree of {category.pk}')
+        self._execute(Command.update(self.repository_categories, category))
 
-    def _delete_category(self, pk: int) -> None:
+    def _delete_category(self, pk: int, cascade: bool = False) -> None:
         """
-        Удаляет запись о категории по ПК.
+        Удаляет запись о категории по ПК. Записи и подкатегории удаляемой
+        категории передаются её родителю. У категории верхнего уровня
+        передать их некому: если cascade не задан, удаление такой категории
+        с записями или подкатегориями вызывает ValueError, иначе они
+        удаляются вместе с ней. Удаление можно отменить.
         """
-        self.repository_categories.delete(pk)
-        self._update_data_in_view_wrapped()
+        category = self.repository_categories.get(pk)
+        if category is None:
+            raise KeyError(pk)
+        if category.parent is not None:
+            self._execute_bulk(
+                partial(delete_category, pk, self.repository_categories,
+                        self._category_dependents(), category.parent),
+                self._category_records({pk}))
+            return
+        pks = subtree(pk, self.repository_categories)
+        records = self._category_records(pks)
+        *dependents, _ = records
+        if not cascade and (len(pks) > 1 or any(objs for _, objs in dependents)):
+            raise ValueError(f'category {pk} has subcategories or records')
+        self._execute_bulk(
+            partial(delete_category, pk, self.repository_categories,
+                    self._category_dependents()),
+            records)
+
+    def _merge_categories(self, source: int, target: int) -> None:
+        """
+        Сливает категорию source с категорией target.
+        """
+        self._execute_bulk(
+            partial(merge_categories, source, target, self.repository_categories,
+                    self._category_dependents()),
+            self._category_records({source}))
+
+    def _check_budget(self, budget: Budget) -> None:
+        """
+        Проверяет бюджет перед записью: срок - один из BUDGET_PERIODS,
+        для валюты есть курс. Иначе вызывает ValueError.
+        """
+        if budget.period not in self.BUDGET_PERIODS:
+            raise ValueError(f'unknown budget period {budget.period!r}')
+        self._check_currency(budget.currency, datetime.date.today())
 
     def _create_budget(self, budget: Budget) -> None:
         """
         Создаёт запись о бюджете.
         """
-        self.repository_budgets.add(budget)
-        self._update_data_in_view_wrapped()
+        self._check_budget(budget)
+        self._create(self.repository_budgets, budget)
 
     def _update_budget(self, budget: Budget) -> None:
         """
         Обновляет запись о бюджете.
         """
-        self.repository_budgets.update(budget)
-        self._update_data_in_view_wrapped()
+        self._check_budget(budget)
+        self._execute(Command.update(self.repository_budgets, budget))
 
     def _delete_budget(self, pk: int) -> None:
         """
         Удаляет запись о бюджете по ПК.
         """
-        self.repository_budgets.delete(pk)
-        self._update_data_in_view_wrapped()
+        self._execute(Command.delete(self.repository_budgets, pk))
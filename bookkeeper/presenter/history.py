@@ -0,0 +1,191 @@
+"""
+Модуль описывает историю изменений для отмены и повтора действий (undo/redo).
+
+Каждое изменение записывается командой, которая хранит только то, что нужно
+для её отмены: состояние объекта до изменения и после него. Отмена и повтор
+команды - это одно обращение к репозиторию. Множественное изменение
+(например, удаление категории вместе с расходами) записывается группой
+команд (BulkCommand), которая отменяется и повторяется целиком.
+"""
+
+import copy
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+from bookkeeper.repository.abstract_repository import AbstractRepository
+
+
+@dataclass(slots=True)
+class Command:
+    """
+    Изменение одного объекта в репозитории.
+    repository - репозиторий, в котором произошло изменение
+    before - объект до изменения (None, если объект был создан)
+    after - объект после изменения (None, если объект был удалён)
+    Команда хранит собственные копии объектов и передаёт репозиторию
+    их копии: иначе изменение объекта на месте (update_where) изменило бы
+    и историю.
+    """
+    repository: AbstractRepository[Any]
+    before: Any
+    after: Any
+
+    @property
+    def pk(self) -> int:
+        """ pk изменённого объекта """
+        return (self.after if self.after is not None else self.before).pk
+
+    def apply(self) -> None:
+        """
+        Выполнить (или повторить) изменение.
+        """
+        if self.after is None:
+            self.repository.delete(self.before.pk)
+        elif self.before is None:
+            if self.after.pk == 0:
+                self.after.pk = self.repository.add(copy.copy(self.after))
+            else:
+                self.repository.restore(copy.copy(self.after))
+        else:
+            self.repository.update(copy.copy(self.after))
+
+    def revert(self) -> None:
+        """
+        Отменить изменение.
+        """
+        if self.before is None:
+            self.repository.delete(self.after.pk)
+        elif self.after is None:
+            self.repository.restore(copy.copy(self.before))
+        else:
+            self.repository.update(copy.copy(self.before))
+
+    @classmethod
+    def create(cls, repository: AbstractRepository[Any], obj: Any) -> 'Command':
+        """
+        Команда создания объекта obj. pk созданного объекта - pk команды.
+        """
+        return cls(repository, None, copy.copy(obj))
+
+    @classmethod
+    def update(cls, repository: AbstractRepository[Any], obj: Any) -> 'Command':
+        """ Команда замены объекта с pk = obj.pk на obj """
+        return cls(repository, copy.copy(repository.get(obj.pk)), copy.copy(obj))
+
+    @classmethod
+    def delete(cls, repository: AbstractRepository[Any], pk: int) -> 'Command':
+        """ Команда удаления объекта с данным pk """
+        obj = repository.get(pk)
+        if obj is None:
+            raise KeyError(pk)
+        return cls(repository, copy.copy(obj), None)
+
+
+@dataclass(slots=True)
+class BulkCommand:
+    """
+    Группа изменений, выполняемых как одно действие.
+    commands - изменения в порядке выполнения; отменяются они в обратном
+    порядке, поэтому изменения, от которых зависят другие (удаление
+    записей, ссылающихся на категорию), должны идти раньше них
+    """
+    commands: list[Command]
+
+    def apply(self) -> None:
+        """
+        Выполнить (или повторить) изменения.
+        """
+        for command in self.commands:
+            command.apply()
+
+    def revert(self) -> None:
+        """
+        Отменить изменения.
+        """
+        for command in reversed(self.commands):
+            command.revert()
+
+    @classmethod
+    def record(cls, operation: Callable[[], None],
+               affected: Iterable[tuple[AbstractRepository[Any], list[Any]]]
+               ) -> 'BulkCommand':
+        """
+        Выполнить операцию operation и записать её изменения.
+        affected - пары (репозиторий, объекты), которые операция может
+        изменить или удалить, в порядке выполнения изменений. Объекты,
+        которые операция не изменила, в группу не попадают.
+        """
+        before = [(repository, [copy.copy(obj) for obj in objs])
+                  for repository, objs in affected]
+        operation()
+        commands = []
+        for repository, objs in before:
+            for obj in objs:
+                after = repository.get(obj.pk)
+                if after != obj:
+                    commands.append(Command(repository, obj, copy.copy(after)))
+        return cls(commands)
+
+
+class CommandHistory:
+    """
+    История выполненных команд. Хранит не более max_size последних команд
+    в кольцевом буфере, поэтому память не растёт в длинных сеансах.
+    """
+
+    def __init__(self, max_size: int = 100) -> None:
+        self._done: deque[Command | BulkCommand] = deque(maxlen=max_size)
+        self._undone: deque[Command | BulkCommand] = deque(maxlen=max_size)
+
+    def execute(self, command: Command | BulkCommand) -> None:
+        """
+        Выполнить команду и записать её в историю.
+        Отменённые ранее команды после этого повторить нельзя.
+        """
+        command.apply()
+        self.push(command)
+
+    def push(self, command: Command | BulkCommand) -> None:
+        """
+        Записать в историю уже выполненную команду (см. BulkCommand.record).
+        """
+        self._done.append(command)
+        self._undone.clear()
+
+    def undo(self) -> Command | BulkCommand | None:
+        """
+        Отменить последнюю выполненную команду и вернуть её
+        (или None, если отменять нечего).
+        """
+        if not self._done:
+            return None
+        command = self._done.pop()
+        command.revert()
+        self._undone.append(command)
+        return command
+
+    def redo(self) -> Command | BulkCommand | None:
+        """
+        Повторить последнюю отменённую команду и вернуть её
+        (или None, если повторять нечего).
+        """
+        if not self._undone:
+            return None
+        command = self._undone.pop()
+        command.apply()
+        self._done.append(command)
+        return command
+
+    def clear(self) -> None:
+        """ Забыть все команды """
+        self._done.clear()
+        self._undone.clear()
+
+    def can_undo(self) -> bool:
+        """ Есть ли что отменить """
+        return bool(self._done)
+
+    def can_redo(self) -> bool:
+        """ Есть ли что повторить """
+        return bool(self._undone)
@@ -0,0 +1,154 @@
+"""
+Модуль содержит описание запроса отчёта по расходам и абстрактного
+исполнителя отчётов
+
+Отчёт группирует расходы по измерениям (категория, категория верхнего
+уровня, день, неделя, месяц, год, комментарий, валюта) и считает для каждой
+группы агрегаты сумм (сумма, число, среднее, минимум, максимум, процентили).
+Суммы в разных валютах не пересчитываются: чтобы получить итоги по нескольким
+валютам, отчёт группируется и по валюте, а итоги групп пересчитываются
+по курсам (см. bookkeeper.models.money).
+Строка отчёта - кортеж значений измерений, за которыми идут значения
+агрегатов в порядке, заданном в запросе.
+"""
+
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterator, Sequence
+
+from bookkeeper.repository.abstract_repository import AbstractRepository
+from bookkeeper.repository.result_cache import ResultCache
+
+DIM_CATEGORY = 'category'
+# Категория верхнего уровня, в поддерево которой входит категория расхода
+DIM_SUBTREE = 'subtree'
+# Измерения времени принимают значения 'ГГГГ-ММ-ДД' (для недели - дата
+# её понедельника), 'ГГГГ-ММ' и 'ГГГГ'.
+DIM_DAY = 'day'
+DIM_WEEK = 'week'
+DIM_MONTH = 'month'
+DIM_YEAR = 'year'
+DIM_COMMENT = 'comment'
+DIM_CURRENCY = 'currency'
+DIMENSIONS = (DIM_CATEGORY, DIM_SUBTREE, DIM_DAY, DIM_WEEK, DIM_MONTH, DIM_YEAR,
+              DIM_COMMENT, DIM_CURRENCY)
+
+AGG_SUM = 'sum'
+AGG_COUNT = 'count'
+AGG_AVG = 'avg'
+AGG_MIN = 'min'
+AGG_MAX = 'max'
+AGGREGATES = (AGG_SUM, AGG_COUNT, AGG_AVG, AGG_MIN, AGG_MAX)
+# Процентиль: 'p50' - медиана, 'p90', 'p99.9' и т.д.
+_PERCENTILE_RE = re.compile(r'p(\d{1,2}(\.\d+)?|100)')
+
+Row = tuple[Any, ...]
+
+
+def percentile_rank(aggregate: str) -> float | None:
+    """
+    Получить уровень процентиля (от 0 до 100) из названия агрегата
+    или None, если агрегат - не процентиль.
+    """
+    match = _PERCENTILE_RE.fullmatch(aggregate)
+    return float(match.group(1)) if match else None
+
+
+def percentile(values: Sequence[int], rank: float) -> float | None:
+    """
+    Процентиль отсортированной последовательности с линейной интерполяцией
+    между соседними значениями (как numpy.percentile по умолчанию).
+    Для пустой последовательности - None.
+    """
+    if not values:
+        return None
+    position = rank / 100 * (len(values) - 1)
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+@dataclass(frozen=True)
+class ReportQuery:
+    """
+    Запрос отчёта.
+    group_by - измерения группировки (DIM_*); без них - одна строка итогов
+    aggregates - агрегаты (AGG_* или процентили 'pNN')
+    start, end - учитываются расходы с датой в полуинтервале [start, end)
+    categories - учитываются только расходы этих категорий (None - всех)
+    order_by - агрегат, по убыванию которого упорядочиваются строки
+        (None - по возрастанию значений измерений)
+    limit - число строк отчёта (например, для top-N)
+
+    Запрос неизменяемый и хешируемый, поэтому годится ключом кэша.
+    """
+    group_by: tuple[str, ...] = ()
+    aggregates: tuple[str, ...] = (AGG_SUM,)
+    start: datetime | None = None
+    end: datetime | None = None
+    categories: frozenset[int] | None = None
+    order_by: str | None = None
+    limit: int | None = None
+
+    def __post_init__(self) -> None:
+        for dimension in self.group_by:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f'unknown dimension {dimension!r}')
+        if not self.aggregates:
+            raise ValueError('at least one aggregate is required')
+        for aggregate in self.aggregates:
+            if aggregate not in AGGREGATES and percentile_rank(aggregate) is None:
+                raise ValueError(f'unknown aggregate {aggregate!r}')
+        if self.order_by is not None and self.order_by not in self.aggregates:
+            raise ValueError(f'order_by {self.order_by!r} is not among aggregates')
+        if self.limit is not None and self.limit < 0:
+            raise ValueError(f'limit must not be negative, got {self.limit}')
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        """ Названия столбцов строки отчёта """
+        return self.group_by + self.aggregates
+
+
+class AbstractReportEngine(ABC):
+    """
+    Абстрактный исполнитель отчётов.
+    Абстрактные методы:
+    _execute
+
+    Результаты кэшируются: ключ кэша - запрос и версии репозиториев
+    (см. bookkeeper.repository.result_cache), поэтому после любого изменения
+    данных отчёт считается заново. Если репозиторий не поддерживает
+    версии, отчёты не кэшируются. Статистика кэша - в атрибуте cache.stats.
+    """
+
+    def __init__(self, repositories: Sequence[AbstractRepository[Any]],
+                 cache_size: int = 32) -> None:
+        """
+        repositories - репозитории, от данных которых зависят отчёты
+        cache_size - число хранимых результатов
+        """
+        self._repositories = repositories
+        self.cache = ResultCache(cache_size)
+
+    def run(self, query: ReportQuery) -> Iterator[Row]:
+        """
+        Выполнить запрос и выдавать строки отчёта по мере получения.
+        Результат попадает в кэш, если строки прочитаны до конца.
+        """
+        versions = self.cache.versions(self._repositories)
+        cached: list[Row] | None = self.cache.get(query, versions)
+        if cached is not None:
+            yield from cached
+            return
+        rows = []
+        for row in self._execute(query):
+            rows.append(row)
+            yield row
+        self.cache.put(query, versions, rows)
+
+    @abstractmethod
+    def _execute(self, query: ReportQuery) -> Iterator[Row]:
+        """ Выполнить запрос без кэша """
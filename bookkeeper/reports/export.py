@@ -0,0 +1,29 @@
+"""
+Модуль описывает выгрузку отчётов в файлы
+"""
+
+import csv
+from typing import Iterable, TextIO
+
+from bookkeeper.reports.abstract_report import Row
+
+
+def write_csv(columns: Iterable[str], rows: Iterable[Row], stream: TextIO) -> int:
+    """
+    Записать отчёт в формате CSV: строку заголовка и строки отчёта.
+    Строки записываются по мере получения, не собираясь в памяти.
+    Вернуть число записанных строк отчёта.
+
+    Parameters
+    ----------
+    columns - названия столбцов (см. ReportQuery.columns)
+    rows - строки отчёта
+    stream - текстовый поток, открытый с newline=''
+    """
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
@@ -0,0 +1,104 @@
+"""
+Модуль описывает исполнитель отчётов для любых репозиториев: расходы
+читаются из репозитория и группируются в хеш-таблице в оперативной памяти
+"""
+
+from datetime import timedelta
+from functools import partial
+from operator import itemgetter
+from typing import Any, Callable, Iterator
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.reports.abstract_report import (
+    AGG_AVG, AGG_COUNT, AGG_MAX, AGG_MIN, AGG_SUM, DIM_CATEGORY, DIM_COMMENT,
+    DIM_CURRENCY, DIM_DAY, DIM_MONTH, DIM_SUBTREE, DIM_WEEK, DIM_YEAR,
+    AbstractReportEngine, ReportQuery, Row, percentile, percentile_rank)
+from bookkeeper.repository.abstract_repository import AbstractRepository
+
+_KEYS: dict[str, Callable[[Expense], Any]] = {
+    DIM_CATEGORY: lambda e: e.category,
+    DIM_DAY: lambda e: e.expense_date.date().isoformat(),
+    DIM_WEEK: lambda e: (e.expense_date.date()
+                         - timedelta(days=e.expense_date.weekday())).isoformat(),
+    DIM_MONTH: lambda e: f'{e.expense_date.year:04}-{e.expense_date.month:02}',
+    DIM_YEAR: lambda e: f'{e.expense_date.year:04}',
+    DIM_COMMENT: lambda e: e.comment,
+    DIM_CURRENCY: lambda e: e.currency,
+}
+
+_AGGREGATES: dict[str, Callable[[list[int]], Any]] = {
+    AGG_SUM: sum,
+    AGG_COUNT: len,
+    AGG_AVG: lambda values: sum(values) / len(values) if values else None,
+    AGG_MIN: lambda values: min(values, default=None),
+    AGG_MAX: lambda values: max(values, default=None),
+}
+
+
+def _percentile(values: list[int], rank: float) -> Any:
+    return percentile(sorted(values), rank)
+
+
+class MemoryReportEngine(AbstractReportEngine):
+    """
+    Исполнитель отчётов, группирующий расходы в словаре
+    "значения измерений -> суммы расходов группы".
+    """
+
+    def __init__(self,
+                 expenses: AbstractRepository[Expense],
+                 categories: AbstractRepository[Category],
+                 cache_size: int = 32) -> None:
+        super().__init__([expenses, categories], cache_size)
+        self.expenses = expenses
+        self.categories = categories
+
+    def _roots(self) -> dict[int, int]:
+        """ Категория верхнего уровня для каждой категории """
+        parents = {cat.pk: cat.parent for cat in self.categories.get_all()}
+        roots: dict[int, int] = {}
+        for pk in parents:
+            path = []
+            node = pk
+            while node not in roots and parents.get(node) is not None:
+                path.append(node)
+                node = parents[node]  # type: ignore[assignment]
+            root = roots.get(node, node)
+            for item in path:
+                roots[item] = root
+            roots[node] = root
+        return roots
+
+    def _execute(self, query: ReportQuery) -> Iterator[Row]:
+        roots = self._roots() if DIM_SUBTREE in query.group_by else {}
+        keys: list[Callable[[Expense], Any]] = [
+            (lambda e: roots.get(e.category, e.category)) if dimension == DIM_SUBTREE
+            else _KEYS[dimension]
+            for dimension in query.group_by]
+        aggregates: list[Callable[[list[int]], Any]] = [
+            _AGGREGATES[aggregate] if rank is None
+            else partial(_percentile, rank=rank)
+            for aggregate, rank in zip(query.aggregates,
+                                       map(percentile_rank, query.aggregates))]
+
+        where = None if query.categories is None else {'category': query.categories}
+        groups: dict[Row, list[int]] = {} if query.group_by else {(): []}
+        for expense in self.expenses.get_all(where):
+            if query.start is not None and expense.expense_date < query.start:
+                continue
+            if query.end is not None and expense.expense_date >= query.end:
+                continue
+            key = tuple(get_key(expense) for get_key in keys)
+            amounts = groups.get(key)
+            if amounts is None:
+                amounts = groups[key] = []
+            amounts.append(expense.amount)
+
+        rows = [key + tuple(aggregate(amounts) for aggregate in aggregates)
+                for key, amounts in sorted(groups.items(), key=itemgetter(0))]
+        if query.order_by is not None:
+            rows.sort(key=itemgetter(len(query.group_by)
+                                     + query.aggregates.index(query.order_by)),
+                      reverse=True)
+        yield from rows[:query.limit]
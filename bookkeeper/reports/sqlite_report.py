@@ -0,0 +1,135 @@
+"""
+Модуль описывает исполнитель отчётов для репозиториев SQLite: запрос отчёта
+переводится в один SQL-запрос с GROUP BY, и группировка выполняется СУБД
+"""
+
+import json
+from operator import itemgetter
+from typing import Any, Iterator
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.reports.abstract_report import (
+    AGG_AVG, AGG_COUNT, AGG_MAX, AGG_MIN, AGG_SUM, DIM_CATEGORY, DIM_COMMENT,
+    DIM_CURRENCY, DIM_DAY, DIM_MONTH, DIM_SUBTREE, DIM_WEEK, DIM_YEAR,
+    AbstractReportEngine, ReportQuery, Row, percentile, percentile_rank)
+from bookkeeper.repository.sqlite_repository import SQLiteRepository, adapt_datetime
+
+# Даты хранятся в виде текста 'ГГГГ-ММ-ДД ЧЧ:ММ:СС.ffffff'
+_KEYS = {
+    DIM_CATEGORY: 'e.category',
+    DIM_SUBTREE: 'coalesce(r.root, e.category)',
+    DIM_DAY: 'substr(e.expense_date, 1, 10)',
+    DIM_WEEK: "date(e.expense_date, 'weekday 0', '-6 days')",
+    DIM_MONTH: 'substr(e.expense_date, 1, 7)',
+    DIM_YEAR: 'substr(e.expense_date, 1, 4)',
+    DIM_COMMENT: 'e.comment',
+    DIM_CURRENCY: 'e.currency',
+}
+
+_AGGREGATES = {
+    AGG_SUM: 'coalesce(sum(e.amount), 0)',
+    AGG_COUNT: 'count(*)',
+    AGG_AVG: 'avg(e.amount)',
+    AGG_MIN: 'min(e.amount)',
+    AGG_MAX: 'max(e.amount)',
+}
+
+
+class SQLiteReportEngine(AbstractReportEngine):
+    """
+    Исполнитель отчётов по таблицам репозиториев SQLite.
+    Процентилей в SQLite нет, поэтому для них СУБД собирает суммы группы
+    в массив JSON (json_group_array), а процентиль считается на стороне
+    Python.
+    """
+
+    def __init__(self,
+                 expenses: SQLiteRepository[Expense],
+                 categories: SQLiteRepository[Category],
+                 cache_size: int = 32) -> None:
+        super().__init__([expenses, categories], cache_size)
+        self.expenses = expenses
+        self.categories = categories
+
+    def compile(self, query: ReportQuery) -> tuple[str, list[Any]]:
+        """ Перевести запрос отчёта в SQL-запрос с параметрами """
+        keys = [_KEYS[dimension] for dimension in query.group_by]
+        columns = keys + [_AGGREGATES.get(aggregate, 'NULL')
+                          for aggregate in query.aggregates]
+        ranks = [percentile_rank(aggregate) for aggregate in query.aggregates]
+        if any(rank is not None for rank in ranks):
+            columns.append('json_group_array(e.amount)')
+
+        sql = ''
+        if DIM_SUBTREE in query.group_by:
+            table = self.categories.table_name
+            sql = ('WITH RECURSIVE roots(pk, root) AS ('
+                   f'SELECT pk, pk FROM {table} WHERE parent IS NULL '
+                   f'UNION ALL SELECT c.pk, r.root FROM {table} AS c '
+                   'JOIN roots AS r ON c.parent = r.pk) ')
+        sql += f'SELECT {", ".join(columns)} FROM {self.expenses.table_name} AS e'
+        if DIM_SUBTREE in query.group_by:
+            sql += ' LEFT JOIN roots AS r ON r.pk = e.category'
+
+        where, params = self._where(query)
+        sql += where
+
+        positions = [str(i) for i in range(1, len(keys) + 1)]
+        if keys:
+            sql += ' GROUP BY ' + ', '.join(positions)
+        if query.order_by is not None and percentile_rank(query.order_by) is None:
+            position = len(keys) + query.aggregates.index(query.order_by) + 1
+            positions.insert(0, f'{position} DESC')
+        if positions:
+            sql += ' ORDER BY ' + ', '.join(positions)
+        if query.limit is not None and not self._sorts_in_python(query):
+            sql += ' LIMIT ?'
+            params.append(query.limit)
+        return sql, params
+
+    @staticmethod
+    def _where(query: ReportQuery) -> tuple[str, list[Any]]:
+        conditions = []
+        params: list[Any] = []
+        if query.start is not None:
+            conditions.append('e.expense_date >= ?')
+            params.append(adapt_datetime(query.start))
+        if query.end is not None:
+            conditions.append('e.expense_date < ?')
+            params.append(adapt_datetime(query.end))
+        if query.categories is not None:
+            conditions.append('e.category IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(sorted(query.categories)))
+        if not conditions:
+            return '', params
+        return ' WHERE ' + ' AND '.join(conditions), params
+
+    @staticmethod
+    def _sorts_in_python(query: ReportQuery) -> bool:
+        return query.order_by is not None and percentile_rank(query.order_by) is not None
+
+    def _execute(self, query: ReportQuery) -> Iterator[Row]:
+        sql, params = self.compile(query)
+        rows = self.expenses.read_rows(sql, params)
+        ranks = [percentile_rank(aggregate) for aggregate in query.aggregates]
+        if any(rank is not None for rank in ranks):
+            rows = self._with_percentiles(rows, len(query.group_by), ranks)
+        if not self._sorts_in_python(query):
+            yield from rows
+            return
+        assert query.order_by is not None
+        result = sorted(rows, key=itemgetter(len(query.group_by)
+                                             + query.aggregates.index(query.order_by)),
+                        reverse=True)
+        yield from result[:query.limit]
+
+    @staticmethod
+    def _with_percentiles(rows: Iterator[Row], n_keys: int,
+                          ranks: list[float | None]) -> Iterator[Row]:
+        for *values, amounts in rows:
+            ordered = sorted(json.loads(amounts))
+            for i, rank in enumerate(ranks):
+                if rank is not None:
+                    values[n_keys + i] = percentile(ordered, rank)
+            yield tuple(values)
@@ -7,8 +7,12 @@
 использовать его для иных целей.
 """
 
+import operator
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, Protocol, Any
+from functools import partial
+from typing import Generic, TypeVar, Protocol, Any, Callable, Iterable
+
+from bookkeeper.repository.change_feed import Change, ChangeHandler
 
 
 class Model(Protocol):  # pylint: disable=too-few-public-methods
@@ -21,6 +25,18 @@ class Model(Protocol):  # pylint: disable=too-few-public-methods
 T = TypeVar('T', bound=Model)
 
 
+def where_filter(where: dict[str, Any]) -> Callable[[Any], bool]:
+    """
+    Построить функцию, проверяющую, подходит ли объект под условие where
+    (см. AbstractRepository.get_all).
+    """
+    tests: list[tuple[str, Callable[[Any], bool]]] = [
+        (attr, value.__contains__ if isinstance(value, (set, frozenset))
+         else partial(operator.eq, value))
+        for attr, value in where.items()]
+    return lambda obj: all(test(getattr(obj, attr)) for attr, test in tests)
+
+
 class AbstractRepository(ABC, Generic[T]):
     """
     Абстрактный репозиторий.
@@ -39,6 +55,13 @@ class AbstractRepository(ABC, Generic[T]):
         также записать id в атрибут pk.
         """
 
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        """
+        Добавить несколько объектов, вернуть их id. Репозитории, для которых
+        пакетная запись дешевле поштучной, переопределяют этот метод.
+        """
+        return [self.add(obj) for obj in objs]
+
     @abstractmethod
     def get(self, pk: int) -> T | None:
         """ Получить объект по id """
@@ -48,7 +71,9 @@ class AbstractRepository(ABC, Generic[T]):
         """
         Получить все записи по некоторому условию
         where - условие в виде словаря {'название_поля': значение}
-        если условие не задано (по умолчанию), вернуть все записи
+        если условие не задано (по умолчанию), вернуть все записи.
+        Если значение - множество (set или frozenset), поле должно
+        принимать одно из значений множества.
         """
 
     @abstractmethod
@@ -58,3 +83,70 @@ class AbstractRepository(ABC, Generic[T]):
     @abstractmethod
     def delete(self, pk: int) -> None:
         """ Удалить запись """
+
+    def update_where(self, where: dict[str, Any], values: dict[str, Any]) -> int:
+        """
+        Присвоить полям values новые значения у всех объектов, подходящих
+        под условие where (как в get_all), вернуть число изменённых объектов.
+        Репозитории, умеющие изменять записи одним запросом, переопределяют
+        этот метод.
+        """
+        objs = self.get_all(where)
+        for obj in objs:
+            for attr, value in values.items():
+                setattr(obj, attr, value)
+            self.update(obj)
+        return len(objs)
+
+    def delete_where(self, where: dict[str, Any]) -> int:
+        """
+        Удалить все объекты, подходящие под условие where (как в get_all),
+        вернуть число удалённых объектов.
+        """
+        objs = self.get_all(where)
+        for obj in objs:
+            self.delete(obj.pk)
+        return len(objs)
+
+    def restore(self, obj: T) -> None:
+        """
+        Вернуть в репозиторий объект с уже назначенным pk (например, ранее
+        удалённый), не выдавая ему нового pk. Поддерживается не всеми
+        репозиториями.
+        """
+        raise NotImplementedError(
+            f'{type(self).__name__} does not support restoring objects')
+
+    @property
+    def version(self) -> int:
+        """
+        Номер версии репозитория: растёт с каждым изменением
+        (см. bookkeeper.repository.change_feed).
+        """
+        raise NotImplementedError(
+            f'{type(self).__name__} does not support change feed')
+
+    def changes(self, since: int) -> list[Change]:
+        """
+        Получить изменения, сделанные после версии since.
+        Поддерживается не всеми репозиториями.
+        """
+        raise NotImplementedError(
+            f'{type(self).__name__} does not support change feed')
+
+    def subscribe(self, handler: ChangeHandler) -> Callable[[], None]:
+        """
+        Подписаться на изменения репозитория, вернуть функцию для отписки.
+        handler вызывается с объектом Change для каждого изменения.
+        Поддерживается не всеми репозиториями.
+        """
+        raise NotImplementedError(
+            f'{type(self).__name__} does not support change feed')
+
+    def poll(self) -> int:
+        """
+        Проверить, нет ли изменений, сделанных другими клиентами хранилища,
+        и разослать их подписчикам. Вернуть число разосланных изменений.
+        Изменения через этот объект рассылаются сразу, без вызова poll.
+        """
+        return 0
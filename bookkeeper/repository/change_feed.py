@@ -0,0 +1,80 @@
+"""
+Модуль описывает ленту изменений репозитория (change data capture).
+
+Каждое изменение получает номер версии, номера монотонно возрастают.
+Клиент запоминает последнюю обработанную версию и получает только
+изменения после неё (changes), либо подписывается на новые изменения
+(subscribe) и применяет их по одному, не перечитывая репозиторий целиком.
+"""
+
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, NamedTuple
+
+OP_ADD = 'add'
+OP_UPDATE = 'update'
+OP_DELETE = 'delete'
+# Часть изменений потеряна (лента хранит ограниченное число записей),
+# подписчик должен перечитать репозиторий целиком.
+OP_RESET = 'reset'
+
+
+class Change(NamedTuple):
+    """
+    Изменение одного объекта.
+    version - номер версии репозитория после изменения
+    op - вид изменения: OP_ADD, OP_UPDATE, OP_DELETE или OP_RESET
+    pk - id изменённого объекта (0 для OP_RESET)
+    obj - объект после изменения (None, если объект удалён)
+    """
+    version: int
+    op: str
+    pk: int
+    obj: Any
+
+
+ChangeHandler = Callable[[Change], None]
+
+
+class ChangeFeedGap(ValueError):
+    """ Запрошенные изменения уже удалены из ленты """
+
+
+class ChangeLog:
+    """
+    Лента изменений в оперативной памяти. Хранит не более max_size
+    последних изменений в кольцевом буфере и рассылает новые изменения
+    подписчикам.
+    """
+
+    def __init__(self, max_size: int = 10_000) -> None:
+        self.version = 0
+        self._events: deque[Change] = deque(maxlen=max_size)
+        self._handlers: list[ChangeHandler] = []
+
+    def record(self, op: str, pk: int, obj: Any) -> Change:
+        """ Записать изменение и разослать его подписчикам """
+        self.version += 1
+        change = Change(self.version, op, pk, obj)
+        self._events.append(change)
+        for handler in list(self._handlers):
+            handler(change)
+        return change
+
+    def since(self, version: int) -> list[Change]:
+        """
+        Получить изменения с версией больше version.
+        Если часть из них уже вытеснена из буфера, вызывается ChangeFeedGap.
+        """
+        if version >= self.version:
+            return []
+        # Версии в буфере идут подряд, поэтому позиция вычисляется сразу.
+        first = self.version - len(self._events) + 1
+        if version + 1 < first:
+            raise ChangeFeedGap(f'changes after version {version} are not kept')
+        return list(islice(self._events, version + 1 - first, None))
+
+    def subscribe(self, handler: ChangeHandler) -> Callable[[], None]:
+        """ Подписаться на изменения, вернуть функцию для отписки """
+        self._handlers.append(handler)
+        return lambda: self._handlers.remove(handler)
@@ -0,0 +1,200 @@
+"""
+Модуль описывает потокобезопасный репозиторий в оперативной памяти
+
+Читатели (например, потоки, строящие отчёты) не берут блокировок и всегда
+видят согласованный снимок (snapshot) содержимого: изменение никогда не
+применяется к словарю, который может читать другой поток. Для этого
+объекты разложены по сегментам (shard) по диапазонам pk, и запись
+копирует только затронутые сегменты (copy-on-write), после чего
+одной операцией присваивания публикует новый снимок. Множественное
+изменение (update_where, delete_where) публикуется одним снимком, поэтому
+читатель не увидит его применённым наполовину.
+
+Писатели выполняются по очереди под блокировкой, но не ждут читателей,
+а читатели не ждут писателей. Объекты снимка нельзя изменять на месте:
+update_where изменяет копии объектов.
+"""
+
+import threading
+from copy import copy
+from itertools import chain, count
+from typing import Any, Callable, Generic, Iterable, Iterator
+
+from bookkeeper.repository.abstract_repository import AbstractRepository, T, where_filter
+from bookkeeper.repository.change_feed import (
+    OP_ADD, OP_DELETE, OP_UPDATE, Change, ChangeHandler, ChangeLog,
+)
+
+SHARD_SIZE = 1024  # Сколько подряд идущих pk хранится в одном сегменте.
+
+
+class Snapshot(Generic[T]):
+    """
+    Неизменяемый снимок содержимого репозитория.
+    version - версия репозитория, которой соответствует снимок
+    """
+
+    def __init__(self, shards: tuple[dict[int, T], ...], version: int,
+                 size: int, shard_size: int = SHARD_SIZE) -> None:
+        self.shards = shards
+        self.version = version
+        self._size = size
+        self._shard_size = shard_size
+
+    def get(self, pk: int) -> T | None:
+        """ Получить объект по id """
+        index = pk // self._shard_size
+        return self.shards[index].get(pk) if 0 <= index < len(self.shards) else None
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        """ Получить все объекты по условию (см. AbstractRepository.get_all) """
+        if where is None:
+            return list(self)
+        return list(filter(where_filter(where), self))
+
+    def __iter__(self) -> Iterator[T]:
+        return chain.from_iterable(shard.values() for shard in self.shards)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class ConcurrentMemoryRepository(AbstractRepository[T]):
+    """
+    Потокобезопасный репозиторий в оперативной памяти со снимками
+    для читателей.
+    """
+
+    def __init__(self, shard_size: int = SHARD_SIZE) -> None:
+        """
+        shard_size - число подряд идущих pk в одном сегменте: чем он меньше,
+            тем дешевле запись и тем больше сегментов перебирает get_all
+        """
+        if shard_size < 1:
+            raise ValueError(f'shard_size must be positive, got {shard_size}')
+        self._shard_size = shard_size
+        self._snapshot: Snapshot[T] = Snapshot((), 0, 0, shard_size)
+        self._counter = count(1)
+        self._change_log = ChangeLog()
+        # Повторно входимая, чтобы подписчик мог писать в репозиторий.
+        self._write_lock = threading.RLock()
+
+    def snapshot(self) -> Snapshot[T]:
+        """
+        Получить текущий снимок. Снимок не меняется при последующих
+        изменениях репозитория, поэтому несколько чтений из одного снимка
+        согласованы между собой.
+        """
+        return self._snapshot
+
+    def _publish(self, changes: list[tuple[str, int, T | None]]) -> None:
+        """
+        Применить изменения (вид, pk, объект) к копиям затронутых сегментов,
+        опубликовать новый снимок и записать изменения в ленту.
+        Вызывается под блокировкой записи.
+        """
+        if not changes:
+            return
+        current = self._snapshot
+        shards = list(current.shards)
+        size = len(current)
+        copied = set()
+        for _, pk, obj in changes:
+            index = pk // self._shard_size
+            if index >= len(shards):
+                shards.extend({} for _ in range(index + 1 - len(shards)))
+            if index not in copied:
+                shards[index] = dict(shards[index])
+                copied.add(index)
+            shard = shards[index]
+            if obj is None:
+                size -= shard.pop(pk, None) is not None
+            else:
+                size += pk not in shard
+                shard[pk] = obj
+        self._snapshot = Snapshot(tuple(shards), current.version + len(changes), size,
+                                  self._shard_size)
+        for op, pk, obj in changes:
+            self._change_log.record(op, pk, obj)
+
+    def add(self, obj: T) -> int:
+        if getattr(obj, 'pk', None) != 0:
+            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        with self._write_lock:
+            pk = next(self._counter)
+            obj.pk = pk
+            self._publish([(OP_ADD, pk, obj)])
+        return pk
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        """ Добавить объекты, опубликовав их одним снимком """
+        objs = list(objs)
+        if any(getattr(obj, 'pk', None) != 0 for obj in objs):
+            raise ValueError('trying to add objects with filled `pk` attribute')
+        with self._write_lock:
+            for obj in objs:
+                obj.pk = next(self._counter)
+            self._publish([(OP_ADD, obj.pk, obj) for obj in objs])
+        return [obj.pk for obj in objs]
+
+    def get(self, pk: int) -> T | None:
+        return self._snapshot.get(pk)
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        return self._snapshot.get_all(where)
+
+    def update(self, obj: T) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to update object with unknown primary key')
+        with self._write_lock:
+            self._publish([(OP_UPDATE, obj.pk, obj)])
+
+    def delete(self, pk: int) -> None:
+        with self._write_lock:
+            if self._snapshot.get(pk) is None:
+                raise KeyError(pk)
+            self._publish([(OP_DELETE, pk, None)])
+
+    def update_where(self, where: dict[str, Any], values: dict[str, Any]) -> int:
+        with self._write_lock:
+            changes: list[tuple[str, int, T | None]] = []
+            for obj in self._snapshot.get_all(where):
+                new = copy(obj)
+                for attr, value in values.items():
+                    setattr(new, attr, value)
+                changes.append((OP_UPDATE, new.pk, new))
+            self._publish(changes)
+        return len(changes)
+
+    def delete_where(self, where: dict[str, Any]) -> int:
+        with self._write_lock:
+            changes: list[tuple[str, int, T | None]] = [
+                (OP_DELETE, obj.pk, None) for obj in self._snapshot.get_all(where)]
+            self._publish(changes)
+        return len(changes)
+
+    def restore(self, obj: T) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to restore object with unknown primary key')
+        with self._write_lock:
+            if self._snapshot.get(obj.pk) is not None:
+                raise ValueError(f'object with pk {obj.pk} already exists')
+            self._publish([(OP_ADD, obj.pk, obj)])
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def changes(self, since: int) -> list[Change]:
+        # Лента изменений не рассчитана на чтение во время записи.
+        with self._write_lock:
+            return self._change_log.since(since)
+
+    def subscribe(self, handler: ChangeHandler) -> Callable[[], None]:
+        with self._write_lock:
+            unsubscribe = self._change_log.subscribe(handler)
+
+        def locked_unsubscribe() -> None:
+            with self._write_lock:
+                unsubscribe()
+        return locked_unsubscribe
@@ -0,0 +1,107 @@
+"""
+Модуль описывает ограничения внешнего ключа между репозиториями
+
+Ограничение объявляется у репозитория, объекты которого ссылаются на
+объекты другого репозитория (см. MemoryRepository.add_foreign_key):
+
+    expenses.add_foreign_key('category', categories, ON_DELETE_CASCADE)
+
+Для каждого ограничения поддерживается обратный индекс: pk объекта, на
+который ссылаются, -> pk ссылающихся объектов. Поэтому проверка ссылки
+при записи - одно обращение к репозиторию по pk, а поиск ссылающихся
+объектов при удалении - одно обращение к индексу, без перебора
+репозитория. Значение ссылки, под которым объект учтён в индексе,
+хранится отдельно от самого объекта: объект может быть изменён на месте
+раньше, чем из индекса убрана его прежняя ссылка.
+"""
+
+from collections import defaultdict
+from typing import Any
+
+from bookkeeper.repository.abstract_repository import AbstractRepository
+
+ON_DELETE_RESTRICT = 'restrict'  # Удалять объект, на который ссылаются, нельзя.
+ON_DELETE_CASCADE = 'cascade'  # Ссылающиеся объекты удаляются вместе с ним.
+ON_DELETE_SET_NULL = 'set null'  # Ссылки ссылающихся объектов заменяются на None.
+ON_DELETE_ACTIONS = (ON_DELETE_RESTRICT, ON_DELETE_CASCADE, ON_DELETE_SET_NULL)
+
+
+class IntegrityError(ValueError):
+    """
+    Изменение нарушает ограничение внешнего ключа.
+    """
+
+
+class ForeignKey:
+    """
+    Ограничение: поле field объектов репозитория child содержит pk
+    существующего объекта репозитория parent (или None).
+    on_delete - что происходит со ссылающимися объектами при удалении
+        объекта parent (ON_DELETE_*)
+    """
+
+    def __init__(self,
+                 child: AbstractRepository[Any],
+                 field: str,
+                 parent: AbstractRepository[Any],
+                 on_delete: str = ON_DELETE_RESTRICT) -> None:
+        if on_delete not in ON_DELETE_ACTIONS:
+            raise ValueError(f'unknown on_delete action {on_delete!r}')
+        self.child = child
+        self.field = field
+        self.parent = parent
+        self.on_delete = on_delete
+        self._index: dict[int, set[int]] = defaultdict(set)
+        # Значения ссылок, учтённые в индексе: pk объекта child -> значение.
+        self._values: dict[int, Any] = {}
+
+    def __repr__(self) -> str:
+        return f'ForeignKey({self.field!r}, on_delete={self.on_delete!r})'
+
+    def check(self, value: Any) -> None:
+        """
+        Проверить, что value - pk существующего объекта parent (или None),
+        иначе вызвать IntegrityError.
+        """
+        if value is not None and self.parent.get(value) is None:
+            raise IntegrityError(f'{self.field} = {value!r} refers to missing object')
+
+    def link(self, pk: int, obj: Any) -> None:
+        """ Учесть в индексе ссылку объекта obj с id pk """
+        value = getattr(obj, self.field)
+        if value is not None:
+            self._index[value].add(pk)
+            self._values[pk] = value
+
+    def unlink(self, pk: int) -> None:
+        """
+        Убрать из индекса ссылку объекта с id pk - ту, с которой он был
+        учтён (link), даже если сам объект с тех пор изменился.
+        """
+        value = self._values.pop(pk, None)
+        children = self._index.get(value)
+        if children is not None:
+            children.discard(pk)
+            if not children:
+                del self._index[value]
+
+    def referencing(self, parent_pks: set[int]) -> set[int]:
+        """ pk объектов child, ссылающихся на объекты parent с id из parent_pks """
+        result: set[int] = set()
+        for pk in parent_pks:
+            result |= self._index.get(pk, set())
+        return result
+
+    def violations(self) -> list[int]:
+        """
+        Проверить существующие данные: получить pk объектов child,
+        ссылающихся на отсутствующие объекты. Каждое значение ссылки
+        проверяется один раз, сколько бы объектов на него ни ссылалось.
+        """
+        by_value: dict[Any, list[int]] = defaultdict(list)
+        for obj in self.child.get_all():
+            value = getattr(obj, self.field)
+            if value is not None:
+                by_value[value].append(obj.pk)
+        return sorted(pk for value, pks in by_value.items()
+                      if self.parent.get(value) is None for pk in pks)
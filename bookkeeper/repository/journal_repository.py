@@ -0,0 +1,253 @@
+"""
+Модуль описывает репозиторий в оперативной памяти с журналом упреждающей
+записи (write-ahead log).
+
+Каждое изменение (добавление, изменение, удаление объекта) дописывается компактной записью
+в конец файла журнала. Записи буферизуются и сбрасываются на диск (fsync)
+группами: не чаще одного раза за commit_interval секунд. При сбое питания
+теряется не больше одного такого окна. При запуске состояние
+восстанавливается из последнего снимка и журнала, а журнал периодически
+сворачивается в снимок, чтобы время восстановления оставалось ограниченным.
+
+Изменения транзакции (см. MemoryRepository.begin) копятся в памяти
+и дописываются в журнал одним блоком при commit, а при rollback
+отбрасываются: после сбоя посреди транзакции её изменения
+не восстанавливаются.
+
+Файл журнала начинается с заголовка: сигнатура и версия формата (общая
+со снимками, см. bookkeeper.repository.snapshot). Журнал прежней версии
+при открытии сразу сворачивается в снимок текущей версии.
+
+Формат записи журнала: CRC32 остальной части записи, тип операции, pk,
+длина данных; затем данные объекта (см. pack_row).
+"""
+
+import os
+import struct
+import threading
+import zlib
+from itertools import count
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+from bookkeeper.repository.abstract_repository import T
+from bookkeeper.repository.change_feed import OP_ADD as FEED_OP_ADD
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.snapshot import (
+    FORMAT_VERSION, SnapshotError, model_schema, pack_row, read_snapshot, unpack_row,
+    version_schema,
+)
+
+OP_ADD = 1
+OP_UPDATE = 2
+OP_DELETE = 3
+
+MAGIC = b'BKWAL'
+
+_FILE_HEADER = struct.Struct('<5sH')
+_CHECKSUM = struct.Struct('<I')
+_RECORD_BODY = struct.Struct('<BQI')
+_RECORD_HEADER_SIZE = _CHECKSUM.size + _RECORD_BODY.size
+
+
+class JournalRepository(MemoryRepository[T]):
+    """
+    Репозиторий, работающий в оперативной памяти и записывающий
+    все изменения в журнал на диске.
+
+    Объект нужно закрыть методом close (или использовать как контекстный
+    менеджер), чтобы последние изменения гарантированно попали на диск.
+    """
+
+    def __init__(self,
+                 model: type[T],
+                 journal_path: str | Path,
+                 snapshot_path: str | Path | None = None,
+                 commit_interval: float = 0.05,
+                 compact_every: int = 100_000) -> None:
+        """
+        model - класс хранимых объектов (dataclass)
+        journal_path - путь до файла журнала
+        snapshot_path - путь до файла снимка, по умолчанию рядом с журналом
+        commit_interval - окно групповой фиксации (fsync) в секундах
+        compact_every - число записей в журнале, после которого журнал
+            сворачивается в снимок
+        """
+        super().__init__()
+        self._model = model
+        self._schema = model_schema(model)
+        self._journal_path = Path(journal_path)
+        self._snapshot_path = (Path(snapshot_path) if snapshot_path is not None
+                               else self._journal_path.with_suffix('.snap'))
+        self._commit_interval = commit_interval
+        self._compact_every = compact_every
+        self._records = 0
+        self._pending = 0
+        # Записи открытой транзакции, ещё не дописанные в журнал.
+        self._uncommitted: list[bytes] | None = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+        version = self._replay()
+        self._file = open(self._journal_path, 'ab')  # pylint: disable=consider-using-with
+        if version != FORMAT_VERSION:
+            self._compact()
+        elif self._file.tell() == 0:
+            self._write_header()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def __enter__(self) -> 'JournalRepository[T]':
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None,
+                 exc_value: BaseException | None,
+                 traceback: TracebackType | None) -> None:
+        self.close()
+
+    # Журналируются внутренние операции MemoryRepository, через которые
+    # проходят все изменения: и поштучные, и множественные (update_where,
+    # delete_where), и каскадные по внешним ключам, и откат транзакции.
+
+    def _put(self, pk: int, obj: T, op: str) -> None:
+        super()._put(pk, obj, op)
+        self._append(OP_ADD if op == FEED_OP_ADD else OP_UPDATE, pk,
+                     pack_row(self._schema, obj))
+
+    def _set(self, obj: T, values: dict[str, Any]) -> None:
+        super()._set(obj, values)
+        self._append(OP_UPDATE, obj.pk, pack_row(self._schema, obj))
+
+    def _remove(self, pks: set[int]) -> None:
+        super()._remove(pks)
+        for pk in sorted(pks):
+            self._append(OP_DELETE, pk, b'')
+
+    def begin(self) -> None:
+        super().begin()
+        self._uncommitted = []
+
+    def commit(self) -> None:
+        super().commit()
+        records, self._uncommitted = self._uncommitted or [], None
+        if records:
+            self._write(records)
+
+    def rollback(self) -> None:
+        # Записи возврата прежних состояний отбрасываются вместе
+        # с записями транзакции: в журнале их нет.
+        self._uncommitted = []
+        super().rollback()
+        self._uncommitted = None
+
+    def sync(self) -> None:
+        """
+        Сбросить накопленные записи журнала на диск.
+        """
+        with self._lock:
+            self._sync()
+
+    def compact(self) -> None:
+        """
+        Свернуть журнал в снимок: записать снимок текущего состояния
+        и очистить журнал. Если процесс прервётся между этими шагами,
+        повторное применение журнала к новому снимку ничего не испортит.
+        """
+        with self._lock:
+            self._compact()
+
+    def close(self) -> None:
+        """
+        Остановить фоновую фиксацию, сбросить журнал на диск и закрыть файл.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join()
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+    def _append(self, operation: int, pk: int, data: bytes) -> None:
+        body = _RECORD_BODY.pack(operation, pk, len(data)) + data
+        record = _CHECKSUM.pack(zlib.crc32(body)) + body
+        if self._uncommitted is not None:
+            self._uncommitted.append(record)
+        else:
+            self._write([record])
+
+    def _write(self, records: list[bytes]) -> None:
+        with self._lock:
+            self._file.write(b''.join(records))
+            self._pending += len(records)
+            self._records += len(records)
+            if self._records >= self._compact_every:
+                self._compact()
+
+    def _sync(self) -> None:
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def _write_header(self) -> None:
+        self._file.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _compact(self) -> None:
+        self._sync()
+        self.save_snapshot(self._snapshot_path, self._model)
+        self._file.truncate(0)
+        self._write_header()
+        self._records = 0
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self._commit_interval):
+            with self._lock:
+                self._sync()
+
+    def _replay(self) -> int:
+        """
+        Восстановить состояние из снимка и журнала. Недописанная
+        или повреждённая запись в конце журнала (след сбоя) отбрасывается.
+        Возвращает версию формата журнала.
+        """
+        next_pk = 1
+        if self._snapshot_path.exists():
+            objects, next_pk = read_snapshot(self._snapshot_path, self._model)
+            self._container = {obj.pk: obj for obj in objects}
+        if not self._journal_path.exists() or not self._journal_path.stat().st_size:
+            self._counter = count(next_pk)
+            return FORMAT_VERSION
+
+        data = memoryview(self._journal_path.read_bytes())
+        if len(data) < _FILE_HEADER.size or bytes(data[:len(MAGIC)]) != MAGIC:
+            raise SnapshotError(f'{self._journal_path} is not a journal file')
+        _, version = _FILE_HEADER.unpack_from(data)
+        offset = _FILE_HEADER.size
+        schema = version_schema(self._model, version)
+        while offset + _RECORD_HEADER_SIZE <= len(data):
+            (checksum,) = _CHECKSUM.unpack_from(data, offset)
+            operation, pk, length = _RECORD_BODY.unpack_from(
+                data, offset + _CHECKSUM.size)
+            end = offset + _RECORD_HEADER_SIZE + length
+            if (end > len(data)
+                    or zlib.crc32(data[offset + _CHECKSUM.size:end]) != checksum):
+                break
+            if operation == OP_DELETE:
+                self._container.pop(pk, None)
+            else:
+                self._container[pk] = unpack_row(
+                    schema, self._model, data[offset + _RECORD_HEADER_SIZE:end])
+                next_pk = max(next_pk, pk + 1)
+            self._records += 1
+            offset = end
+        self._counter = count(next_pk)
+
+        if offset < len(data):
+            with open(self._journal_path, 'r+b') as file:
+                file.truncate(offset)
+                os.fsync(file.fileno())
+        return version
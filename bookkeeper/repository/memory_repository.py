@@ -2,27 +2,147 @@
 Модуль описывает репозиторий, работающий в оперативной памяти
 """
 
+from collections import defaultdict
+from copy import copy
 from itertools import count
-from typing import Any
+from pathlib import Path
+from typing import Any, Callable, cast
 
-from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.abstract_repository import AbstractRepository, T, where_filter
+from bookkeeper.repository.change_feed import (
+    OP_ADD, OP_DELETE, OP_UPDATE, Change, ChangeHandler, ChangeLog,
+)
+from bookkeeper.repository.foreign_key import (
+    ON_DELETE_CASCADE, ON_DELETE_RESTRICT, ON_DELETE_SET_NULL, ForeignKey, IntegrityError,
+)
+from bookkeeper.repository.snapshot import read_snapshot, write_snapshot
 
 
 class MemoryRepository(AbstractRepository[T]):
     """
     Репозиторий, работающий в оперативной памяти. Хранит данные в словаре.
+    Поддерживает ограничения внешнего ключа (add_foreign_key).
     """
 
     def __init__(self) -> None:
         self._container: dict[int, T] = {}
         self._counter = count(1)
+        self._change_log = ChangeLog()
+        # Прежние состояния объектов, изменённых в открытой транзакции
+        # (None - транзакция не открыта).
+        self._undo_log: list[tuple[int, T | None]] | None = None
+        # Ограничения на поля объектов этого репозитория и ограничения
+        # других репозиториев, ссылающихся на этот.
+        self.foreign_keys: list[ForeignKey] = []
+        self.referenced_by: list[ForeignKey] = []
+
+    def add_foreign_key(self, field: str, parent: 'MemoryRepository[Any]',
+                        on_delete: str = ON_DELETE_RESTRICT) -> ForeignKey:
+        """
+        Объявить, что поле field объектов репозитория содержит pk объекта
+        репозитория parent (или None). Запись ссылки на отсутствующий объект
+        вызывает IntegrityError, удаление объекта parent обрабатывается
+        согласно on_delete (см. bookkeeper.repository.foreign_key).
+        Уже сохранённые объекты не проверяются (см. ForeignKey.violations).
+        """
+        foreign_key = ForeignKey(self, field, parent, on_delete)
+        for pk, obj in self._container.items():
+            foreign_key.link(pk, obj)
+        self.foreign_keys.append(foreign_key)
+        parent.referenced_by.append(foreign_key)
+        return foreign_key
+
+    def _remember(self, pk: int, obj: T | None) -> None:
+        if self._undo_log is not None:
+            self._undo_log.append((pk, None if obj is None else copy(obj)))
+
+    def _check(self, obj: T) -> None:
+        for foreign_key in self.foreign_keys:
+            foreign_key.check(getattr(obj, foreign_key.field))
+
+    def _put(self, pk: int, obj: T, op: str) -> None:
+        """ Записать объект, обновив обратные индексы ограничений """
+        old = self._container.get(pk)
+        self._remember(pk, old)
+        for foreign_key in self.foreign_keys:
+            foreign_key.unlink(pk)
+            foreign_key.link(pk, obj)
+        self._container[pk] = obj
+        self._change_log.record(op, pk, obj)
+
+    def _set(self, obj: T, values: dict[str, Any]) -> None:
+        """ Изменить поля объекта на месте, обновив обратные индексы ограничений """
+        self._remember(obj.pk, obj)
+        for foreign_key in self.foreign_keys:
+            foreign_key.unlink(obj.pk)
+        for attr, value in values.items():
+            setattr(obj, attr, value)
+        for foreign_key in self.foreign_keys:
+            foreign_key.link(obj.pk, obj)
+        self._change_log.record(OP_UPDATE, obj.pk, obj)
+
+    def _remove(self, pks: set[int]) -> None:
+        """ Удалить объекты, обновив обратные индексы ограничений """
+        for pk in sorted(pks):
+            obj = self._container.pop(pk)
+            self._remember(pk, obj)
+            for foreign_key in self.foreign_keys:
+                foreign_key.unlink(pk)
+            self._change_log.record(OP_DELETE, pk, None)
+
+    def _plan_delete(self, pks: set[int]) -> tuple[
+            dict['MemoryRepository[Any]', set[int]], list[tuple[ForeignKey, set[int]]]]:
+        """
+        Найти по обратным индексам все объекты, которые удалятся вместе
+        с объектами pks (каскадно), и ссылки, которые заменятся на None.
+        Если удаление запрещено ограничением, вызывается IntegrityError.
+        """
+        deletes: dict[MemoryRepository[Any], set[int]] = defaultdict(set)
+        restricted: list[tuple[ForeignKey, set[int]]] = []
+        nulled: list[tuple[ForeignKey, set[int]]] = []
+        stack: list[tuple[MemoryRepository[Any], set[int]]] = [(self, pks)]
+        while stack:
+            repo, new = stack.pop()
+            new = new - deletes[repo]
+            if not new:
+                continue
+            deletes[repo] |= new
+            for foreign_key in repo.referenced_by:
+                children = foreign_key.referencing(new)
+                child = cast(MemoryRepository[Any], foreign_key.child)
+                if children and foreign_key.on_delete == ON_DELETE_CASCADE:
+                    stack.append((child, children))
+                elif children:
+                    (nulled if foreign_key.on_delete == ON_DELETE_SET_NULL
+                     else restricted).append((foreign_key, children))
+        # Ссылки объектов, которые удаляются той же операцией, не мешают удалению.
+        for foreign_key, children in restricted:
+            if children - deletes[cast(MemoryRepository[Any], foreign_key.child)]:
+                raise IntegrityError(
+                    f'objects {sorted(children)} refer to deleted objects '
+                    f'through {foreign_key.field}')
+        return deletes, nulled
+
+    def _delete(self, pks: set[int]) -> None:
+        """
+        Удалить объекты вместе с каскадными изменениями ссылающихся на них
+        объектов. Все ограничения проверяются до первого изменения.
+        """
+        deletes, nulled = self._plan_delete(pks)
+        for foreign_key, children in nulled:
+            child = cast(MemoryRepository[Any], foreign_key.child)
+            for pk in sorted(children - deletes[child]):
+                child._set(child._container[pk], {foreign_key.field: None})
+        for repo, removed in deletes.items():
+            repo._remove(removed)
 
     def add(self, obj: T) -> int:
         if getattr(obj, 'pk', None) != 0:
             raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        self._check(obj)
         pk = next(self._counter)
-        self._container[pk] = obj
         obj.pk = pk
+        self._put(pk, obj, OP_ADD)
         return pk
 
     def get(self, pk: int) -> T | None:
@@ -31,13 +151,113 @@ class MemoryRepository(AbstractRepository[T]):
     def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
         if where is None:
             return list(self._container.values())
-        return [obj for obj in self._container.values()
-                if all(getattr(obj, attr) == value for attr, value in where.items())]
+        return list(filter(where_filter(where), self._container.values()))
 
     def update(self, obj: T) -> None:
         if obj.pk == 0:
             raise ValueError('attempt to update object with unknown primary key')
-        self._container[obj.pk] = obj
+        self._check(obj)
+        self._put(obj.pk, obj, OP_UPDATE)
 
     def delete(self, pk: int) -> None:
-        self._container.pop(pk)
+        if pk not in self._container:
+            raise KeyError(pk)
+        self._delete({pk})
+
+    def update_where(self, where: dict[str, Any], values: dict[str, Any]) -> int:
+        # Новое значение ссылки проверяется один раз, а не для каждого объекта.
+        for foreign_key in self.foreign_keys:
+            if foreign_key.field in values:
+                foreign_key.check(values[foreign_key.field])
+        objs = self.get_all(where)
+        for obj in objs:
+            self._set(obj, values)
+        return len(objs)
+
+    def delete_where(self, where: dict[str, Any]) -> int:
+        pks = {obj.pk for obj in self.get_all(where)}
+        self._delete(pks)
+        return len(pks)
+
+    def restore(self, obj: T) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to restore object with unknown primary key')
+        if obj.pk in self._container:
+            raise ValueError(f'object with pk {obj.pk} already exists')
+        self._check(obj)
+        self._put(obj.pk, obj, OP_ADD)
+
+    def begin(self) -> None:
+        """
+        Начать транзакцию: до commit или rollback репозиторий запоминает
+        прежние состояния изменяемых объектов
+        (см. bookkeeper.repository.unit_of_work).
+        """
+        self._undo_log = []
+
+    def commit(self) -> None:
+        """ Зафиксировать изменения транзакции """
+        self._undo_log = None
+
+    def rollback(self) -> None:
+        """
+        Отменить изменения транзакции, вернув прежние состояния объектов.
+        Подписчики получают обратные изменения.
+        """
+        undo_log, self._undo_log = self._undo_log or [], None
+        for pk, obj in reversed(undo_log):
+            if obj is None:
+                self._remove({pk})
+            else:
+                self._put(pk, obj, OP_UPDATE if pk in self._container else OP_ADD)
+
+    @property
+    def version(self) -> int:
+        return self._change_log.version
+
+    def changes(self, since: int) -> list[Change]:
+        return self._change_log.since(since)
+
+    def subscribe(self, handler: ChangeHandler) -> Callable[[], None]:
+        return self._change_log.subscribe(handler)
+
+    def _next_pk(self) -> int:
+        """ Узнать следующее значение счётчика pk, не расходуя его """
+        pk = next(self._counter)
+        self._counter = count(pk)
+        return pk
+
+    def save_snapshot(self, path: str | Path, model: type[T],
+                      compress: bool = False) -> None:
+        """
+        Сохранить содержимое репозитория в бинарный файл снимка
+        (см. модуль bookkeeper.repository.snapshot).
+
+        Parameters
+        ----------
+        path - путь до файла снимка
+        model - класс хранимых объектов (dataclass)
+        compress - сжимать ли снимок
+        """
+        write_snapshot(path, model, self._container.values(), self._next_pk(), compress)
+
+    @classmethod
+    def load_snapshot(cls, path: str | Path, model: type[T]) -> 'MemoryRepository[T]':
+        """
+        Создать репозиторий из файла снимка. Счётчик pk продолжается
+        с того места, где он был при сохранении снимка.
+
+        Parameters
+        ----------
+        path - путь до файла снимка
+        model - класс хранимых объектов (dataclass)
+
+        Returns
+        -------
+        Новый репозиторий с восстановленными объектами
+        """
+        objects, next_pk = read_snapshot(path, model)
+        repo = cls()
+        repo._container = {obj.pk: obj for obj in objects}
+        repo._counter = count(next_pk)
+        return repo
@@ -0,0 +1,261 @@
+"""
+Модуль описывает репозиторий расходов, разбитый на помесячные секции
+(partitions).
+
+Каждая секция - отдельный словарь в оперативной памяти, ключ секции -
+пара (год, месяц) даты расхода. Запросы по диапазону дат обращаются только
+к секциям нужных месяцев. Старые секции можно заморозить: они сжимаются
+в архивные снимки на диске (см. bookkeeper.repository.snapshot), становятся
+доступны только для чтения и загружаются обратно лишь при обращении к ним.
+
+Рядом с архивом секции хранится список pk её расходов (файл .pks), поэтому
+индекс "pk -> секция" восстанавливается при создании репозитория без
+чтения самих архивов: архивы из папки archive_dir подхватываются новым
+репозиторием (например, после перезапуска). Если списка pk нет (архив
+записан без него или запись прервалась), он строится по архиву один раз,
+при создании репозитория, и сохраняется.
+"""
+
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+import numpy as np
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository, where_filter
+from bookkeeper.repository.change_feed import (
+    OP_ADD, OP_DELETE, OP_UPDATE, Change, ChangeHandler, ChangeLog,
+)
+from bookkeeper.repository.snapshot import read_snapshot, write_snapshot
+
+PartitionKey = tuple[int, int]
+
+_ARCHIVE_NAME = re.compile(r'expenses-(\d{4})-(\d{2})\.snap')
+_PKS_DTYPE = np.dtype('<u8')
+
+
+def partition_key(date: datetime) -> PartitionKey:
+    """ Ключ секции, в которую попадает расход с датой date """
+    return date.year, date.month
+
+
+def _months(first: PartitionKey, last: PartitionKey) -> Iterator[PartitionKey]:
+    year, month = first
+    while (year, month) <= last:
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _write_pks(path: Path, pks: Iterable[int]) -> None:
+    """ Записать список pk секции (через временный файл) """
+    tmp_path = path.with_name(path.name + '.tmp')
+    np.fromiter(pks, _PKS_DTYPE).tofile(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class PartitionedExpenseRepository(AbstractRepository[Expense]):
+    """
+    Репозиторий расходов с разбиением на помесячные секции.
+    Добавление, получение, изменение и удаление по pk выполняются
+    за константное время независимо от объёма истории.
+    """
+
+    def __init__(self, archive_dir: str | Path | None = None,
+                 archive_cache_size: int = 12) -> None:
+        """
+        archive_dir - папка для архивов замороженных секций
+        archive_cache_size - сколько архивных секций держать загруженными
+        """
+        self._archive_dir = Path(archive_dir) if archive_dir is not None else None
+        self._archive_cache_size = archive_cache_size
+        self._partitions: dict[PartitionKey, dict[int, Expense]] = {}
+        self._archives: dict[PartitionKey, Path] = {}
+        self._loaded_archives: OrderedDict[PartitionKey, dict[int, Expense]] = (
+            OrderedDict())
+        self._locations: dict[int, PartitionKey] = {}
+        self._change_log = ChangeLog()
+        next_pk = 1
+        if self._archive_dir is not None and self._archive_dir.is_dir():
+            next_pk = self._open_archives()
+        self._counter = count(next_pk)
+
+    def add(self, obj: Expense) -> int:
+        if getattr(obj, 'pk', None) != 0:
+            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        key = partition_key(obj.expense_date)
+        self._check_not_frozen(key)
+        pk = next(self._counter)
+        obj.pk = pk
+        self._partitions.setdefault(key, {})[pk] = obj
+        self._locations[pk] = key
+        self._change_log.record(OP_ADD, pk, obj)
+        return pk
+
+    def get(self, pk: int) -> Expense | None:
+        key = self._locations.get(pk)
+        if key is None:
+            return None
+        return self._partition(key).get(pk)
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[Expense]:
+        result = []
+        for key in sorted(self._partitions.keys() | self._archives.keys()):
+            result.extend(self._select(self._partition(key).values(), where))
+        return result
+
+    def get_range(self, start: datetime, end: datetime,
+                  where: dict[str, Any] | None = None) -> list[Expense]:
+        """
+        Получить расходы с датой в полуинтервале [start, end).
+        Просматриваются только секции месяцев, пересекающихся с диапазоном.
+
+        Parameters
+        ----------
+        start - начало диапазона (включительно)
+        end - конец диапазона (не включительно)
+        where - дополнительное условие, как в get_all
+
+        Returns
+        -------
+        Список расходов
+        """
+        result: list[Expense] = []
+        for key in _months(partition_key(start), partition_key(end)):
+            if key not in self._partitions and key not in self._archives:
+                continue
+            result.extend(
+                obj for obj in self._select(self._partition(key).values(), where)
+                if start <= obj.expense_date < end)
+        return result
+
+    def update(self, obj: Expense) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to update object with unknown primary key')
+        old_key = self._locations.get(obj.pk)
+        new_key = partition_key(obj.expense_date)
+        self._check_not_frozen(new_key)
+        if old_key is not None:
+            self._check_not_frozen(old_key)
+            if old_key != new_key:
+                del self._partitions[old_key][obj.pk]
+        self._partitions.setdefault(new_key, {})[obj.pk] = obj
+        self._locations[obj.pk] = new_key
+        self._change_log.record(OP_UPDATE, obj.pk, obj)
+
+    def delete(self, pk: int) -> None:
+        key = self._locations[pk]
+        self._check_not_frozen(key)
+        del self._partitions[key][pk]
+        del self._locations[pk]
+        self._change_log.record(OP_DELETE, pk, None)
+
+    def restore(self, obj: Expense) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to restore object with unknown primary key')
+        if obj.pk in self._locations:
+            raise ValueError(f'object with pk {obj.pk} already exists')
+        key = partition_key(obj.expense_date)
+        self._check_not_frozen(key)
+        self._partitions.setdefault(key, {})[obj.pk] = obj
+        self._locations[obj.pk] = key
+        self._change_log.record(OP_ADD, obj.pk, obj)
+
+    @property
+    def version(self) -> int:
+        return self._change_log.version
+
+    def changes(self, since: int) -> list[Change]:
+        return self._change_log.since(since)
+
+    def subscribe(self, handler: ChangeHandler) -> Callable[[], None]:
+        return self._change_log.subscribe(handler)
+
+    def partitions(self) -> list[PartitionKey]:
+        """ Ключи всех секций, включая замороженные, по возрастанию """
+        return sorted(self._partitions.keys() | self._archives.keys())
+
+    def is_frozen(self, key: PartitionKey) -> bool:
+        """ Заморожена ли секция с данным ключом """
+        return key in self._archives
+
+    def freeze(self, before: datetime) -> list[PartitionKey]:
+        """
+        Заморозить все секции месяцев, предшествующих месяцу даты before:
+        записать их в сжатые архивы и выгрузить из памяти. Расходы в
+        замороженных секциях доступны только для чтения.
+
+        Parameters
+        ----------
+        before - дата, месяцы раньше которой замораживаются
+
+        Returns
+        -------
+        Список ключей замороженных секций
+        """
+        if self._archive_dir is None:
+            raise ValueError('archive_dir is not set, cannot freeze partitions')
+        self._archive_dir.mkdir(parents=True, exist_ok=True)
+        limit = partition_key(before)
+        frozen = []
+        for key in sorted(k for k in self._partitions if k < limit):
+            path = self._archive_dir / f'expenses-{key[0]:04d}-{key[1]:02d}.snap'
+            partition = self._partitions.pop(key)
+            write_snapshot(path, Expense, partition.values(), next_pk=0, compress=True)
+            _write_pks(path.with_suffix('.pks'), partition)
+            self._archives[key] = path
+            frozen.append(key)
+        return frozen
+
+    def _open_archives(self) -> int:
+        """
+        Подключить архивы из папки archive_dir и восстановить по их спискам
+        pk индекс "pk -> секция". Возвращает pk, следующий за наибольшим.
+        """
+        assert self._archive_dir is not None
+        next_pk = 1
+        for path in sorted(self._archive_dir.iterdir()):
+            match = _ARCHIVE_NAME.fullmatch(path.name)
+            if match is None:
+                continue
+            key = int(match[1]), int(match[2])
+            pks_path = path.with_suffix('.pks')
+            if pks_path.exists():
+                pks = np.fromfile(pks_path, _PKS_DTYPE).tolist()
+            else:
+                objects, _ = read_snapshot(path, Expense)
+                pks = [obj.pk for obj in objects]
+                _write_pks(pks_path, pks)
+            self._archives[key] = path
+            self._locations.update(dict.fromkeys(pks, key))
+            next_pk = max(next_pk, max(pks, default=0) + 1)
+        return next_pk
+
+    def _check_not_frozen(self, key: PartitionKey) -> None:
+        if key in self._archives:
+            raise ValueError(f'partition {key[0]:04d}-{key[1]:02d} is frozen')
+
+    def _partition(self, key: PartitionKey) -> dict[int, Expense]:
+        partition = self._partitions.get(key)
+        if partition is not None:
+            return partition
+        partition = self._loaded_archives.get(key)
+        if partition is not None:
+            self._loaded_archives.move_to_end(key)
+            return partition
+        objects, _ = read_snapshot(self._archives[key], Expense)
+        partition = {obj.pk: obj for obj in objects}
+        self._loaded_archives[key] = partition
+        if len(self._loaded_archives) > self._archive_cache_size:
+            self._loaded_archives.popitem(last=False)
+        return partition
+
+    @staticmethod
+    def _select(objects: Any, where: dict[str, Any] | None) -> Any:
+        if where is None:
+            return objects
+        return list(filter(where_filter(where), objects))
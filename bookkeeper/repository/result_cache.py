@@ -0,0 +1,134 @@
+"""
+Модуль описывает кэш результатов запросов к репозиториям
+
+Результат (итоги анализа бюджета, строки отчёта) хранится вместе с версиями
+репозиториев, из которых он прочитан (см. AbstractRepository.version).
+Если при обращении версия хотя бы одного из них изменилась, запись
+считается устаревшей и результат вычисляется заново, поэтому сбрасывать
+кэш при изменениях не нужно: изменение расхода не трогает результаты,
+зависящие только от бюджетов. Если источник не поддерживает версии,
+результат не кэшируется.
+
+Число записей ограничено, при переполнении удаляется запись, к которой
+дольше всего не обращались (LRU). Статистика обращений собирается
+в атрибуте stats.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable, Protocol, TypeVar
+
+V = TypeVar('V')
+
+
+class Versioned(Protocol):
+    """
+    Источник данных с версией, которая меняется при каждом изменении
+    (репозиторий, курсы валют).
+    """
+
+    @property
+    def version(self) -> int: ...
+
+
+@dataclass
+class CacheStats:
+    """
+    Статистика кэша.
+    hits - число обращений, результат которых взят из кэша
+    misses - число обращений, результат которых вычислен заново
+    invalidations - сколько из них пришлось на устаревшие записи
+    evictions - число записей, удалённых из-за переполнения
+    """
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """ Доля обращений, результат которых взят из кэша """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResultCache:
+    """
+    Кэш результатов, ключ которого - запрос и версии источников данных.
+    """
+
+    def __init__(self, maxsize: int = 32) -> None:
+        """
+        maxsize - число хранимых результатов (0 - не кэшировать)
+        """
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._entries: OrderedDict[
+            Hashable, tuple[tuple[int, ...], Any, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def versions(sources: Iterable[Versioned]) -> tuple[int, ...] | None:
+        """
+        Версии источников данных или None, если какой-то из них
+        не поддерживает версии.
+        """
+        try:
+            return tuple(source.version for source in sources)
+        except NotImplementedError:
+            return None
+
+    def get(self, key: Hashable, versions: tuple[int, ...] | None,
+            now: Any = None) -> Any:
+        """
+        Получить результат запроса key, прочитанный из источников с версиями
+        versions. Если его нет, он устарел или срок его действия истёк
+        к моменту now (см. put), возвращается None.
+        """
+        entry = self._entries.get(key) if versions is not None else None
+        if entry is not None:
+            cached_versions, value, expires = entry
+            if cached_versions == versions and (
+                    expires is None or now is None or now < expires):
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return value
+            del self._entries[key]
+            self.stats.invalidations += 1
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: Hashable, versions: tuple[int, ...] | None, value: Any,
+            expires: Any = None) -> None:
+        """
+        Сохранить результат value запроса key, прочитанный из источников
+        с версиями versions. expires - момент, начиная с которого результат
+        устаревает, даже если данные не менялись (например, расход выходит
+        из окна "за последний день").
+        """
+        if versions is None or self.maxsize <= 0:
+            return
+        self._entries[key] = (versions, value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def get_or_compute(self, key: Hashable, sources: Iterable[Versioned],
+                       compute: Callable[[], V]) -> V:
+        """
+        Получить результат запроса key из кэша или вычислить его функцией
+        compute, читающей данные из источников sources.
+        """
+        versions = self.versions(sources)
+        value = self.get(key, versions)
+        if value is None:
+            value = compute()
+            self.put(key, versions, value)
+        return value
+
+    def clear(self) -> None:
+        """ Удалить все результаты (статистика сохраняется) """
+        self._entries.clear()
@@ -0,0 +1,358 @@
+"""
+Модуль описывает бинарный формат снимков (snapshot) репозитория.
+
+Снимок хранит объекты одной модели (dataclass) по столбцам: каждое поле
+модели записывается одним непрерывным блоком, что делает файл компактным
+и позволяет читать его целиком через отображение в память (mmap).
+
+Структура файла:
+    заголовок (см. _HEADER) - сигнатура, версия формата, флаги,
+        следующее значение счётчика pk, число строк, длина схемы,
+        контрольная сумма CRC32 всего, что идёт после заголовка;
+    схема - строка вида 'имя:тип,имя:тип' в кодировке utf-8;
+    данные - столбцы подряд, каждый предварён своей длиной в байтах,
+        при установленном флаге FLAG_COMPRESSED сжаты zlib целиком.
+
+Версия формата растёт, когда в модели добавляются поля (см. ADDED_FIELDS).
+Файлы прежних версий читаются: добавленные позже поля получают значения
+по умолчанию.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from dataclasses import fields, is_dataclass
+from datetime import datetime, timedelta
+from itertools import repeat
+from pathlib import Path
+from typing import Any, Iterable, get_type_hints
+
+from bookkeeper.utils import paused_gc
+
+MAGIC = b'BKSNAP'
+FORMAT_VERSION = 2
+# Поля моделей, появившиеся в данной версии формата.
+ADDED_FIELDS: dict[int, tuple[str, ...]] = {
+    2: ('currency',),
+}
+FLAG_COMPRESSED = 1
+
+_HEADER = struct.Struct('<6sHBxQQII')
+_LENGTH = struct.Struct('<Q')
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+KIND_INT = 'i'
+KIND_OPTIONAL_INT = 'n'
+KIND_STR = 's'
+KIND_DATETIME = 't'
+
+_KINDS: dict[Any, str] = {
+    int: KIND_INT,
+    int | None: KIND_OPTIONAL_INT,
+    str: KIND_STR,
+    datetime: KIND_DATETIME,
+}
+
+
+class SnapshotError(ValueError):
+    """
+    Файл снимка повреждён или не соответствует модели.
+    """
+
+
+def model_schema(model: type) -> list[tuple[str, str]]:
+    """
+    Получить схему модели в виде списка пар (имя поля, тип столбца).
+
+    Parameters
+    ----------
+    model - класс модели, должен быть dataclass
+
+    Returns
+    -------
+    Список пар в порядке объявления полей
+    """
+    if not is_dataclass(model):
+        raise TypeError(f'{model!r} is not a dataclass')
+    hints = get_type_hints(model)
+    schema = []
+    for fld in fields(model):
+        try:
+            schema.append((fld.name, _KINDS[hints[fld.name]]))
+        except KeyError:
+            raise TypeError(
+                f'field {fld.name!r} of {model.__name__} has unsupported '
+                f'type {hints[fld.name]!r}') from None
+    return schema
+
+
+def version_schema(model: type, version: int) -> list[tuple[str, str]]:
+    """
+    Получить схему, с которой объекты модели записывались в файлы версии
+    формата version: схему модели без полей, добавленных в более поздних
+    версиях. Если версия не поддерживается, вызывается SnapshotError.
+    """
+    if not 1 <= version <= FORMAT_VERSION:
+        raise SnapshotError(f'unsupported format version {version}')
+    added = {name for later in range(version + 1, FORMAT_VERSION + 1)
+             for name in ADDED_FIELDS.get(later, ())}
+    return [(name, kind) for name, kind in model_schema(model) if name not in added]
+
+
+def _row_factory(schema: list[tuple[str, str]], model: type) -> Any:
+    """
+    Функция, создающая объект модели из значений полей схемы schema
+    в порядке схемы. Поля модели, которых нет в схеме, получают значения
+    по умолчанию.
+    """
+    if len(schema) == len(fields(model)):
+        return model
+    names = [name for name, _ in schema]
+    return lambda *values: model(**dict(zip(names, values)))
+
+
+def datetime_to_int(value: datetime) -> int:
+    """ Представить дату числом микросекунд от начала эпохи """
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def int_to_datetime(value: int) -> datetime:
+    """ Обратное преобразование к datetime_to_int """
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def _int_array(values: Iterable[int]) -> bytes:
+    arr = array('q', values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _read_int_array(data: memoryview) -> array:
+    arr = array('q')
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+
+def _encode_column(kind: str, values: list[Any]) -> list[bytes]:
+    if kind == KIND_INT:
+        return [_int_array(values)]
+    if kind == KIND_OPTIONAL_INT:
+        return [_int_array(0 if v is None else v for v in values),
+                bytes(v is None for v in values)]
+    if kind == KIND_DATETIME:
+        return [_int_array(map(datetime_to_int, values))]
+    # KIND_STR: смещения считаются в символах, чтобы при чтении
+    # декодировать весь блок одним вызовом и резать готовую строку.
+    offsets = [0]
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return [_int_array(offsets), ''.join(values).encode('utf-8')]
+
+
+def _decode_column(kind: str, blocks: list[memoryview]) -> Iterable[Any]:
+    if kind == KIND_INT:
+        return _read_int_array(blocks[0])
+    if kind == KIND_OPTIONAL_INT:
+        nulls = bytes(blocks[1])
+        return [None if null else v
+                for v, null in zip(_read_int_array(blocks[0]), nulls)]
+    if kind == KIND_DATETIME:
+        values = _read_int_array(blocks[0])
+        zeros = repeat(0)
+        return map(_EPOCH.__add__, map(timedelta, zeros, zeros, values))
+    offsets = _read_int_array(blocks[0])
+    text = str(blocks[1], 'utf-8')
+    return [text[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+_INT = struct.Struct('<q')
+_OPTIONAL_INT = struct.Struct('<?q')
+_STR_LENGTH = struct.Struct('<I')
+
+
+def pack_row(schema: list[tuple[str, str]], obj: Any) -> bytes:
+    """
+    Упаковать один объект построчно (используется журналом, где записи
+    идут по одной, а не столбцами).
+
+    Parameters
+    ----------
+    schema - схема модели, см. model_schema
+    obj - упаковываемый объект
+
+    Returns
+    -------
+    Байтовое представление объекта
+    """
+    parts = []
+    for name, kind in schema:
+        value = getattr(obj, name)
+        if kind == KIND_INT:
+            parts.append(_INT.pack(value))
+        elif kind == KIND_OPTIONAL_INT:
+            parts.append(_OPTIONAL_INT.pack(value is None, value or 0))
+        elif kind == KIND_DATETIME:
+            parts.append(_INT.pack(datetime_to_int(value)))
+        else:
+            encoded = value.encode('utf-8')
+            parts.append(_STR_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+    return b''.join(parts)
+
+
+def unpack_row(schema: list[tuple[str, str]], model: type,
+               data: bytes | memoryview) -> Any:
+    """
+    Обратное преобразование к pack_row.
+
+    Parameters
+    ----------
+    schema - схема модели, см. model_schema
+    model - класс объекта
+    data - результат pack_row (схема может быть схемой прежней версии
+        формата, см. version_schema)
+
+    Returns
+    -------
+    Восстановленный объект
+    """
+    values: list[Any] = []
+    offset = 0
+    for _, kind in schema:
+        if kind == KIND_INT:
+            values.append(_INT.unpack_from(data, offset)[0])
+            offset += _INT.size
+        elif kind == KIND_OPTIONAL_INT:
+            is_none, value = _OPTIONAL_INT.unpack_from(data, offset)
+            values.append(None if is_none else value)
+            offset += _OPTIONAL_INT.size
+        elif kind == KIND_DATETIME:
+            values.append(int_to_datetime(_INT.unpack_from(data, offset)[0]))
+            offset += _INT.size
+        else:
+            (length,) = _STR_LENGTH.unpack_from(data, offset)
+            offset += _STR_LENGTH.size
+            values.append(str(data[offset:offset + length], 'utf-8'))
+            offset += length
+    return _row_factory(schema, model)(*values)
+
+
+_BLOCKS_PER_KIND = {KIND_INT: 1, KIND_OPTIONAL_INT: 2, KIND_DATETIME: 1, KIND_STR: 2}
+
+
+def write_snapshot(path: str | Path, model: type, objects: Iterable[Any],
+                   next_pk: int, compress: bool = False) -> None:
+    """
+    Атомарно записать снимок в файл: данные сначала пишутся во временный
+    файл рядом с целевым, сбрасываются на диск и только затем подменяют его.
+
+    Parameters
+    ----------
+    path - путь до файла снимка
+    model - класс сохраняемых объектов
+    objects - сохраняемые объекты
+    next_pk - следующее значение счётчика pk репозитория
+    compress - сжимать ли данные zlib
+    """
+    schema = model_schema(model)
+    objects = list(objects)
+    payload = bytearray()
+    for name, kind in schema:
+        for block in _encode_column(kind, [getattr(obj, name) for obj in objects]):
+            payload += _LENGTH.pack(len(block))
+            payload += block
+    if compress:
+        payload = bytearray(zlib.compress(payload))
+    schema_bytes = ','.join(f'{name}:{kind}' for name, kind in schema).encode()
+    checksum = zlib.crc32(payload, zlib.crc32(schema_bytes))
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_COMPRESSED if compress else 0,
+                          next_pk, len(objects), len(schema_bytes), checksum)
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as file:
+        file.write(header)
+        file.write(schema_bytes)
+        file.write(payload)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def read_snapshot(path: str | Path, model: type) -> tuple[list[Any], int]:
+    """
+    Прочитать снимок из файла. Несжатые снимки читаются через mmap
+    без промежуточного копирования файла в память.
+
+    Parameters
+    ----------
+    path - путь до файла снимка
+    model - класс сохранённых объектов
+
+    Returns
+    -------
+    Пара (список объектов, следующее значение счётчика pk)
+    """
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < _HEADER.size:
+            raise SnapshotError(f'{path}: file is too short')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                try:
+                    return _parse(view, model, str(path))
+                except SnapshotError as exc:
+                    message = str(exc)
+                except (struct.error, zlib.error) as exc:
+                    message = f'{path}: {exc}'
+    # Трассировка исключения держит срезы view, поэтому новое исключение
+    # поднимается только после того, как mmap закрыт.
+    raise SnapshotError(message)
+
+
+def _parse(view: memoryview, model: type, name: str) -> tuple[list[Any], int]:
+    (magic, version, flags, next_pk, rows,
+     schema_length, checksum) = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError(f'{name}: not a snapshot file')
+    try:
+        schema = version_schema(model, version)
+    except SnapshotError as exc:
+        raise SnapshotError(f'{name}: {exc}') from None
+    body = view[_HEADER.size:]
+    if zlib.crc32(body) != checksum:
+        raise SnapshotError(f'{name}: checksum mismatch')
+
+    expected = ','.join(f'{n}:{k}' for n, k in schema)
+    if str(body[:schema_length], 'utf-8') != expected:
+        raise SnapshotError(f'{name}: schema does not match {model.__name__}')
+    payload = body[schema_length:]
+    if flags & FLAG_COMPRESSED:
+        payload = memoryview(zlib.decompress(payload))
+
+    columns = []
+    offset = 0
+    for _, kind in schema:
+        blocks = []
+        for _ in range(_BLOCKS_PER_KIND[kind]):
+            (length,) = _LENGTH.unpack_from(payload, offset)
+            offset += _LENGTH.size
+            blocks.append(payload[offset:offset + length])
+            offset += length
+        columns.append(_decode_column(kind, blocks))
+    with paused_gc():
+        objects = list(map(_row_factory(schema, model), *columns)) if rows else []
+    return objects, next_pk
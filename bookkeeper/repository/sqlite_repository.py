@@ -0,0 +1,603 @@
+"""
+Модуль описывает репозиторий, работающий в СУБД SQLite
+
+Репозиторий рассчитан на то, что с одним файлом базы данных одновременно
+работают несколько процессов (например, графический интерфейс и фоновый
+импорт). Для этого:
+- база переводится в режим WAL, в котором читатели не блокируют писателя;
+- каждая запись - короткая транзакция, которая начинается с
+  BEGIN IMMEDIATE, т. е. сразу берёт блокировку на запись, а не пытается
+  повысить блокировку посреди транзакции (что в SQLite ведёт к ошибке
+  "database is locked" без ожидания);
+- при занятой базе SQLite сам ждёт busy_timeout, а если блокировку получить
+  не удалось, транзакция повторяется с экспоненциальной задержкой со
+  случайной составляющей (jitter), чтобы процессы не просыпались одновременно;
+- чтение идёт через пул отдельных соединений только для чтения.
+Статистика ожиданий блокировок собирается в атрибуте stats.
+
+Репозитории нескольких таблиц одной базы можно объединить единицей работы
+(SQLiteUnitOfWork): они пишут через одно общее соединение, и изменения всех
+таблиц внутри блока with фиксируются одной транзакцией.
+
+Изменения таблицы записываются триггерами в таблицу <имя>_changes, из которой
+строится лента изменений (см. bookkeeper.repository.change_feed). Изменения
+других процессов обнаруживаются дешёвой проверкой PRAGMA data_version.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import MISSING, dataclass, fields
+from datetime import datetime
+from pathlib import Path
+from queue import Empty, LifoQueue
+from typing import Any, Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager
+
+from bookkeeper.repository.abstract_repository import AbstractRepository, T
+from bookkeeper.repository.change_feed import (
+    OP_ADD, OP_DELETE, OP_RESET, OP_UPDATE, Change, ChangeFeedGap, ChangeHandler,
+)
+from bookkeeper.repository.snapshot import (
+    KIND_DATETIME, KIND_INT, KIND_OPTIONAL_INT, model_schema,
+)
+from bookkeeper.repository.unit_of_work import AbstractUnitOfWork
+
+_SQL_TYPES = {
+    KIND_INT: 'INTEGER NOT NULL',
+    KIND_OPTIONAL_INT: 'INTEGER',
+    KIND_DATETIME: 'TEXT NOT NULL',
+}
+
+CHANGE_LOG_SIZE = 10_000  # Сколько последних изменений хранить в таблице изменений.
+
+
+def adapt_datetime(value: datetime) -> str:
+    """
+    Представить дату строкой фиксированной длины, чтобы даты
+    правильно сравнивались и сортировались средствами SQLite.
+    """
+    return value.isoformat(sep=' ', timespec='microseconds')
+
+
+@dataclass
+class LockStats:
+    """
+    Статистика транзакций на запись.
+    transactions - число успешных транзакций
+    retries - число повторов из-за занятой базы
+    failures - число транзакций, так и не выполненных из-за блокировки
+    lock_wait - суммарное время ожидания блокировок, секунд
+    """
+    transactions: int = 0
+    retries: int = 0
+    failures: int = 0
+    lock_wait: float = 0.0
+
+
+def _column_default(model: type, name: str) -> str:
+    """
+    Значение по умолчанию поля модели в виде литерала SQL.
+    """
+    default = next(fld.default for fld in fields(model) if fld.name == name)
+    if default is MISSING:
+        raise ValueError(f'field {name!r} of {model.__name__} has no default value')
+    if default is None:
+        return 'NULL'
+    if isinstance(default, str):
+        return "'" + default.replace("'", "''") + "'"
+    return str(int(default))
+
+
+def _is_locked_error(exc: sqlite3.OperationalError) -> bool:
+    message = str(exc).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def _connect(db_file: str, busy_timeout: float,
+             read_only: bool = False) -> sqlite3.Connection:
+    if read_only:
+        uri = Path(db_file).absolute().as_uri() + '?mode=ro'
+        connection = sqlite3.connect(uri, uri=True, timeout=busy_timeout,
+                                     isolation_level=None, check_same_thread=False)
+    else:
+        connection = sqlite3.connect(db_file, timeout=busy_timeout,
+                                     isolation_level=None, check_same_thread=False)
+    connection.execute(f'PRAGMA busy_timeout = {int(busy_timeout * 1000)}')
+    return connection
+
+
+def _begin_immediate(cursor: sqlite3.Cursor, stats: LockStats,
+                     max_retries: int, retry_delay: float) -> None:
+    """
+    Начать транзакцию на запись, повторяя попытку, пока база занята
+    другим процессом.
+    """
+    delay = retry_delay
+    for attempt in range(max_retries + 1):
+        started = time.perf_counter()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            stats.lock_wait += time.perf_counter() - started
+            return
+        except sqlite3.OperationalError as exc:
+            stats.lock_wait += time.perf_counter() - started
+            if not _is_locked_error(exc) or attempt == max_retries:
+                if _is_locked_error(exc):
+                    stats.failures += 1
+                raise
+            stats.retries += 1
+            pause = random.uniform(0, delay)
+            time.sleep(pause)
+            stats.lock_wait += pause
+            delay *= 2
+
+
+class SQLiteUnitOfWork(AbstractUnitOfWork):
+    """
+    Единица работы над таблицами одной базы SQLite. Репозитории, созданные
+    методом repository, пишут через общее соединение единицы работы.
+    Изменения внутри блока with выполняются в одной транзакции и фиксируются
+    одним COMMIT (одна синхронизация с диском вместо синхронизации на каждое
+    изменение), а при исключении откатываются. Пока блок открыт, другие
+    потоки ждут его завершения, чтобы начать запись; подписчики репозиториев
+    получают изменения после фиксации.
+    """
+
+    def __init__(self,
+                 db_file: str | Path,
+                 busy_timeout: float = 5.0,
+                 max_retries: int = 10,
+                 retry_delay: float = 0.005,
+                 read_pool_size: int = 4) -> None:
+        """
+        Параметры - как у SQLiteRepository, они передаются всем репозиториям
+        единицы работы.
+        """
+        super().__init__()
+        self.db_file = str(db_file)
+        self.busy_timeout = busy_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.read_pool_size = read_pool_size
+        self.stats = LockStats()
+        self.repositories: list[SQLiteRepository[Any]] = []
+        self.lock = threading.RLock()
+        self.connection = _connect(self.db_file, busy_timeout)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self._owner: int | None = None
+
+    def repository(self, model: type[T]) -> 'SQLiteRepository[T]':
+        """ Создать репозиторий модели model, пишущий через эту единицу работы """
+        repository = SQLiteRepository(
+            self.db_file, model, self.busy_timeout, self.max_retries, self.retry_delay,
+            self.read_pool_size, unit_of_work=self)
+        self.repositories.append(repository)
+        return repository
+
+    @property
+    def active(self) -> bool:
+        """ Открыт ли блок единицы работы в текущем потоке """
+        return self._owner == threading.get_ident()
+
+    def __enter__(self) -> 'SQLiteUnitOfWork':
+        self.lock.acquire()
+        try:
+            super().__enter__()
+        except BaseException:
+            self.lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        try:
+            super().__exit__(*exc_info)
+        finally:
+            self.lock.release()
+
+    def _begin(self) -> None:
+        _begin_immediate(self.connection.cursor(), self.stats,
+                         self.max_retries, self.retry_delay)
+        self._owner = threading.get_ident()
+
+    def _commit(self) -> None:
+        try:
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self._rollback()
+            raise
+        self._owner = None
+        self.stats.transactions += 1
+        for repository in self.repositories:
+            repository._publish()  # pylint: disable=protected-access
+
+    def _rollback(self) -> None:
+        self._owner = None
+        if self.connection.in_transaction:
+            self.connection.execute('ROLLBACK')
+
+    def close(self) -> None:
+        """ Закрыть соединения единицы работы и всех её репозиториев """
+        for repository in self.repositories:
+            repository.close()
+        with self.lock:
+            self.connection.close()
+
+
+class SQLiteRepository(AbstractRepository[T]):
+    """
+    Репозиторий, хранящий объекты одной модели (dataclass) в таблице SQLite.
+    Имя таблицы - имя класса модели в нижнем регистре.
+    """
+
+    def __init__(self,
+                 db_file: str | Path,
+                 model: type[T],
+                 busy_timeout: float = 5.0,
+                 max_retries: int = 10,
+                 retry_delay: float = 0.005,
+                 read_pool_size: int = 4,
+                 unit_of_work: SQLiteUnitOfWork | None = None) -> None:
+        """
+        db_file - путь до файла базы данных
+        model - класс хранимых объектов
+        busy_timeout - сколько SQLite ждёт освобождения базы, секунд
+        max_retries - сколько раз повторять транзакцию, если база занята
+        retry_delay - начальная задержка перед повтором, секунд
+        read_pool_size - число соединений для чтения
+        unit_of_work - единица работы, через соединение которой пишет
+            репозиторий (обычно репозиторий создаётся её методом repository)
+        """
+        self.db_file = str(db_file)
+        self.model = model
+        self.table_name = model.__name__.lower()
+        self.changes_table_name = f'{self.table_name}_changes'
+        self._unit_of_work = unit_of_work
+        self.stats = LockStats() if unit_of_work is None else unit_of_work.stats
+        self._schema = model_schema(model)
+        self._fields = [name for name, _ in self._schema if name != 'pk']
+        kinds = dict(self._schema)
+        self._datetime_indexes = [index for index, name in enumerate(self._fields)
+                                  if kinds[name] == KIND_DATETIME]
+        self._converters = [datetime.fromisoformat if kind == KIND_DATETIME else None
+                            for name, kind in self._schema]
+        self._busy_timeout = busy_timeout
+        self._max_retries = max_retries
+        self._retry_delay = retry_delay
+        self._read_pool: LifoQueue[sqlite3.Connection] = LifoQueue(read_pool_size)
+        self._handlers: list[ChangeHandler] = []
+
+        self._write_lock: threading.Lock | threading.RLock
+        if unit_of_work is None:
+            self._write_lock = threading.Lock()
+            self._connection = _connect(self.db_file, busy_timeout)
+            self._connection.execute('PRAGMA journal_mode = WAL')
+        else:
+            self._write_lock = unit_of_work.lock
+            self._connection = unit_of_work.connection
+        self._write(self._create_tables)
+        self._seen_version = self.version
+        self._data_version = self._get_data_version()
+
+    def _create_tables(self, cursor: sqlite3.Cursor) -> None:
+        table, changes = self.table_name, self.changes_table_name
+        columns = ', '.join(f'{name} {_SQL_TYPES.get(kind, "TEXT NOT NULL")}'
+                            for name, kind in self._schema if name != 'pk')
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                       f'(pk INTEGER PRIMARY KEY, {columns})')
+        # Поля, добавленные в модель после создания таблицы, добавляются
+        # в таблицу столбцами со значением поля по умолчанию.
+        existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+        for name, kind in self._schema:
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} '
+                               f'{_SQL_TYPES.get(kind, "TEXT NOT NULL")} '
+                               f'DEFAULT {_column_default(self.model, name)}')
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {changes} '
+                       '(version INTEGER PRIMARY KEY, '
+                       'op TEXT NOT NULL, pk INTEGER NOT NULL)')
+        for event, op, row in (('INSERT', OP_ADD, 'NEW'),
+                               ('UPDATE', OP_UPDATE, 'NEW'),
+                               ('DELETE', OP_DELETE, 'OLD')):
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_feed '
+                           f'AFTER {event} ON {table} BEGIN '
+                           f"INSERT INTO {changes} (op, pk) VALUES ('{op}', {row}.pk); "
+                           'END')
+        # Старые изменения удаляются не при каждой вставке, а через каждую
+        # тысячу: так массовая запись не платит за удаление на каждой строке.
+        # Последние изменения не удаляются никогда, поэтому номер версии
+        # (следующий после наибольшего) растёт монотонно и без AUTOINCREMENT,
+        # который заметно замедляет вставку.
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {changes}_trim '
+                       f'AFTER INSERT ON {changes} WHEN NEW.version % 1000 = 0 '
+                       'BEGIN '
+                       f'DELETE FROM {changes} '
+                       f'WHERE version <= NEW.version - {CHANGE_LOG_SIZE}; '
+                       'END')
+
+    def _in_unit_of_work(self) -> bool:
+        """ Открыт ли в текущем потоке блок единицы работы репозитория """
+        return self._unit_of_work is not None and self._unit_of_work.active
+
+    def _write(self, action: Callable[[sqlite3.Cursor], Any]) -> Any:
+        """
+        Выполнить action в короткой транзакции на запись, дождавшись
+        освобождения базы другим процессом. Внутри блока единицы работы
+        action выполняется в её транзакции.
+        """
+        with self._write_lock:
+            cursor = self._connection.cursor()
+            try:
+                if self._in_unit_of_work():
+                    return action(cursor)
+                _begin_immediate(cursor, self.stats,
+                                 self._max_retries, self._retry_delay)
+                try:
+                    result = action(cursor)
+                    cursor.execute('COMMIT')
+                except BaseException:
+                    cursor.execute('ROLLBACK')
+                    raise
+                self.stats.transactions += 1
+                return result
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Взять соединение для чтения из пула и вернуть его после работы.
+        Внутри блока единицы работы читается соединение на запись, чтобы
+        были видны ещё не зафиксированные изменения.
+        """
+        if self._in_unit_of_work():
+            yield self._connection
+            return
+        try:
+            connection = self._read_pool.get_nowait()
+        except Empty:
+            connection = _connect(self.db_file, self._busy_timeout, read_only=True)
+        try:
+            yield connection
+        finally:
+            if self._read_pool.full():
+                connection.close()
+            else:
+                self._read_pool.put_nowait(connection)
+
+    def _select(self, sql: str, params: tuple[Any, ...] = ()) -> list[T]:
+        with self._reader() as connection:
+            rows = connection.execute(sql, params).fetchall()
+        return [self._make_object(row) for row in rows]
+
+    def _make_object(self, row: tuple[Any, ...]) -> T:
+        return self.model(*(value if convert is None else convert(value)
+                            for value, convert in zip(row, self._converters)))
+
+    def _values(self, obj: T) -> list[Any]:
+        values = [getattr(obj, name) for name in self._fields]
+        for index in self._datetime_indexes:
+            values[index] = adapt_datetime(values[index])
+        return values
+
+    def _columns(self) -> str:
+        return ', '.join(name for name, _ in self._schema)
+
+    def _where(self, where: dict[str, Any] | None) -> tuple[str, tuple[Any, ...]]:
+        if not where:
+            return '', ()
+        conditions = []
+        params = []
+        for name, value in where.items():
+            if name not in self._fields and name != 'pk':
+                raise ValueError(f'{self.model.__name__} has no field {name!r}')
+            if value is None:
+                conditions.append(f'{name} IS NULL')
+            elif isinstance(value, (set, frozenset)):
+                # Множество передаётся одним параметром, поэтому его размер
+                # не ограничен числом параметров запроса.
+                conditions.append(f'{name} IN (SELECT value FROM json_each(?))')
+                params.append(json.dumps([adapt_datetime(item)
+                                          if isinstance(item, datetime) else item
+                                          for item in value]))
+            else:
+                conditions.append(f'{name} = ?')
+                params.append(adapt_datetime(value) if isinstance(value, datetime)
+                              else value)
+        return ' WHERE ' + ' AND '.join(conditions), tuple(params)
+
+    def read_rows(self, sql: str,
+                  params: Sequence[Any] = ()) -> Iterator[tuple[Any, ...]]:
+        """
+        Выполнить произвольный запрос на чтение (например, отчёт, который
+        объединяет несколько таблиц) и выдавать строки по мере чтения.
+        Соединение открыто только для чтения.
+        """
+        with self._reader() as connection:
+            yield from connection.execute(sql, params)
+
+    def add(self, obj: T) -> int:
+        if getattr(obj, 'pk', None) != 0:
+            raise ValueError(f'trying to add object {obj} with filled `pk` attribute')
+        values = self._values(obj)
+        placeholders = ', '.join('?' * len(values))
+        pk = self._write(lambda cursor: cursor.execute(
+            f'INSERT INTO {self.table_name} ({", ".join(self._fields)}) '
+            f'VALUES ({placeholders})', values).lastrowid)
+        obj.pk = pk
+        self._publish()
+        return pk
+
+    def add_many(self, objs: Iterable[T]) -> list[int]:
+        """
+        Добавить объекты одной транзакцией (одна фиксация на диск
+        вместо фиксации на каждый объект).
+        """
+        objs = list(objs)
+        if any(getattr(obj, 'pk', None) != 0 for obj in objs):
+            raise ValueError('trying to add objects with filled `pk` attribute')
+        rows = [self._values(obj) for obj in objs]
+        sql = (f'INSERT INTO {self.table_name} ({", ".join(self._fields)}) '
+               f'VALUES ({", ".join("?" * len(self._fields))})')
+
+        def insert(cursor: sqlite3.Cursor) -> list[int]:
+            first, = cursor.execute(
+                f'SELECT coalesce(max(pk), 0) + 1 FROM {self.table_name}').fetchone()
+            cursor.executemany(sql, rows)
+            # Новые строки получают pk больше всех существующих, по возрастанию.
+            return [pk for pk, in cursor.execute(
+                f'SELECT pk FROM {self.table_name} WHERE pk >= ? ORDER BY pk', (first,))]
+
+        pks = self._write(insert) if rows else []
+        for obj, pk in zip(objs, pks):
+            obj.pk = pk
+        self._publish()
+        return pks
+
+    def get(self, pk: int) -> T | None:
+        objects = self._select(
+            f'SELECT {self._columns()} FROM {self.table_name} WHERE pk = ?', (pk,))
+        return objects[0] if objects else None
+
+    def get_all(self, where: dict[str, Any] | None = None) -> list[T]:
+        condition, params = self._where(where)
+        return self._select(
+            f'SELECT {self._columns()} FROM {self.table_name}{condition} ORDER BY pk',
+            params)
+
+    def update(self, obj: T) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to update object with unknown primary key')
+        assignments = ', '.join(f'{name} = ?' for name in self._fields)
+        self._write(lambda cursor: cursor.execute(
+            f'UPDATE {self.table_name} SET {assignments} WHERE pk = ?',
+            [*self._values(obj), obj.pk]))
+        self._publish()
+
+    def delete(self, pk: int) -> None:
+        deleted = self._write(lambda cursor: cursor.execute(
+            f'DELETE FROM {self.table_name} WHERE pk = ?', (pk,)).rowcount)
+        if not deleted:
+            raise KeyError(pk)
+        self._publish()
+
+    def update_where(self, where: dict[str, Any], values: dict[str, Any]) -> int:
+        for name in values:
+            if name not in self._fields:
+                raise ValueError(f'{self.model.__name__} has no field {name!r}')
+        condition, params = self._where(where)
+        assignments = ', '.join(f'{name} = ?' for name in values)
+        new_values = [adapt_datetime(value) if isinstance(value, datetime) else value
+                      for value in values.values()]
+        updated: int = self._write(lambda cursor: cursor.execute(
+            f'UPDATE {self.table_name} SET {assignments}{condition}',
+            [*new_values, *params]).rowcount)
+        self._publish()
+        return updated
+
+    def delete_where(self, where: dict[str, Any]) -> int:
+        condition, params = self._where(where)
+        deleted: int = self._write(lambda cursor: cursor.execute(
+            f'DELETE FROM {self.table_name}{condition}', params).rowcount)
+        self._publish()
+        return deleted
+
+    def restore(self, obj: T) -> None:
+        if obj.pk == 0:
+            raise ValueError('attempt to restore object with unknown primary key')
+        values = self._values(obj)
+        try:
+            self._write(lambda cursor: cursor.execute(
+                f'INSERT INTO {self.table_name} (pk, {", ".join(self._fields)}) '
+                f'VALUES (?{", ?" * len(values)})', [obj.pk, *values]))
+        except sqlite3.IntegrityError:
+            raise ValueError(f'object with pk {obj.pk} already exists') from None
+        self._publish()
+
+    @property
+    def version(self) -> int:
+        with self._reader() as connection:
+            version, = connection.execute(
+                f'SELECT coalesce(max(version), 0) FROM {self.changes_table_name}'
+            ).fetchone()
+        return version
+
+    def changes(self, since: int) -> list[Change]:
+        columns = ', '.join(f't.{name}' for name, _ in self._schema)
+        with self._reader() as connection:
+            first, = connection.execute(
+                f'SELECT min(version) FROM {self.changes_table_name}').fetchone()
+            rows = connection.execute(
+                f'SELECT c.version, c.op, c.pk, {columns} '
+                f'FROM {self.changes_table_name} AS c '
+                f'LEFT JOIN {self.table_name} AS t ON t.pk = c.pk '
+                'WHERE c.version > ? ORDER BY c.version', (since,)).fetchall()
+        if rows and first > since + 1:
+            raise ChangeFeedGap(f'changes after version {since} are not kept')
+        # Объект читается в его текущем состоянии: если после изменения
+        # объект удалён, obj будет None.
+        return [Change(version, op, pk,
+                       None if op == OP_DELETE or row[0] is None
+                       else self._make_object(row))
+                for version, op, pk, *row in rows]
+
+    def subscribe(self, handler: ChangeHandler) -> Callable[[], None]:
+        if not self._handlers:
+            self._seen_version = self.version
+        self._handlers.append(handler)
+        return lambda: self._handlers.remove(handler)
+
+    def poll(self) -> int:
+        data_version = self._get_data_version()
+        if data_version == self._data_version:
+            return 0
+        self._data_version = data_version
+        return self._publish()
+
+    def _get_data_version(self) -> int:
+        """
+        Значение PRAGMA data_version меняется, когда базу изменяет другое
+        соединение, поэтому проверка не требует чтения таблиц.
+        """
+        with self._write_lock:
+            return self._connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def _publish(self) -> int:
+        """
+        Разослать подписчикам изменения, которые они ещё не получили.
+        Изменения внутри блока единицы работы рассылаются после фиксации.
+        """
+        if not self._handlers or self._in_unit_of_work():
+            return 0
+        try:
+            changes = self.changes(self._seen_version)
+        except ChangeFeedGap:
+            changes = [Change(self.version, OP_RESET, 0, None)]
+        if changes:
+            self._seen_version = changes[-1].version
+        for change in changes:
+            for handler in list(self._handlers):
+                handler(change)
+        return len(changes)
+
+    def close(self) -> None:
+        """
+        Закрыть все соединения с базой данных. Общее соединение единицы
+        работы закрывается её методом close.
+        """
+        if self._unit_of_work is None:
+            with self._write_lock:
+                self._connection.close()
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except Empty:
+                break
+
+    def __enter__(self) -> 'SQLiteRepository[T]':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,334 @@
+"""
+Модуль описывает двустороннюю синхронизацию двух баз данных SQLite
+(например, копии на ноутбуке и на домашнем сервере).
+
+Передаются только строки, изменённые с прошлой синхронизации. Для этого
+в каждой базе ведётся служебная таблица sync_rows, которую заполняют
+триггеры на таблицах расходов, категорий и бюджетов. Для каждой строки
+в ней хранятся:
+- uid - глобальный идентификатор строки (pk в разных базах не совпадают,
+  поэтому ссылки между таблицами передаются через uid);
+- counter - локальный номер изменения, по нему выбираются строки,
+  которые ещё не отправлялись другой базе;
+- modified, origin - время изменения (гибридные часы: не меньше времени
+  любого уже известного изменения) и id базы, где было сделано изменение.
+  Конфликт решается в пользу изменения с большей парой (modified, origin),
+  поэтому обе базы приходят к одному результату;
+- deleted - признак удаления (строка-надгробие).
+
+Каждая база помнит для каждой другой базы, до какого номера изменения
+она ей всё отправила (подтверждение приходит в следующем сообщении от неё)
+и до какого номера всё от неё получила. Изменения применяются в одной
+транзакции, повторное применение тех же изменений ничего не меняет.
+"""
+
+import json
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+from uuid import uuid4
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.snapshot import model_schema
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+SYNC_MODELS = (Category, Expense, Budget)  # Порядок важен: сначала те, на кого ссылаются.
+
+# Ссылки между таблицами: таблица -> {поле: таблица, на которую оно ссылается}.
+FOREIGN_KEYS = {
+    'category': {'parent': 'category'},
+    'expense': {'category': 'category'},
+    'budget': {'category': 'category'},
+}
+
+_NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+_REPLICA_ID = "(SELECT value FROM sync_meta WHERE key = 'replica_id')"
+_STAMP = f"""
+    (SELECT coalesce(max(counter), 0) + 1 FROM sync_rows),
+    max({_NOW_MS}, (SELECT coalesce(max(modified), 0) + 1 FROM sync_rows)),
+    {_REPLICA_ID}"""
+_INSERT_ROW = 'INSERT INTO sync_rows (table_name, pk, uid, counter, modified, origin) '
+
+# Отложенная ссылка: (таблица, поле, таблица ссылки, uid ссылки, uid строки).
+_Fixup = tuple[str, str, str, str, str]
+
+
+class SyncError(ValueError):
+    """ Изменения нельзя применить к базе данных """
+
+
+@dataclass
+class SyncResult:
+    """
+    Итоги синхронизации.
+    sent - число строк, отправленных из первой базы во вторую
+    received - число строк, полученных первой базой от второй
+    applied - число строк, изменённых в обеих базах
+    transferred - суммарный размер сообщений в байтах
+    """
+    sent: int = 0
+    received: int = 0
+    applied: int = 0
+    transferred: int = 0
+
+
+class SyncReplica:
+    """
+    База данных, участвующая в синхронизации.
+    Обмен идёт сообщениями-байтами (сжатый JSON), поэтому их можно
+    передавать по сети; для двух локальных файлов есть функция sync.
+    """
+
+    def __init__(self, db_file: str | Path, busy_timeout: float = 5.0) -> None:
+        for model in SYNC_MODELS:
+            SQLiteRepository(db_file, model).close()
+        self._connection = sqlite3.connect(db_file, timeout=busy_timeout,
+                                           isolation_level=None)
+        self._schemas = {model.__name__.lower(): [name for name, _ in model_schema(model)
+                                                  if name != 'pk']
+                         for model in SYNC_MODELS}
+        with self._transaction():
+            self._prepare()
+        self.replica_id: str = self._connection.execute(
+            "SELECT value FROM sync_meta WHERE key = 'replica_id'").fetchone()[0]
+
+    def __enter__(self) -> 'SyncReplica':
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None,
+                 exc_value: BaseException | None,
+                 traceback: TracebackType | None) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Закрыть соединение с базой данных """
+        self._connection.close()
+
+    def _transaction(self) -> 'sqlite3.Connection':
+        self._connection.execute('BEGIN IMMEDIATE')
+        return self._connection
+
+    def _prepare(self) -> None:
+        """ Создать служебные таблицы и триггеры, зарегистрировать старые строки """
+        execute = self._connection.execute
+        execute('CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value TEXT)')
+        execute("INSERT OR IGNORE INTO sync_meta VALUES ('replica_id', ?)",
+                (uuid4().hex,))
+        execute('CREATE TABLE IF NOT EXISTS sync_peers '
+                '(peer TEXT PRIMARY KEY, sent INTEGER NOT NULL DEFAULT 0, '
+                'received INTEGER NOT NULL DEFAULT 0)')
+        execute('CREATE TABLE IF NOT EXISTS sync_rows '
+                '(table_name TEXT NOT NULL, pk INTEGER NOT NULL, '
+                'uid TEXT NOT NULL UNIQUE, counter INTEGER NOT NULL, '
+                'modified INTEGER NOT NULL, '
+                'origin TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0, '
+                'received_from TEXT, PRIMARY KEY (table_name, pk))')
+        execute('CREATE INDEX IF NOT EXISTS sync_rows_counter ON sync_rows (counter)')
+        execute('CREATE INDEX IF NOT EXISTS sync_rows_modified ON sync_rows (modified)')
+        for table in self._schemas:
+            # SQLite может выдать новой строке pk удалённой, тогда надгробие
+            # удалённой строки отодвигается на отрицательный pk.
+            execute(f'CREATE TRIGGER IF NOT EXISTS {table}_insert_sync '
+                    f'AFTER INSERT ON {table} BEGIN '
+                    'UPDATE sync_rows SET pk = -counter '
+                    f"WHERE table_name = '{table}' AND pk = NEW.pk AND deleted; "
+                    f"{_INSERT_ROW} VALUES ('{table}', NEW.pk, "
+                    f'lower(hex(randomblob(16))), {_STAMP}); '
+                    'END')
+            execute(f'CREATE TRIGGER IF NOT EXISTS {table}_update_sync '
+                    f'AFTER UPDATE ON {table} BEGIN '
+                    'UPDATE sync_rows SET received_from = NULL, '
+                    f'(counter, modified, origin) = (SELECT {_STAMP}) '
+                    f"WHERE table_name = '{table}' AND pk = NEW.pk; "
+                    'END')
+            execute(f'CREATE TRIGGER IF NOT EXISTS {table}_delete_sync '
+                    f'AFTER DELETE ON {table} BEGIN '
+                    'UPDATE sync_rows SET deleted = 1, received_from = NULL, '
+                    f'(counter, modified, origin) = (SELECT {_STAMP}) '
+                    f"WHERE table_name = '{table}' AND pk = OLD.pk; "
+                    'END')
+            # Строки, появившиеся до подключения синхронизации, считаются
+            # самыми старыми (modified = 0).
+            execute(f"{_INSERT_ROW} SELECT '{table}', pk, lower(hex(randomblob(16))), "
+                    '(SELECT coalesce(max(counter), 0) FROM sync_rows) + pk, 0, '
+                    f'{_REPLICA_ID} FROM {table} WHERE pk NOT IN '
+                    f"(SELECT pk FROM sync_rows WHERE table_name = '{table}')")
+
+    def _peer(self, peer: str) -> tuple[int, int]:
+        row = self._connection.execute(
+            'SELECT sent, received FROM sync_peers WHERE peer = ?', (peer,)).fetchone()
+        return row if row is not None else (0, 0)
+
+    def delta_for(self, peer: str) -> bytes:
+        """
+        Получить сообщение для базы peer: строки, изменённые после
+        последнего подтверждённого ею сообщения, и подтверждение
+        полученных от неё изменений.
+        """
+        execute = self._connection.execute
+        execute('BEGIN')
+        try:
+            sent, received = self._peer(peer)
+            counter, = execute(
+                'SELECT coalesce(max(counter), 0) FROM sync_rows').fetchone()
+            tables = {}
+            for table, fields in self._schemas.items():
+                references = FOREIGN_KEYS.get(table, {})
+                # Ссылка на строку, которой нет в базе, передаётся как 0.
+                columns = ', '.join(
+                    f"coalesce((SELECT uid FROM sync_rows WHERE table_name = "
+                    f"'{references[name]}' AND pk = t.{name}), t.{name} * 0)"
+                    if name in references else f't.{name}'
+                    for name in fields)
+                rows = execute(
+                    f'SELECT s.uid, s.modified, s.origin, s.deleted, {columns} '
+                    f'FROM sync_rows AS s LEFT JOIN {table} AS t ON t.pk = s.pk '
+                    'WHERE s.table_name = ? AND s.counter > ? '
+                    'AND (s.received_from IS NULL OR s.received_from != ?) '
+                    'ORDER BY s.counter', (table, sent, peer)).fetchall()
+                if rows:
+                    tables[table] = [[uid, modified, origin, deleted,
+                                      None if deleted else values]
+                                     for uid, modified, origin, deleted, *values in rows]
+        finally:
+            execute('COMMIT')
+        message = {'from': self.replica_id, 'ack': received,
+                   'counter': counter, 'tables': tables}
+        return zlib.compress(json.dumps(message, ensure_ascii=False,
+                                        separators=(',', ':')).encode())
+
+    def apply_delta(self, data: bytes) -> int:
+        """
+        Применить сообщение от другой базы в одной транзакции.
+        Вернуть число изменённых строк.
+        """
+        try:
+            message = json.loads(zlib.decompress(data))
+        except (zlib.error, ValueError) as exc:
+            raise SyncError(f'malformed sync message: {exc}') from None
+        peer = message['from']
+        with self._transaction():
+            applied = self._apply_rows(peer, message['tables'])
+            self._connection.execute(
+                'INSERT INTO sync_peers (peer, sent, received) VALUES (?, ?, ?) '
+                'ON CONFLICT (peer) DO UPDATE SET '
+                'sent = max(sent, excluded.sent), '
+                'received = max(received, excluded.received)',
+                (peer, message['ack'], message['counter']))
+        return applied
+
+    def _apply_rows(self, peer: str, tables: dict[str, list[list[Any]]]) -> int:
+        execute = self._connection.execute
+        stamps = []
+        fixups: list[_Fixup] = []
+        for table in self._schemas:
+            for uid, modified, origin, deleted, values in tables.get(table, ()):
+                local = execute('SELECT pk, modified, origin, deleted FROM sync_rows '
+                                'WHERE uid = ?', (uid,)).fetchone()
+                if local is not None and (modified, origin) <= (local[1], local[2]):
+                    continue
+                if not deleted:
+                    pk = self._write_row(table, uid, local, values, fixups)
+                elif local is not None:
+                    pk = local[0]
+                    if not local[3]:
+                        execute(f'DELETE FROM {table} WHERE pk = ?', (pk,))
+                else:
+                    # Удаление неизвестной строки можно пропустить.
+                    continue
+                stamps.append((uid, modified, origin, peer, table, pk))
+        for table, name, ref_table, ref_uid, uid in fixups:
+            ref_pk = self._local_pk(ref_table, ref_uid)
+            if ref_pk is None:
+                raise SyncError(f'{table}.{name} refers to unknown row {ref_uid}')
+            execute(f'UPDATE {table} SET {name} = ? WHERE pk = '
+                    '(SELECT pk FROM sync_rows WHERE uid = ?)', (ref_pk, uid))
+        # Метки ставятся последними: триггеры на изменения выше
+        # записали бы вместо них локальное время и id этой базы.
+        self._connection.executemany(
+            'UPDATE sync_rows SET uid = ?, modified = ?, origin = ?, '
+            'received_from = ? WHERE table_name = ? AND pk = ?', stamps)
+        return len(stamps)
+
+    def _write_row(self, table: str, uid: str, local: tuple[Any, ...] | None,
+                   values: list[Any], fixups: list[_Fixup]) -> int:
+        """
+        Вставить или обновить строку, вернуть её pk. Ссылки на строки,
+        которых ещё нет в базе, записываются в fixups.
+        """
+        execute = self._connection.execute
+        fields = self._schemas[table]
+        references = FOREIGN_KEYS.get(table, {})
+        if local is not None and local[3]:
+            # Удалённая здесь строка восстановлена в другой базе:
+            # она вставляется заново с новым pk.
+            execute('DELETE FROM sync_rows WHERE uid = ?', (uid,))
+            local = None
+        values = list(values)
+        for index, name in enumerate(fields):
+            if name in references and isinstance(values[index], str):
+                ref_uid = values[index]
+                values[index] = self._local_pk(references[name], ref_uid)
+                if values[index] is None:
+                    values[index] = 0
+                    fixups.append((table, name, references[name], ref_uid, uid))
+        if local is None:
+            placeholders = ', '.join('?' * len(fields))
+            inserted = execute(f'INSERT INTO {table} ({", ".join(fields)}) '
+                               f'VALUES ({placeholders})', values).lastrowid
+            assert inserted is not None
+            pk = inserted
+        else:
+            pk = local[0]
+            assignments = ', '.join(f'{name} = ?' for name in fields)
+            execute(f'UPDATE {table} SET {assignments} WHERE pk = ?', [*values, pk])
+        # Временный uid от триггера сразу заменяется, чтобы ссылки
+        # на эту строку из этого же сообщения нашлись.
+        execute('UPDATE sync_rows SET uid = ? WHERE table_name = ? AND pk = ?',
+                (uid, table, pk))
+        return pk
+
+    def _local_pk(self, table: str, uid: str) -> int | None:
+        """
+        pk строки с данным uid, None - если строка неизвестна.
+        Ссылка на удалённую строку, pk которой уже занят, заменяется на 0.
+        """
+        row = self._connection.execute(
+            'SELECT pk FROM sync_rows WHERE table_name = ? AND uid = ?',
+            (table, uid)).fetchone()
+        if row is None:
+            return None
+        return max(row[0], 0)
+
+
+def _count_rows(data: bytes) -> int:
+    tables = json.loads(zlib.decompress(data))['tables']
+    return sum(map(len, tables.values()))
+
+
+def sync(first: SyncReplica, second: SyncReplica) -> SyncResult:
+    """
+    Синхронизировать две базы данных.
+    Третье сообщение несёт только подтверждение, чтобы при следующей
+    синхронизации вторая база не отправляла уже известные первой строки.
+
+    Returns
+    -------
+    Итоги синхронизации
+    """
+    result = SyncResult()
+    to_second = first.delta_for(second.replica_id)
+    result.applied += second.apply_delta(to_second)
+    to_first = second.delta_for(first.replica_id)
+    result.applied += first.apply_delta(to_first)
+    acknowledgement = first.delta_for(second.replica_id)
+    second.apply_delta(acknowledgement)
+    result.sent = _count_rows(to_second)
+    result.received = _count_rows(to_first)
+    result.transferred = len(to_second) + len(to_first) + len(acknowledgement)
+    return result
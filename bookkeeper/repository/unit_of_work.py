@@ -0,0 +1,93 @@
+"""
+Модуль описывает единицу работы (unit of work) над несколькими репозиториями
+
+Единица работы объединяет изменения нескольких репозиториев (например,
+удаление категории и передачу её расходов другой категории) так, что они
+применяются целиком или не применяются совсем:
+
+    with unit_of_work:
+        repository_expenses.update_where(...)
+        repository_categories.delete(...)
+
+При выходе из блока без исключения изменения фиксируются, при исключении
+откатываются. Блоки можно вкладывать друг в друга: вложенный блок входит
+во внешний, и фиксация происходит при выходе из внешнего.
+"""
+
+from abc import ABC, abstractmethod
+from types import TracebackType
+from typing import Any, Iterable
+
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+class AbstractUnitOfWork(ABC):
+    """
+    Абстрактная единица работы.
+    Абстрактные методы:
+    _begin
+    _commit
+    _rollback
+    """
+
+    def __init__(self) -> None:
+        self._depth = 0
+
+    @property
+    def active(self) -> bool:
+        """ Открыт ли блок единицы работы """
+        return self._depth > 0
+
+    def __enter__(self) -> 'AbstractUnitOfWork':
+        if self._depth == 0:
+            self._begin()
+        self._depth += 1
+        return self
+
+    def __exit__(self,
+                 exc_type: type[BaseException] | None,
+                 exc: BaseException | None,
+                 traceback: TracebackType | None) -> None:
+        self._depth -= 1
+        if self._depth:
+            return
+        if exc_type is None:
+            self._commit()
+        else:
+            self._rollback()
+
+    @abstractmethod
+    def _begin(self) -> None:
+        """ Начать транзакцию """
+
+    @abstractmethod
+    def _commit(self) -> None:
+        """ Зафиксировать изменения """
+
+    @abstractmethod
+    def _rollback(self) -> None:
+        """ Отменить изменения """
+
+
+class MemoryUnitOfWork(AbstractUnitOfWork):
+    """
+    Единица работы над репозиториями в оперативной памяти. Пока блок открыт,
+    репозитории запоминают прежние состояния изменяемых объектов, а при
+    откате возвращают их (подписчики получают обратные изменения).
+    """
+
+    def __init__(self, repositories: Iterable[MemoryRepository[Any]]) -> None:
+        super().__init__()
+        self.repositories = list(repositories)
+
+    def _begin(self) -> None:
+        for repository in self.repositories:
+            repository.begin()
+
+    def _commit(self) -> None:
+        for repository in self.repositories:
+            repository.commit()
+
+    def _rollback(self) -> None:
+        for repository in self.repositories:
+            repository.rollback()
@@ -0,0 +1,228 @@
+"""
+Модуль описывает репозиторий в оперативной памяти, хранящий историю версий
+
+Обычный репозиторий при изменении объекта теряет его прежнее состояние,
+поэтому на вопрос "каким был бюджет в марте" ответить нельзя, а анализ
+за прошлый период меняется вместе с данными. Версионируемый репозиторий
+для каждого объекта хранит список версий с интервалами действия
+[начало, конец): при изменении текущая версия закрывается моментом
+изменения и открывается новая, при удалении текущая версия закрывается.
+Начала версий объекта отсортированы, поэтому версию на любой момент
+get и get_all с параметром as_of находят двоичным поиском (bisect).
+
+Изменения внутри транзакции (см. MemoryRepository.begin) попадают
+в историю только при commit: версии, отменённые rollback, в ней
+не остаются.
+
+Текущее состояние хранится так же, как в MemoryRepository, и запросы
+без as_of работают с ним без обращения к истории. Старые версии можно
+удалить (compact), после чего запросы на моменты до границы удаления
+недоступны.
+"""
+
+from bisect import bisect_right
+from copy import copy
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Generic, cast
+
+from bookkeeper.repository.abstract_repository import T, where_filter
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+class RecordHistory(Generic[T]):
+    """
+    Версии одного объекта, упорядоченные по началу действия.
+    Конец действия последней версии - None, если объект не удалён.
+    """
+
+    __slots__ = ('starts', 'ends', 'objs')
+
+    def __init__(self) -> None:
+        self.starts: list[datetime] = []
+        self.ends: list[datetime | None] = []
+        self.objs: list[T] = []
+
+    def open(self, moment: datetime, obj: T) -> None:
+        """ Закрыть текущую версию моментом moment и начать с него версию obj """
+        self.close(moment)
+        if self.starts and self.starts[-1] == moment:
+            # Несколько изменений в один момент - одна версия.
+            self.ends[-1] = None
+            self.objs[-1] = obj
+            return
+        self.starts.append(moment)
+        self.ends.append(None)
+        self.objs.append(obj)
+
+    def close(self, moment: datetime) -> None:
+        """ Закрыть текущую версию моментом moment """
+        if self.ends and self.ends[-1] is None:
+            self.ends[-1] = moment
+
+    def at(self, moment: datetime) -> T | None:
+        """ Версия, действовавшая в момент moment (None - объекта не было) """
+        index = bisect_right(self.starts, moment) - 1
+        if index < 0:
+            return None
+        end = self.ends[index]
+        if end is not None and moment >= end:
+            return None
+        return self.objs[index]
+
+    def compact(self, before: datetime) -> int:
+        """ Удалить версии, закончившиеся не позже before, вернуть их число """
+        removed = 0
+        while removed < len(self.ends):
+            end = self.ends[removed]
+            if end is None or end > before:
+                break
+            removed += 1
+        del self.starts[:removed], self.ends[:removed], self.objs[:removed]
+        return removed
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class VersionedMemoryRepository(MemoryRepository[T]):
+    """
+    Репозиторий в оперативной памяти с историей версий объектов.
+    Объекты, возвращаемые запросами с as_of, - копии версий.
+    """
+
+    def __init__(self, clock: Callable[[], datetime] = datetime.now) -> None:
+        """
+        clock - источник моментов изменений
+        """
+        super().__init__()
+        self._clock = clock
+        self._last_moment = datetime.min
+        self._history: dict[int, RecordHistory[T]] = {}
+        # Версии, записанные в открытой транзакции: (pk, момент, версия
+        # или None, если объект удалён).
+        self._pending: list[tuple[int, datetime, T | None]] | None = None
+        self.compacted_before: datetime | None = None
+
+    def _moment(self) -> datetime:
+        # Моменты не убывают, даже если часы перевели назад:
+        # иначе нарушится порядок версий.
+        self._last_moment = max(self._clock(), self._last_moment)
+        return self._last_moment
+
+    def _record(self, pk: int, obj: T) -> None:
+        self._write_version(pk, self._moment(), copy(obj))
+
+    def _write_version(self, pk: int, moment: datetime, obj: T | None) -> None:
+        """ Записать версию obj (None - объект удалён) или отложить до commit """
+        if self._pending is not None:
+            self._pending.append((pk, moment, obj))
+        elif obj is None:
+            self._history[pk].close(moment)
+        else:
+            history = self._history.get(pk)
+            if history is None:
+                history = self._history[pk] = RecordHistory()
+            history.open(moment, obj)
+
+    def _put(self, pk: int, obj: T, op: str) -> None:
+        super()._put(pk, obj, op)
+        self._record(pk, obj)
+
+    def _set(self, obj: T, values: dict[str, Any]) -> None:
+        super()._set(obj, values)
+        self._record(obj.pk, obj)
+
+    def _remove(self, pks: set[int]) -> None:
+        super()._remove(pks)
+        moment = self._moment()
+        for pk in pks:
+            self._write_version(pk, moment, None)
+
+    def begin(self) -> None:
+        super().begin()
+        self._pending = []
+
+    def commit(self) -> None:
+        super().commit()
+        pending, self._pending = self._pending or [], None
+        for pk, moment, obj in pending:
+            self._write_version(pk, moment, obj)
+
+    def rollback(self) -> None:
+        # Возврат прежних состояний тоже пишется в буфер и отбрасывается
+        # вместе с версиями транзакции.
+        self._pending = []
+        super().rollback()
+        self._pending = None
+
+    def _check_as_of(self, as_of: datetime) -> None:
+        if self.compacted_before is not None and as_of < self.compacted_before:
+            raise ValueError(
+                f'history before {self.compacted_before} has been compacted')
+
+    def get(self, pk: int, as_of: datetime | None = None) -> T | None:
+        """
+        Получить объект по id. as_of - момент, на который нужно получить
+        версию объекта (по умолчанию - текущая версия).
+        """
+        if as_of is None:
+            return super().get(pk)
+        self._check_as_of(as_of)
+        history = self._history.get(pk)
+        obj = None if history is None else history.at(as_of)
+        return None if obj is None else copy(obj)
+
+    def get_all(self, where: dict[str, Any] | None = None,
+                as_of: datetime | None = None) -> list[T]:
+        """
+        Получить все объекты по условию (см. AbstractRepository.get_all)
+        в версиях, действовавших в момент as_of (по умолчанию - текущие).
+        """
+        if as_of is None:
+            return super().get_all(where)
+        self._check_as_of(as_of)
+        objs = (history.at(as_of) for history in self._history.values())
+        found = [obj for obj in objs if obj is not None]
+        if where is not None:
+            found = list(filter(where_filter(where), found))
+        return [copy(obj) for obj in found]
+
+    def versions(self, pk: int) -> list[tuple[datetime, datetime | None, T]]:
+        """
+        История объекта: список (начало, конец, версия) от старых к новым.
+        Конец последней версии - None, если объект не удалён.
+        """
+        history = self._history.get(pk)
+        if history is None:
+            return []
+        return [(start, end, copy(obj))
+                for start, end, obj in zip(history.starts, history.ends, history.objs)]
+
+    def compact(self, before: datetime) -> int:
+        """
+        Удалить версии, действие которых закончилось не позже before,
+        и вернуть их число. После этого запросы с as_of раньше before
+        вызывают ValueError.
+        """
+        removed = 0
+        for pk in list(self._history):
+            history = self._history[pk]
+            removed += history.compact(before)
+            if not history:
+                del self._history[pk]
+        if self.compacted_before is None or before > self.compacted_before:
+            self.compacted_before = before
+        return removed
+
+    @classmethod
+    def load_snapshot(cls, path: str | Path, model: type[T]) -> 'MemoryRepository[T]':
+        """
+        Создать репозиторий из файла снимка (см. MemoryRepository.load_snapshot).
+        Снимок не содержит истории: версии объектов начинаются с момента
+        загрузки.
+        """
+        repo = cast(VersionedMemoryRepository[T], super().load_snapshot(path, model))
+        for pk, obj in repo._container.items():
+            repo._record(pk, obj)
+        return repo
@@ -0,0 +1,64 @@
+"""
+Модуль содержит описание абстрактного поискового индекса
+
+Индекс хранит для каждого pk расхода слова из его комментария
+и позволяет находить расходы по словам или их началам (префиксам).
+"""
+
+import re
+from abc import ABC, abstractmethod
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Разбить текст на слова для индексации и поиска.
+    Регистр не учитывается, буква "ё" приравнивается к "е".
+
+    Parameters
+    ----------
+    text - произвольный текст
+
+    Returns
+    -------
+    Список нормализованных слов в порядке следования в тексте
+    """
+    return _WORD_RE.findall(text.casefold().replace('ё', 'е'))
+
+
+class AbstractSearchIndex(ABC):
+    """
+    Абстрактный поисковый индекс.
+    Абстрактные методы:
+    add
+    remove
+    search
+    __len__
+    """
+
+    @abstractmethod
+    def add(self, pk: int, text: str) -> None:
+        """ Проиндексировать текст записи с данным pk """
+
+    @abstractmethod
+    def remove(self, pk: int) -> None:
+        """ Убрать запись из индекса, если она там есть """
+
+    def update(self, pk: int, text: str) -> None:
+        """ Переиндексировать запись с новым текстом """
+        self.remove(pk)
+        self.add(pk, text)
+
+    @abstractmethod
+    def search(self, query: str, offset: int = 0,
+               limit: int | None = None) -> list[int]:
+        """
+        Найти записи, содержащие все слова запроса (каждое слово запроса
+        может быть началом слова в тексте). Вернуть pk найденных записей
+        от новых к старым, начиная с offset, не более limit штук.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """ Число проиндексированных записей """
@@ -0,0 +1,93 @@
+"""
+Модуль описывает поисковый индекс, работающий в оперативной памяти
+"""
+
+from bisect import bisect_left, insort
+
+from bookkeeper.search.abstract_index import AbstractSearchIndex, tokenize
+
+
+class MemorySearchIndex(AbstractSearchIndex):
+    """
+    Обратный (инвертированный) индекс в оперативной памяти.
+    Для каждого слова хранится множество pk записей, в которых оно
+    встречается, а отсортированный список слов позволяет за логарифмическое
+    время находить все слова с заданным началом.
+    """
+
+    def __init__(self) -> None:
+        self._postings: dict[str, set[int]] = {}
+        self._terms: list[str] = []
+        self._documents: dict[int, set[str]] = {}
+        self._last_result: tuple[str, list[int]] | None = None
+
+    def add(self, pk: int, text: str) -> None:
+        # Запись, которая уже есть в индексе, индексируется заново:
+        # слова прежнего текста не должны находить её.
+        self.remove(pk)
+        terms = set(tokenize(text))
+        if not terms:
+            return
+        self._last_result = None
+        self._documents[pk] = terms
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = set()
+                insort(self._terms, term)
+            posting.add(pk)
+
+    def update(self, pk: int, text: str) -> None:
+        # Если набор слов не изменился (например, у расхода изменилась
+        # только категория), индекс не трогается.
+        if self._documents.get(pk, set()) == set(tokenize(text)):
+            return
+        super().update(pk, text)
+
+    def remove(self, pk: int) -> None:
+        terms = self._documents.pop(pk, None)
+        if terms is None:
+            return
+        self._last_result = None
+        for term in terms:
+            posting = self._postings[term]
+            posting.discard(pk)
+            if not posting:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def search(self, query: str, offset: int = 0,
+               limit: int | None = None) -> list[int]:
+        # Полный отсортированный результат запоминается, чтобы листание
+        # страниц одного и того же запроса не пересчитывало его заново.
+        if self._last_result is None or self._last_result[0] != query:
+            self._last_result = query, self._find(query)
+        result = self._last_result[1]
+        return result[offset:None if limit is None else offset + limit]
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _find(self, query: str) -> list[int]:
+        words = tokenize(query)
+        if not words:
+            return []
+        matches = sorted((self._match_prefix(word) for word in words), key=len)
+        found = set(matches[0])
+        for match in matches[1:]:
+            found &= match
+            if not found:
+                break
+        return sorted(found, reverse=True)
+
+    def _match_prefix(self, prefix: str) -> set[int]:
+        start = bisect_left(self._terms, prefix)
+        end = start
+        while end < len(self._terms) and self._terms[end].startswith(prefix):
+            end += 1
+        if end - start == 1:
+            return self._postings[self._terms[start]]
+        result: set[int] = set()
+        for term in self._terms[start:end]:
+            result |= self._postings[term]
+        return result
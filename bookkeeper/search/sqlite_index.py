@@ -0,0 +1,74 @@
+"""
+Модуль описывает поисковый индекс на основе полнотекстового поиска SQLite (FTS5)
+"""
+
+import sqlite3
+from pathlib import Path
+
+from bookkeeper.search.abstract_index import AbstractSearchIndex, tokenize
+
+
+class SQLiteSearchIndex(AbstractSearchIndex):
+    """
+    Поисковый индекс, хранящийся в виртуальной таблице FTS5 базы данных SQLite.
+    pk записи используется как rowid таблицы. В таблицу пишется уже
+    нормализованный текст (см. tokenize), чтобы правила сравнения слов
+    совпадали с MemorySearchIndex.
+    """
+
+    def __init__(self, db_file: str | Path, table_name: str = 'expense_search') -> None:
+        """
+        db_file - путь до файла базы данных
+        table_name - имя виртуальной таблицы индекса
+        """
+        self._connection = sqlite3.connect(db_file)
+        self._table_name = table_name
+        with self._connection:
+            self._connection.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {table_name} '
+                f'USING fts5(words, tokenize="unicode61")')
+
+    def add(self, pk: int, text: str) -> None:
+        words = tokenize(text)
+        if not words:
+            return
+        with self._connection:
+            self._connection.execute(
+                f'INSERT INTO {self._table_name}(rowid, words) VALUES (?, ?)',
+                (pk, ' '.join(words)))
+
+    def remove(self, pk: int) -> None:
+        with self._connection:
+            self._connection.execute(
+                f'DELETE FROM {self._table_name} WHERE rowid = ?', (pk,))
+
+    def update(self, pk: int, text: str) -> None:
+        words = tokenize(text)
+        with self._connection:
+            self._connection.execute(
+                f'DELETE FROM {self._table_name} WHERE rowid = ?', (pk,))
+            if words:
+                self._connection.execute(
+                    f'INSERT INTO {self._table_name}(rowid, words) VALUES (?, ?)',
+                    (pk, ' '.join(words)))
+
+    def search(self, query: str, offset: int = 0,
+               limit: int | None = None) -> list[int]:
+        words = tokenize(query)
+        if not words:
+            return []
+        match = ' '.join(f'"{word}"*' for word in words)
+        rows = self._connection.execute(
+            f'SELECT rowid FROM {self._table_name} WHERE {self._table_name} MATCH ? '
+            f'ORDER BY rowid DESC LIMIT ? OFFSET ?',
+            (match, -1 if limit is None else limit, offset))
+        return [pk for (pk,) in rows]
+
+    def __len__(self) -> int:
+        (result,) = self._connection.execute(
+            f'SELECT count(*) FROM {self._table_name}').fetchone()
+        return result
+
+    def close(self) -> None:
+        """ Закрыть соединение с базой данных """
+        self._connection.close()
@@ -1,6 +1,7 @@
 """
 Файл настроек приложения bookkeeper.
 """
+from datetime import timedelta
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parents[1]  # Корневая папка проекта.
@@ -10,3 +11,18 @@ SQLITE_DB_FILE_PATH = BASE_DIR / 'bookkeeper' / 'db.sqlite3'  # Путь до б
 PYSIDE6_MAIN_WINDOW_GEOMETRY = 200, 100, 900, 790  # Размеры главного окна приложения.
 PYSIDE6_MAIN_WINDOW_TITLE = 'The Bookkeeper App'  # Заголовок главного окна приложения.
 PYSIDE6_MAIN_FONT_SIZE = 14  # Размер шрифта всего приложения.
+
+DATE_FORMAT = '%Y-%m-%d'  # Формат дат в таблицах (strftime).
+# Суммы хранятся целыми числами в минимальных единицах валюты;
+# число знаков дробной части при выводе (0 - суммы в целых единицах).
+AMOUNT_MINOR_DIGITS = 0
+CURRENCIES = ['RUB', 'USD', 'EUR']  # Валюты в полях ввода сумм (первая - базовая).
+
+# Допуск по времени, в пределах которого импортируемый расход считается
+# похожим на загруженный раньше.
+IMPORT_DUPLICATE_TOLERANCE = timedelta(minutes=5)
+
+CHANGES_POLL_INTERVAL_MS = 1000  # Как часто проверять изменения от других клиентов.
+
+HTTP_SERVER_HOST = '127.0.0.1'  # Адрес HTTP-сервера (0.0.0.0 - доступ из локальной сети).
+HTTP_SERVER_PORT = 8000  # Порт HTTP-сервера.
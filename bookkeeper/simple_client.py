@@ -1,5 +1,21 @@
 """
 Простой тестовый скрипт для терминала
+
+Пакетный режим: команды читаются из файла, имя которого передано
+аргументом ("-" - стандартный ввод), или из канала, и вместо вывода
+каждого расхода выводится итог:
+
+    python simple_client.py expenses.txt
+    cat expenses.txt | python simple_client.py
+
+Вторым аргументом можно передать файл базы данных SQLite: расходы
+сохраняются в нём между запусками вместе с индексом дубликатов, и расходы,
+загруженные из пересекающихся выписок раньше, будут пропущены:
+
+    python simple_client.py expenses.txt bookkeeper.sqlite3
+
+Без аргументов (или с "-" вместо имени файла) при вводе с терминала
+клиент работает интерактивно.
 """
 import sys
 
@@ -8,15 +24,22 @@ if (base_dir_str := str(settings.BASE_DIR)) not in sys.path:
     sys.path.append(base_dir_str)
 # Это костыль, чтобы не было ошибки ModuleNotFoundError.
 
+from bookkeeper.batch import BATCH_SIZE, BatchSummary, CommandExecutor
+from bookkeeper.dedup.sqlite_index import SQLiteDuplicateIndex
 from bookkeeper.models.budget import Budget
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
+from bookkeeper.repository.abstract_repository import AbstractRepository
 from bookkeeper.repository.memory_repository import MemoryRepository
-from bookkeeper.utils import read_tree
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.utils import iter_tree
 
+db_file = sys.argv[2] if len(sys.argv) > 2 else None
 bud_repo = MemoryRepository[Budget]()
 cat_repo = MemoryRepository[Category]()
-exp_repo = MemoryRepository[Expense]()
+exp_repo: AbstractRepository[Expense] = (
+    MemoryRepository[Expense]() if db_file is None
+    else SQLiteRepository(db_file, Expense))
 
 cats = '''
 продукты
@@ -28,28 +51,36 @@ cats = '''
 одежда
 '''.splitlines()
 
-Category.create_from_tree(read_tree(cats), cat_repo)
-
-while True:
-    try:
-        cmd = input('$> ')
-    except EOFError:
-        break
-    if not cmd:
-        continue
-    if cmd == 'категории':
-        print(*cat_repo.get_all(), sep='\n')
-    elif cmd == 'расходы':
-        print(*exp_repo.get_all(), sep='\n')
-    elif cmd == 'бюджет':
-        print(*bud_repo.get_all(), sep='\n')
-    elif cmd[0].isdecimal():
-        amount, name = cmd.split(maxsplit=1)
+Category.create_from_paths(iter_tree(cats), cat_repo)
+
+batch_file: str | None = sys.argv[1] if len(sys.argv) > 1 else '-'
+if batch_file == '-' and sys.stdin.isatty():
+    batch_file = None
+# Индекс лежит в той же базе, что и расходы, и догоняет их при открытии.
+duplicates = SQLiteDuplicateIndex(db_file) if db_file is not None else None
+executor = CommandExecutor(bud_repo, cat_repo, exp_repo, sys.stdout,
+                           batch_size=1 if batch_file is None else BATCH_SIZE,
+                           duplicates=duplicates,
+                           tolerance=settings.IMPORT_DUPLICATE_TOLERANCE)
+
+summary: BatchSummary | None = None
+if batch_file is None:
+    while True:
         try:
-            cat = cat_repo.get_all({'name': name})[0]
-        except IndexError:
-            print(f'категория {name} не найдена')
-            continue
-        exp = Expense(int(amount), cat.pk)
-        exp_repo.add(exp)
-        print(exp)
+            cmd = input('$> ')
+        except EOFError:
+            break
+        executor.execute(cmd)
+elif batch_file == '-':
+    summary = executor.execute_all(sys.stdin)
+else:
+    with open(batch_file, encoding='utf-8') as commands:
+        summary = executor.execute_all(commands)
+
+if duplicates is not None:
+    duplicates.close()
+if isinstance(exp_repo, SQLiteRepository):
+    exp_repo.close()
+if summary is not None:
+    print(summary)
+    sys.exit(1 if summary.errors or summary.unknown_categories else 0)
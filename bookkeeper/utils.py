@@ -1,19 +1,18 @@
 """
 Вспомогательные функции
 """
+import gc
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Iterable, Iterator
 
 
-def _get_indent(line: str) -> int:
-    return len(line) - len(line.lstrip())
-
-
 def _lines_with_indent(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
     for line in lines:
-        if not line or line.isspace():
+        stripped = line.lstrip()
+        if not stripped:
             continue
-        yield _get_indent(line), line.strip()
+        yield len(line) - len(stripped), stripped.rstrip()
 
 
 def read_tree(lines: Iterable[str]) -> list[tuple[str, str | None]]:
@@ -42,29 +41,71 @@ def read_tree(lines: Iterable[str]) -> list[tuple[str, str | None]]:
     -------
     Список пар "потомок-родитель"
     """
-    parents: list[tuple[str | None, int]] = []
-    last_indent = -1
-    last_name = None
-    result: list[tuple[str, str | None]] = []
+    return [(path[-1], path[-2] if len(path) > 1 else None)
+            for path in iter_tree(lines)]
+
+
+def iter_tree(lines: Iterable[str]) -> Iterator[tuple[str, ...]]:
+    """
+    Прочитать структуру дерева из текста на основе отступов (как read_tree),
+    но лениво: строки читаются по мере надобности, а для каждого элемента
+    возвращается путь к нему - кортеж имён от элемента верхнего уровня
+    до самого элемента. В отличие от имени, путь однозначно определяет
+    элемент, даже если одинаковые имена встречаются в разных ветках.
+
+    Для текста из примера к read_tree будут получены пути:
+    ('parent',), ('parent', 'child1'), ('parent', 'child1', 'child2'),
+    ('parent', 'child3')
+
+    Parameters
+    ----------
+    lines - Итерируемый объект, содержащий строки текста (файл или список строк)
+
+    Yields
+    -------
+    Пути к элементам в порядке топологической сортировки
+    """
+    path: list[str] = []
+    indents: list[int] = []
     for i, (indent, name) in enumerate(_lines_with_indent(lines)):
-        if indent > last_indent:
-            parents.append((last_name, last_indent))
-        elif indent < last_indent:
-            while indent < last_indent:
-                _, last_indent = parents.pop()
-            if indent != last_indent:
-                raise IndentationError(
-                    f'unindent does not match any outer indentation '
-                    f'level in line {i}:\n'
-                )
-        result.append((name, parents[-1][0]))
-        last_name = name
-        last_indent = indent
-    return result
+        unindented = False
+        while indents and indent < indents[-1]:
+            indents.pop()
+            path.pop()
+            unindented = True
+        if indents and indent == indents[-1]:
+            path[-1] = name
+        elif unindented:
+            raise IndentationError(
+                f'unindent does not match any outer indentation '
+                f'level in line {i}:\n'
+            )
+        else:
+            indents.append(indent)
+            path.append(name)
+        yield tuple(path)
+
+
+@contextmanager
+def paused_gc() -> Iterator[None]:
+    """
+    Отключить сборщик мусора на время блока. Используется при массовом
+    создании объектов: иначе сборщик многократно обходит только что
+    созданные объекты, хотя освобождать среди них нечего.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
 
 def humanize_datetime(dt: datetime) -> str:
     """
-    Возвращает человекопонятное представление объекта datetime.
+    Возвращает человекопонятное представление объекта datetime
+    (время - в 24-часовом формате). Для вывода большого числа значений
+    см. bookkeeper.view.formatting.
     """
-    return dt.strftime('%Y-%m-%d %I:%M:%S')
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Callable
+from typing import Callable, Iterable
 
 from bookkeeper.models.budget import Budget
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
+from bookkeeper.models.forecast import BudgetForecast
+from bookkeeper.reports.abstract_report import ReportQuery, Row
 
 
 class AbstractView(ABC):
@@ -59,6 +61,42 @@ class AbstractView(ABC):
         """
         ...
 
+    def show_pk_changes(self, model: type, added: list[int], removed: list[int]) -> None:
+        """
+        Сообщает, какие pk записей модели model (Budget, Category, Expense)
+        появились (added) и исчезли (removed) с прошлого вывода. Поля выбора
+        pk можно обновлять по этим изменениям, не перебирая все записи.
+        """
+        ...
+
+    def show_budget_forecast(self, forecasts: list[BudgetForecast],
+                             categories: list[Category]) -> None:
+        """
+        Выводит прогноз исполнения бюджетов к концу их сроков.
+        """
+        ...
+
+    def show_search_results(
+            self,
+            expenses: list[Expense],
+            categories: list[Category],
+            page: int,
+            has_more: bool,
+    ) -> None:
+        """
+        Выводит страницу результатов поиска расходов.
+        page - номер страницы (с нуля), has_more - есть ли следующая страница.
+        """
+        ...
+
+    def show_report(self, query: ReportQuery, rows: Iterable[Row],
+                    categories: list[Category]) -> None:
+        """
+        Выводит отчёт по расходам. rows - строки отчёта (см. ReportQuery),
+        их следует читать по мере вывода, а не собирать заранее.
+        """
+        ...
+
     def add_handler_expense_create(self, handler: Callable[[Expense], None]) -> None:
         """
         Добавляет обработчик запроса на создание записи о расходах.
@@ -107,8 +145,52 @@ class AbstractView(ABC):
         """
         ...
 
-    def add_handler_category_delete(self, handler: Callable[[int], None]) -> None:
+    def add_handler_category_delete(self,
+                                    handler: Callable[[int, bool], None]) -> None:
+        """
+        Добавляет обработчик запроса на удаление записи о категории расходов.
+        Обработчик принимает pk категории и признак каскадного удаления:
+        категория верхнего уровня удаляется вместе с подкатегориями
+        и записями, только если он задан.
+        """
+        ...
+
+    def add_handler_category_merge(self, handler: Callable[[int, int], None]) -> None:
+        """
+        Добавляет обработчик запроса на слияние двух категорий расходов.
+        Обработчик принимает pk сливаемой категории и pk категории,
+        которой передаются её записи и подкатегории.
+        """
+        ...
+
+    def add_handler_expense_search(self, handler: Callable[[str, int], None]) -> None:
+        """
+        Добавляет обработчик запроса на поиск расходов по комментарию.
+        Обработчик принимает строку запроса и номер страницы результатов.
+        """
+        ...
+
+    def add_handler_report(self, handler: Callable[[ReportQuery], None]) -> None:
+        """
+        Добавляет обработчик запроса на построение отчёта по расходам.
+        """
+        ...
+
+    def add_handler_undo(self, handler: Callable[[], None]) -> None:
+        """
+        Добавляет обработчик запроса на отмену последнего изменения.
+        """
+        ...
+
+    def add_handler_redo(self, handler: Callable[[], None]) -> None:
+        """
+        Добавляет обработчик запроса на повтор отменённого изменения.
+        """
+        ...
+
+    def add_handler_poll_changes(self, handler: Callable[[], None]) -> None:
         """
-        Добавляет обработчик запроса на удаление записи о категории расходов
+        Добавляет обработчик, который представление периодически вызывает,
+        чтобы получить изменения данных, сделанные другими клиентами.
         """
         ...
@@ -0,0 +1,78 @@
+"""
+Модуль описывает форматирование значений для ячеек таблиц.
+
+Таблица перерисовывает видимые ячейки при каждой прокрутке, поэтому
+форматирование должно быть дешёвым. Дата форматируется strftime один раз
+на каждый день (результат хранится в ограниченном кэше), время
+собирается из заранее подготовленных строк. Суммы форматируются
+из целого числа минимальных единиц валюты целочисленной арифметикой,
+без перевода в float, и тоже кэшируются.
+"""
+
+import locale
+from datetime import date, datetime
+from functools import lru_cache
+
+_TWO_DIGITS = tuple(f'{i:02}' for i in range(60))
+
+
+class CellFormatter:
+    """
+    Форматирование дат и сумм с кэшем последних результатов.
+    Разделители разрядов и дробной части по умолчанию берутся
+    из текущей локали (locale.localeconv), поэтому локаль нужно
+    установить до создания объекта.
+    """
+
+    def __init__(self,
+                 date_format: str = '%Y-%m-%d',
+                 minor_digits: int = 0,
+                 thousands_sep: str | None = None,
+                 decimal_point: str | None = None,
+                 cache_size: int = 4096) -> None:
+        """
+        date_format - формат даты для strftime
+        minor_digits - число знаков дробной части: суммы передаются
+            целым числом минимальных единиц (например, копеек при 2)
+        thousands_sep, decimal_point - разделители разрядов и дробной части
+            (None - взять из локали)
+        cache_size - размер каждого кэша
+        """
+        if minor_digits < 0:
+            raise ValueError(f'minor_digits must not be negative, got {minor_digits}')
+        conventions = locale.localeconv()
+        self.date_format = date_format
+        self.minor_digits = minor_digits
+        self.thousands_sep = (str(conventions['thousands_sep'])
+                              if thousands_sep is None else thousands_sep)
+        self.decimal_point = (str(conventions['decimal_point'])
+                              if decimal_point is None else decimal_point)
+        self._scale = 10 ** minor_digits
+        self._format_day = lru_cache(maxsize=cache_size)(self._format_day_uncached)
+        self._format_amount = lru_cache(maxsize=cache_size)(
+            self._format_amount_uncached)
+
+    def _format_day_uncached(self, ordinal: int) -> str:
+        return date.fromordinal(ordinal).strftime(self.date_format)
+
+    def format_date(self, value: date) -> str:
+        """ Дата (или дата объекта datetime) """
+        return self._format_day(value.toordinal())
+
+    def format_datetime(self, value: datetime) -> str:
+        """ Дата и время в 24-часовом формате с точностью до секунды """
+        return (f'{self._format_day(value.toordinal())} {_TWO_DIGITS[value.hour]}:'
+                f'{_TWO_DIGITS[value.minute]}:{_TWO_DIGITS[value.second]}')
+
+    def format_amount(self, value: int) -> str:
+        """ Сумма, заданная целым числом минимальных единиц валюты """
+        return self._format_amount(value)
+
+    def _format_amount_uncached(self, value: int) -> str:
+        units, minor = divmod(abs(value), self._scale)
+        text = f'{units:,}'
+        if self.thousands_sep != ',':
+            text = text.replace(',', self.thousands_sep)
+        if self.minor_digits:
+            text = f'{text}{self.decimal_point}{minor:0{self.minor_digits}}'
+        return '-' + text if value < 0 else text
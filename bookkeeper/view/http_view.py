@@ -0,0 +1,480 @@
+"""
+Модуль описывает представление, доступное по HTTP в виде JSON API.
+
+Представление работает на asyncio: все запросы обрабатываются в одном
+потоке цикла событий, поэтому обращения к презентеру и репозиториям
+никогда не выполняются одновременно. Соединения поддерживают keep-alive
+и конвейерную передачу запросов (pipelining): запросы читаются из
+соединения по очереди, а ответы пишутся в том же порядке. Списки
+отдаются постранично (параметры offset и limit) и передаются по частям
+(Transfer-Encoding: chunked), не собираясь целиком в памяти.
+
+Ресурсы: /budgets, /categories, /expenses
+    GET /<ресурс>?offset=0&limit=100 - список
+    POST /<ресурс> - создать запись, тело - JSON объекта
+    GET /<ресурс>/<pk> - получить запись
+    PUT /<ресурс>/<pk> - изменить запись
+    DELETE /<ресурс>/<pk> - удалить запись; категория верхнего уровня
+        с подкатегориями или расходами удаляется вместе с ними только
+        с параметром cascade=1, иначе ответ - 400
+    POST /categories/<pk>/merge - слить категорию с категорией из тела
+        запроса {"target": <pk>}
+    GET /analysis - суммы бюджетов и расходов за день, неделю и месяц
+    GET /forecast - прогноз исполнения бюджетов к концу их сроков
+    GET /report?group_by=category,month&aggregates=sum,count&order_by=sum
+        &limit=10&start=2024-01-01&end=2024-02-01&categories=1,2
+        - отчёт по расходам (см. bookkeeper.reports), список строк отчёта
+"""
+
+import asyncio
+import json
+from dataclasses import asdict
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any, Callable, Iterable
+from urllib.parse import parse_qs
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.models.forecast import BudgetForecast
+from bookkeeper.reports.abstract_report import ReportQuery, Row
+from bookkeeper.repository.snapshot import KIND_DATETIME, model_schema
+from bookkeeper.view.abstract_view import AbstractView
+
+RESOURCES: dict[str, type] = {
+    'budgets': Budget,
+    'categories': Category,
+    'expenses': Expense,
+}
+PERIODS = ['день', 'неделя', 'месяц']
+
+
+class HTTPError(Exception):
+    """
+    Ошибка, которую нужно вернуть клиенту с данным кодом ответа.
+    """
+
+    def __init__(self, status: HTTPStatus, message: str = '') -> None:
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+class Request:  # pylint: disable=too-few-public-methods
+    """
+    Разобранный HTTP-запрос.
+    """
+
+    def __init__(self, method: str, target: str, version: str,
+                 headers: dict[str, str], body: bytes) -> None:
+        self.method = method
+        path, _, query = target.partition('?')
+        self.parts = [part for part in path.split('/') if part]
+        self.query = {key: values[-1] for key, values in parse_qs(query).items()}
+        self.headers = headers
+        self.body = body
+        connection = headers.get('connection', '').lower()
+        self.keep_alive = (connection != 'close' if version == 'HTTP/1.1'
+                           else connection == 'keep-alive')
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{value!r} is not JSON serializable')
+
+
+def encode(obj: Any) -> bytes:
+    """ Представить объект модели (или любые данные) в виде JSON """
+    if hasattr(obj, '__dataclass_fields__'):
+        obj = asdict(obj)
+    return json.dumps(obj, ensure_ascii=False, default=_encode_value).encode('utf-8')
+
+
+def decode(model: type, body: bytes, pk: int = 0) -> Any:
+    """
+    Создать объект модели из JSON. pk берётся из аргумента, а не из тела.
+    """
+    try:
+        data = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'invalid JSON: {exc}') from None
+    if not isinstance(data, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, 'JSON object expected')
+    data['pk'] = pk
+    try:
+        for name, kind in model_schema(model):
+            if kind == KIND_DATETIME and name in data:
+                data[name] = datetime.fromisoformat(data[name])
+        return model(**data)
+    except (TypeError, ValueError) as exc:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, str(exc)) from None
+
+
+def parse_report_query(params: dict[str, str]) -> ReportQuery:
+    """
+    Создать запрос отчёта из параметров строки запроса. Списки передаются
+    через запятую, даты - в формате ISO.
+    """
+    def split(name: str, default: str = '') -> tuple[str, ...]:
+        return tuple(item for item in params.get(name, default).split(',') if item)
+
+    try:
+        categories = split('categories')
+        return ReportQuery(
+            group_by=split('group_by'),
+            aggregates=split('aggregates', 'sum'),
+            start=datetime.fromisoformat(params['start']) if 'start' in params else None,
+            end=datetime.fromisoformat(params['end']) if 'end' in params else None,
+            categories=frozenset(map(int, categories)) if categories else None,
+            order_by=params.get('order_by'),
+            limit=int(params['limit']) if 'limit' in params else None,
+        )
+    except ValueError as exc:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, str(exc)) from None
+
+
+class HTTPView(AbstractView):
+    """
+    Реализует представление в виде HTTP-сервера с JSON API.
+    Данные для ответов на GET-запросы - последние данные, переданные
+    презентером через методы show_*.
+    """
+    DEFAULT_PAGE_SIZE = 100
+    STREAM_CHUNK_SIZE = 64
+    MAX_BODY_SIZE = 1 << 20
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+        """
+        host, port - адрес, на котором принимаются соединения
+        """
+        self.host = host
+        self.port = port
+        self.server: asyncio.AbstractServer | None = None
+        self._data: dict[str, list[Any]] = {name: [] for name in RESOURCES}
+        self._by_pk: dict[str, dict[int, Any] | None] = {name: None for name in RESOURCES}
+        self._analysis: dict[str, Any] = {}
+        self._forecast: list[dict[str, Any]] = []
+        self._report: Iterable[Row] = ()
+        self._handlers: dict[tuple[str, str], Callable[..., None]] = {}
+        self._poll_changes: Callable[[], None] | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    def update_data_in_view(
+            self,
+            budgets: list[Budget],
+            categories: list[Category],
+            expenses: list[Expense],
+            budgets_sums: list[int],
+            expenses_sums: list[int],
+    ) -> None:
+        self.show_expenses(expenses, categories)
+        self.show_categories(categories)
+        self.show_budgets(budgets, categories)
+        self.show_budget_analysis(budgets_sums, expenses_sums)
+
+    def run(self) -> None:
+        asyncio.run(self.serve_forever())
+
+    async def start(self) -> asyncio.AbstractServer:
+        """
+        Начать принимать соединения в текущем цикле событий.
+        Если port = 0, фактический порт записывается в self.port.
+        """
+        self.server = await asyncio.start_server(
+            self._serve_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def stop(self) -> None:
+        """
+        Перестать принимать соединения и закрыть открытые.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for writer in list(self._writers):
+            writer.close()
+            await writer.wait_closed()
+
+    async def serve_forever(self) -> None:
+        """
+        Запустить сервер и обслуживать запросы до остановки цикла событий.
+        """
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def _set_data(self, name: str, objects: list[Any]) -> None:
+        self._data[name] = objects
+        self._by_pk[name] = None
+
+    def show_expenses(self, expenses: list[Expense], categories: list[Category]) -> None:
+        self._set_data('expenses', expenses)
+
+    def show_categories(self, categories: list[Category]) -> None:
+        self._set_data('categories', categories)
+
+    def show_budgets(self, budgets: list[Budget], categories: list[Category]) -> None:
+        self._set_data('budgets', budgets)
+
+    def show_budget_analysis(
+            self, budgets_sums: list[int], expenses_sums: list[int]) -> None:
+        self._analysis = {
+            'periods': PERIODS,
+            'budgets': budgets_sums,
+            'expenses': expenses_sums,
+        }
+
+    def show_budget_forecast(self, forecasts: list[BudgetForecast],
+                             categories: list[Category]) -> None:
+        self._forecast = [{**asdict(forecast), 'exceeded': forecast.exceeded}
+                          for forecast in forecasts]
+
+    def show_report(self, query: ReportQuery, rows: Iterable[Row],
+                    categories: list[Category]) -> None:
+        self._report = rows
+
+    def add_handler_expense_create(self, handler: Callable[[Expense], None]) -> None:
+        self._handlers['expenses', 'create'] = handler
+
+    def add_handler_expense_update(self, handler: Callable[[Expense], None]) -> None:
+        self._handlers['expenses', 'update'] = handler
+
+    def add_handler_expense_delete(self, handler: Callable[[int], None]) -> None:
+        self._handlers['expenses', 'delete'] = handler
+
+    def add_handler_budget_create(self, handler: Callable[[Budget], None]) -> None:
+        self._handlers['budgets', 'create'] = handler
+
+    def add_handler_budget_update(self, handler: Callable[[Budget], None]) -> None:
+        self._handlers['budgets', 'update'] = handler
+
+    def add_handler_budget_delete(self, handler: Callable[[int], None]) -> None:
+        self._handlers['budgets', 'delete'] = handler
+
+    def add_handler_category_create(self, handler: Callable[[Category], None]) -> None:
+        self._handlers['categories', 'create'] = handler
+
+    def add_handler_category_update(self, handler: Callable[[Category], None]) -> None:
+        self._handlers['categories', 'update'] = handler
+
+    def add_handler_category_delete(self,
+                                    handler: Callable[[int, bool], None]) -> None:
+        self._handlers['categories', 'delete'] = handler
+
+    def add_handler_category_merge(self, handler: Callable[[int, int], None]) -> None:
+        self._handlers['categories', 'merge'] = handler
+
+    def add_handler_report(self, handler: Callable[[ReportQuery], None]) -> None:
+        self._handlers['report', 'run'] = handler
+
+    def add_handler_poll_changes(self, handler: Callable[[], None]) -> None:
+        self._poll_changes = handler
+
+    async def _serve_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as exc:
+                    self._write_response(writer, exc.status,
+                                         encode({'error': str(exc)}), False)
+                    break
+                if request is None:
+                    break
+                await self._respond(request, writer)
+                # Ответ дописывается в буфер сразу; ждать отправки нужно,
+                # только если клиент не успевает его забирать.
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Request | None:
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as exc:
+            if exc.partial.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST) from None
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE) from None
+        try:
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, version = request_line.split()
+            headers = {}
+            for line in header_lines:
+                if line:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST) from None
+        if length > self.MAX_BODY_SIZE:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b''
+        return Request(method.upper(), target, version, headers, body)
+
+    async def _respond(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        # Проверка изменений от других клиентов дешёвая, поэтому выполняется
+        # перед каждым запросом: ответы не бывают устаревшими.
+        if self._poll_changes is not None:
+            self._poll_changes()
+        try:
+            if request.parts == ['analysis'] and request.method == 'GET':
+                self._write_response(writer, HTTPStatus.OK, encode(self._analysis),
+                                     request.keep_alive)
+            elif request.parts == ['forecast'] and request.method == 'GET':
+                self._write_response(writer, HTTPStatus.OK, encode(self._forecast),
+                                     request.keep_alive)
+            elif request.parts == ['report'] and request.method == 'GET':
+                self._call_handler('report', 'run', parse_report_query(request.query))
+                await self._write_rows(request, writer, self._report)
+            elif request.parts[:1] == ['categories'] and request.parts[2:] == ['merge']:
+                self._merge_categories(request, writer, request.parts[1])
+            elif request.parts and request.parts[0] in RESOURCES:
+                await self._respond_resource(request, writer)
+            else:
+                raise HTTPError(HTTPStatus.NOT_FOUND)
+        except HTTPError as exc:
+            self._write_response(writer, exc.status, encode({'error': str(exc)}),
+                                 request.keep_alive)
+
+    async def _respond_resource(self, request: Request,
+                                writer: asyncio.StreamWriter) -> None:
+        name, *rest = request.parts
+        model = RESOURCES[name]
+        if len(rest) > 1:
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+        if not rest:
+            if request.method == 'GET':
+                await self._write_list(request, writer, self._data[name])
+                return
+            if request.method == 'POST':
+                obj = decode(model, request.body)
+                self._call_handler(name, 'create', obj)
+                self._write_response(writer, HTTPStatus.CREATED, encode(obj),
+                                     request.keep_alive)
+                return
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+        try:
+            pk = int(rest[0])
+        except ValueError:
+            raise HTTPError(HTTPStatus.NOT_FOUND) from None
+        if request.method == 'GET':
+            obj = self._get(name, pk)
+        elif request.method == 'PUT':
+            self._get(name, pk)
+            obj = decode(model, request.body, pk)
+            self._call_handler(name, 'update', obj)
+        elif request.method == 'DELETE':
+            self._get(name, pk)
+            cascade = (request.query.get('cascade') in ('1', 'true'),)
+            self._call_handler(name, 'delete', pk,
+                               *(cascade if name == 'categories' else ()))
+            self._write_response(writer, HTTPStatus.NO_CONTENT, b'', request.keep_alive)
+            return
+        else:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        self._write_response(writer, HTTPStatus.OK, encode(obj), request.keep_alive)
+
+    def _merge_categories(self, request: Request, writer: asyncio.StreamWriter,
+                          source: str) -> None:
+        if request.method != 'POST':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        try:
+            source_pk = int(source)
+        except ValueError:
+            raise HTTPError(HTTPStatus.NOT_FOUND) from None
+        self._get('categories', source_pk)
+        try:
+            target_pk = int(json.loads(request.body)['target'])
+        except (ValueError, TypeError, KeyError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'expected {"target": <pk>}') from None
+        self._call_handler('categories', 'merge', source_pk, target_pk)
+        self._write_response(writer, HTTPStatus.NO_CONTENT, b'', request.keep_alive)
+
+    def _get(self, name: str, pk: int) -> Any:
+        by_pk = self._by_pk[name]
+        if by_pk is None:
+            by_pk = self._by_pk[name] = {obj.pk: obj for obj in self._data[name]}
+        try:
+            return by_pk[pk]
+        except KeyError:
+            raise HTTPError(HTTPStatus.NOT_FOUND) from None
+
+    def _call_handler(self, name: str, action: str, *arguments: Any) -> None:
+        handler = self._handlers.get((name, action))
+        if handler is None:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        try:
+            handler(*arguments)
+        except KeyError as exc:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'not found: {exc}') from None
+        except (TypeError, ValueError) as exc:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(exc)) from None
+
+    async def _write_list(self, request: Request, writer: asyncio.StreamWriter,
+                          objects: list[Any]) -> None:
+        try:
+            offset = max(int(request.query.get('offset', 0)), 0)
+            limit = max(int(request.query.get('limit', self.DEFAULT_PAGE_SIZE)), 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'invalid offset or limit') from None
+        # Список заменяется презентером целиком при каждом изменении,
+        # поэтому его можно отдавать по частям без копирования.
+        page = objects[offset:offset + limit]
+        writer.write(self._head(HTTPStatus.OK, request.keep_alive, {
+            'Transfer-Encoding': 'chunked',
+            'X-Total-Count': str(len(objects)),
+        }))
+        for start in range(0, max(len(page), 1), self.STREAM_CHUNK_SIZE):
+            items = b','.join(encode(obj)
+                              for obj in page[start:start + self.STREAM_CHUNK_SIZE])
+            chunk = (b'[' if start == 0 else b',') + items
+            if start + self.STREAM_CHUNK_SIZE >= len(page):
+                chunk += b']'
+            writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+
+    async def _write_rows(self, request: Request, writer: asyncio.StreamWriter,
+                          rows: Iterable[Row]) -> None:
+        # Строки читаются по мере отправки, поэтому их число заранее
+        # неизвестно.
+        writer.write(self._head(HTTPStatus.OK, request.keep_alive,
+                                {'Transfer-Encoding': 'chunked'}))
+        first = True
+        items: list[bytes] = []
+        for row in rows:
+            items.append((b'[' if first else b',') + encode(row))
+            first = False
+            if len(items) == self.STREAM_CHUNK_SIZE:
+                chunk = b''.join(items)
+                writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                await writer.drain()
+                items = []
+        items.append(b'[]' if first else b']')
+        chunk = b''.join(items)
+        writer.write(b'%x\r\n%s\r\n0\r\n\r\n' % (len(chunk), chunk))
+
+    @staticmethod
+    def _head(status: HTTPStatus, keep_alive: bool, headers: dict[str, str]) -> bytes:
+        lines = [f'HTTP/1.1 {status.value} {status.phrase}',
+                 'Content-Type: application/json; charset=utf-8',
+                 f'Connection: {"keep-alive" if keep_alive else "close"}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    def _write_response(self, writer: asyncio.StreamWriter, status: HTTPStatus,
+                        body: bytes, keep_alive: bool) -> None:
+        writer.write(self._head(status, keep_alive,
+                                {'Content-Length': str(len(body))}) + body)
@@ -1,22 +1,55 @@
 """
 В данном модуле будут описаны виджеты, используемые в графическом интерфейсе.
 """
-from typing import Optional, Sequence
+from bisect import bisect_left
+from decimal import Decimal
+from functools import cache, partial
+from typing import Any, Iterable, Optional, Sequence
 
 import PySide6.QtCore
-from PySide6.QtGui import QIntValidator
+from PySide6.QtCore import (
+    QAbstractListModel, QAbstractTableModel, QModelIndex, QPersistentModelIndex, Qt,
+    QRegularExpression)
+from PySide6.QtGui import (
+    QBrush, QColor, QIntValidator, QKeySequence, QRegularExpressionValidator, QShortcut)
 from PySide6.QtWidgets import (
     QMainWindow,
     QWidget,
     QTableWidget,
     QHeaderView, QApplication, QTableWidgetItem, QVBoxLayout, QTabWidget, QGridLayout,
-    QComboBox, QPushButton, QLineEdit, QLabel, QDateTimeEdit,
+    QComboBox, QPushButton, QLineEdit, QLabel, QDateTimeEdit, QCompleter, QTableView,
+    QHBoxLayout, QCheckBox,
 )
 
-from bookkeeper import settings, utils
+from bookkeeper import settings
 from bookkeeper.models.budget import Budget
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
+from bookkeeper.models.forecast import BudgetForecast
+from bookkeeper.models.money import BASE_CURRENCY
+from bookkeeper.reports.abstract_report import (
+    AGG_AVG, AGG_COUNT, AGG_SUM, DIM_CATEGORY, DIM_COMMENT, DIM_CURRENCY, DIM_DAY,
+    DIM_MONTH, DIM_SUBTREE, DIM_WEEK, DIM_YEAR, ReportQuery, Row)
+from bookkeeper.view.formatting import CellFormatter
+from bookkeeper.view.refresh import RefreshScheduler
+
+
+@cache
+def cell_formatter() -> CellFormatter:
+    """
+    Общий для всех таблиц объект форматирования. Создаётся при первом
+    выводе данных, когда локаль приложения уже установлена.
+    """
+    return CellFormatter(settings.DATE_FORMAT, settings.AMOUNT_MINOR_DIGITS)
+
+
+def format_money(amount: int, currency: str) -> str:
+    """
+    Текст суммы для ячейки таблицы; у сумм не в базовой валюте
+    добавляется код валюты.
+    """
+    text = cell_formatter().format_amount(amount)
+    return text if currency == BASE_CURRENCY else f'{text} {currency}'
 
 
 class Application:
@@ -62,6 +95,10 @@ class MainWindow(QMainWindow):
     signal_categories_updated = PySide6.QtCore.Signal(list)
     signal_expenses_updated = PySide6.QtCore.Signal(list, list)
     signal_budget_analysis_updated = PySide6.QtCore.Signal(list, list)
+    signal_budget_forecast_updated = PySide6.QtCore.Signal(list, list)
+    signal_search_results_updated = PySide6.QtCore.Signal(list, list, int, bool)
+    signal_report_updated = PySide6.QtCore.Signal(ReportQuery, object, list)
+    signal_pks_changed = PySide6.QtCore.Signal(object, list, list)
 
     signal_budget_creation_requested = PySide6.QtCore.Signal(Budget)
     signal_budget_update_requested = PySide6.QtCore.Signal(Budget)
@@ -69,11 +106,17 @@ class MainWindow(QMainWindow):
 
     signal_category_creation_requested = PySide6.QtCore.Signal(Category)
     signal_category_update_requested = PySide6.QtCore.Signal(Category)
-    signal_category_deletion_requested = PySide6.QtCore.Signal(int)
+    signal_category_deletion_requested = PySide6.QtCore.Signal(int, bool)
+    signal_category_merge_requested = PySide6.QtCore.Signal(int, int)
 
     signal_expense_creation_requested = PySide6.QtCore.Signal(Expense)
     signal_expense_update_requested = PySide6.QtCore.Signal(Expense)
     signal_expense_deletion_requested = PySide6.QtCore.Signal(int)
+    signal_expense_search_requested = PySide6.QtCore.Signal(str, int)
+    signal_report_requested = PySide6.QtCore.Signal(ReportQuery)
+
+    signal_undo_requested = PySide6.QtCore.Signal()
+    signal_redo_requested = PySide6.QtCore.Signal()
 
     __instance: 'MainWindow' = None
 
@@ -88,9 +131,14 @@ class MainWindow(QMainWindow):
         *_, width, height = geometry
         self.setGeometry(*geometry)
         self.setWindowTitle(settings.PYSIDE6_MAIN_WINDOW_TITLE)
+        self.refresh_scheduler = RefreshScheduler()
         self.main_widget = MainWidget()
         self.setCentralWidget(self.main_widget)
         self.setFixedSize(width, height)
+        QShortcut(QKeySequence.Undo, self,  # type: ignore[attr-defined]
+                  self.signal_undo_requested.emit)
+        QShortcut(QKeySequence.Redo, self,  # type: ignore[attr-defined]
+                  self.signal_redo_requested.emit)
 
     @classmethod
     def instance(cls) -> 'MainWindow':
@@ -123,9 +171,17 @@ class MainWidget(QWidget):
             (TabCategories(self), "Категории расходов"),
             (TabBudgets(self), "Бюджеты"),
             (TabBudgetAnalysis(self), "Анализ бюджета"),
+            (TabBudgetForecast(self), "Прогноз бюджета"),
+            (TabSearch(self), "Поиск"),
+            (TabReports(self), "Отчёты"),
         ]
         for tab_widget, tab_title in tab_tuples:
             self.tab_widget.addTab(tab_widget, tab_title)
+        # Скрытые вкладки обновляются при показе, а не при каждом изменении.
+        scheduler = MainWindow.instance().refresh_scheduler
+        scheduler.set_current(self.tab_widget.currentWidget)
+        self.tab_widget.currentChanged.connect(
+            lambda index: scheduler.show(self.tab_widget.widget(index)))
 
         self._layout.addWidget(self.tab_widget)
 
@@ -141,9 +197,9 @@ class TabExpanses(QWidget):
         self._layout.setRowStretch(0, 3)
         self._layout.setRowStretch(1, 1)
         self.setLayout(self._layout)
-        self.table_expenses = QTableWidget(10, 5)
-        self.table_expenses.setHorizontalHeaderLabels(
-            ['№', 'Дата', 'Сумма', 'Категория', 'Комметарий'])
+        self.model_expenses = ExpenseTableModel(self)
+        self.table_expenses = QTableView()
+        self.table_expenses.setModel(self.model_expenses)
         header = self.table_expenses.horizontalHeader()
         header.setSectionResizeMode(
             0, QHeaderView.ResizeToContents)  # type: ignore[attr-defined]
@@ -156,6 +212,9 @@ class TabExpanses(QWidget):
         header.setSectionResizeMode(
             4, QHeaderView.Stretch)  # type: ignore[attr-defined]
         self.table_expenses.verticalHeader().setVisible(False)
+        # Строки одной высоты: представлению не нужно измерять каждую строку.
+        self.table_expenses.verticalHeader().setSectionResizeMode(
+            QHeaderView.Fixed)  # type: ignore[attr-defined]
         self._layout.addWidget(self.table_expenses, 0, 0)
 
         edit_panel_widget = QWidget()
@@ -175,38 +234,36 @@ class TabExpanses(QWidget):
         edit_panel_widget_layout.addWidget(QLabel('№ категории:'), 0, 3, 1, 1)
         edit_panel_widget_layout.addWidget(QLabel('Комментарий:'), 0, 4, 1, 1)
 
-        self.combo_box_pk = QComboBox()
+        self.picker_pk = PkPicker()
         self.input_datetime = QDateTimeEdit()
-        self.input_amount = NaturalNumberLineEdit()
-        self.combo_box_category = QComboBox()
+        self.input_amount = MoneyInput()
+        self.picker_category = PkPicker()
         self.input_comment = QLineEdit()
         button_create_expense = QPushButton('Создать')
         button_create_expense.clicked.connect(self.button_create_expense_on_click)
         button_update_expense = QPushButton('Обновить')
         button_update_expense.clicked.connect(self.button_update_expense_on_click)
-        edit_panel_widget_layout.addWidget(self.combo_box_pk, 1, 0, 1, 1)
+        edit_panel_widget_layout.addWidget(self.picker_pk, 1, 0, 1, 1)
         edit_panel_widget_layout.addWidget(self.input_datetime, 1, 1, 1, 1)
         edit_panel_widget_layout.addWidget(self.input_amount, 1, 2, 1, 1)
-        edit_panel_widget_layout.addWidget(self.combo_box_category, 1, 3, 1, 1)
+        edit_panel_widget_layout.addWidget(self.picker_category, 1, 3, 1, 1)
         edit_panel_widget_layout.addWidget(self.input_comment, 1, 4, 1, 1)
         edit_panel_widget_layout.addWidget(button_create_expense, 2, 0, 1, 2)
         edit_panel_widget_layout.addWidget(button_update_expense, 2, 2, 1, 2)
 
-        self.combo_box_delete_expense = QComboBox()
-        edit_panel_widget_layout.addWidget(self.combo_box_delete_expense, 0, 5, 1, 1)
+        self.picker_delete_expense = PkPicker()
+        edit_panel_widget_layout.addWidget(self.picker_delete_expense, 0, 5, 1, 1)
         button_delete_expense = QPushButton('Удалить по №')
         button_delete_expense.clicked.connect(self.button_delete_expense_on_click)
         edit_panel_widget_layout.addWidget(button_delete_expense, 1, 5, 2, 1)
         self._layout.addWidget(edit_panel_widget, 1, 0)
 
         self.main_window = MainWindow.instance()
-        self.main_window.signal_expenses_updated.connect(self.update_table_expenses)
-        self.main_window.signal_expenses_updated.connect(
-            self.update_combo_box_delete_expense_items)
+        deferred = partial(self.main_window.refresh_scheduler.slot, self)
         self.main_window.signal_expenses_updated.connect(
-            self.update_combo_box_pk)
-        self.main_window.signal_categories_updated.connect(
-            self.update_combo_box_category)
+            deferred(self.update_table_expenses))
+        connect_pickers({Expense: (self.picker_pk, self.picker_delete_expense),
+                         Category: (self.picker_category,)})
 
     def update_table_expenses(self, expenses: list[Expense], categories: list[Category]):
         """
@@ -214,43 +271,7 @@ class TabExpanses(QWidget):
         categories - список категорий. При этом нужно чтобы каждому расходу
             соответствовала категория из categories.
         """
-        self.table_expenses.setRowCount(len(expenses))
-        for i, expense in enumerate(expenses):
-            self.table_expenses.setItem(
-                i, 0, QTableWidgetItem(str(expense.pk)))
-            self.table_expenses.setItem(
-                i, 1, QTableWidgetItem(
-                    utils.humanize_datetime(expense.expense_date)))
-            self.table_expenses.setItem(
-                i, 2, QTableWidgetItem(str(expense.amount)))
-            self.table_expenses.setItem(
-                i, 3, QTableWidgetItem(
-                    categories[expense.category - 1].name.capitalize()))
-            self.table_expenses.setItem(
-                i, 4, QTableWidgetItem(str(expense.comment)))
-
-    def update_combo_box_delete_expense_items(
-            self, expenses: list[Expense], categories: list[Category]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
-        """
-        self.combo_box_delete_expense.clear()
-        self.combo_box_delete_expense.addItems([str(expense.pk) for expense in expenses])
-
-    def update_combo_box_pk(
-            self, expenses: list[Expense], categories: list[Category]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
-        """
-        self.combo_box_pk.clear()
-        self.combo_box_pk.addItems([str(expense.pk) for expense in expenses])
-
-    def update_combo_box_category(self, categories: list[Category]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
-        """
-        self.combo_box_category.clear()
-        self.combo_box_category.addItems([str(category.pk) for category in categories])
+        self.model_expenses.set_expenses(expenses, categories)
 
     def button_create_expense_on_click(self) -> None:
         """
@@ -258,8 +279,9 @@ class TabExpanses(QWidget):
         """
         expense = Expense(
             expense_date=self.input_datetime.dateTime().toPython(),
-            amount=int(self.input_amount.text()),
-            category=int(self.combo_box_category.currentText()),
+            amount=self.input_amount.amount(),
+            currency=self.input_amount.currency(),
+            category=int(self.picker_category.currentText()),
             comment=self.input_comment.text()
         )
         self.main_window.signal_expense_creation_requested.emit(expense)
@@ -269,10 +291,11 @@ class TabExpanses(QWidget):
         Обработчика нажатия на соответствующую кнопку.
         """
         expense = Expense(
-            pk=int(self.combo_box_pk.currentText()),
+            pk=int(self.picker_pk.currentText()),
             expense_date=self.input_datetime.dateTime().toPython(),
-            amount=int(self.input_amount.text()),
-            category=int(self.combo_box_category.currentText()),
+            amount=self.input_amount.amount(),
+            currency=self.input_amount.currency(),
+            category=int(self.picker_category.currentText()),
             comment=self.input_comment.text()
         )
         self.main_window.signal_expense_update_requested.emit(expense)
@@ -282,7 +305,7 @@ class TabExpanses(QWidget):
         Обработчика нажатия на соответствующую кнопку.
         """
         self.main_window.signal_expense_deletion_requested.emit(
-            int(self.combo_box_delete_expense.currentText()))
+            int(self.picker_delete_expense.currentText()))
 
 
 class TabCategories(QWidget):
@@ -323,40 +346,52 @@ class TabCategories(QWidget):
         edit_panel_widget_layout.addWidget(QLabel('Название:'), 0, 1, 1, 1)
         edit_panel_widget_layout.addWidget(QLabel('№ родителя:'), 0, 2, 1, 1)
 
-        self.combo_box_pk = QComboBox()
+        self.picker_pk = PkPicker()
         self.input_name = QLineEdit()
-        self.combo_box_parent = QComboBox()
+        self.picker_parent = PkPicker()
         button_create_category = QPushButton('Создать')
         button_create_category.clicked.connect(self.button_create_category_on_click)
         button_update_category = QPushButton('Обновить')
         button_update_category.clicked.connect(self.button_update_category_on_click)
-        edit_panel_widget_layout.addWidget(self.combo_box_pk, 1, 0, 1, 1)
+        edit_panel_widget_layout.addWidget(self.picker_pk, 1, 0, 1, 1)
         edit_panel_widget_layout.addWidget(self.input_name, 1, 1, 1, 1)
-        edit_panel_widget_layout.addWidget(self.combo_box_parent, 1, 2, 1, 1)
+        edit_panel_widget_layout.addWidget(self.picker_parent, 1, 2, 1, 1)
         edit_panel_widget_layout.addWidget(button_create_category, 2, 0, 1, 2)
         edit_panel_widget_layout.addWidget(button_update_category, 2, 2, 1, 2)
 
-        self.combo_box_delete_category = QComboBox()
-        edit_panel_widget_layout.addWidget(self.combo_box_delete_category, 0, 3, 1, 1)
+        self.picker_delete_category = PkPicker()
+        edit_panel_widget_layout.addWidget(self.picker_delete_category, 0, 3, 1, 1)
         button_delete_expense = QPushButton('Удалить по №')
         button_delete_expense.clicked.connect(self.button_delete_category_on_click)
         edit_panel_widget_layout.addWidget(button_delete_expense, 1, 3, 1, 1)
+        self.checkbox_cascade = QCheckBox('с подкатегориями\nи расходами')
+        edit_panel_widget_layout.addWidget(self.checkbox_cascade, 3, 3, 1, 1)
+
+        edit_panel_widget_layout.addWidget(QLabel('Объединить №\nс категорией №'),
+                                           0, 4, 1, 2)
+        self.picker_merge_source = PkPicker()
+        self.picker_merge_target = PkPicker()
+        button_merge_categories = QPushButton('Объединить')
+        button_merge_categories.clicked.connect(self.button_merge_categories_on_click)
+        edit_panel_widget_layout.addWidget(self.picker_merge_source, 1, 4, 1, 1)
+        edit_panel_widget_layout.addWidget(self.picker_merge_target, 1, 5, 1, 1)
+        edit_panel_widget_layout.addWidget(button_merge_categories, 2, 4, 1, 2)
         self._layout.addWidget(edit_panel_widget, 1, 0)
 
         self.main_window = MainWindow.instance()
-        self.main_window.signal_categories_updated.connect(self.update_table_categories)
-        self.main_window.signal_categories_updated.connect(
-            self.update_combo_box_delete_category_items)
+        deferred = partial(self.main_window.refresh_scheduler.slot, self)
         self.main_window.signal_categories_updated.connect(
-            self.update_combo_box_pk)
-        self.main_window.signal_categories_updated.connect(
-            self.update_combo_box_parent)
+            deferred(self.update_table_categories))
+        connect_pickers({Category: (self.picker_pk, self.picker_parent,
+                                    self.picker_delete_category,
+                                    self.picker_merge_source, self.picker_merge_target)})
 
     def update_table_categories(
             self, categories: list[Category]):
         """
         categories - список категорий расходов
         """
+        names = {category.pk: category.name for category in categories}
         self.table_categories.setRowCount(len(categories))
         for i, category in enumerate(categories):
             self.table_categories.setItem(
@@ -365,48 +400,33 @@ class TabCategories(QWidget):
                 i, 1, QTableWidgetItem(category.name.capitalize()))
             parent_category_name = (
                 'родителя нет' if category.parent is None
-                else categories[category.parent - 1].name.capitalize()
+                else names.get(category.parent, '').capitalize()
             )
             self.table_categories.setItem(
                 i, 2, QTableWidgetItem(parent_category_name))
 
-    def update_combo_box_pk(
-            self, categories: list[Category]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
+    def button_merge_categories_on_click(self) -> None:
         """
-        self.combo_box_pk.clear()
-        self.combo_box_pk.addItems([str(category.pk) for category in categories])
-
-    def update_combo_box_parent(self, categories: list[Category]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
-        """
-        self.combo_box_parent.clear()
-        self.combo_box_parent.addItems([str(category.pk) for category in categories])
-
-    def update_combo_box_delete_category_items(
-            self, categories: list[Category]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
+        Обработчика нажатия на соответствующую кнопку.
         """
-        self.combo_box_delete_category.clear()
-        self.combo_box_delete_category.addItems(
-            [str(category.pk) for category in categories])
+        self.main_window.signal_category_merge_requested.emit(
+            int(self.picker_merge_source.currentText()),
+            int(self.picker_merge_target.currentText()))
 
     def button_delete_category_on_click(self) -> None:
         """
         Обработчика нажатия на соответствующую кнопку.
         """
         self.main_window.signal_category_deletion_requested.emit(
-            int(self.combo_box_delete_category.currentText()))
+            int(self.picker_delete_category.currentText()),
+            self.checkbox_cascade.isChecked())
 
     def button_create_category_on_click(self) -> None:
         """
         Обработчика нажатия на соответствующую кнопку.
         """
 
-        parent_pk_str = self.combo_box_parent.currentText()
+        parent_pk_str = self.picker_parent.currentText()
         if not parent_pk_str:
             parent = None
         else:
@@ -423,14 +443,14 @@ class TabCategories(QWidget):
         Обработчика нажатия на соответствующую кнопку.
         """
 
-        parent_pk_str = self.combo_box_parent.currentText()
+        parent_pk_str = self.picker_parent.currentText()
         if not parent_pk_str:
             parent = None
         else:
             parent = int(parent_pk_str)
 
         category = Category(
-            pk=int(self.combo_box_pk.currentText()),
+            pk=int(self.picker_pk.currentText()),
             name=self.input_name.text(),
             parent=parent
         )
@@ -480,38 +500,35 @@ class TabBudgets(QWidget):
         edit_panel_widget_layout.addWidget(QLabel('Сумма:'), 0, 2, 1, 1)
         edit_panel_widget_layout.addWidget(QLabel('№ категории:'), 0, 3, 1, 1)
 
-        self.combo_box_pk = QComboBox()
+        self.picker_pk = PkPicker()
         self.combo_box_period = QComboBox()
         self.combo_box_period.addItems(['День', 'Неделя', 'Месяц'])
-        self.input_amount = NaturalNumberLineEdit()
-        self.combo_box_category = QComboBox()
+        self.input_amount = MoneyInput()
+        self.picker_category = PkPicker()
         button_create_budget = QPushButton('Создать')
         button_create_budget.clicked.connect(self.button_create_budget_on_click)
         button_update_budget = QPushButton('Обновить')
         button_update_budget.clicked.connect(self.button_update_budget_on_click)
-        edit_panel_widget_layout.addWidget(self.combo_box_pk, 1, 0, 1, 1)
+        edit_panel_widget_layout.addWidget(self.picker_pk, 1, 0, 1, 1)
         edit_panel_widget_layout.addWidget(self.combo_box_period, 1, 1, 1, 1)
         edit_panel_widget_layout.addWidget(self.input_amount, 1, 2, 1, 1)
-        edit_panel_widget_layout.addWidget(self.combo_box_category, 1, 3, 1, 1)
+        edit_panel_widget_layout.addWidget(self.picker_category, 1, 3, 1, 1)
         edit_panel_widget_layout.addWidget(button_create_budget, 2, 0, 1, 2)
         edit_panel_widget_layout.addWidget(button_update_budget, 2, 2, 1, 2)
 
-        self.combo_box_delete_budget = QComboBox()
-        edit_panel_widget_layout.addWidget(self.combo_box_delete_budget, 0, 4, 1, 1)
+        self.picker_delete_budget = PkPicker()
+        edit_panel_widget_layout.addWidget(self.picker_delete_budget, 0, 4, 1, 1)
         button_delete_expense = QPushButton('Удалить по №')
         button_delete_expense.clicked.connect(self.button_delete_budget_on_click)
         edit_panel_widget_layout.addWidget(button_delete_expense, 1, 4, 1, 1)
         self._layout.addWidget(edit_panel_widget, 1, 0)
 
         self.main_window = MainWindow.instance()
+        deferred = partial(self.main_window.refresh_scheduler.slot, self)
         self.main_window.signal_budgets_updated.connect(
-            self.update_table_budgets)
-        self.main_window.signal_budgets_updated.connect(
-            self.update_combo_box_delete_budget_items)
-        self.main_window.signal_budgets_updated.connect(
-            self.update_combo_box_pk)
-        self.main_window.signal_categories_updated.connect(
-            self.update_combo_box_category)
+            deferred(self.update_table_budgets))
+        connect_pickers({Budget: (self.picker_pk, self.picker_delete_budget),
+                         Category: (self.picker_category,)})
 
     def update_table_budgets(
             self, budgets: list[Budget], categories: list[Category]):
@@ -519,6 +536,7 @@ class TabBudgets(QWidget):
         budgets - список бюджетов
         categories - список категорий расходов
         """
+        names = {category.pk: category.name for category in categories}
         self.table_budgets.setRowCount(len(budgets))
         for i, budget in enumerate(budgets):
             budgets_sum: int
@@ -529,39 +547,16 @@ class TabBudgets(QWidget):
                 i, 1, QTableWidgetItem(budget.period.capitalize()))
             self.table_budgets.setItem(
                 i, 2, QTableWidgetItem(
-                    categories[budget.category - 1].name.capitalize()))
+                    names.get(budget.category, '').capitalize()))
             self.table_budgets.setItem(
-                i, 3, QTableWidgetItem(str(budget.amount)))
-
-    def update_combo_box_pk(
-            self, budgets: list[Budget]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
-        """
-        self.combo_box_pk.clear()
-        self.combo_box_pk.addItems([str(budget.pk) for budget in budgets])
-
-    def update_combo_box_category(self, categories: list[Category]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
-        """
-        self.combo_box_category.clear()
-        self.combo_box_category.addItems([str(category.pk) for category in categories])
-
-    def update_combo_box_delete_budget_items(
-            self, budgets: list[Budget], categories: list[Category]) -> None:
-        """
-        Обновляет пункты меню соответствующего комбобокса.
-        """
-        self.combo_box_delete_budget.clear()
-        self.combo_box_delete_budget.addItems([str(budget.pk) for budget in budgets])
+                i, 3, QTableWidgetItem(format_money(budget.amount, budget.currency)))
 
     def button_delete_budget_on_click(self) -> None:
         """
         Обработчика нажатия на соответствующую кнопку.
         """
         self.main_window.signal_budget_deletion_requested.emit(
-            int(self.combo_box_delete_budget.currentText()))
+            int(self.picker_delete_budget.currentText()))
 
     def button_create_budget_on_click(self) -> None:
         """
@@ -569,8 +564,9 @@ class TabBudgets(QWidget):
         """
         budget = Budget(
             period=self.combo_box_period.currentText().lower(),
-            amount=int(self.input_amount.text()),
-            category=int(self.combo_box_category.currentText()),
+            amount=self.input_amount.amount(),
+            currency=self.input_amount.currency(),
+            category=int(self.picker_category.currentText()),
         )
         self.main_window.signal_budget_creation_requested.emit(budget)
 
@@ -579,10 +575,11 @@ class TabBudgets(QWidget):
         Обработчика нажатия на соответствующую кнопку.
         """
         budget = Budget(
-            pk=int(self.combo_box_pk.currentText()),
-            period=self.combo_box_period.currentText(),
-            amount=int(self.input_amount.text()),
-            category=int(self.combo_box_category.currentText()),
+            pk=int(self.picker_pk.currentText()),
+            period=self.combo_box_period.currentText().lower(),
+            amount=self.input_amount.amount(),
+            currency=self.input_amount.currency(),
+            category=int(self.picker_category.currentText()),
         )
         self.main_window.signal_budget_update_requested.emit(budget)
 
@@ -607,8 +604,9 @@ class TabBudgetAnalysis(QWidget):
             QHeaderView.Stretch)  # type: ignore[attr-defined]
         self._layout.addWidget(self.table_budget_analysis)
         main_window = MainWindow.instance()
+        deferred = partial(main_window.refresh_scheduler.slot, self)
         main_window.signal_budget_analysis_updated.connect(
-            self.update_table_budget_analysis)
+            deferred(self.update_table_budget_analysis))
 
     def update_table_budget_analysis(
             self, budgets_sums: list[int], expenses_sums: list[int]):
@@ -634,13 +632,425 @@ class TabBudgetAnalysis(QWidget):
             [expenses_sum_monthly, budgets_sum_monthly],
         ]
 
+        formatter = cell_formatter()
         for i, (expenses_sum, budgets_sum) in enumerate(expenses_and_budget_sums):
             budgets_sum: int
             expenses_sum: int
             self.table_budget_analysis.setItem(
-                i, 0, QTableWidgetItem(str(expenses_sum)))
+                i, 0, QTableWidgetItem(formatter.format_amount(expenses_sum)))
             self.table_budget_analysis.setItem(
-                i, 1, QTableWidgetItem(str(budgets_sum)))
+                i, 1, QTableWidgetItem(formatter.format_amount(budgets_sum)))
+
+
+class TabBudgetForecast(QWidget):
+    """
+    Вкладка прогноза исполнения бюджетов к концу их сроков.
+    Бюджеты, которые по прогнозу будут превышены, выделяются цветом.
+    """
+    EXCEEDED_COLOR = QColor(255, 200, 200)
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self._layout = QVBoxLayout()
+        self.setLayout(self._layout)
+        self.table_forecast = QTableWidget(0, 5)
+        self.table_forecast.setHorizontalHeaderLabels(
+            ['Категория', 'Срок', 'Бюджет', 'Потрачено', 'Прогноз'])
+        self.table_forecast.horizontalHeader().setSectionResizeMode(
+            QHeaderView.Stretch)  # type: ignore[attr-defined]
+        self._layout.addWidget(self.table_forecast)
+        main_window = MainWindow.instance()
+        deferred = partial(main_window.refresh_scheduler.slot, self)
+        main_window.signal_budget_forecast_updated.connect(
+            deferred(self.update_table_forecast))
+
+    def update_table_forecast(
+            self, forecasts: list[BudgetForecast], categories: list[Category]) -> None:
+        """
+        forecasts - прогнозы исполнения бюджетов
+        categories - список категорий расходов
+        """
+        names = {category.pk: category.name for category in categories}
+        self.table_forecast.setRowCount(len(forecasts))
+        for i, forecast in enumerate(forecasts):
+            budget = forecast.budget
+            values = [names.get(budget.category, '').capitalize(),
+                      budget.period.capitalize(),
+                      format_money(budget.amount, budget.currency),
+                      format_money(forecast.spent, budget.currency),
+                      format_money(forecast.projected, budget.currency)]
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if forecast.exceeded:
+                    item.setBackground(QBrush(self.EXCEEDED_COLOR))
+                self.table_forecast.setItem(i, j, item)
+
+
+class TabSearch(QWidget):
+    """
+    Вкладка для поиска расходов по комментарию.
+    Результаты подгружаются постранично по кнопке "Показать ещё".
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self._layout = QGridLayout()
+        self.setLayout(self._layout)
+        self._query = ''
+        self._page = 0
+
+        self.input_query = QLineEdit()
+        self.input_query.setPlaceholderText('Слова из комментария')
+        self.input_query.returnPressed.connect(self.button_search_on_click)
+        button_search = QPushButton('Найти')
+        button_search.clicked.connect(self.button_search_on_click)
+        self._layout.addWidget(self.input_query, 0, 0, 1, 3)
+        self._layout.addWidget(button_search, 0, 3, 1, 1)
+
+        self.table_results = QTableWidget(0, 5)
+        self.table_results.setHorizontalHeaderLabels(
+            ['№', 'Дата', 'Сумма', 'Категория', 'Комметарий'])
+        header = self.table_results.horizontalHeader()
+        for column in range(4):
+            header.setSectionResizeMode(
+                column, QHeaderView.ResizeToContents)  # type: ignore[attr-defined]
+        header.setSectionResizeMode(
+            4, QHeaderView.Stretch)  # type: ignore[attr-defined]
+        self.table_results.verticalHeader().setVisible(False)
+        self._layout.addWidget(self.table_results, 1, 0, 1, 4)
+
+        self.button_more = QPushButton('Показать ещё')
+        self.button_more.setEnabled(False)
+        self.button_more.clicked.connect(self.button_more_on_click)
+        self._layout.addWidget(self.button_more, 2, 0, 1, 4)
+
+        self.main_window = MainWindow.instance()
+        self.main_window.signal_search_results_updated.connect(
+            self.update_table_results)
+
+    def update_table_results(
+            self, expenses: list[Expense], categories: list[Category],
+            page: int, has_more: bool) -> None:
+        """
+        expenses - найденные расходы (одна страница результатов).
+        categories - список категорий.
+        page - номер страницы; первая страница заменяет таблицу,
+            следующие дописываются в её конец.
+        has_more - есть ли ещё результаты.
+        """
+        category_names = {category.pk: category.name for category in categories}
+        formatter = cell_formatter()
+        first_row = 0 if page == 0 else self.table_results.rowCount()
+        self.table_results.setRowCount(first_row + len(expenses))
+        for i, expense in enumerate(expenses, start=first_row):
+            self.table_results.setItem(
+                i, 0, QTableWidgetItem(str(expense.pk)))
+            self.table_results.setItem(
+                i, 1, QTableWidgetItem(
+                    formatter.format_datetime(expense.expense_date)))
+            self.table_results.setItem(
+                i, 2, QTableWidgetItem(format_money(expense.amount, expense.currency)))
+            self.table_results.setItem(
+                i, 3, QTableWidgetItem(
+                    category_names.get(expense.category, '').capitalize()))
+            self.table_results.setItem(
+                i, 4, QTableWidgetItem(expense.comment))
+        self._page = page
+        self.button_more.setEnabled(has_more)
+
+    def button_search_on_click(self) -> None:
+        """
+        Обработчика нажатия на соответствующую кнопку.
+        """
+        self._query = self.input_query.text()
+        self.main_window.signal_expense_search_requested.emit(self._query, 0)
+
+    def button_more_on_click(self) -> None:
+        """
+        Обработчика нажатия на соответствующую кнопку.
+        """
+        self.main_window.signal_expense_search_requested.emit(
+            self._query, self._page + 1)
+
+
+class ExpenseTableModel(QAbstractTableModel):
+    """
+    Модель таблицы расходов. Текст ячейки форматируется только тогда,
+    когда представление запрашивает его (т. е. для видимых ячеек),
+    поэтому таблица с миллионом строк прокручивается так же быстро,
+    как с десятком.
+    """
+    HEADERS = ['№', 'Дата', 'Сумма', 'Категория', 'Комметарий']
+
+    def __init__(self, parent: Optional[PySide6.QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+        self._expenses: list[Expense] = []
+        self._names: dict[int, str] = {}
+
+    def set_expenses(self, expenses: list[Expense], categories: list[Category]) -> None:
+        """
+        Заменить данные модели.
+        """
+        self.beginResetModel()
+        self._expenses = expenses
+        self._names = {category.pk: category.name.capitalize()
+                       for category in categories}
+        self.endResetModel()
+
+    def rowCount(  # pylint: disable=invalid-name
+            self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        """
+        Число строк модели.
+        """
+        return 0 if parent.isValid() else len(self._expenses)
+
+    def columnCount(  # pylint: disable=invalid-name
+            self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        """
+        Число столбцов модели.
+        """
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex,
+             role: int = Qt.DisplayRole) -> Any:  # type: ignore[assignment]
+        """
+        Текст ячейки.
+        """
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        expense = self._expenses[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(expense.pk)
+        if column == 1:
+            return cell_formatter().format_datetime(expense.expense_date)
+        if column == 2:
+            return format_money(expense.amount, expense.currency)
+        if column == 3:
+            return self._names.get(expense.category, '')
+        return expense.comment
+
+    def headerData(  # pylint: disable=invalid-name
+            self, section: int, orientation: Qt.Orientation,
+            role: int = Qt.DisplayRole) -> Any:  # type: ignore[assignment]
+        """
+        Заголовки столбцов.
+        """
+        if orientation == Qt.Orientation.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+
+class PkListModel(QAbstractListModel):
+    """
+    Модель списка pk для поля выбора.
+
+    Хранит только числа, строки для Qt создаются в data() по запросу,
+    т. е. лишь для тех строк, которые действительно показываются.
+    pk упорядочены как строки, чтобы QCompleter мог искать совпадения
+    по началу двоичным поиском, не перебирая всю модель.
+    """
+
+    def __init__(self, parent: Optional[PySide6.QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+        self._pks: list[int] = []
+
+    def rowCount(  # pylint: disable=invalid-name
+            self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        """
+        Число строк модели.
+        """
+        return 0 if parent.isValid() else len(self._pks)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex,
+             role: int = Qt.DisplayRole) -> Any:  # type: ignore[assignment]
+        """
+        Текст строки модели.
+        """
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return str(self._pks[index.row()])
+        return None
+
+    def update_pks(self, added: Iterable[int], removed: Iterable[int]) -> None:
+        """
+        Добавить в модель pk added и убрать из неё pk removed. Модели
+        сообщается только о добавленных и удалённых строках, поэтому после
+        единичной правки обновляется одна строка, а не весь список.
+        """
+        added = set(added)
+        removed = set(removed) - added
+        if len(removed) + len(added) > len(self._pks) // 2:
+            self.beginResetModel()
+            self._pks = sorted((set(self._pks) - removed) | added, key=str)
+            self.endResetModel()
+            return
+        for pk in removed:
+            row = bisect_left(self._pks, str(pk), key=str)
+            if row < len(self._pks) and self._pks[row] == pk:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._pks[row]
+                self.endRemoveRows()
+        for pk in added:
+            row = bisect_left(self._pks, str(pk), key=str)
+            if row == len(self._pks) or self._pks[row] != pk:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._pks.insert(row, pk)
+                self.endInsertRows()
+
+
+class TabReports(QWidget):
+    """
+    Вкладка отчётов по расходам: суммы, число и средние расходов,
+    сгруппированные по одному или двум измерениям. Суммы в разных валютах
+    не складываются: отчёт всегда группируется и по валюте.
+    """
+    DIMENSION_TITLES = {
+        DIM_CATEGORY: 'Категория',
+        DIM_SUBTREE: 'Раздел',
+        DIM_DAY: 'День',
+        DIM_WEEK: 'Неделя',
+        DIM_MONTH: 'Месяц',
+        DIM_YEAR: 'Год',
+        DIM_COMMENT: 'Комментарий',
+        DIM_CURRENCY: 'Валюта',
+    }
+    AGGREGATES = (AGG_SUM, AGG_COUNT, AGG_AVG)
+    AGGREGATE_TITLES = ['Сумма', 'Число', 'Среднее']
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self._layout = QGridLayout()
+        self.setLayout(self._layout)
+        self.picker_dimensions = [QComboBox(), QComboBox()]
+        self.picker_dimensions[1].addItem('—', None)
+        for picker in self.picker_dimensions:
+            for dimension, title in self.DIMENSION_TITLES.items():
+                picker.addItem(title, dimension)
+        self.input_limit = NaturalNumberLineEdit(initial_value='')
+        self.input_limit.setPlaceholderText('Первые N по сумме')
+        button_run = QPushButton('Построить')
+        button_run.clicked.connect(self.button_run_on_click)
+        self._layout.addWidget(QLabel('Группировать по:'), 0, 0, 1, 1)
+        self._layout.addWidget(self.picker_dimensions[0], 0, 1, 1, 1)
+        self._layout.addWidget(self.picker_dimensions[1], 0, 2, 1, 1)
+        self._layout.addWidget(self.input_limit, 0, 3, 1, 1)
+        self._layout.addWidget(button_run, 0, 4, 1, 1)
+
+        self.table_report = QTableWidget(0, 0)
+        self.table_report.verticalHeader().setVisible(False)
+        self._layout.addWidget(self.table_report, 1, 0, 1, 5)
+
+        self.main_window = MainWindow.instance()
+        self.main_window.signal_report_updated.connect(self.update_table_report)
+
+    def button_run_on_click(self) -> None:
+        """
+        Обработчика нажатия на соответствующую кнопку.
+        """
+        group_by = tuple(picker.currentData() for picker in self.picker_dimensions
+                         if picker.currentData() is not None)
+        limit = self.input_limit.text()
+        self.main_window.signal_report_requested.emit(ReportQuery(
+            group_by=tuple(dict.fromkeys((*group_by, DIM_CURRENCY))),
+            aggregates=self.AGGREGATES,
+            order_by=AGG_SUM if limit else None,
+            limit=int(limit) if limit else None,
+        ))
+
+    def update_table_report(self, query: ReportQuery, rows: Iterable[Row],
+                            categories: list[Category]) -> None:
+        """
+        query - запрос отчёта
+        rows - строки отчёта, добавляются в таблицу по мере чтения
+        categories - список категорий расходов
+        """
+        names = {category.pk: category.name for category in categories}
+        titles = ([self.DIMENSION_TITLES[dimension] for dimension in query.group_by]
+                  + self.AGGREGATE_TITLES)
+        self.table_report.setRowCount(0)
+        self.table_report.setColumnCount(len(titles))
+        self.table_report.setHorizontalHeaderLabels(titles)
+        self.table_report.horizontalHeader().setSectionResizeMode(
+            QHeaderView.Stretch)  # type: ignore[attr-defined]
+        for i, row in enumerate(rows):
+            self.table_report.insertRow(i)
+            for j, value in enumerate(row):
+                if j < len(query.group_by) and query.group_by[j] in (
+                        DIM_CATEGORY, DIM_SUBTREE):
+                    text = names.get(value, str(value)).capitalize()
+                elif isinstance(value, float):
+                    text = f'{value:.2f}'
+                else:
+                    text = str(value)
+                self.table_report.setItem(i, j, QTableWidgetItem(text))
+
+
+class PkPicker(QLineEdit):
+    """
+    Поле выбора pk: ввод номера с автодополнением по модели PkListModel.
+    В отличие от QComboBox не создаёт пункт меню на каждый pk.
+    """
+
+    def __init__(self, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.pk_model = PkListModel(self)
+        completer = QCompleter(self.pk_model, self)
+        completer.setModelSorting(
+            QCompleter.CaseSensitivelySortedModel)  # type: ignore[attr-defined]
+        completer.setMaxVisibleItems(10)
+        self.setCompleter(completer)
+        validator = QIntValidator()
+        validator.setBottom(1)
+        self.setValidator(validator)
+
+    def update_pks(self, added: Iterable[int], removed: Iterable[int]) -> None:
+        """
+        Обновляет набор pk, доступных для выбора: добавляет added
+        и убирает removed.
+        """
+        self.pk_model.update_pks(added, removed)
+
+    def currentText(self) -> str:  # pylint: disable=invalid-name
+        """
+        Выбранный pk в виде строки (как у QComboBox).
+        """
+        return self.text()
+
+
+class MoneyInput(QWidget):
+    """
+    Поле ввода суммы с выбором валюты. Сумма вводится в единицах валюты
+    с не более чем settings.AMOUNT_MINOR_DIGITS знаками дробной части
+    и возвращается целым числом минимальных единиц.
+    """
+
+    def __init__(self, parent: QWidget | None = None, initial_value: str = '1') -> None:
+        super().__init__(parent)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+        digits = settings.AMOUNT_MINOR_DIGITS
+        pattern = r'\d+' if digits == 0 else rf'\d+([.,]\d{{0,{digits}}})?'
+        self.input_amount = QLineEdit(initial_value)
+        self.input_amount.setValidator(
+            QRegularExpressionValidator(QRegularExpression(pattern)))
+        self.combo_box_currency = QComboBox()
+        self.combo_box_currency.addItems(settings.CURRENCIES)
+        layout.addWidget(self.input_amount, 1)
+        layout.addWidget(self.combo_box_currency)
+
+    def amount(self) -> int:
+        """
+        Введённая сумма в минимальных единицах валюты.
+        """
+        value = Decimal(self.input_amount.text().replace(',', '.') or '0')
+        return int(value.scaleb(settings.AMOUNT_MINOR_DIGITS))
+
+    def currency(self) -> str:
+        """
+        Выбранная валюта.
+        """
+        return self.combo_box_currency.currentText()
 
 
 class NaturalNumberLineEdit(QLineEdit):
@@ -669,3 +1079,19 @@ class NaturalNumberLineEdit(QLineEdit):
         self.setValidator(validator)
         if self.is_natural(initial_value):
             self.setText(str(initial_value))
+
+
+def connect_pickers(pickers: dict[type, tuple[PkPicker, ...]]) -> None:
+    """
+    Подключить поля выбора pk к изменениям наборов pk записей
+    (MainWindow.signal_pks_changed): pickers - поля выбора pk записей
+    каждой модели. Изменения применяются сразу, а не при показе вкладки:
+    планировщик обновлений хранит только последний вызов слота, а ни одно
+    изменение набора pk пропускать нельзя. Стоимость обновления зависит
+    от числа изменённых записей, а не от числа всех записей.
+    """
+    def update(model: type, added: list[int], removed: list[int]) -> None:
+        for picker in pickers.get(model, ()):
+            picker.update_pks(added, removed)
+
+    MainWindow.instance().signal_pks_changed.connect(update)
@@ -1,9 +1,14 @@
 import sys
-from typing import Callable
+from typing import Callable, Iterable
 
+from PySide6.QtCore import QTimer
+
+from bookkeeper import settings
 from bookkeeper.models.budget import Budget
 from bookkeeper.models.category import Category
 from bookkeeper.models.expense import Expense
+from bookkeeper.models.forecast import BudgetForecast
+from bookkeeper.reports.abstract_report import ReportQuery, Row
 from bookkeeper.view.abstract_view import AbstractView
 from bookkeeper.view.qtgui.gui import Application, MainWindow
 
@@ -15,6 +20,8 @@ class QtGUIView(AbstractView):
     def __init__(self):
         self.application = Application(sys.argv)
         self.main_window = MainWindow.instance()
+        self.poll_timer = QTimer()
+        self.poll_timer.setInterval(settings.CHANGES_POLL_INTERVAL_MS)
 
     def update_data_in_view(
             self,
@@ -46,6 +53,27 @@ class QtGUIView(AbstractView):
             self, budgets_sums: list[int], expenses_sums: list[int]) -> None:
         self.main_window.signal_budget_analysis_updated.emit(budgets_sums, expenses_sums)
 
+    def show_pk_changes(self, model: type, added: list[int], removed: list[int]) -> None:
+        self.main_window.signal_pks_changed.emit(model, added, removed)
+
+    def show_budget_forecast(self, forecasts: list[BudgetForecast],
+                             categories: list[Category]) -> None:
+        self.main_window.signal_budget_forecast_updated.emit(forecasts, categories)
+
+    def show_search_results(
+            self,
+            expenses: list[Expense],
+            categories: list[Category],
+            page: int,
+            has_more: bool,
+    ) -> None:
+        self.main_window.signal_search_results_updated.emit(
+            expenses, categories, page, has_more)
+
+    def show_report(self, query: ReportQuery, rows: Iterable[Row],
+                    categories: list[Category]) -> None:
+        self.main_window.signal_report_updated.emit(query, rows, categories)
+
     def add_handler_expense_create(self, handler: Callable[[Expense], None]) -> None:
         self.main_window.signal_expense_creation_requested.connect(handler)
 
@@ -55,6 +83,9 @@ class QtGUIView(AbstractView):
     def add_handler_expense_delete(self, handler: Callable[[int], None]) -> None:
         self.main_window.signal_expense_deletion_requested.connect(handler)
 
+    def add_handler_expense_search(self, handler: Callable[[str, int], None]) -> None:
+        self.main_window.signal_expense_search_requested.connect(handler)
+
     def add_handler_budget_create(self, handler: Callable[[Budget], None]) -> None:
         self.main_window.signal_budget_creation_requested.connect(handler)
 
@@ -70,7 +101,22 @@ class QtGUIView(AbstractView):
     def add_handler_category_update(self, handler: Callable[[Category], None]) -> None:
         self.main_window.signal_category_update_requested.connect(handler)
 
-    def add_handler_category_delete(self, handler: Callable[[int], None]) -> None:
+    def add_handler_category_delete(self,
+                                    handler: Callable[[int, bool], None]) -> None:
         self.main_window.signal_category_deletion_requested.connect(handler)
 
+    def add_handler_category_merge(self, handler: Callable[[int, int], None]) -> None:
+        self.main_window.signal_category_merge_requested.connect(handler)
+
+    def add_handler_report(self, handler: Callable[[ReportQuery], None]) -> None:
+        self.main_window.signal_report_requested.connect(handler)
+
+    def add_handler_undo(self, handler: Callable[[], None]) -> None:
+        self.main_window.signal_undo_requested.connect(handler)
+
+    def add_handler_redo(self, handler: Callable[[], None]) -> None:
+        self.main_window.signal_redo_requested.connect(handler)
 
+    def add_handler_poll_changes(self, handler: Callable[[], None]) -> None:
+        self.poll_timer.timeout.connect(handler)
+        self.poll_timer.start()
@@ -0,0 +1,53 @@
+"""
+Модуль описывает планировщик обновления вкладок.
+
+Представление получает новые данные сразу для всех вкладок, но видна
+только одна из них. Обновления видимой вкладки выполняются сразу,
+а обновления скрытых откладываются: вкладка помечается устаревшей
+(dirty), и при её показе каждый отложенный слот вызывается один раз,
+с последними переданными данными. Поэтому правка расхода перестраивает
+таблицы и списки выбора только той вкладки, на которую смотрит
+пользователь.
+"""
+
+from typing import Any, Callable, Hashable
+
+
+class RefreshScheduler:
+    """
+    Планировщик обновления вкладок.
+    Какая вкладка видна, сообщает функция current (см. set_current);
+    пока она не задана, все обновления выполняются сразу.
+    """
+
+    def __init__(self) -> None:
+        self._current: Callable[[], Any] | None = None
+        # Отложенные вызовы слотов по вкладкам: вкладка -> {слот: аргументы}
+        self._pending: dict[Hashable, dict[Callable[..., Any], tuple[Any, ...]]] = {}
+
+    def set_current(self, current: Callable[[], Any]) -> None:
+        """ Задать функцию, возвращающую видимую вкладку """
+        self._current = current
+
+    def slot(self, tab: Hashable, slot: Callable[..., Any]) -> Callable[..., None]:
+        """
+        Обернуть слот slot вкладки tab: обёртку нужно подключить к сигналу
+        вместо самого слота.
+        """
+        def deferred(*args: Any) -> None:
+            if self._current is None or self._current() is tab:
+                slot(*args)
+            else:
+                self._pending.setdefault(tab, {})[slot] = args
+        return deferred
+
+    def is_dirty(self, tab: Hashable) -> bool:
+        """ Есть ли у вкладки отложенные обновления """
+        return tab in self._pending
+
+    def show(self, tab: Hashable) -> None:
+        """
+        Вкладка tab стала видимой: выполнить её отложенные обновления.
+        """
+        for slot, args in self._pending.pop(tab, {}).items():
+            slot(*args)
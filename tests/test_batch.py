@@ -0,0 +1,99 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from bookkeeper.batch import CommandExecutor
+from bookkeeper.dedup.memory_index import MemoryDuplicateIndex
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+@pytest.fixture
+def executor():
+    categories = MemoryRepository[Category]()
+    categories.add(Category('продукты'))
+    categories.add(Category('сырое мясо', 1))
+    return CommandExecutor(MemoryRepository[Budget](), categories,
+                           MemoryRepository[Expense](), io.StringIO(), batch_size=2)
+
+
+def test_batch(executor):
+    summary = executor.execute_all(
+        ['100 продукты\n', '\n', '20 сырое мясо\n', '5 машина\n', 'сто продукты\n',
+         '7 продукты\n'])
+    assert [(e.amount, e.category) for e in executor.expenses.get_all()] == [
+        (100, 1), (20, 2), (7, 1)]
+    assert (summary.lines, summary.added, summary.total) == (5, 3, 127)
+    assert summary.unknown_categories == {'машина': 1}
+    assert summary.errors == [5]
+    assert executor.output.getvalue() == ''
+    assert str(summary).splitlines()[0] == 'строк: 5, добавлено расходов: 3 на сумму 127'
+
+
+def test_list_command_flushes_buffer(executor):
+    executor.execute('100 продукты')
+    assert executor.expenses.get_all() == []
+    executor.execute('расходы')
+    assert 'amount=100' in executor.output.getvalue()
+
+
+def test_interactive(executor):
+    executor.batch_size = 1
+    executor.execute('100 продукты')
+    executor.execute('5 машина')
+    lines = executor.output.getvalue().splitlines()
+    assert lines[0].startswith('Expense(amount=100')
+    assert lines[1] == 'категория машина не найдена'
+
+
+def test_dates_and_comments(executor):
+    executor.execute_all(['2024-03-01T12:30 100 сырое мясо; Рынок '])
+    [expense] = executor.expenses.get_all()
+    assert (expense.expense_date, expense.category, expense.comment) == (
+        datetime(2024, 3, 1, 12, 30), 2, 'Рынок')
+
+
+def test_overlapping_imports_skip_duplicates(executor):
+    executor.duplicates = MemoryDuplicateIndex()
+    executor.tolerance = timedelta(minutes=5)
+    executor.execute_all(['2024-03-01 100 продукты', '2024-03-01 100 продукты',
+                          '2024-03-02T10:00 50 продукты; хлеб'])
+    assert executor.summary.added == 3
+    summary = executor.execute_all(['2024-03-02T10:00 50 продукты; Хлеб',
+                                    '2024-03-02T10:03 50 продукты; хлеб',
+                                    '2024-03-03 70 продукты'])
+    assert summary.duplicates == 1
+    assert summary.near_duplicates == [2]
+    assert summary.added == 5
+
+
+def test_deleted_expenses_can_be_imported_again(executor):
+    executor.duplicates = MemoryDuplicateIndex()
+    lines = ['2024-03-01 100 продукты', '2024-03-02 50 продукты']
+    executor.execute_all(lines)
+    executor.expenses.delete(1)
+    summary = executor.execute_all(lines)
+    assert (summary.duplicates, summary.added) == (1, 3)
+    assert [e.amount for e in executor.expenses.get_all()] == [50, 100]
+
+
+def test_undated_lines_are_not_checked(executor):
+    executor.duplicates = MemoryDuplicateIndex()
+    executor.execute_all(['100 продукты', '2024-03-01 100 продукты'])
+    summary = executor.execute_all(['100 продукты', '2024-03-01 100 продукты'])
+    assert (summary.undated, summary.duplicates, summary.added) == (2, 1, 3)
+    assert 'без даты' in str(summary)
+
+
+def test_interactive_mode_updates_index():
+    categories = MemoryRepository[Category]()
+    categories.add(Category('продукты'))
+    executor = CommandExecutor(MemoryRepository[Budget](), categories,
+                               MemoryRepository[Expense](), io.StringIO(),
+                               batch_size=1, duplicates=MemoryDuplicateIndex())
+    executor.execute('2024-03-01 100 продукты')
+    executor.execute('2024-03-01 100 продукты')
+    assert (executor.summary.added, executor.summary.duplicates) == (1, 1)
@@ -0,0 +1,43 @@
+import random
+
+import numpy as np
+import pytest
+
+from bookkeeper.dedup.bloom import BloomFilter
+
+
+@pytest.fixture
+def keys():
+    rng = random.Random(0)
+    return [rng.getrandbits(64) - (1 << 63) for _ in range(2000)]
+
+
+def test_no_false_negatives(keys):
+    bloom = BloomFilter(len(keys))
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+def test_add_many_matches_add(keys):
+    one_by_one = BloomFilter(len(keys))
+    for key in keys:
+        one_by_one.add(key)
+    bulk = BloomFilter(len(keys))
+    bulk.add_many(np.array(keys, np.int64))
+    assert bulk._bits == one_by_one._bits
+
+
+def test_false_positive_rate(keys):
+    bloom = BloomFilter(len(keys), error_rate=0.01)
+    bloom.add_many(keys)
+    rng = random.Random(1)
+    others = [rng.getrandbits(64) - (1 << 63) for _ in range(20000)]
+    assert sum(key in bloom for key in others) / len(others) < 0.02
+
+
+def test_validation():
+    with pytest.raises(ValueError):
+        BloomFilter(0)
+    with pytest.raises(ValueError):
+        BloomFilter(10, error_rate=1)
@@ -0,0 +1,146 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from bookkeeper.dedup.abstract_index import expense_keys
+from bookkeeper.dedup.memory_index import MemoryDuplicateIndex
+from bookkeeper.dedup.sqlite_index import SQLiteDuplicateIndex
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.change_feed import ChangeLog
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+DAY = datetime(2024, 3, 1, 12)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def index(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryDuplicateIndex(capacity=4)
+        return
+    index = SQLiteDuplicateIndex(tmp_path / 'test.sqlite3', capacity=4)
+    yield index
+    index.close()
+
+
+def test_canonical_keys():
+    first = Expense(100, 1, DAY, comment='Рынок,  мясо ')
+    assert expense_keys(first) == expense_keys(
+        Expense(100, 1, DAY, DAY + timedelta(days=1), comment='рынок, мясо'))
+    assert expense_keys(first)[0] != expense_keys(Expense(100, 1, DAY, currency='USD'))[0]
+
+
+def test_duplicate(index):
+    index.add(Expense(100, 1, DAY, comment='Рынок', pk=1))
+    assert index.is_duplicate(Expense(100, 1, DAY, comment='рынок'))
+    assert not index.is_duplicate(Expense(100, 2, DAY, comment='рынок'))
+    assert not index.is_duplicate(Expense(100, 1, DAY + timedelta(seconds=1)))
+    index.remove(1)
+    assert not index.is_duplicate(Expense(100, 1, DAY, comment='рынок'))
+    assert len(index) == 0
+    with pytest.raises(ValueError):
+        index.add(Expense(100, 1, DAY))
+
+
+def test_same_keys_different_pks(index):
+    index.add_many([Expense(100, 1, DAY, pk=1), Expense(100, 1, DAY, pk=2)])
+    index.remove(1)
+    assert index.is_duplicate(Expense(100, 1, DAY))
+    assert index.is_near_duplicate(Expense(100, 1, DAY), timedelta(0))
+    index.add(Expense(200, 1, DAY, pk=2))
+    assert not index.is_duplicate(Expense(100, 1, DAY))
+    assert len(index) == 1
+
+
+def test_near_duplicate(index):
+    index.add(Expense(100, 1, DAY, pk=1))
+    tolerance = timedelta(minutes=5)
+    assert index.is_near_duplicate(Expense(100, 1, DAY + tolerance), tolerance)
+    assert index.is_near_duplicate(Expense(100, 1, DAY - tolerance), tolerance)
+    assert not index.is_near_duplicate(
+        Expense(100, 1, DAY + tolerance + timedelta(seconds=1)), tolerance)
+    assert not index.is_near_duplicate(Expense(101, 1, DAY), tolerance)
+
+
+def test_filters_grow(index):
+    expenses = [Expense(i, 1, DAY, pk=i + 1) for i in range(100)]
+    index.add_many(expenses)
+    index.add_many(expenses[:10])
+    assert len(index) == 100
+    assert index.capacity >= 100
+    assert all(map(index.is_duplicate, expenses))
+
+
+def test_sync_follows_repository(index):
+    repo = MemoryRepository[Expense]()
+    repo.add_many([Expense(100, 1, DAY), Expense(200, 1, DAY), Expense(300, 1, DAY)])
+    assert index.sync(repo) == 3
+    repo.delete(1)
+    repo.update(Expense(250, 1, DAY, pk=2))
+    repo.add(Expense(400, 1, DAY))
+    repo.delete(4)
+    assert index.sync(repo) == 4
+    assert index.version == repo.version
+    assert [index.is_duplicate(Expense(amount, 1, DAY))
+            for amount in (100, 200, 250, 300, 400)] == [False, False, True, True, False]
+    assert len(index) == 2
+    assert index.sync(repo) == 0
+
+
+def test_sync_rebuilds_after_gap(index):
+    repo = MemoryRepository[Expense]()
+    repo._change_log = ChangeLog(max_size=2)
+    index.add(Expense(1, 1, DAY, pk=99))
+    repo.add_many([Expense(i, 1, DAY) for i in range(5)])
+    assert index.sync(repo) == 5
+    assert len(index) == 5
+    assert not index.is_duplicate(Expense(1, 1, DAY + timedelta(days=1)))
+    assert index.version == repo.version
+
+
+def test_persistent_with_repository(tmp_path):
+    db_file = tmp_path / 'test.sqlite3'
+    repo = SQLiteRepository(db_file, Expense)
+    repo.add(Expense(100, 1, DAY))
+    index = SQLiteDuplicateIndex(db_file)
+    index.sync(repo)
+    index.close()
+    repo.add(Expense(200, 1, DAY))
+    repo.delete(1)
+    index = SQLiteDuplicateIndex(db_file)
+    assert len(index) == 1
+    assert index.is_duplicate(Expense(100, 1, DAY))
+    assert index.sync(repo) == 2
+    assert not index.is_duplicate(Expense(100, 1, DAY))
+    assert index.is_duplicate(Expense(200, 1, DAY))
+    index.close()
+    repo.close()
+
+
+def test_old_table_is_replaced(tmp_path):
+    db_file = tmp_path / 'test.sqlite3'
+    with sqlite3.connect(db_file) as connection:
+        connection.execute('CREATE TABLE expense_duplicates (exact INTEGER PRIMARY KEY, '
+                           'near INTEGER NOT NULL, at INTEGER NOT NULL)')
+        connection.execute('INSERT INTO expense_duplicates VALUES (1, 2, 3)')
+    connection.close()
+    index = SQLiteDuplicateIndex(db_file)
+    assert (len(index), index.version) == (0, 0)
+    index.close()
+
+
+def test_new_expenses_skip_index():
+    index = MemoryDuplicateIndex()
+    history = [Expense(i % 1000, i % 20, DAY + timedelta(minutes=i), pk=i + 1)
+               for i in range(200_000)]
+    index.add_many(history)
+    imported = [Expense(i % 1000, i % 20, DAY + timedelta(minutes=i, seconds=30))
+                for i in range(20_000)]
+    started = time.perf_counter()
+    duplicates = sum(map(index.is_duplicate, imported))
+    per_row = (time.perf_counter() - started) / len(imported)
+    print(f'\n{per_row * 1e6:.1f} us per imported row against {len(index)} rows')
+    assert duplicates == 0
+    assert index.stats.lookups < 0.05 * len(imported)
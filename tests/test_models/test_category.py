@@ -106,3 +106,22 @@ def test_create_from_tree_error(repo):
     tree = [('1', 'parent'), ('parent', None)]
     with pytest.raises(KeyError):
         Category.create_from_tree(tree, repo)
+
+
+def test_create_from_paths(repo):
+    paths = [('еда',), ('еда', 'прочее'), ('одежда',), ('одежда', 'прочее'),
+             ('еда', 'прочее', 'соль'), ('еда',)]
+    index = Category.create_from_paths(paths, repo, batch_size=2)
+    assert len(repo.get_all()) == len(index) == 5
+    for path, cat in index.items():
+        assert repo.get(cat.pk) is cat
+        assert cat.name == path[-1]
+        if len(path) > 1:
+            assert cat.parent == index[path[:-1]].pk
+        else:
+            assert cat.parent is None
+
+
+def test_create_from_paths_error(repo):
+    with pytest.raises(KeyError):
+        Category.create_from_paths([('еда', 'соль')], repo)
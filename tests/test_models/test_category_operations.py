@@ -0,0 +1,106 @@
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_operations import (
+    delete_category, merge_categories, move_category, subtree)
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def repos(request, tmp_path):
+    if request.param == 'memory':
+        yield (MemoryRepository[Category](), MemoryRepository[Expense](),
+               MemoryRepository[Budget]())
+        return
+    db_file = tmp_path / 'test.sqlite3'
+    with SQLiteRepository(db_file, Category) as cats, \
+            SQLiteRepository(db_file, Expense) as expenses, \
+            SQLiteRepository(db_file, Budget) as budgets:
+        yield cats, expenses, budgets
+
+
+@pytest.fixture
+def tree(repos):
+    """
+    1 продукты
+        2 мясо
+            3 сырое мясо
+        4 сладости
+    5 книги
+    """
+    cats, expenses, budgets = repos
+    cats.add_many([Category('продукты'), Category('мясо', 1),
+                   Category('сырое мясо', 2), Category('сладости', 1),
+                   Category('книги')])
+    expenses.add_many([Expense(i, 1 + i % 5) for i in range(20)])
+    budgets.add_many([Budget('день', 3, 100), Budget('день', 5, 200)])
+    return cats, [(expenses, 'category'), (budgets, 'category')]
+
+
+def test_subtree(tree):
+    cats, _ = tree
+    assert subtree(1, cats) == {1, 2, 3, 4}
+    assert subtree(2, cats) == {2, 3}
+    assert subtree(5, cats) == {5}
+    with pytest.raises(KeyError):
+        subtree(10, cats)
+
+
+def test_delete_cascade(tree):
+    cats, dependents = tree
+    (expenses, _), (budgets, _) = dependents
+    delete_category(2, cats, dependents)
+    assert [c.pk for c in cats.get_all()] == [1, 4, 5]
+    assert {e.category for e in expenses.get_all()} == {1, 4, 5}
+    assert len(expenses.get_all()) == 12
+    assert [b.category for b in budgets.get_all()] == [5]
+
+
+def test_delete_reassign(tree):
+    cats, dependents = tree
+    (expenses, _), (budgets, _) = dependents
+    delete_category(2, cats, dependents, reassign_to=1)
+    assert [c.pk for c in cats.get_all()] == [1, 3, 4, 5]
+    assert cats.get(3).parent == 1
+    assert len(expenses.get_all(where={'category': 1})) == 8
+    assert {b.category for b in budgets.get_all()} == {3, 5}
+
+
+def test_merge(tree):
+    cats, dependents = tree
+    (expenses, _), _ = dependents
+    merge_categories(1, 5, cats, dependents)
+    assert [c.pk for c in cats.get_all(where={'parent': 5})] == [2, 4]
+    assert cats.get(1) is None
+    assert len(expenses.get_all(where={'category': 5})) == 8
+
+
+@pytest.mark.parametrize('target', [1, 3])
+def test_merge_into_own_subtree(tree, target):
+    cats, dependents = tree
+    with pytest.raises(ValueError):
+        merge_categories(1, target, cats, dependents)
+    assert len(cats.get_all()) == 5
+
+
+def test_merge_missing(tree):
+    cats, dependents = tree
+    with pytest.raises(KeyError):
+        merge_categories(1, 10, cats, dependents)
+    with pytest.raises(KeyError):
+        merge_categories(10, 1, cats, dependents)
+
+
+def test_move(tree):
+    cats, _ = tree
+    move_category(2, 5, cats)
+    assert subtree(5, cats) == {5, 2, 3}
+    move_category(2, None, cats)
+    assert cats.get(2).parent is None
+    with pytest.raises(ValueError):
+        move_category(1, 4, cats)
+    with pytest.raises(KeyError):
+        move_category(1, 10, cats)
@@ -0,0 +1,107 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.models.forecast import BudgetForecast, SpendForecast, period_bounds
+from bookkeeper.models.money import FxRates
+from bookkeeper.models.recurring_expense import RecurringExpense
+
+# Среда
+TODAY = date(2024, 5, 15)
+
+
+def at(day):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+
+
+@pytest.fixture
+def categories():
+    return [Category('продукты', pk=1), Category('мясо', 1, pk=2),
+            Category('книги', pk=3)]
+
+
+def test_period_bounds():
+    assert period_bounds('день', TODAY) == (TODAY, date(2024, 5, 16))
+    assert period_bounds('неделя', TODAY) == (date(2024, 5, 13), date(2024, 5, 20))
+    assert period_bounds('месяц', TODAY) == (date(2024, 5, 1), date(2024, 6, 1))
+    assert period_bounds('месяц', date(2024, 12, 31)) == (
+        date(2024, 12, 1), date(2025, 1, 1))
+    assert period_bounds('год', TODAY) == (date(2024, 1, 1), date(2025, 1, 1))
+    with pytest.raises(ValueError):
+        period_bounds('век', TODAY)
+
+
+def test_series(categories):
+    expenses = [Expense(100, 1, at(TODAY)), Expense(50, 1, at(TODAY)),
+                Expense(70, 3, at(TODAY - timedelta(days=2))),
+                Expense(10, 9, at(TODAY)),
+                Expense(1000, 1, at(TODAY + timedelta(days=1)))]
+    forecast = SpendForecast(expenses, categories, TODAY, window=7)
+    assert forecast.series.shape == (3, 7)
+    assert forecast.first_day == TODAY - timedelta(days=6)
+    assert forecast.series[0, -1] == 150
+    assert forecast.series[2, -3] == 70
+    assert forecast.series.sum() == 220
+
+
+def test_constant_spending(categories):
+    expenses = [Expense(100, 2, at(TODAY - timedelta(days=i))) for i in range(60)]
+    forecast = SpendForecast(expenses, categories, TODAY)
+    assert np.allclose(forecast.daily(TODAY, TODAY + timedelta(days=3))[1], 100)
+    day, week, month = forecast.forecast_budgets([
+        Budget('день', 1, 100), Budget('неделя', 1, 500), Budget('месяц', 2, 5000)])
+    assert (day.spent, day.projected, day.exceeded) == (100, 100, False)
+    assert (week.spent, week.projected, week.exceeded) == (300, 700, True)
+    assert (month.spent, month.projected) == (1500, 3100)
+
+
+def test_currencies(categories):
+    rates = FxRates()
+    rates.add('USD', TODAY - timedelta(days=100), 90)
+    rates.add('USD', TODAY - timedelta(days=1), 100)
+    expenses = [Expense(3, 1, at(TODAY - timedelta(days=2)), currency='USD'),
+                Expense(2, 1, at(TODAY), currency='USD'),
+                Expense(30, 1, at(TODAY))]
+    forecast = SpendForecast(expenses, categories, TODAY, window=7, rates=rates)
+    assert forecast.series[0, -3:].tolist() == [270, 0, 230]
+    [rub, usd] = forecast.forecast_budgets([Budget('день', 1, 500),
+                                            Budget('день', 1, 5, 'USD')])
+    assert (rub.spent, rub.projected, rub.exceeded) == (230, 230, False)
+    assert (usd.spent, usd.projected, usd.exceeded) == (2, 2, False)
+    subscription = RecurringExpense(1, 3, 'день', start_date=at(TODAY), currency='USD')
+    [books] = forecast.forecast_budgets([Budget('неделя', 3, 1000)], [subscription])
+    assert (books.spent, books.projected) == (100, 500)
+
+
+def test_weekly_seasonality(categories):
+    # Расходы только по субботам
+    saturdays = [TODAY - timedelta(days=4 + 7 * i) for i in range(20)]
+    forecast = SpendForecast([Expense(700, 3, at(day)) for day in saturdays],
+                             categories, TODAY)
+    week = forecast.daily(date(2024, 5, 13), date(2024, 5, 20))[2]
+    assert np.allclose(week[:5], 0)
+    assert week[5] == pytest.approx(700, rel=0.05)
+    [budget] = forecast.forecast_budgets([Budget('неделя', 3, 600)])
+    assert budget.spent == 0
+    assert budget.projected == pytest.approx(700, rel=0.05)
+    assert budget.exceeded
+
+
+def test_recurring_and_empty(categories):
+    forecast = SpendForecast([], categories, TODAY)
+    rent = RecurringExpense(30000, 2, 'месяц', start_date=datetime(2024, 1, 20))
+    fee = RecurringExpense(500, 3, 'месяц', start_date=datetime(2024, 1, 2))
+    [budget] = forecast.forecast_budgets([Budget('месяц', 1, 20000)], [rent, fee])
+    assert (budget.spent, budget.projected) == (0, 30000)
+    assert SpendForecast([], [], TODAY).forecast_budgets([Budget('день', 1, 1)]) == [
+        BudgetForecast(Budget('день', 1, 1), 0, 0)]
+
+
+def test_unknown_period_is_skipped(categories):
+    forecast = SpendForecast([Expense(100, 1, at(TODAY))], categories, TODAY)
+    [day] = forecast.forecast_budgets([Budget('День', 1, 10), Budget('день', 1, 500)])
+    assert (day.budget.amount, day.spent) == (500, 100)
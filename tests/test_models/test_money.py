@@ -0,0 +1,84 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+from fractions import Fraction
+
+import pytest
+
+from bookkeeper.models.money import FxRates, Money
+
+
+@pytest.fixture
+def rates():
+    rates = FxRates()
+    rates.add('USD', date(2024, 1, 1), '90.5')
+    rates.add('USD', date(2024, 2, 1), 92)
+    rates.add('EUR', date(2024, 1, 1), '99.25')
+    return rates
+
+
+def test_money():
+    assert Money(150) + Money(50) == Money(200, 'RUB')
+    assert Money(5, 'USD') - Money(7, 'USD') == -Money(2, 'USD')
+    with pytest.raises(ValueError):
+        Money(1) + Money(1, 'USD')
+
+
+def test_rate_lookup(rates):
+    assert rates.rate('RUB', date(1900, 1, 1)) == 1
+    assert rates.rate('USD', date(2024, 1, 31)) == Fraction('90.5')
+    assert rates.rate('USD', date(2024, 2, 1)) == 92
+    assert rates.rate('USD', datetime(2030, 1, 1, 12)) == 92
+    with pytest.raises(KeyError):
+        rates.rate('USD', date(2023, 12, 31))
+    with pytest.raises(KeyError):
+        rates.rate('GBP', date(2024, 1, 1))
+    rates.add('USD', date(2024, 2, 1), 93)
+    assert rates.cross_rate('USD', 'RUB', date(2024, 3, 1)) == 93
+    assert rates.currencies() == ['RUB', 'EUR', 'USD']
+    with pytest.raises(ValueError):
+        rates.add('RUB', date(2024, 1, 1), 1)
+    with pytest.raises(ValueError):
+        rates.add('USD', date(2024, 1, 1), 0)
+
+
+def test_convert(rates):
+    day = date(2024, 1, 10)
+    assert rates.convert(Money(200, 'USD'), 'RUB', day) == Money(18100)
+    assert rates.convert(Money(9925), 'EUR', day) == Money(100, 'EUR')
+    assert rates.convert(Money(100, 'EUR'), 'USD', day) == Money(110, 'USD')
+    assert rates.convert(Money(7), 'RUB', day) == Money(7)
+
+
+def test_total(rates):
+    amounts = [(100, 'RUB', date(2024, 1, 5)), (1, 'USD', date(2024, 1, 5)),
+               (1, 'USD', date(2024, 1, 6)), (1, 'USD', date(2024, 2, 6)),
+               (2, 'EUR', datetime(2024, 3, 1, 10))]
+    assert rates.total(amounts) == Money(100 + 181 + 92 + 199)
+    assert rates.total([(905, 'RUB', date(2024, 1, 5)), (920, 'RUB', date(2024, 2, 5)),
+                        (3, 'USD', date(2024, 2, 5))], 'USD') == Money(23, 'USD')
+    assert rates.total([]) == Money(0)
+
+
+def test_total_is_cheaper_than_converting_each_amount(rates):
+    random.seed(1)
+    start = date(2019, 1, 1)
+    for currency in ('USD', 'EUR'):
+        for day in range(0, 5 * 365, 7):
+            rates.add(currency, start + timedelta(days=day),
+                      Fraction(random.randint(8000, 11000), 100))
+    amounts = [(random.randint(1, 10_000), random.choice(['RUB', 'USD', 'EUR']),
+                start + timedelta(days=random.randrange(5 * 365)))
+               for _ in range(200_000)]
+
+    started = time.perf_counter()
+    expected = sum(Fraction(amount) * rates.rate(currency, day)
+                   for amount, currency, day in amounts)
+    per_row = time.perf_counter() - started
+
+    started = time.perf_counter()
+    total = rates.total(amounts)
+    bulk = time.perf_counter() - started
+    print(f'\nper row: {per_row:.3f} s, grouped: {bulk:.3f} s')
+    assert total == Money(round(expected))
+    assert bulk < per_row
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pytest
+
+from bookkeeper.models.recurring_expense import RecurringExpense, expand
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+@pytest.fixture
+def repo():
+    return MemoryRepository()
+
+
+def test_create_brief():
+    r = RecurringExpense(100, 1, 'месяц')
+    assert r.interval == 1
+    assert r.end_date is None
+    assert r.pk == 0
+
+
+def test_can_add_to_repo(repo):
+    r = RecurringExpense(100, 1, 'месяц')
+    pk = repo.add(r)
+    assert r.pk == pk
+
+
+def test_daily():
+    r = RecurringExpense(10, 1, 'день', interval=2,
+                         start_date=datetime(2023, 1, 1, 9))
+    assert r.occurrences(datetime(2023, 1, 4), datetime(2023, 1, 10)) == (
+        datetime(2023, 1, 5, 9), datetime(2023, 1, 7, 9), datetime(2023, 1, 9, 9))
+
+
+def test_weekly_window_before_start():
+    r = RecurringExpense(10, 1, 'неделя', start_date=datetime(2023, 1, 10))
+    assert r.occurrences(datetime(2023, 1, 1), datetime(2023, 1, 25)) == (
+        datetime(2023, 1, 10), datetime(2023, 1, 17), datetime(2023, 1, 24))
+
+
+def test_monthly_clamps_to_month_end():
+    r = RecurringExpense(10, 1, 'месяц', start_date=datetime(2023, 1, 31))
+    assert r.occurrences(datetime(2023, 2, 1), datetime(2023, 5, 1)) == (
+        datetime(2023, 2, 28), datetime(2023, 3, 31), datetime(2023, 4, 30))
+
+
+def test_yearly_and_end_date():
+    r = RecurringExpense(10, 1, 'год', start_date=datetime(2020, 2, 29),
+                         end_date=datetime(2023, 2, 28))
+    assert r.occurrences(datetime(2000, 1, 1), datetime(2100, 1, 1)) == (
+        datetime(2020, 2, 29), datetime(2021, 2, 28),
+        datetime(2022, 2, 28), datetime(2023, 2, 28))
+
+
+def test_far_window_is_computed_directly():
+    r = RecurringExpense(10, 1, 'день', start_date=datetime(1900, 1, 1))
+    assert len(r.occurrences(datetime(2023, 1, 1), datetime(2023, 2, 1))) == 31
+
+
+def test_invalid_rule():
+    with pytest.raises(ValueError):
+        RecurringExpense(10, 1, 'век').occurrences(datetime.min, datetime.max)
+    with pytest.raises(ValueError):
+        RecurringExpense(10, 1, 'день', interval=0).occurrences(
+            datetime.min, datetime.max)
+
+
+def test_expand():
+    rules = [
+        RecurringExpense(100, 1, 'месяц', start_date=datetime(2023, 1, 15),
+                         comment='Аренда'),
+        RecurringExpense(5, 2, 'неделя', start_date=datetime(2023, 1, 1)),
+    ]
+    expenses = expand(rules, datetime(2023, 1, 10), datetime(2023, 1, 20))
+    assert [(e.amount, e.expense_date.day) for e in expenses] == [(100, 15), (5, 15)]
+    assert expenses[0].comment == 'Аренда'
+    assert all(e.pk == 0 for e in expenses)
+
+
+def test_materialize_keeps_currency():
+    rule = RecurringExpense(10, 1, 'день', start_date=datetime(2023, 1, 1),
+                            currency='USD')
+    expenses = rule.materialize(datetime(2023, 1, 1), datetime(2023, 1, 3))
+    assert [e.currency for e in expenses] == ['USD', 'USD']
+    rule = RecurringExpense(10, 1, 'день', start_date=datetime(2023, 1, 1))
+    [expense] = rule.materialize(datetime(2023, 1, 1), datetime(2023, 1, 2))
+    assert expense.currency == 'RUB'
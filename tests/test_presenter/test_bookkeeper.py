@@ -0,0 +1,339 @@
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.models.money import FxRates
+from bookkeeper.models.recurring_expense import RecurringExpense
+from bookkeeper.presenter.bookkeeper import BookkeeperPresenter
+from bookkeeper.reports.abstract_report import ReportQuery
+from bookkeeper.repository.change_feed import OP_RESET, Change
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository, SQLiteUnitOfWork
+from bookkeeper.search.memory_index import MemorySearchIndex
+from bookkeeper.view.abstract_view import AbstractView
+
+
+class FakeView(AbstractView):
+    def __init__(self):
+        self.handlers = {}
+        self.shown = {}
+        self.pk_changes = []
+
+    def __getattribute__(self, name):
+        if name.startswith('add_handler_'):
+            return lambda handler: self.handlers.__setitem__(name[12:], handler)
+        return super().__getattribute__(name)
+
+    def update_data_in_view(self, budgets, categories, expenses,
+                            budgets_sums, expenses_sums):
+        self.show_expenses(expenses, categories)
+        self.show_categories(categories)
+        self.show_budgets(budgets, categories)
+        self.show_budget_analysis(budgets_sums, expenses_sums)
+
+    def run(self):
+        pass
+
+    def show_expenses(self, expenses, categories):
+        self.shown['expenses'] = expenses
+
+    def show_categories(self, categories):
+        self.shown['categories'] = categories
+
+    def show_budgets(self, budgets, categories):
+        self.shown['budgets'] = budgets
+
+    def show_budget_analysis(self, budgets_sums, expenses_sums):
+        self.shown['analysis'] = budgets_sums, expenses_sums
+
+    def show_budget_forecast(self, forecasts, categories):
+        self.shown['forecast'] = forecasts
+
+    def show_report(self, query, rows, categories):
+        self.shown['report'] = list(rows)
+
+    def show_search_results(self, expenses, categories, page, has_more):
+        self.shown['search'] = expenses, page, has_more
+
+    def show_pk_changes(self, model, added, removed):
+        self.pk_changes.append((model.__name__, sorted(added), sorted(removed)))
+
+
+@pytest.fixture
+def view():
+    return FakeView()
+
+
+@pytest.fixture
+def presenter(view):
+    categories = MemoryRepository[Category]()
+    categories.add(Category('продукты'))
+    expenses = MemoryRepository[Expense]()
+    expenses.add(Expense(100, 1, comment='Гречка'))
+    return BookkeeperPresenter(
+        MemoryRepository[Budget](), categories, expenses, view, MemorySearchIndex())
+
+
+def test_create_and_undo_expense(presenter, view):
+    view.handlers['expense_create'](Expense(50, 1, comment='Греча'))
+    assert len(view.shown['expenses']) == 2
+    view.handlers['undo']()
+    assert len(view.shown['expenses']) == 1
+    view.handlers['redo']()
+    assert len(view.shown['expenses']) == 2
+
+
+def test_undo_keeps_search_index_in_sync(presenter, view):
+    view.handlers['expense_delete'](1)
+    view.handlers['expense_search']('греч', 0)
+    assert view.shown['search'] == ([], 0, False)
+    view.handlers['undo']()
+    view.handlers['expense_search']('греч', 0)
+    assert [e.pk for e in view.shown['search'][0]] == [1]
+
+
+def test_search_paging(presenter, view):
+    presenter.SEARCH_PAGE_SIZE = 2
+    for i in range(4):
+        view.handlers['expense_create'](Expense(i, 1, comment='Гречка'))
+    view.handlers['expense_search']('гречка', 0)
+    expenses, page, has_more = view.shown['search']
+    assert [e.pk for e in expenses] == [5, 4]
+    assert has_more
+    view.handlers['expense_search']('гречка', 2)
+    assert [e.pk for e in view.shown['search'][0]] == [1]
+    assert not view.shown['search'][2]
+
+
+def test_update_budget_refreshes_only_budgets(presenter, view):
+    view.handlers['budget_create'](Budget('день', 1, 100))
+    view.shown.clear()
+    view.handlers['budget_update'](Budget('день', 1, 200, pk=1))
+    assert set(view.shown) == {'budgets', 'analysis', 'forecast'}
+    assert view.shown['analysis'][0][0] == 200
+
+
+def test_budget_change_does_not_rescan_expenses(presenter, view, monkeypatch):
+    scans = []
+    get_all = presenter.repository_expenses.get_all
+    monkeypatch.setattr(presenter.repository_expenses, 'get_all',
+                        lambda where=None: scans.append(1) or get_all(where))
+    hits = presenter.cache.stats.hits
+    view.handlers['budget_create'](Budget('день', 1, 100))
+    assert scans == []
+    assert presenter.cache.stats.hits == hits + 2
+    view.handlers['expense_create'](Expense(50, 1))
+    assert view.shown['analysis'][1][0] == 150
+    assert [e.amount for e in view.shown['expenses']] == [100, 50]
+    assert scans == []
+    presenter._on_change(presenter.repository_expenses, Change(0, OP_RESET, 0, None))
+    presenter._apply_changes()
+    assert scans == [1]
+
+
+def test_analysis_cache_expires_with_window(view):
+    expenses = MemoryRepository[Expense]()
+    expenses.add(Expense(100, 1, datetime.now() - timedelta(days=1, seconds=-1)))
+    presenter = BookkeeperPresenter(MemoryRepository[Budget](),
+                                    MemoryRepository[Category](), expenses, view)
+    assert presenter._calculate_current_expenses_sums() == [100, 100, 100]
+    time.sleep(1.1)
+    assert presenter._calculate_current_expenses_sums() == [0, 100, 100]
+
+
+def test_recurring_expenses_in_analysis(view):
+    recurring = MemoryRepository[RecurringExpense]()
+    recurring.add(RecurringExpense(300, 1, 'день',
+                                   start_date=datetime.now() - timedelta(days=10)))
+    BookkeeperPresenter(MemoryRepository[Budget](), MemoryRepository[Category](),
+                        MemoryRepository[Expense](), view,
+                        repository_recurring=recurring)
+    assert view.shown['analysis'][1] == [300, 7 * 300, 11 * 300]
+
+
+def test_analysis_in_base_currency(view):
+    rates = FxRates()
+    rates.add('USD', date(2000, 1, 1), 90)
+    budgets = MemoryRepository[Budget]()
+    budgets.add(Budget('день', 1, 10, 'USD'))
+    budgets.add(Budget('день', 1, 500))
+    expenses = MemoryRepository[Expense]()
+    expenses.add(Expense(2, 1, datetime.now() - timedelta(hours=1), currency='USD'))
+    expenses.add(Expense(20, 1, datetime.now() - timedelta(hours=1)))
+    BookkeeperPresenter(budgets, MemoryRepository[Category](), expenses, view,
+                        fx_rates=rates)
+    assert view.shown['analysis'] == ([1400, 0, 0], [200, 200, 200])
+
+
+def test_unknown_currency_is_rejected(presenter, view):
+    version = presenter.repository_expenses.version
+    with pytest.raises(ValueError):
+        view.handlers['expense_create'](Expense(5, 1, currency='USD'))
+    with pytest.raises(ValueError):
+        view.handlers['budget_update'](Budget('день', 1, 10, 'USD', pk=1))
+    assert presenter.repository_expenses.version == version
+    presenter.fx_rates.add('USD', date(2000, 1, 1), 90)
+    view.handlers['expense_create'](Expense(5, 1, datetime.now(), currency='USD'))
+    assert view.shown['expenses'][-1].currency == 'USD'
+
+
+def test_unknown_budget_period_is_rejected(presenter, view):
+    with pytest.raises(ValueError):
+        view.handlers['budget_create'](Budget('День', 1, 10))
+    assert view.shown['budgets'] == []
+    view.handlers['budget_create'](Budget('день', 1, 10))
+    assert [b.period for b in view.shown['budgets']] == ['день']
+
+
+def test_external_changes_are_applied_on_poll(presenter, view):
+    presenter.repository_expenses.add(Expense(70, 1, comment='Овсянка'))
+    presenter.repository_expenses.delete(1)
+    view.shown.clear()
+    view.handlers['poll_changes']()
+    assert set(view.shown) == {'expenses', 'analysis', 'forecast'}
+    assert [e.comment for e in view.shown['expenses']] == ['Овсянка']
+    view.handlers['expense_search']('овс', 0)
+    assert [e.pk for e in view.shown['search'][0]] == [2]
+    view.handlers['expense_search']('греч', 0)
+    assert view.shown['search'][0] == []
+
+
+def test_external_write_before_local_edit(view, tmp_path):
+    db_file = tmp_path / 'test.sqlite3'
+    with SQLiteRepository(db_file, Budget) as budgets, \
+            SQLiteRepository(db_file, Category) as categories, \
+            SQLiteRepository(db_file, Expense) as expenses, \
+            SQLiteRepository(db_file, Expense) as other:
+        categories.add(Category('продукты'))
+        BookkeeperPresenter(budgets, categories, expenses, view)
+        other.add(Expense(50, 1, datetime.now() - timedelta(hours=1)))
+        view.handlers['budget_create'](Budget('день', 1, 100))
+        assert view.shown['analysis'] == ([100, 0, 0], [0, 0, 0])
+        view.handlers['poll_changes']()
+        assert [e.amount for e in view.shown['expenses']] == [50]
+        assert view.shown['analysis'] == ([100, 0, 0], [50, 50, 50])
+
+
+def test_pk_changes(presenter, view):
+    assert view.pk_changes == [('Category', [1], []), ('Expense', [1], [])]
+    view.pk_changes.clear()
+    view.handlers['expense_create'](Expense(50, 1))
+    view.handlers['expense_update'](Expense(70, 1, pk=2))
+    view.handlers['expense_delete'](1)
+    view.handlers['undo']()
+    assert view.pk_changes == [('Expense', [2], []), ('Expense', [], [1]),
+                               ('Expense', [1], [])]
+    view.pk_changes.clear()
+    presenter._on_change(presenter.repository_expenses, Change(0, OP_RESET, 0, None))
+    presenter.repository_expenses.delete(2)
+    presenter._apply_changes()
+    assert view.pk_changes == [('Expense', [], [2])]
+
+
+def test_poll_without_changes_does_not_refresh(presenter, view):
+    view.shown.clear()
+    view.handlers['poll_changes']()
+    assert view.shown == {}
+
+
+def test_delete_category_reassigns_to_parent(presenter, view):
+    view.handlers['category_create'](Category('мясо', 1))
+    view.handlers['expense_create'](Expense(300, 2, comment='Фарш'))
+    view.handlers['category_delete'](2)
+    assert [c.pk for c in view.shown['categories']] == [1]
+    assert [e.category for e in view.shown['expenses']] == [1, 1]
+    view.handlers['expense_search']('фарш', 0)
+    assert [e.pk for e in view.shown['search'][0]] == [2]
+    view.handlers['undo']()
+    assert [c.pk for c in view.shown['categories']] == [1, 2]
+    assert [e.category for e in view.shown['expenses']] == [1, 2]
+    view.handlers['redo']()
+    assert [c.pk for c in view.shown['categories']] == [1]
+    assert [e.category for e in view.shown['expenses']] == [1, 1]
+
+
+def test_delete_top_category_is_restricted(presenter, view):
+    with pytest.raises(ValueError):
+        view.handlers['category_delete'](1)
+    view.handlers['category_create'](Category('книги'))
+    view.handlers['category_delete'](2)
+    assert [c.pk for c in view.shown['categories']] == [1]
+
+
+def test_delete_top_category_cascades(presenter, view):
+    view.handlers['category_create'](Category('мясо', 1))
+    view.handlers['category_create'](Category('фарш', 2))
+    view.handlers['budget_create'](Budget('день', 3, 100))
+    view.handlers['category_delete'](1, True)
+    assert view.shown['categories'] == []
+    assert view.shown['expenses'] == []
+    assert view.shown['budgets'] == []
+    view.handlers['undo']()
+    assert [c.pk for c in view.shown['categories']] == [1, 2, 3]
+    assert [e.category for e in view.shown['expenses']] == [1]
+    assert [b.category for b in view.shown['budgets']] == [3]
+    view.handlers['redo']()
+    assert view.shown['categories'] == []
+
+
+def test_merge_categories(presenter, view):
+    view.handlers['category_create'](Category('книги'))
+    view.handlers['category_merge'](1, 2)
+    assert [c.pk for c in view.shown['categories']] == [2]
+    assert [e.category for e in view.shown['expenses']] == [2]
+    with pytest.raises(ValueError):
+        view.handlers['category_merge'](2, 2)
+
+
+def test_merge_categories_is_atomic(view, tmp_path, monkeypatch):
+    uow = SQLiteUnitOfWork(tmp_path / 'test.sqlite3')
+    categories = uow.repository(Category)
+    expenses = uow.repository(Expense)
+    categories.add_many([Category('продукты'), Category('книги')])
+    expenses.add(Expense(100, 1))
+    BookkeeperPresenter(uow.repository(Budget), categories, expenses, view,
+                        unit_of_work=uow)
+
+    def fail(where):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(categories, 'delete_where', fail)
+    with pytest.raises(RuntimeError):
+        view.handlers['category_merge'](1, 2)
+    assert [e.category for e in expenses.get_all()] == [1]
+    monkeypatch.undo()
+    view.handlers['category_merge'](1, 2)
+    assert [e.category for e in expenses.get_all()] == [2]
+    assert [c.pk for c in view.shown['categories']] == [2]
+    uow.close()
+
+
+def test_update_category_rejects_cycle(presenter, view):
+    view.handlers['category_create'](Category('мясо', 1))
+    with pytest.raises(ValueError):
+        view.handlers['category_update'](Category('продукты', 2, pk=1))
+
+
+def test_budget_forecast(presenter, view):
+    view.handlers['budget_create'](Budget('день', 1, 150))
+    [forecast] = view.shown['forecast']
+    assert forecast.spent == 100
+    view.handlers['expense_create'](Expense(100, 1))
+    [forecast] = view.shown['forecast']
+    assert forecast.spent == 200
+    assert forecast.exceeded
+
+
+def test_report(presenter, view):
+    view.handlers['expense_create'](Expense(50, 1, comment='Гречка'))
+    view.handlers['report'](ReportQuery(group_by=('comment',),
+                                        aggregates=('sum', 'count')))
+    assert view.shown['report'] == [('Гречка', 150, 2)]
+    view.handlers['report'](ReportQuery(group_by=('comment',),
+                                        aggregates=('sum', 'count')))
+    assert view.shown['report'] == [('Гречка', 150, 2)]
+    assert presenter.report_engine.cache.stats.hits == 1
@@ -0,0 +1,125 @@
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.presenter.history import BulkCommand, Command, CommandHistory
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+@pytest.fixture
+def repo():
+    return MemoryRepository[Budget]()
+
+
+@pytest.fixture
+def history():
+    return CommandHistory(max_size=3)
+
+
+def test_create(repo, history):
+    budget = Budget('день', 1, 100)
+    command = Command.create(repo, budget)
+    history.execute(command)
+    assert command.pk == 1
+    assert repo.get_all() == [command.after]
+    history.undo()
+    assert repo.get_all() == []
+    history.redo()
+    assert repo.get_all() == [Budget('день', 1, 100, pk=1)]
+
+
+def test_history_is_not_changed_in_place(repo, history):
+    history.execute(Command.create(repo, Budget('день', 1, 100)))
+    history.execute(Command.update(repo, Budget('день', 1, 200, pk=1)))
+    repo.update_where({'category': 1}, {'category': 2})
+    history.undo()
+    assert repo.get(1).category == 1
+    history.undo()
+    history.redo()
+    assert repo.get(1) == Budget('день', 1, 100, pk=1)
+    repo.get(1).amount = 0
+    history.undo()
+    history.redo()
+    assert repo.get(1).amount == 100
+
+
+def test_update(repo, history):
+    repo.add(Budget('день', 1, 100))
+    history.execute(Command.update(repo, Budget('день', 1, 200, pk=1)))
+    assert repo.get(1).amount == 200
+    history.undo()
+    assert repo.get(1).amount == 100
+    history.redo()
+    assert repo.get(1).amount == 200
+
+
+def test_delete(repo, history):
+    budget = Budget('день', 1, 100)
+    repo.add(budget)
+    history.execute(Command.delete(repo, 1))
+    assert repo.get(1) is None
+    history.undo()
+    assert repo.get(1) == budget
+    history.redo()
+    assert repo.get(1) is None
+
+
+def test_cannot_delete_unexistent(repo):
+    with pytest.raises(KeyError):
+        Command.delete(repo, 1)
+
+
+def test_history_is_bounded(repo, history):
+    for i in range(5):
+        history.execute(Command.create(repo, Budget('день', 1, i)))
+    while history.undo():
+        pass
+    assert [b.amount for b in repo.get_all()] == [0, 1]
+
+
+def test_new_command_clears_redo(repo, history):
+    history.execute(Command.create(repo, Budget('день', 1, 100)))
+    history.undo()
+    assert history.can_redo()
+    history.execute(Command.create(repo, Budget('день', 1, 200)))
+    assert not history.can_redo()
+    assert history.redo() is None
+
+
+def test_bulk(repo, history):
+    repo.add(Budget('день', 1, 100))
+    repo.add(Budget('день', 2, 200))
+    repo.add(Budget('месяц', 2, 300))
+
+    def operation():
+        repo.delete_where({'category': 1})
+        repo.update_where({'category': 2}, {'category': 1})
+
+    history.push(BulkCommand.record(operation, [(repo, repo.get_all())]))
+    assert [(b.pk, b.category) for b in repo.get_all()] == [(2, 1), (3, 1)]
+    assert len(history.undo().commands) == 3
+    assert sorted((b.pk, b.category) for b in repo.get_all()) == [(1, 1), (2, 2), (3, 2)]
+    history.redo()
+    assert [(b.pk, b.category) for b in repo.get_all()] == [(2, 1), (3, 1)]
+
+
+def test_single_and_bulk(repo, history):
+    history.execute(Command.create(repo, Budget('день', 1, 100)))
+
+    def merge():
+        repo.update_where({'category': 1}, {'category': 2})
+
+    history.push(BulkCommand.record(merge, [(repo, repo.get_all({'category': 1}))]))
+    history.execute(Command.create(repo, Budget('месяц', 2, 300)))
+    for _ in range(3):
+        history.undo()
+    assert repo.get_all() == []
+    history.redo()
+    assert repo.get_all() == [Budget('день', 1, 100, pk=1)]
+    history.redo()
+    history.redo()
+    assert sorted((b.pk, b.category) for b in repo.get_all()) == [(1, 2), (2, 2)]
+    history.undo()
+    history.undo()
+    history.execute(Command.delete(repo, 1))
+    history.undo()
+    assert repo.get_all() == [Budget('день', 1, 100, pk=1)]
@@ -0,0 +1,129 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.reports.abstract_report import ReportQuery, percentile
+from bookkeeper.reports.export import write_csv
+from bookkeeper.reports.memory_report import MemoryReportEngine
+from bookkeeper.reports.sqlite_report import SQLiteReportEngine
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+EXPENSES = [
+    Expense(100, 2, datetime(2024, 1, 1, 10), comment='Фарш'),
+    Expense(300, 2, datetime(2024, 1, 7, 23, 59), comment='Фарш'),
+    Expense(50, 3, datetime(2024, 1, 8), comment='Конфеты'),
+    Expense(1000, 4, datetime(2024, 2, 29), comment='Учебник', currency='USD'),
+    Expense(200, 1, datetime(2023, 12, 31, 12), comment=''),
+]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def engine(request, tmp_path):
+    """
+    1 продукты
+        2 мясо
+        3 сладости
+    4 книги
+    """
+    categories = [Category('продукты'), Category('мясо', 1),
+                  Category('сладости', 1), Category('книги')]
+    expenses = [Expense(e.amount, e.category, e.expense_date, comment=e.comment,
+                        currency=e.currency) for e in EXPENSES]
+    if request.param == 'memory':
+        cat_repo = MemoryRepository[Category]()
+        exp_repo = MemoryRepository[Expense]()
+        cat_repo.add_many(categories)
+        exp_repo.add_many(expenses)
+        yield MemoryReportEngine(exp_repo, cat_repo)
+        return
+    db_file = tmp_path / 'test.sqlite3'
+    with SQLiteRepository(db_file, Category) as cat_repo, \
+            SQLiteRepository(db_file, Expense) as exp_repo:
+        cat_repo.add_many(categories)
+        exp_repo.add_many(expenses)
+        yield SQLiteReportEngine(exp_repo, cat_repo)
+
+
+def run(engine, **kwargs):
+    return list(engine.run(ReportQuery(**kwargs)))
+
+
+def test_totals(engine):
+    assert run(engine, aggregates=('sum', 'count', 'min', 'max', 'avg')) == [
+        (1650, 5, 50, 1000, 330.0)]
+    assert run(engine, categories=frozenset({7}), aggregates=('sum', 'count')) == [
+        (0, 0)]
+
+
+def test_group_by_category_and_month(engine):
+    assert run(engine, group_by=('category', 'month')) == [
+        (1, '2023-12', 200), (2, '2024-01', 400), (3, '2024-01', 50),
+        (4, '2024-02', 1000)]
+
+
+def test_time_dimensions(engine):
+    assert run(engine, group_by=('week',), aggregates=('count',)) == [
+        ('2023-12-25', 1), ('2024-01-01', 2), ('2024-01-08', 1), ('2024-02-26', 1)]
+    assert run(engine, group_by=('day',), start=datetime(2024, 1, 7),
+               end=datetime(2024, 2, 29)) == [('2024-01-07', 300), ('2024-01-08', 50)]
+    assert run(engine, group_by=('year',)) == [('2023', 200), ('2024', 1450)]
+
+
+def test_subtree(engine):
+    assert run(engine, group_by=('subtree',), aggregates=('sum', 'count')) == [
+        (1, 650, 4), (4, 1000, 1)]
+
+
+def test_top_comments(engine):
+    assert run(engine, group_by=('comment',), order_by='sum', limit=2) == [
+        ('Учебник', 1000), ('Фарш', 400)]
+
+
+def test_currency(engine):
+    assert run(engine, group_by=('currency',), aggregates=('sum', 'count')) == [
+        ('RUB', 650, 4), ('USD', 1000, 1)]
+
+
+def test_percentiles(engine):
+    assert run(engine, aggregates=('p50', 'p100')) == [(200, 1000)]
+    assert run(engine, group_by=('category',), aggregates=('p25',),
+               categories=frozenset({2, 3}), order_by='p25', limit=1) == [(2, 150)]
+
+
+def test_cache(engine):
+    query = ReportQuery(group_by=('category',))
+    first = list(engine.run(query))
+    assert list(engine.run(query)) == first
+    engine.expenses.add(Expense(1, 4))
+    assert list(engine.run(query))[-1] == (4, 1001)
+    assert (engine.cache.stats.hits, engine.cache.stats.invalidations) == (1, 1)
+
+
+def test_query_validation():
+    with pytest.raises(ValueError):
+        ReportQuery(group_by=('hour',))
+    with pytest.raises(ValueError):
+        ReportQuery(aggregates=('median',))
+    with pytest.raises(ValueError):
+        ReportQuery(aggregates=('sum',), order_by='count')
+    with pytest.raises(ValueError):
+        ReportQuery(aggregates=())
+    assert ReportQuery(group_by=('day',), aggregates=('p99.5',)).columns == (
+        'day', 'p99.5')
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([1, 2, 3, 4], 0) == 1
+
+
+def test_write_csv(engine):
+    query = ReportQuery(group_by=('subtree',), aggregates=('sum', 'count'))
+    stream = io.StringIO(newline='')
+    assert write_csv(query.columns, engine.run(query), stream) == 2
+    assert stream.getvalue().splitlines() == ['subtree,sum,count', '1,650,4', '4,1000,1']
@@ -0,0 +1,56 @@
+import pytest
+
+from bookkeeper.repository.change_feed import (
+    OP_ADD, OP_DELETE, OP_UPDATE, Change, ChangeFeedGap, ChangeLog,
+)
+from bookkeeper.repository.memory_repository import MemoryRepository
+
+
+class Custom:
+    pk = 0
+
+
+def test_record_and_since():
+    log = ChangeLog()
+    log.record(OP_ADD, 1, 'a')
+    log.record(OP_UPDATE, 1, 'b')
+    log.record(OP_DELETE, 1, None)
+    assert log.version == 3
+    assert log.since(1) == [Change(2, OP_UPDATE, 1, 'b'), Change(3, OP_DELETE, 1, None)]
+    assert log.since(3) == []
+
+
+def test_gap():
+    log = ChangeLog(max_size=2)
+    for pk in range(1, 5):
+        log.record(OP_ADD, pk, None)
+    assert [change.pk for change in log.since(2)] == [3, 4]
+    with pytest.raises(ChangeFeedGap):
+        log.since(1)
+
+
+def test_subscribe():
+    log = ChangeLog()
+    received = []
+    unsubscribe = log.subscribe(received.append)
+    log.record(OP_ADD, 1, None)
+    unsubscribe()
+    log.record(OP_ADD, 2, None)
+    assert [change.pk for change in received] == [1]
+
+
+def test_memory_repository_feed():
+    repo = MemoryRepository()
+    received = []
+    repo.subscribe(received.append)
+    obj = Custom()
+    pk = repo.add(obj)
+    repo.update(obj)
+    repo.delete(pk)
+    with pytest.raises(KeyError):
+        repo.delete(pk)
+    repo.restore(obj)
+    assert [(c.op, c.pk) for c in received] == [
+        (OP_ADD, pk), (OP_UPDATE, pk), (OP_DELETE, pk), (OP_ADD, pk)]
+    assert repo.version == 4
+    assert repo.changes(2) == received[2:]
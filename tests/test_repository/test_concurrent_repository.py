@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.change_feed import OP_ADD, OP_DELETE, OP_UPDATE
+from bookkeeper.repository.concurrent_repository import ConcurrentMemoryRepository
+
+
+@pytest.fixture
+def repo():
+    return ConcurrentMemoryRepository[Expense](shard_size=4)
+
+
+def test_crud(repo):
+    obj = Expense(100, 1)
+    pk = repo.add(obj)
+    assert repo.get(pk) is obj
+    obj2 = Expense(200, 1, pk=pk)
+    repo.update(obj2)
+    assert repo.get(pk) is obj2
+    repo.delete(pk)
+    assert repo.get(pk) is None
+    assert repo.get(10 ** 6) is None
+    with pytest.raises(KeyError):
+        repo.delete(pk)
+    with pytest.raises(ValueError):
+        repo.add(obj2)
+    with pytest.raises(ValueError):
+        ConcurrentMemoryRepository(shard_size=0)
+
+
+def test_bulk_changes(repo):
+    received = []
+    repo.subscribe(received.append)
+    assert repo.add_many([Expense(i, i % 3) for i in range(10)]) == list(range(1, 11))
+    assert repo.update_where({'category': {1, 2}}, {'category': 0}) == 6
+    assert repo.delete_where({'amount': {0, 9}}) == 2
+    assert [e.amount for e in repo.get_all({'category': 0})] == list(range(1, 9))
+    assert len(repo.snapshot()) == 8
+    assert repo.version == 18
+    assert [c.op for c in repo.changes(16)] == [OP_DELETE, OP_DELETE]
+    assert [c.op for c in received] == [OP_ADD] * 10 + [OP_UPDATE] * 6 + [OP_DELETE] * 2
+
+
+def test_snapshot_is_isolated(repo):
+    repo.add_many([Expense(i, 1) for i in range(10)])
+    snapshot = repo.snapshot()
+    repo.update_where({}, {'category': 2})
+    repo.delete(1)
+    repo.add(Expense(100, 3))
+    assert [e.category for e in snapshot] == [1] * 10
+    assert len(snapshot) == 10 and snapshot.version == 10
+    assert [e.category for e in repo.get_all()] == [2] * 9 + [3]
+
+
+def test_readers_never_see_half_applied_changes():
+    repo = ConcurrentMemoryRepository[Expense]()
+    repo.add_many([Expense(1, 1) for _ in range(2_000)])
+    stop = threading.Event()
+    errors = []
+    reads = []
+
+    def reader():
+        count = 0
+        while not stop.is_set():
+            snapshot = repo.snapshot()
+            expenses = snapshot.get_all()
+            # Все расходы переносятся между категориями одним изменением
+            if len({e.category for e in expenses}) != 1 or len(expenses) != len(snapshot):
+                errors.append(snapshot.version)
+            count += 1
+        reads.append(count)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    latencies = []
+    for i in range(50):
+        started = time.perf_counter()
+        repo.update_where({}, {'category': i % 2 + 1})
+        if i % 10 == 0:
+            repo.add(Expense(1, i % 2 + 1))
+        latencies.append(time.perf_counter() - started)
+    stop.set()
+    for thread in readers:
+        thread.join()
+    latencies.sort()
+    print(f'\nreads: {sum(reads)}, write p50: {latencies[25] * 1000:.1f} ms, '
+          f'max: {latencies[-1] * 1000:.1f} ms')
+    assert errors == []
+    assert all(count > 0 for count in reads)
@@ -0,0 +1,164 @@
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.category_operations import delete_category, merge_categories
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.change_feed import OP_DELETE
+from bookkeeper.repository.foreign_key import (
+    ON_DELETE_CASCADE, ON_DELETE_SET_NULL, ForeignKey, IntegrityError)
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.unit_of_work import MemoryUnitOfWork
+
+
+@pytest.fixture
+def repos():
+    """
+    1 продукты
+        2 мясо
+            3 фарш
+    4 книги
+    """
+    categories = MemoryRepository[Category]()
+    expenses = MemoryRepository[Expense]()
+    budgets = MemoryRepository[Budget]()
+    categories.add_foreign_key('parent', categories)
+    expenses.add_foreign_key('category', categories)
+    budgets.add_foreign_key('category', categories)
+    categories.add_many([Category('продукты'), Category('мясо', 1),
+                         Category('фарш', 2), Category('книги')])
+    expenses.add_many([Expense(100, 3), Expense(200, 2), Expense(300, 4)])
+    budgets.add(Budget('месяц', 1, 1000))
+    return categories, expenses, budgets
+
+
+def test_dangling_references_are_rejected(repos):
+    categories, expenses, budgets = repos
+    with pytest.raises(IntegrityError):
+        expenses.add(Expense(1, 99))
+    with pytest.raises(IntegrityError):
+        expenses.update(Expense(1, 99, pk=1))
+    with pytest.raises(IntegrityError):
+        expenses.update_where({}, {'category': 99})
+    with pytest.raises(IntegrityError):
+        budgets.restore(Budget('день', 99, 1, pk=10))
+    with pytest.raises(IntegrityError):
+        categories.add(Category('сладости', 99))
+    assert [e.category for e in expenses.get_all()] == [3, 2, 4]
+    assert categories.add(Category('сладости', 1)) == 5
+    assert expenses.update_where({'category': 4}, {'category': 5}) == 1
+
+
+def test_restrict(repos):
+    categories, expenses, budgets = repos
+    version = categories.version
+    for pk in (1, 2, 4):
+        with pytest.raises(IntegrityError):
+            categories.delete(pk)
+    assert categories.version == version
+    expenses.delete_where({'category': 4})
+    categories.delete(4)
+    # Подкатегории, удаляемые той же операцией, удалению не мешают
+    expenses.delete_where({'category': {2, 3}})
+    with pytest.raises(IntegrityError):
+        categories.delete_where({'pk': {1, 2, 3}})
+    budgets.delete(1)
+    assert categories.delete_where({'pk': {1, 2, 3}}) == 3
+    assert categories.get_all() == []
+
+
+def test_cascade_and_set_null():
+    categories = MemoryRepository[Category]()
+    expenses = MemoryRepository[Expense]()
+    categories.add_foreign_key('parent', categories, ON_DELETE_SET_NULL)
+    expenses.add_foreign_key('category', categories, ON_DELETE_CASCADE)
+    categories.add_many([Category('продукты'), Category('мясо', 1),
+                         Category('сладости', 1)])
+    expenses.add_many([Expense(100, 1), Expense(200, 2), Expense(300, 3)])
+    received = []
+    expenses.subscribe(received.append)
+    categories.delete(1)
+    assert [(c.pk, c.parent) for c in categories.get_all()] == [(2, None), (3, None)]
+    assert [e.amount for e in expenses.get_all()] == [200, 300]
+    assert [(c.op, c.pk) for c in received] == [(OP_DELETE, 1)]
+
+    tree = MemoryRepository[Category]()
+    tree.add_foreign_key('parent', tree, ON_DELETE_CASCADE)
+    tree.add_many([Category('a'), Category('b', 1), Category('c', 2), Category('d')])
+    tree.delete(1)
+    assert [c.name for c in tree.get_all()] == ['d']
+
+
+def test_deletes_use_reverse_index(repos, monkeypatch):
+    categories, expenses, _ = repos
+    expenses.add_many([Expense(i, 1 + i % 3) for i in range(10_000)])
+
+    def scan(where=None):
+        raise AssertionError('repository scanned')
+
+    monkeypatch.setattr(expenses, 'get_all', scan)
+    with pytest.raises(IntegrityError):
+        categories.delete(2)
+    expenses.delete(3)
+    categories.add(Category('одежда'))
+    categories.delete(5)
+
+
+def test_operations_respect_constraints(repos):
+    categories, expenses, budgets = repos
+    dependents = [(expenses, 'category'), (budgets, 'category')]
+    merge_categories(2, 4, categories, dependents)
+    assert [e.category for e in expenses.get_all()] == [3, 4, 4]
+    assert categories.get(3).parent == 4
+    delete_category(1, categories, dependents)
+    assert [c.name for c in categories.get_all()] == ['фарш', 'книги']
+    assert budgets.get_all() == []
+
+
+def test_rollback_restores_index(repos):
+    categories, expenses, budgets = repos
+    uow = MemoryUnitOfWork([categories, expenses, budgets])
+    with pytest.raises(RuntimeError):
+        with uow:
+            expenses.update_where({'category': 4}, {'category': 1})
+            raise RuntimeError
+    assert [e.category for e in expenses.get_all()] == [3, 2, 4]
+    with pytest.raises(IntegrityError):
+        categories.delete(4)
+    expenses.delete(1)
+    expenses.update(Expense(50, 1, pk=2))
+    categories.delete(3)
+
+
+def test_update_in_place_then_delete_parent(repos):
+    categories, expenses, _ = repos
+    expense = expenses.get(3)
+    expense.category = 1
+    expenses.update(expense)
+    expenses.delete(2)
+    categories.delete(4)
+    with pytest.raises(IntegrityError):
+        categories.delete(1)
+
+    tree = MemoryRepository[Category]()
+    tree.add_foreign_key('parent', tree, ON_DELETE_CASCADE)
+    tree.add_many([Category('a'), Category('b', 1), Category('c')])
+    child = tree.get(2)
+    child.parent = 3
+    tree.update(child)
+    tree.delete(3)
+    assert [c.name for c in tree.get_all()] == ['a']
+
+
+def test_violations():
+    categories = MemoryRepository[Category]()
+    expenses = MemoryRepository[Expense]()
+    categories.add(Category('продукты'))
+    expenses.add_many([Expense(100, 1), Expense(200, 7), Expense(300, 7), Expense(5, 8)])
+    foreign_key = expenses.add_foreign_key('category', categories)
+    assert foreign_key.violations() == [2, 3, 4]
+    assert isinstance(foreign_key, ForeignKey)
+    with pytest.raises(IntegrityError):
+        categories.delete(1)
+    with pytest.raises(ValueError):
+        expenses.add_foreign_key('category', categories, 'ignore')
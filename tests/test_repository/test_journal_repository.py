@@ -0,0 +1,170 @@
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.foreign_key import ON_DELETE_CASCADE, ON_DELETE_SET_NULL
+from bookkeeper.repository.journal_repository import JournalRepository
+from bookkeeper.repository.snapshot import SnapshotError
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / 'expenses.wal', tmp_path / 'expenses.snap'
+
+
+def open_repo(paths, **kwargs):
+    journal_path, snapshot_path = paths
+    return JournalRepository(Expense, journal_path, snapshot_path, **kwargs)
+
+
+def test_replay(paths):
+    with open_repo(paths) as repo:
+        pk1 = repo.add(Expense(100, 1, comment='Гречка'))
+        pk2 = repo.add(Expense(200, 2))
+        repo.update(Expense(150, 1, comment='Гречка', pk=pk1))
+        repo.delete(pk2)
+        expected = repo.get_all()
+    with open_repo(paths) as repo:
+        assert repo.get_all() == expected
+        assert repo.get(pk1).amount == 150
+        assert repo.add(Expense(1, 1)) == 3
+
+
+def test_failed_operations_are_not_journaled(paths):
+    with open_repo(paths) as repo:
+        size = paths[0].stat().st_size
+        with pytest.raises(KeyError):
+            repo.delete(1)
+        with pytest.raises(ValueError):
+            repo.update(Expense(1, 1))
+    assert paths[0].stat().st_size == size
+
+
+def test_torn_tail_is_discarded(paths):
+    with open_repo(paths) as repo:
+        repo.add(Expense(100, 1))
+        repo.add(Expense(200, 1))
+    journal_path = paths[0]
+    data = journal_path.read_bytes()
+    journal_path.write_bytes(data[:-3])
+    with open_repo(paths) as repo:
+        assert [e.amount for e in repo.get_all()] == [100]
+        repo.add(Expense(300, 1))
+    with open_repo(paths) as repo:
+        assert [e.amount for e in repo.get_all()] == [100, 300]
+
+
+def test_compaction(paths):
+    journal_path, snapshot_path = paths
+    with open_repo(paths, compact_every=3) as repo:
+        for i in range(4):
+            repo.add(Expense(i, 1))
+        repo.delete(1)
+        assert snapshot_path.exists()
+        expected = repo.get_all()
+    with open_repo(paths) as repo:
+        assert repo.get_all() == expected
+        assert repo.add(Expense(1, 1)) == 5
+
+
+def test_replay_after_compaction_is_idempotent(paths):
+    journal_path, _ = paths
+    with open_repo(paths) as repo:
+        repo.add(Expense(1, 1))
+        repo.add(Expense(2, 1))
+        repo.delete(1)
+        repo.sync()
+        journal = journal_path.read_bytes()
+        repo.compact()
+    # Имитируем сбой между записью снимка и очисткой журнала.
+    journal_path.write_bytes(journal)
+    with open_repo(paths) as repo:
+        assert [e.amount for e in repo.get_all()] == [2]
+
+
+def test_bulk_changes_are_journaled(paths):
+    with open_repo(paths) as repo:
+        repo.add_many([Expense(100, 1), Expense(200, 2), Expense(300, 2)])
+        assert repo.update_where({'category': 2}, {'category': 3}) == 2
+        assert repo.delete_where({'amount': 100}) == 1
+        expected = repo.get_all()
+    with open_repo(paths) as repo:
+        assert repo.get_all() == expected
+        assert [e.category for e in repo.get_all()] == [3, 3]
+
+
+def test_rollback_is_journaled(paths):
+    with open_repo(paths) as repo:
+        pk = repo.add(Expense(100, 1))
+        repo.begin()
+        repo.update(Expense(500, 1, pk=pk))
+        repo.add(Expense(200, 1))
+        repo.delete(pk)
+        repo.rollback()
+        expected = repo.get_all()
+    with open_repo(paths) as repo:
+        assert repo.get_all() == expected
+        assert [e.amount for e in repo.get_all()] == [100]
+
+
+def test_transaction_is_journaled_on_commit(paths):
+    with open_repo(paths) as repo:
+        repo.add(Expense(100, 1))
+        repo.sync()
+        size = paths[0].stat().st_size
+        repo.begin()
+        repo.add(Expense(200, 1))
+        repo.delete(1)
+        repo.sync()
+        assert paths[0].stat().st_size == size
+        # Сбой посреди транзакции: её изменений в журнале нет.
+        with open_repo(paths) as crashed:
+            assert [e.amount for e in crashed.get_all()] == [100]
+        repo.commit()
+        repo.begin()
+        repo.add(Expense(300, 1))
+        repo.rollback()
+    with open_repo(paths) as repo:
+        assert [e.amount for e in repo.get_all()] == [200]
+
+
+def test_not_a_journal(paths):
+    paths[0].write_bytes(b'garbage')
+    with pytest.raises(SnapshotError):
+        open_repo(paths)
+
+
+def test_cascade_deletes_are_journaled(tmp_path):
+    def open_both():
+        categories = JournalRepository(Category, tmp_path / 'categories.wal')
+        expenses = JournalRepository(Expense, tmp_path / 'expenses.wal')
+        expenses.add_foreign_key('category', categories, ON_DELETE_CASCADE)
+        return categories, expenses
+
+    categories, expenses = open_both()
+    pk = categories.add(Category('продукты'))
+    expenses.add(Expense(100, pk))
+    categories.delete(pk)
+    categories.close()
+    expenses.close()
+    categories, expenses = open_both()
+    assert categories.get_all() == []
+    assert expenses.get_all() == []
+    categories.close()
+    expenses.close()
+
+
+def test_set_null_deletes_are_journaled(tmp_path):
+    def open_categories():
+        categories = JournalRepository(Category, tmp_path / 'categories.wal')
+        categories.add_foreign_key('parent', categories, ON_DELETE_SET_NULL)
+        return categories
+
+    categories = open_categories()
+    parent = categories.add(Category('еда'))
+    child = categories.add(Category('мясо', parent))
+    categories.delete(parent)
+    categories.close()
+    categories = open_categories()
+    assert categories.get_all() == [Category('мясо', None, child)]
+    categories.close()
@@ -69,3 +69,17 @@ def test_get_all_with_condition(repo, custom_class):
         objects.append(o)
     assert repo.get_all({'name': '0'}) == [objects[0]]
     assert repo.get_all({'test': 'test'}) == objects
+
+
+def test_update_and_delete_where(repo, custom_class):
+    for i in range(6):
+        obj = custom_class()
+        obj.value = i % 3
+        repo.add(obj)
+    assert len(repo.get_all({'value': {0, 2}})) == 4
+    since = repo.version
+    assert repo.update_where({'value': {0, 2}}, {'value': 1}) == 4
+    assert len(repo.get_all({'value': 1})) == 6
+    assert repo.delete_where({'pk': {1, 2}}) == 2
+    assert [c.op for c in repo.changes(since)] == ['update'] * 4 + ['delete'] * 2
+    assert len(repo.get_all()) == 4
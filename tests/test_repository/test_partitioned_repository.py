@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository import partitioned_repository
+from bookkeeper.repository.partitioned_repository import PartitionedExpenseRepository
+from bookkeeper.repository.snapshot import read_snapshot
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = PartitionedExpenseRepository(archive_dir=tmp_path)
+    for month in (1, 2, 3):
+        for day in (1, 15):
+            repo.add(Expense(month * 100 + day, 1,
+                             expense_date=datetime(2023, month, day)))
+    return repo
+
+
+def test_crud(repo):
+    e = Expense(100, 1, expense_date=datetime(2023, 4, 1))
+    pk = repo.add(e)
+    assert repo.get(pk) == e
+    e2 = Expense(200, 1, expense_date=datetime(2023, 5, 1), pk=pk)
+    repo.update(e2)
+    assert repo.get(pk) == e2
+    assert (2023, 4) in repo.partitions()
+    repo.delete(pk)
+    assert repo.get(pk) is None
+
+
+def test_cannot_add_with_pk(repo):
+    with pytest.raises(ValueError):
+        repo.add(Expense(1, 1, pk=1))
+
+
+def test_get_all_with_condition(repo):
+    assert len(repo.get_all()) == 6
+    assert [e.amount for e in repo.get_all({'amount': 201})] == [201]
+
+
+def test_get_range(repo):
+    result = repo.get_range(datetime(2023, 1, 10), datetime(2023, 3, 1))
+    assert [e.amount for e in result] == [115, 201, 215]
+
+
+def test_freeze(repo, tmp_path):
+    assert repo.freeze(datetime(2023, 3, 1)) == [(2023, 1), (2023, 2)]
+    assert repo.is_frozen((2023, 1))
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == [
+        '.pks', '.pks', '.snap', '.snap']
+    assert [e.amount for e in repo.get_range(
+        datetime(2023, 2, 10), datetime(2023, 4, 1))] == [215, 301, 315]
+    assert repo.get(1).amount == 101
+    assert len(repo.get_all()) == 6
+
+
+def test_frozen_partitions_are_read_only(repo):
+    repo.freeze(datetime(2023, 2, 1))
+    with pytest.raises(ValueError):
+        repo.delete(1)
+    with pytest.raises(ValueError):
+        repo.update(Expense(1, 1, expense_date=datetime(2023, 3, 1), pk=1))
+    with pytest.raises(ValueError):
+        repo.add(Expense(1, 1, expense_date=datetime(2023, 1, 20)))
+
+
+def test_archives_are_loaded_lazily(tmp_path):
+    repo = PartitionedExpenseRepository(archive_dir=tmp_path, archive_cache_size=1)
+    for month in (1, 2, 3):
+        repo.add(Expense(month, 1, expense_date=datetime(2023, month, 1)))
+    repo.freeze(datetime(2023, 3, 1))
+    assert repo.get(1).amount == 1
+    assert repo.get(2).amount == 2
+    assert repo.get(1).amount == 1
+
+
+def test_archives_are_reopened(repo, tmp_path, monkeypatch):
+    repo.freeze(datetime(2023, 3, 1))
+    reads = []
+    monkeypatch.setattr(partitioned_repository, 'read_snapshot',
+                        lambda *args: reads.append(args) or read_snapshot(*args))
+    reopened = PartitionedExpenseRepository(archive_dir=tmp_path)
+    assert reopened.partitions() == [(2023, 1), (2023, 2)]
+    assert reads == []
+    assert reopened.get(3).amount == 201
+    assert len(reads) == 1
+    assert reopened.add(Expense(1, 1, expense_date=datetime(2023, 3, 1))) == 5
+    # Список pk, которого нет, строится по архиву при открытии.
+    (tmp_path / 'expenses-2023-01.pks').unlink()
+    reads.clear()
+    reopened = PartitionedExpenseRepository(archive_dir=tmp_path)
+    assert len(reads) == 1
+    assert reopened.get(2).amount == 115
+    assert (tmp_path / 'expenses-2023-01.pks').exists()
+
+
+def test_freeze_requires_archive_dir():
+    with pytest.raises(ValueError):
+        PartitionedExpenseRepository().freeze(datetime.now())
@@ -0,0 +1,57 @@
+from bookkeeper.models.category import Category
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.result_cache import CacheStats, ResultCache
+
+
+class Unversioned:
+    @property
+    def version(self):
+        raise NotImplementedError
+
+
+def test_hit_and_invalidation():
+    cache = ResultCache()
+    repo = MemoryRepository[Category]()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(repo.get_all())
+
+    assert cache.get_or_compute('count', [repo], compute) == 0
+    assert cache.get_or_compute('count', [repo], compute) == 0
+    repo.add(Category('продукты'))
+    assert cache.get_or_compute('count', [repo], compute) == 1
+    assert len(calls) == 2
+    assert cache.stats == CacheStats(hits=1, misses=2, invalidations=1)
+    assert cache.stats.hit_rate == 1 / 3
+
+
+def test_lru_eviction():
+    cache = ResultCache(maxsize=2)
+    for key in ('a', 'b'):
+        cache.put(key, (1,), key.upper())
+    assert cache.get('a', (1,)) == 'A'
+    cache.put('c', (1,), 'C')
+    assert len(cache) == 2
+    assert cache.get('b', (1,)) is None
+    assert cache.get('a', (1,)) == 'A'
+    assert cache.stats.evictions == 1
+
+
+def test_expires():
+    cache = ResultCache()
+    cache.put('sums', (1,), [1], expires=10)
+    assert cache.get('sums', (1,), now=9) == [1]
+    assert cache.get('sums', (1,), now=10) is None
+    assert len(cache) == 0
+
+
+def test_unversioned_source_is_not_cached():
+    cache = ResultCache()
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute('x', [Unversioned()], lambda: calls.append(1) or 1)
+    assert len(calls) == 2
+    assert len(cache) == 0
+    assert cache.stats.hit_rate == 0.0
@@ -0,0 +1,148 @@
+import struct
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.snapshot import (
+    FORMAT_VERSION, SnapshotError, model_schema, version_schema)
+
+
+@pytest.fixture
+def repo():
+    repo = MemoryRepository[Expense]()
+    repo.add(Expense(100, 1, expense_date=datetime(2023, 3, 1, 12, 30),
+                     comment='Гречка'))
+    repo.add(Expense(250, 2, comment=''))
+    repo.add(Expense(399, 1, comment='Пельмени'))
+    repo.delete(2)
+    return repo
+
+
+def test_model_schema():
+    assert model_schema(Category) == [('name', 's'), ('parent', 'n'), ('pk', 'i')]
+
+
+def test_model_schema_requires_dataclass():
+    with pytest.raises(TypeError):
+        model_schema(int)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_save_and_load(tmp_path, repo, compress):
+    path = tmp_path / 'expenses.snap'
+    repo.save_snapshot(path, Expense, compress=compress)
+    restored = MemoryRepository.load_snapshot(path, Expense)
+    assert restored.get_all() == repo.get_all()
+    assert restored.get(3).comment == 'Пельмени'
+    assert restored.get(1).expense_date == datetime(2023, 3, 1, 12, 30)
+
+
+def test_counter_is_preserved(tmp_path, repo):
+    path = tmp_path / 'expenses.snap'
+    repo.save_snapshot(path, Expense)
+    restored = MemoryRepository.load_snapshot(path, Expense)
+    assert restored.add(Expense(1, 1)) == 4
+    assert repo.add(Expense(1, 1)) == 4
+
+
+def test_optional_fields(tmp_path):
+    repo = MemoryRepository[Category]()
+    root = repo.add(Category('продукты'))
+    repo.add(Category('мясо', root))
+    path = tmp_path / 'categories.snap'
+    repo.save_snapshot(path, Category)
+    restored = MemoryRepository.load_snapshot(path, Category)
+    assert [c.parent for c in restored.get_all()] == [None, root]
+
+
+def test_empty_repository(tmp_path):
+    path = tmp_path / 'empty.snap'
+    MemoryRepository().save_snapshot(path, Expense)
+    restored = MemoryRepository.load_snapshot(path, Expense)
+    assert restored.get_all() == []
+    assert restored.add(Expense(1, 1)) == 1
+
+
+def test_overwrite_is_atomic(tmp_path, repo):
+    path = tmp_path / 'expenses.snap'
+    repo.save_snapshot(path, Expense)
+    repo.save_snapshot(path, Expense, compress=True)
+    assert [p.name for p in tmp_path.iterdir()] == ['expenses.snap']
+
+
+def test_corrupted_snapshot(tmp_path, repo):
+    path = tmp_path / 'expenses.snap'
+    repo.save_snapshot(path, Expense)
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(data)
+    with pytest.raises(SnapshotError):
+        MemoryRepository.load_snapshot(path, Expense)
+
+
+def test_wrong_model(tmp_path, repo):
+    path = tmp_path / 'expenses.snap'
+    repo.save_snapshot(path, Expense)
+    with pytest.raises(SnapshotError):
+        MemoryRepository.load_snapshot(path, Category)
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / 'garbage.snap'
+    path.write_bytes(b'x' * 100)
+    with pytest.raises(SnapshotError):
+        MemoryRepository.load_snapshot(path, Expense)
+
+
+@dataclass
+class ExpenseV1:
+    """ Расход в том виде, в каком он записывался до появления валют """
+    amount: int
+    category: int
+    expense_date: datetime = field(default_factory=datetime.now)
+    added_date: datetime = field(default_factory=datetime.now)
+    comment: str = ''
+    pk: int = 0
+
+
+def set_version(path, version):
+    data = bytearray(path.read_bytes())
+    struct.pack_into('<H', data, 6, version)
+    path.write_bytes(data)
+
+
+def test_version_schema():
+    assert version_schema(Expense, FORMAT_VERSION) == model_schema(Expense)
+    assert version_schema(Expense, 1) == model_schema(ExpenseV1)
+    with pytest.raises(SnapshotError):
+        version_schema(Expense, FORMAT_VERSION + 1)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_old_format_is_migrated(tmp_path, compress):
+    old = MemoryRepository[ExpenseV1]()
+    old.add(ExpenseV1(100, 1, datetime(2023, 3, 1), comment='Гречка'))
+    old.add(ExpenseV1(250, 2))
+    path = tmp_path / 'expenses.snap'
+    old.save_snapshot(path, ExpenseV1, compress=compress)
+    set_version(path, 1)
+    restored = MemoryRepository.load_snapshot(path, Expense)
+    assert restored.get(1) == Expense(100, 1, datetime(2023, 3, 1),
+                                      old.get(1).added_date, 'Гречка', 'RUB', 1)
+    assert [e.currency for e in restored.get_all()] == ['RUB', 'RUB']
+    assert restored.add(Expense(1, 1)) == 3
+
+
+def test_unsupported_version(tmp_path, repo):
+    path = tmp_path / 'expenses.snap'
+    repo.save_snapshot(path, Expense)
+    set_version(path, FORMAT_VERSION + 1)
+    with pytest.raises(SnapshotError):
+        MemoryRepository.load_snapshot(path, Expense)
+    set_version(path, 1)
+    with pytest.raises(SnapshotError):
+        MemoryRepository.load_snapshot(path, Expense)
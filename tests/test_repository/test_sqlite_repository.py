@@ -0,0 +1,202 @@
+import multiprocessing
+import time
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.change_feed import OP_ADD, OP_DELETE, OP_RESET, OP_UPDATE
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return tmp_path / 'test.sqlite3'
+
+
+@pytest.fixture
+def repo(db_file):
+    with SQLiteRepository(db_file, Expense) as repo:
+        yield repo
+
+
+def test_crud(repo):
+    obj = Expense(100, 1, expense_date=datetime(2023, 1, 2, 3, 4, 5), comment='Хлеб')
+    pk = repo.add(obj)
+    assert obj.pk == pk
+    assert repo.get(pk) == obj
+    obj2 = Expense(200, 2, comment='Молоко', pk=pk)
+    repo.update(obj2)
+    assert repo.get(pk) == obj2
+    repo.delete(pk)
+    assert repo.get(pk) is None
+
+
+def test_add_many(repo):
+    repo.add(Expense(1, 1))
+    objs = [Expense(i, 1) for i in range(10)]
+    pks = repo.add_many(objs)
+    assert pks == [obj.pk for obj in objs] == list(range(2, 12))
+    assert [repo.get(pk).amount for pk in pks] == list(range(10))
+    with pytest.raises(ValueError):
+        repo.add_many([Expense(1, 1, pk=1)])
+    assert repo.add_many([]) == []
+
+
+def test_cannot_add_with_pk(repo):
+    with pytest.raises(ValueError):
+        repo.add(Expense(100, 1, pk=1))
+
+
+def test_cannot_update_without_pk(repo):
+    with pytest.raises(ValueError):
+        repo.update(Expense(100, 1))
+
+
+def test_cannot_delete_unexistent(repo):
+    with pytest.raises(KeyError):
+        repo.delete(1)
+
+
+def test_restore(repo):
+    obj = Expense(100, 1)
+    repo.add(obj)
+    repo.delete(obj.pk)
+    repo.restore(obj)
+    assert repo.get(obj.pk) == obj
+    with pytest.raises(ValueError):
+        repo.restore(obj)
+
+
+def test_get_all_with_condition(db_file):
+    with SQLiteRepository(db_file, Category) as repo:
+        food = Category('Продукты')
+        repo.add(food)
+        meat = Category('Мясо', food.pk)
+        repo.add(meat)
+        assert repo.get_all() == [food, meat]
+        assert repo.get_all({'parent': None}) == [food]
+        assert repo.get_all({'name': 'Мясо', 'parent': food.pk}) == [meat]
+        with pytest.raises(ValueError):
+            repo.get_all({'name; DROP TABLE category': 1})
+
+
+def test_data_persists(db_file):
+    with SQLiteRepository(db_file, Expense) as repo:
+        pk = repo.add(Expense(100, 1))
+    with SQLiteRepository(db_file, Expense) as repo:
+        assert repo.get(pk).amount == 100
+
+
+def _write_and_read(db_file, worker, rows, results):
+    with SQLiteRepository(db_file, Expense, busy_timeout=0.05) as repo:
+        for i in range(rows):
+            repo.add(Expense(i, worker, comment=f'процесс {worker}'))
+            repo.get_all({'category': worker})
+        results.put((worker, repo.stats))
+
+
+def test_concurrent_processes(db_file):
+    workers, rows = 4, 100
+    SQLiteRepository(db_file, Expense).close()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_write_and_read,
+                                         args=(db_file, worker, rows, results))
+                 for worker in range(workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    stats = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    assert all(process.exitcode == 0 for process in processes)
+    with SQLiteRepository(db_file, Expense) as repo:
+        for worker in range(workers):
+            amounts = [expense.amount for expense in repo.get_all({'category': worker})]
+            assert amounts == list(range(rows))
+    assert all(worker_stats.failures == 0 for _, worker_stats in stats)
+    print(f'\n{workers * rows / elapsed:.0f} transactions/s,',
+          f'retries: {sum(s.retries for _, s in stats)},',
+          f'lock wait: {sum(s.lock_wait for _, s in stats):.3f} s')
+
+
+def test_change_feed(repo):
+    first = Expense(100, 1)
+    repo.add(first)
+    repo.update(Expense(150, 1, pk=first.pk))
+    second = Expense(200, 2)
+    repo.add(second)
+    repo.delete(second.pk)
+    changes = repo.changes(1)
+    assert [(c.op, c.pk) for c in changes] == [
+        (OP_UPDATE, first.pk), (OP_ADD, second.pk), (OP_DELETE, second.pk)]
+    assert changes[0].obj.amount == 150
+    assert changes[1].obj is None  # объект уже удалён
+    assert repo.version == 4
+
+
+def test_changes_of_other_connections_are_polled(db_file):
+    with SQLiteRepository(db_file, Expense) as repo, \
+            SQLiteRepository(db_file, Expense) as other:
+        received = []
+        repo.subscribe(received.append)
+        repo.add(Expense(100, 1))
+        assert [c.op for c in received] == [OP_ADD]
+        assert repo.poll() == 0
+        other.add(Expense(200, 2))
+        assert repo.poll() == 1
+        assert received[-1].obj.amount == 200
+        assert repo.poll() == 0
+
+
+def test_change_feed_gap_resets_subscribers(db_file):
+    with SQLiteRepository(db_file, Expense) as repo, \
+            SQLiteRepository(db_file, Expense) as other:
+        received = []
+        repo.subscribe(received.append)
+        other.add(Expense(100, 1))
+        other.add(Expense(200, 1))
+        connection = sqlite3.connect(db_file)
+        with connection:
+            connection.execute('DELETE FROM expense_changes WHERE version = 1')
+        connection.close()
+        repo.poll()
+        assert [c.op for c in received] == [OP_RESET]
+
+
+def test_where_set(repo):
+    repo.add_many([Expense(i, i % 4) for i in range(8)])
+    assert [e.amount for e in repo.get_all({'category': {1, 3}})] == [1, 3, 5, 7]
+    assert repo.get_all({'category': set()}) == []
+
+
+def test_update_and_delete_where(repo):
+    repo.add_many([Expense(i, i % 4) for i in range(8)])
+    since = repo.version
+    assert repo.update_where({'category': {1, 3}}, {'category': 0}) == 4
+    assert len(repo.get_all({'category': 0})) == 6
+    assert [c.op for c in repo.changes(since)] == [OP_UPDATE] * 4
+    assert repo.delete_where({'category': 0}) == 6
+    assert [e.category for e in repo.get_all()] == [2, 2]
+    with pytest.raises(ValueError):
+        repo.update_where({}, {'name': 'x'})
+
+
+def test_new_model_fields_are_added_to_existing_table(db_file):
+    connection = sqlite3.connect(db_file)
+    connection.execute('CREATE TABLE expense (pk INTEGER PRIMARY KEY, '
+                       'amount INTEGER NOT NULL, category INTEGER NOT NULL, '
+                       'expense_date TEXT NOT NULL, added_date TEXT NOT NULL, '
+                       'comment TEXT NOT NULL)')
+    connection.execute("INSERT INTO expense VALUES (1, 100, 1, '2023-01-02 00:00:00', "
+                       "'2023-01-02 00:00:00', 'Хлеб')")
+    connection.commit()
+    connection.close()
+    with SQLiteRepository(db_file, Expense) as repo:
+        assert repo.get(1).currency == 'RUB'
+        repo.add(Expense(5, 1, currency='USD'))
+        assert [e.currency for e in repo.get_all()] == ['RUB', 'USD']
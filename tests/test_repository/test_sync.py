@@ -0,0 +1,121 @@
+import json
+import time
+import zlib
+from datetime import datetime
+
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.sqlite_repository import SQLiteRepository
+from bookkeeper.repository.sync import SyncError, SyncReplica, sync
+
+
+class Database:
+    def __init__(self, path):
+        self.path = path
+        self.categories = SQLiteRepository(path, Category)
+        self.expenses = SQLiteRepository(path, Expense)
+        self.budgets = SQLiteRepository(path, Budget)
+        self.replica = SyncReplica(path)
+
+    def close(self):
+        for closable in (self.categories, self.expenses, self.budgets, self.replica):
+            closable.close()
+
+    def content(self):
+        names = {c.pk: c.name for c in self.categories.get_all()}
+        return (
+            sorted((c.name, names.get(c.parent)) for c in self.categories.get_all()),
+            sorted((e.amount, names.get(e.category), e.expense_date, e.comment)
+                   for e in self.expenses.get_all()),
+            sorted((b.period, names.get(b.category), b.amount)
+                   for b in self.budgets.get_all()),
+        )
+
+
+@pytest.fixture
+def laptop(tmp_path):
+    db = Database(tmp_path / 'laptop.sqlite3')
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def server(tmp_path):
+    db = Database(tmp_path / 'server.sqlite3')
+    yield db
+    db.close()
+
+
+def test_sync_maps_foreign_keys(laptop, server):
+    server.categories.add(Category('Транспорт'))
+    food = Category('Продукты')
+    laptop.categories.add(food)
+    meat = Category('Мясо', food.pk)
+    laptop.categories.add(meat)
+    laptop.expenses.add(Expense(300, meat.pk, datetime(2023, 5, 1), comment='Курица'))
+    laptop.budgets.add(Budget('месяц', food.pk, 10000))
+
+    result = sync(laptop.replica, server.replica)
+    assert (result.sent, result.received) == (4, 1)
+    assert laptop.content() == server.content()
+    assert server.expenses.get_all()[0].category != meat.pk  # pk в базах разные
+
+
+def test_second_sync_transfers_only_changes(laptop, server):
+    for i in range(2000):
+        laptop.expenses.add(Expense(i, 1, comment=f'Покупка номер {i}'))
+    first = sync(laptop.replica, server.replica)
+    laptop.expenses.update(Expense(1, 1, comment='Исправлено', pk=5))
+    server.expenses.delete(10)
+    second = sync(laptop.replica, server.replica)
+    assert (second.sent, second.received) == (1, 1)
+    assert second.transferred < 1000 < first.transferred
+    assert laptop.content() == server.content()
+    assert sync(laptop.replica, server.replica).sent == 0
+
+
+def test_conflict_resolution_is_deterministic(laptop, server):
+    laptop.categories.add(Category('Еда'))
+    sync(laptop.replica, server.replica)
+    server_pk = server.categories.get_all()[0].pk
+    laptop.categories.update(Category('Продукты', pk=1))
+    time.sleep(0.01)
+    server.categories.update(Category('Покупки', pk=server_pk))
+    sync(laptop.replica, server.replica)
+    assert laptop.content() == server.content()
+    assert laptop.categories.get(1).name == 'Покупки'
+
+
+def test_deletion_wins_over_older_update(laptop, server):
+    laptop.expenses.add(Expense(100, 1))
+    sync(server.replica, laptop.replica)
+    laptop.expenses.update(Expense(150, 1, pk=1))
+    time.sleep(0.01)
+    server.expenses.delete(server.expenses.get_all()[0].pk)
+    sync(laptop.replica, server.replica)
+    assert laptop.expenses.get_all() == server.expenses.get_all() == []
+
+
+def test_sync_is_idempotent(laptop, server):
+    laptop.categories.add(Category('Еда'))
+    message = laptop.replica.delta_for(server.replica.replica_id)
+    assert server.replica.apply_delta(message) == 1
+    assert server.replica.apply_delta(message) == 0
+    assert len(server.categories.get_all()) == 1
+
+
+def test_failed_sync_changes_nothing(laptop, server):
+    laptop.categories.add(Category('Еда'))
+    laptop.expenses.add(Expense(100, 1))
+    laptop.expenses.add(Expense(200, 1))
+    message = json.loads(zlib.decompress(
+        laptop.replica.delta_for(server.replica.replica_id)))
+    del message['tables']['category']
+    with pytest.raises(SyncError):
+        server.replica.apply_delta(zlib.compress(json.dumps(message).encode()))
+    with pytest.raises(SyncError):
+        server.replica.apply_delta(b'garbage')
+    assert server.expenses.get_all() == []
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.repository.change_feed import OP_ADD, OP_DELETE, OP_UPDATE
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.sqlite_repository import SQLiteRepository, SQLiteUnitOfWork
+from bookkeeper.repository.unit_of_work import MemoryUnitOfWork
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def uow(request, tmp_path):
+    if request.param == 'memory':
+        categories = MemoryRepository[Category]()
+        expenses = MemoryRepository[Expense]()
+        uow = MemoryUnitOfWork([categories, expenses])
+        yield uow, categories, expenses
+        return
+    uow = SQLiteUnitOfWork(tmp_path / 'test.sqlite3')
+    yield uow, uow.repository(Category), uow.repository(Expense)
+    uow.close()
+
+
+def test_commit(uow):
+    uow, categories, expenses = uow
+    with uow:
+        pk = categories.add(Category('продукты'))
+        expenses.add(Expense(100, pk))
+        # Внутри блока видны его собственные изменения
+        assert categories.get(pk).name == 'продукты'
+        assert len(expenses.get_all({'category': pk})) == 1
+    assert [e.amount for e in expenses.get_all()] == [100]
+
+
+def test_rollback(uow):
+    uow, categories, expenses = uow
+    food = categories.add(Category('продукты'))
+    books = categories.add(Category('книги'))
+    expenses.add_many([Expense(100, food), Expense(200, books)])
+    received = []
+    categories.subscribe(received.append)
+    with pytest.raises(RuntimeError):
+        with uow:
+            expenses.update_where({'category': food}, {'category': books})
+            categories.delete(food)
+            with uow:
+                categories.add(Category('одежда'))
+            raise RuntimeError
+    assert sorted(c.name for c in categories.get_all()) == ['книги', 'продукты']
+    assert [e.category for e in expenses.get_all()] == [food, books]
+    assert not uow.active
+    # Подписчик видит либо изменения и обратные им, либо ничего
+    ops = [change.op for change in received]
+    assert ops in ([], [OP_DELETE, OP_ADD, OP_DELETE, OP_ADD])
+
+
+def test_changes_published_after_commit(uow):
+    uow, categories, _ = uow
+    received = []
+    categories.subscribe(received.append)
+    with uow:
+        pk = categories.add(Category('продукты'))
+        categories.update(Category('еда', pk=pk))
+    assert [change.op for change in received] == [OP_ADD, OP_UPDATE]
+
+
+def test_single_commit(tmp_path):
+    db_file = tmp_path / 'test.sqlite3'
+    n = 300
+    with SQLiteRepository(db_file, Category) as categories:
+        started = time.perf_counter()
+        for i in range(n):
+            categories.add(Category(f'категория {i}'))
+        separate = time.perf_counter() - started
+
+    uow = SQLiteUnitOfWork(db_file)
+    categories = uow.repository(Category)
+    expenses = uow.repository(Expense)
+    transactions = uow.stats.transactions
+    started = time.perf_counter()
+    with uow:
+        for i in range(n):
+            pk = categories.add(Category(f'категория {i}'))
+            expenses.add(Expense(i, pk))
+    together = time.perf_counter() - started
+    uow.close()
+    print(f'\n{n} separate commits: {separate:.3f} s, '
+          f'{2 * n} changes in one commit: {together:.3f} s')
+    assert uow.stats.transactions == transactions + 1
+    assert together < separate
+
+
+def test_other_threads_wait_for_commit(tmp_path):
+    uow = SQLiteUnitOfWork(tmp_path / 'test.sqlite3')
+    categories = uow.repository(Category)
+    entered = threading.Event()
+    seen = []
+
+    def writer():
+        entered.wait()
+        categories.add(Category('книги'))
+        seen.append([c.name for c in categories.get_all()])
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    with uow:
+        categories.add(Category('продукты'))
+        entered.set()
+        time.sleep(0.05)
+        assert [c.name for c in categories.get_all()] == ['продукты']
+    thread.join()
+    uow.close()
+    assert seen == [['продукты', 'книги']]
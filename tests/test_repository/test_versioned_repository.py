@@ -0,0 +1,155 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.repository.unit_of_work import MemoryUnitOfWork
+from bookkeeper.repository.versioned_repository import VersionedMemoryRepository
+
+MARCH = datetime(2024, 3, 1)
+
+
+class Clock:
+    def __init__(self):
+        self.now = MARCH
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, days):
+        self.now += timedelta(days=days)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def repo(clock):
+    return VersionedMemoryRepository[Budget](clock)
+
+
+def test_as_of(repo, clock):
+    pk = repo.add(Budget('месяц', 1, 3000))
+    clock.advance(31)
+    repo.update(Budget('месяц', 1, 5000, pk=pk))
+    clock.advance(30)
+    repo.delete(pk)
+    assert repo.get(pk) is None
+    assert repo.get(pk, as_of=MARCH - timedelta(days=1)) is None
+    assert repo.get(pk, as_of=MARCH + timedelta(days=15)).amount == 3000
+    assert repo.get(pk, as_of=MARCH + timedelta(days=31)).amount == 5000
+    assert repo.get(pk, as_of=clock.now) is None
+    assert [end for _, end, _ in repo.versions(pk)] == [
+        MARCH + timedelta(days=31), clock.now]
+
+
+def test_history_is_not_changed_in_place(repo, clock):
+    pk = repo.add(Budget('месяц', 1, 3000))
+    clock.advance(1)
+    repo.update_where({'category': 1}, {'amount': 4000})
+    repo.get(pk, as_of=MARCH).amount = 0
+    assert repo.get(pk, as_of=MARCH).amount == 3000
+    assert repo.get(pk).amount == 4000
+
+
+def test_get_all_as_of(repo, clock):
+    repo.add(Budget('месяц', 1, 3000))
+    repo.add(Budget('день', 2, 100))
+    clock.advance(10)
+    repo.add(Budget('неделя', 1, 700))
+    repo.delete_where({'period': 'день'})
+    assert [b.amount for b in repo.get_all(as_of=MARCH)] == [3000, 100]
+    assert [b.amount for b in repo.get_all({'category': 1}, as_of=clock.now)] == [
+        3000, 700]
+    assert repo.get_all() == repo.get_all(as_of=clock.now)
+
+
+def test_changes_in_one_moment_are_one_version(repo):
+    pk = repo.add(Budget('месяц', 1, 3000))
+    repo.update(Budget('месяц', 1, 4000, pk=pk))
+    assert [obj.amount for _, _, obj in repo.versions(pk)] == [4000]
+
+
+def test_clock_going_back(repo, clock):
+    pk = repo.add(Budget('месяц', 1, 3000))
+    clock.advance(-1)
+    repo.update(Budget('месяц', 1, 4000, pk=pk))
+    assert repo.get(pk, as_of=MARCH).amount == 4000
+
+
+def test_compact(repo, clock):
+    old = repo.add(Budget('месяц', 1, 3000))
+    kept = repo.add(Budget('день', 1, 100))
+    for amount in (3100, 3200):
+        clock.advance(30)
+        repo.update(Budget('месяц', 1, amount, pk=old))
+    repo.delete(kept)
+    boundary = MARCH + timedelta(days=45)
+    assert repo.compact(boundary) == 1
+    assert repo.get(old, as_of=boundary).amount == 3100
+    assert repo.get(kept, as_of=boundary).amount == 100
+    assert repo.compact(clock.now) == 2
+    assert repo.versions(kept) == []
+    assert len(repo.versions(old)) == 1
+    with pytest.raises(ValueError):
+        repo.get(old, as_of=MARCH)
+
+
+def test_rollback(clock):
+    categories = VersionedMemoryRepository[Category](clock)
+    pk = categories.add(Category('продукты'))
+    clock.advance(1)
+    with pytest.raises(RuntimeError):
+        with MemoryUnitOfWork([categories]):
+            categories.update(Category('еда', pk=pk))
+            raise RuntimeError
+    assert categories.get(pk, as_of=clock.now).name == 'продукты'
+
+
+def test_transaction_history(repo, clock):
+    pk = repo.add(Budget('месяц', 1, 3000))
+    clock.advance(1)
+    with pytest.raises(RuntimeError):
+        with MemoryUnitOfWork([repo]):
+            repo.update(Budget('месяц', 1, 4000, pk=pk))
+            clock.advance(1)
+            repo.add(Budget('день', 1, 100))
+            raise RuntimeError
+    assert [(start, end) for start, end, _ in repo.versions(pk)] == [(MARCH, None)]
+    assert repo.versions(2) == []
+    assert repo.get_all(as_of=clock.now) == [Budget('месяц', 1, 3000, pk=pk)]
+    with MemoryUnitOfWork([repo]):
+        repo.update(Budget('месяц', 1, 5000, pk=pk))
+        assert repo.versions(pk)[-1][2].amount == 3000
+    assert [obj.amount for _, _, obj in repo.versions(pk)] == [3000, 5000]
+
+
+def test_snapshot(tmp_path):
+    repo = MemoryRepository[Category]()
+    repo.add(Category('продукты'))
+    repo.save_snapshot(tmp_path / 'snapshot.bin', Category)
+    loaded = VersionedMemoryRepository.load_snapshot(tmp_path / 'snapshot.bin', Category)
+    assert [c.name for c in loaded.get_all(as_of=datetime.now())] == ['продукты']
+
+
+def test_current_state_speed(clock):
+    plain = MemoryRepository[Budget]()
+    versioned = VersionedMemoryRepository[Budget](clock)
+    for repo in (plain, versioned):
+        for i in range(2000):
+            pk = repo.add(Budget('месяц', i, 100))
+            for amount in range(5):
+                repo.update(Budget('месяц', i, amount, pk=pk))
+    timings = []
+    for repo in (plain, versioned):
+        started = time.perf_counter()
+        for _ in range(50):
+            repo.get_all({'category': 5})
+        timings.append(time.perf_counter() - started)
+    print(f'\nget_all: plain {timings[0]:.3f} s, versioned {timings[1]:.3f} s')
+    assert timings[1] < 2 * timings[0] + 0.01
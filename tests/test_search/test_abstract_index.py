@@ -0,0 +1,13 @@
+import pytest
+
+from bookkeeper.search.abstract_index import AbstractSearchIndex, tokenize
+
+
+def test_tokenize():
+    assert tokenize('Гречка, ПЕЛЬМЕНИ и ёжики!') == ['гречка', 'пельмени', 'и', 'ежики']
+    assert tokenize('  ...  ') == []
+
+
+def test_cannot_create_abstract_index():
+    with pytest.raises(TypeError):
+        AbstractSearchIndex()
@@ -0,0 +1,52 @@
+import pytest
+
+from bookkeeper.search.sqlite_index import SQLiteSearchIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SQLiteSearchIndex(tmp_path / 'search.sqlite3')
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def filled(index):
+    index.add(1, 'Гречка')
+    index.add(2, 'Пельмени домашние')
+    index.add(3, 'гречка ядрица')
+    index.add(4, 'Ёлка')
+    index.add(5, '')
+    return index
+
+
+def test_search(filled):
+    assert filled.search('гречка') == [3, 1]
+    assert filled.search('ГРЕЧКА ядрица') == [3]
+    assert filled.search('молоко') == []
+    assert filled.search('') == []
+
+
+def test_prefix(filled):
+    assert filled.search('греч') == [3, 1]
+    assert filled.search('пел дом') == [2]
+    assert filled.search('елк') == [4]
+
+
+def test_paging(filled):
+    assert filled.search('греч', offset=0, limit=1) == [3]
+    assert filled.search('греч', offset=1, limit=1) == [1]
+    assert filled.search('греч', offset=2, limit=1) == []
+
+
+def test_remove_and_update(filled):
+    filled.remove(3)
+    assert filled.search('греч') == [1]
+    filled.update(1, 'Пельмени')
+    assert filled.search('греч') == []
+    assert filled.search('пельмени') == [2, 1]
+    filled.remove(100)
+
+
+def test_len(filled):
+    assert len(filled) == 4
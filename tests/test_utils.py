@@ -3,7 +3,7 @@ from textwrap import dedent
 
 import pytest
 
-from bookkeeper.utils import read_tree
+from bookkeeper.utils import iter_tree, read_tree
 
 
 def test_create_tree():
@@ -71,3 +71,36 @@ def test_with_file():
             ('child2', 'parent1'),
             ('parent2', None)
         ]
+
+
+def test_iter_tree_paths():
+    text = dedent('''
+        parent1
+            child
+                grandchild
+        parent2
+            child
+    ''')
+    assert list(iter_tree(text.splitlines())) == [
+        ('parent1',),
+        ('parent1', 'child'),
+        ('parent1', 'child', 'grandchild'),
+        ('parent2',),
+        ('parent2', 'child'),
+    ]
+
+
+def test_iter_tree_is_lazy():
+    def lines():
+        yield 'parent'
+        yield '    child'
+        raise AssertionError('read too far')
+
+    paths = iter_tree(lines())
+    assert next(paths) == ('parent',)
+    assert next(paths) == ('parent', 'child')
+
+
+def test_iter_tree_indentation_error():
+    with pytest.raises(IndentationError):
+        list(iter_tree(['    parent', 'child']))
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from bookkeeper.utils import humanize_datetime
+from bookkeeper.view.formatting import CellFormatter
+
+
+@pytest.fixture
+def formatter():
+    return CellFormatter(minor_digits=2, thousands_sep=' ', decimal_point=',')
+
+
+def test_format_datetime(formatter):
+    value = datetime(2024, 3, 1, 15, 4, 5, 999999)
+    assert formatter.format_datetime(value) == '2024-03-01 15:04:05'
+    assert formatter.format_datetime(value) == humanize_datetime(value)
+    assert formatter.format_date(value) == formatter.format_date(value.date()) \
+        == '2024-03-01'
+    assert CellFormatter('%d.%m.%Y').format_datetime(value) == '01.03.2024 15:04:05'
+
+
+def test_format_amount(formatter):
+    assert formatter.format_amount(0) == '0,00'
+    assert formatter.format_amount(5) == '0,05'
+    assert formatter.format_amount(123456789) == '1 234 567,89'
+    assert formatter.format_amount(-100) == '-1,00'
+    # Точность не теряется на суммах, не представимых в float
+    assert formatter.format_amount(10 ** 20 + 1) == '1 000 000 000 000 000 000,01'
+    plain = CellFormatter(thousands_sep='')
+    assert plain.format_amount(1234567) == '1234567'
+    with pytest.raises(ValueError):
+        CellFormatter(minor_digits=-1)
+
+
+def test_many_cells(formatter):
+    n = 200_000
+    start = datetime(2020, 1, 1)
+    values = [(start + timedelta(minutes=7 * i), i * 37 % 100_000) for i in range(n)]
+    cells = [(formatter.format_datetime(dt), formatter.format_amount(amount))
+             for dt, amount in values]
+    assert [text for text, _ in cells] == [
+        dt.strftime('%Y-%m-%d %H:%M:%S') for dt, _ in values]
+    assert [amount for _, amount in cells[:4]] == ['0,00', '0,37', '0,74', '1,11']
+    assert cells[3000][1] == '110,00'
@@ -0,0 +1,146 @@
+import asyncio
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from bookkeeper.models.budget import Budget
+from bookkeeper.models.category import Category
+from bookkeeper.models.expense import Expense
+from bookkeeper.presenter.bookkeeper import BookkeeperPresenter
+from bookkeeper.repository.memory_repository import MemoryRepository
+from bookkeeper.view.http_view import HTTPView
+
+
+@pytest.fixture
+def server():
+    categories = MemoryRepository[Category]()
+    categories.add(Category('продукты'))
+    view = HTTPView(port=0)
+    presenter = BookkeeperPresenter(
+        MemoryRepository[Budget](), categories, MemoryRepository[Expense](), view)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(view.start(), loop).result()
+    yield view, presenter
+    asyncio.run_coroutine_threadsafe(view.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture
+def client(server):
+    view, _ = server
+    connection = http.client.HTTPConnection('127.0.0.1', view.port, timeout=5)
+    yield connection
+    connection.close()
+
+
+def request(client, method, url, body=None):
+    client.request(method, url, body=None if body is None else json.dumps(body))
+    response = client.getresponse()
+    data = response.read()
+    return response.status, json.loads(data) if data else None
+
+
+def test_crud(client):
+    status, expense = request(client, 'POST', '/expenses',
+                              {'amount': 100, 'category': 1, 'comment': 'Гречка',
+                               'expense_date': '2023-03-01T12:00:00'})
+    assert status == 201
+    assert expense['pk'] == 1
+    assert request(client, 'GET', '/expenses/1')[1]['comment'] == 'Гречка'
+    status, expense = request(client, 'PUT', '/expenses/1',
+                              {'amount': 200, 'category': 1})
+    assert status == 200
+    assert request(client, 'GET', '/expenses')[1][0]['amount'] == 200
+    assert request(client, 'DELETE', '/expenses/1')[0] == 204
+    assert request(client, 'GET', '/expenses/1')[0] == 404
+    assert request(client, 'GET', '/expenses') == (200, [])
+
+
+def test_categories_and_budgets(client):
+    assert request(client, 'GET', '/categories')[1] == [
+        {'name': 'продукты', 'parent': None, 'pk': 1}]
+    status, budget = request(client, 'POST', '/budgets',
+                             {'period': 'день', 'category': 1, 'amount': 500})
+    assert status == 201
+    assert request(client, 'GET', '/analysis')[1]['budgets'] == [500, 0, 0]
+    [forecast] = request(client, 'GET', '/forecast')[1]
+    assert forecast['budget']['amount'] == 500
+    assert not forecast['exceeded']
+
+
+def test_merge_categories(client):
+    request(client, 'POST', '/categories', {'name': 'книги'})
+    request(client, 'POST', '/expenses', {'amount': 100, 'category': 1})
+    assert request(client, 'POST', '/categories/1/merge', {'target': 2})[0] == 204
+    assert [c['pk'] for c in request(client, 'GET', '/categories')[1]] == [2]
+    assert request(client, 'GET', '/expenses/1')[1]['category'] == 2
+    assert request(client, 'POST', '/categories/2/merge', {'target': 2})[0] == 400
+    assert request(client, 'POST', '/categories/2/merge', {})[0] == 400
+    assert request(client, 'POST', '/categories/2/merge', {'target': 5})[0] == 404
+    assert request(client, 'POST', '/categories/7/merge', {'target': 2})[0] == 404
+
+
+def test_delete_category_cascade(client):
+    request(client, 'POST', '/expenses', {'amount': 100, 'category': 1})
+    assert request(client, 'DELETE', '/categories/1')[0] == 400
+    assert request(client, 'GET', '/expenses/1')[0] == 200
+    assert request(client, 'DELETE', '/categories/1?cascade=1')[0] == 204
+    assert request(client, 'GET', '/categories') == (200, [])
+    assert request(client, 'GET', '/expenses') == (200, [])
+
+
+def test_report(client):
+    for amount, comment in [(100, 'Гречка'), (300, 'Фарш'), (50, 'Гречка')]:
+        request(client, 'POST', '/expenses',
+                {'amount': amount, 'category': 1, 'comment': comment,
+                 'expense_date': '2024-03-01T12:00:00'})
+    assert request(client, 'GET', '/report?group_by=comment&order_by=sum') == (
+        200, [['Фарш', 300], ['Гречка', 150]])
+    assert request(client, 'GET', '/report?group_by=month&aggregates=count,p50'
+                                  '&start=2024-03-01') == (200, [['2024-03', 3, 100]])
+    assert request(client, 'GET', '/report?group_by=day&end=2024-01-01') == (200, [])
+    assert request(client, 'GET', '/report?group_by=hour')[0] == 400
+    assert request(client, 'GET', '/report?limit=x')[0] == 400
+
+
+def test_pagination(client):
+    for i in range(150):
+        request(client, 'POST', '/categories', {'name': str(i)})
+    client.request('GET', '/categories?offset=100&limit=60')
+    response = client.getresponse()
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    assert response.getheader('X-Total-Count') == '151'
+    names = [c['name'] for c in json.loads(response.read())]
+    assert names == [str(i) for i in range(99, 150)]
+
+
+def test_errors(client):
+    assert request(client, 'GET', '/unknown')[0] == 404
+    assert request(client, 'GET', '/expenses/abc')[0] == 404
+    assert request(client, 'PATCH', '/expenses')[0] == 405
+    assert request(client, 'DELETE', '/budgets/1')[0] == 404
+    client.request('POST', '/expenses', body='not json')
+    response = client.getresponse()
+    response.read()
+    assert response.status == 400
+    assert request(client, 'POST', '/expenses', {'amount': 1})[0] == 400
+    assert request(client, 'GET', '/expenses?limit=x')[0] == 400
+
+
+def test_pipelining(server):
+    view, _ = server
+    with socket.create_connection(('127.0.0.1', view.port), timeout=5) as sock:
+        sock.sendall(b'GET /analysis HTTP/1.1\r\nHost: x\r\n\r\n' * 3
+                     + b'GET /analysis HTTP/1.1\r\nConnection: close\r\n\r\n')
+        data = b''
+        while chunk := sock.recv(65536):
+            data += chunk
+    assert data.count(b'HTTP/1.1 200 OK') == 4
+    assert data.count(b'Connection: close') == 1
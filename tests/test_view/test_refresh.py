@@ -0,0 +1,41 @@
+from bookkeeper.view.refresh import RefreshScheduler
+
+
+class Tab:
+    def __init__(self):
+        self.calls = []
+
+    def update(self, *args):
+        self.calls.append(args)
+
+
+def test_visible_tab_is_updated_at_once():
+    visible, hidden = Tab(), Tab()
+    scheduler = RefreshScheduler()
+    scheduler.set_current(lambda: visible)
+    for tab in (visible, hidden):
+        scheduler.slot(tab, tab.update)(1)
+    assert visible.calls == [(1,)]
+    assert hidden.calls == []
+    assert scheduler.is_dirty(hidden)
+    assert not scheduler.is_dirty(visible)
+
+
+def test_hidden_tab_is_updated_once_on_show():
+    visible, hidden = Tab(), Tab()
+    scheduler = RefreshScheduler()
+    scheduler.set_current(lambda: visible)
+    slot = scheduler.slot(hidden, hidden.update)
+    for i in range(4):
+        slot(i, 'категории')
+    scheduler.show(hidden)
+    assert hidden.calls == [(3, 'категории')]
+    assert not scheduler.is_dirty(hidden)
+    scheduler.show(hidden)
+    assert len(hidden.calls) == 1
+
+
+def test_without_current_updates_are_immediate():
+    tab = Tab()
+    RefreshScheduler().slot(tab, tab.update)(1)
+    assert tab.calls == [(1,)]